@@ -0,0 +1,80 @@
+"""
+Compara la latencia de los backends de inferencia para ambas arquitecturas de actor.
+
+Uso:
+    python api/benchmark_backends.py [--batch-sizes 1 21 64 1344] [--iterations 2000]
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inference_backends import BACKENDS, create_backend
+from models.models import Actor
+from src.utils.model_predictor import Actor as PredictorActor
+from constants.constants import STATE_DIM, ACTION_DIM
+
+def measure(backend_name: str, actor: torch.nn.Module, states: np.ndarray, iterations: int) -> Dict[str, float]:
+    """
+    Mide la latencia de un backend sobre un lote fijo de estados.
+
+    Parámetros:
+    -----------
+    backend_name : str
+        Nombre del backend.
+    actor : torch.nn.Module
+        Actor a evaluar.
+    states : np.ndarray
+        Lote de estados en float32.
+    iterations : int
+        Repeticiones medidas (tras un calentamiento).
+
+    Retorna:
+    --------
+    Dict[str, float]
+        Percentiles 50 y 99 de latencia en microsegundos.
+    """
+    backend = create_backend(backend_name)
+    for _ in range(min(100, iterations)):
+        backend.run(actor, states)
+
+    timings: np.ndarray = np.empty(iterations)
+    for i in range(iterations):
+        start: float = time.perf_counter()
+        backend.run(actor, states)
+        timings[i] = time.perf_counter() - start
+    return {"p50_us": float(np.percentile(timings, 50) * 1e6), "p99_us": float(np.percentile(timings, 99) * 1e6)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latencia de los backends de inferencia")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 21, 64, 1344])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1, help="Hilos de torch (BLAS de NumPy usa su propia configuración)")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    actors: Dict[str, torch.nn.Module] = {
+        "api.Actor (4-400-300-3)": Actor(STATE_DIM, ACTION_DIM).eval(),
+        "model_predictor.Actor (5-512-256-3, LayerNorm)": PredictorActor().eval(),
+    }
+    rng: np.random.Generator = np.random.default_rng(0)
+
+    print(f"{'actor':<48} {'batch':>6} " + " ".join(f"{name + ' p50/p99 (us)':>26}" for name in BACKENDS))
+    for actor_name, actor in actors.items():
+        state_dim: int = actor.net[0].in_features
+        for batch_size in args.batch_sizes:
+            states: np.ndarray = rng.uniform(0, 1, size=(batch_size, state_dim)).astype(np.float32)
+            columns: List[str] = []
+            for backend_name in BACKENDS:
+                stats: Dict[str, float] = measure(backend_name, actor, states, args.iterations)
+                columns.append(f"{stats['p50_us']:>12.1f} / {stats['p99_us']:>11.1f}")
+            print(f"{actor_name:<48} {batch_size:>6} " + " ".join(f"{column:>26}" for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+class CGMRingBuffer:
+    """
+    Historial de lecturas de CGM (timestamp, valor) de un usuario con capacidad fija.
+    
+    Los timestamps (segundos epoch, float64) y los valores (mg/dL, float32) viven en arrays
+    preasignados. Cada lectura se escribe dos veces, en la posición i y en i + capacidad: así
+    cualquier tramo de hasta `capacity` lecturas consecutivas es contiguo en memoria y las
+    ventanas se devuelven como vistas de solo lectura, sin copiar. Agregar una lectura en
+    orden es O(1); las lecturas atrasadas o repetidas (cargas retroactivas) se mezclan
+    ordenando el contenido, y ante timestamps iguales prevalece la última lectura recibida.
+    
+    Las vistas reflejan el buffer: una escritura posterior puede sobrescribirlas cuando el
+    buffer da la vuelta, por lo que quien necesite conservarlas debe copiarlas.
+    """
+    
+    def __init__(self, capacity: int) -> None:
+        """
+        Inicializa los arrays del historial.
+        
+        Parámetros:
+        -----------
+        capacity : int
+            Lecturas que se conservan (las más antiguas se descartan).
+        """
+        if capacity <= 0:
+            raise ValueError("La capacidad del historial de CGM debe ser positiva")
+        self.capacity: int = capacity
+        self._timestamps: np.ndarray = np.zeros(2 * capacity, dtype=np.float64)
+        self._values: np.ndarray = np.zeros(2 * capacity, dtype=np.float32)
+        # Posición (módulo capacidad) de la próxima escritura y lecturas guardadas
+        self._end: int = 0
+        self._size: int = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        """
+        Timestamp de la lectura más reciente, o None si el historial está vacío.
+        """
+        return float(self._timestamps[self._end - 1 + self.capacity]) if self._size else None
+    
+    def _write(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """
+        Escribe lecturas ordenadas y posteriores a las guardadas a continuación de la última.
+        """
+        count: int = len(timestamps)
+        if count > self.capacity:
+            timestamps, values, count = timestamps[-self.capacity:], values[-self.capacity:], self.capacity
+        positions: np.ndarray = (self._end + np.arange(count)) % self.capacity
+        for offset in (0, self.capacity):
+            self._timestamps[positions + offset] = timestamps
+            self._values[positions + offset] = values
+        self._end = (self._end + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+    
+    def append(self, timestamp: float, value: float) -> int:
+        """
+        Agrega una lectura.
+        
+        Parámetros:
+        -----------
+        timestamp : float
+            Momento de la lectura en segundos epoch.
+        value : float
+            Glucosa en mg/dL.
+        
+        Retorna:
+        --------
+        int
+            1 si la lectura quedó en el historial (0 si es más antigua que todo lo guardado con el buffer lleno).
+        """
+        last: Optional[float] = self.last_timestamp
+        if last is None or timestamp > last:
+            # Camino habitual: escritura en las dos copias sin reservar memoria
+            self._timestamps[self._end] = self._timestamps[self._end + self.capacity] = timestamp
+            self._values[self._end] = self._values[self._end + self.capacity] = value
+            self._end = (self._end + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            return 1
+        return self.extend(np.array([timestamp]), np.array([value]))
+    
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Agrega un bloque de lecturas en cualquier orden.
+        
+        Parámetros:
+        -----------
+        timestamps : np.ndarray
+            Momentos de las lecturas en segundos epoch con forma (N,).
+        values : np.ndarray
+            Glucosa en mg/dL con forma (N,).
+        
+        Retorna:
+        --------
+        int
+            Lecturas del bloque que quedaron en el historial.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float32)
+        if len(timestamps) == 0:
+            return 0
+        received: int = len(timestamps)
+        last: Optional[float] = self.last_timestamp
+        if last is not None and timestamps.min() <= last:
+            # Lecturas atrasadas: se mezclan con el contenido actual (las recibidas quedan después
+            # y prevalecen ante timestamps iguales)
+            stored_timestamps, stored_values = self.latest(self._size)
+            timestamps = np.concatenate((stored_timestamps, timestamps))
+            values = np.concatenate((stored_values, values))
+            self._end = self._size = 0
+        order: np.ndarray = np.argsort(timestamps, kind="stable")
+        timestamps, values = timestamps[order], values[order]
+        keep: np.ndarray = np.append(timestamps[1:] != timestamps[:-1], True)
+        timestamps, values = timestamps[keep], values[keep]
+        self._write(timestamps, values)
+        # Las lecturas del bloque son las de índice original >= len(order) - received
+        return int(np.count_nonzero(order[keep][-self.capacity:] >= len(order) - received))
+    
+    def latest(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Obtiene las últimas lecturas como vistas de solo lectura, de la más antigua a la más reciente.
+        
+        Parámetros:
+        -----------
+        count : int
+            Lecturas pedidas (se devuelven como máximo las guardadas).
+        
+        Retorna:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            Timestamps y valores con forma (min(count, len),).
+        """
+        count = max(0, min(count, self._size))
+        start: int = (self._end - count) % self.capacity
+        timestamps: np.ndarray = self._timestamps[start:start + count]
+        values: np.ndarray = self._values[start:start + count]
+        timestamps.flags.writeable = False
+        values.flags.writeable = False
+        return timestamps, values
+    
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Obtiene las lecturas con timestamp en [start, end] como vistas de solo lectura.
+        
+        Parámetros:
+        -----------
+        start : Optional[float]
+            Inicio de la ventana en segundos epoch (None: desde la más antigua).
+        end : Optional[float]
+            Fin de la ventana en segundos epoch (None: hasta la más reciente).
+        
+        Retorna:
+        --------
+        Tuple[np.ndarray, np.ndarray]
+            Timestamps y valores de la ventana, en orden.
+        """
+        timestamps, values = self.latest(self._size)
+        low: int = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        high: int = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        return timestamps[low:high], values[low:high]
+    
+    def nbytes(self) -> int:
+        return self._timestamps.nbytes + self._values.nbytes
+
+class CGMHistoryStore:
+    """
+    Historiales de CGM por usuario, con una cantidad máxima de usuarios en memoria.
+    
+    Al superarla se descarta el historial del usuario sin lecturas hace más tiempo.
+    """
+    
+    def __init__(self, capacity: int, max_users: int) -> None:
+        """
+        Inicializa el almacén.
+        
+        Parámetros:
+        -----------
+        capacity : int
+            Lecturas por usuario.
+        max_users : int
+            Usuarios con historial en memoria.
+        """
+        self.capacity: int = capacity
+        self.max_users: int = max_users
+        self._buffers: "OrderedDict[str, CGMRingBuffer]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.evictions: int = 0
+    
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._buffers
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buffers)
+    
+    def _buffer(self, user_id: str) -> CGMRingBuffer:
+        """
+        Obtiene (o crea) el historial del usuario y lo marca como el más reciente. Debe llamarse con el lock tomado.
+        """
+        buffer: Optional[CGMRingBuffer] = self._buffers.get(user_id)
+        if buffer is None:
+            if len(self._buffers) >= self.max_users:
+                self._buffers.popitem(last=False)
+                self.evictions += 1
+            buffer = self._buffers[user_id] = CGMRingBuffer(self.capacity)
+        else:
+            self._buffers.move_to_end(user_id)
+        return buffer
+    
+    def append(self, user_id: str, timestamp: float, value: float) -> int:
+        """
+        Agrega una lectura al historial del usuario.
+        
+        Retorna:
+        --------
+        int
+            Lecturas en el historial del usuario.
+        """
+        with self._lock:
+            buffer: CGMRingBuffer = self._buffer(user_id)
+            buffer.append(timestamp, value)
+            return len(buffer)
+    
+    def extend(self, user_id: str, timestamps: np.ndarray, values: np.ndarray) -> Tuple[int, int]:
+        """
+        Agrega un bloque de lecturas (por ejemplo, una carga retroactiva) al historial del usuario.
+        
+        Retorna:
+        --------
+        Tuple[int, int]
+            Lecturas del bloque que quedaron en el historial y lecturas totales del historial.
+        """
+        with self._lock:
+            buffer: CGMRingBuffer = self._buffer(user_id)
+            stored: int = buffer.extend(timestamps, values)
+            return stored, len(buffer)
+    
+    def extend_many(self, user_ids: Sequence[str], timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Agrega lecturas intercaladas de varios usuarios (por ejemplo, las de un gateway de sensores).
+        
+        Las lecturas se agrupan por usuario y se agregan con una sola toma del lock; la lectura
+        única de un usuario, si es posterior a su historial, usa el camino O(1) de `append`.
+        
+        Parámetros:
+        -----------
+        user_ids : Sequence[str]
+            Usuario de cada lectura.
+        timestamps : np.ndarray
+            Momentos de las lecturas en segundos epoch con forma (N,).
+        values : np.ndarray
+            Glucosa en mg/dL con forma (N,).
+        
+        Retorna:
+        --------
+        int
+            Lecturas que quedaron en los historiales.
+        """
+        positions_by_user: Dict[str, List[int]] = {}
+        for position, user_id in enumerate(user_ids):
+            positions_by_user.setdefault(user_id, []).append(position)
+        
+        stored: int = 0
+        with self._lock:
+            for user_id, positions in positions_by_user.items():
+                buffer: CGMRingBuffer = self._buffer(user_id)
+                if len(positions) == 1:
+                    stored += buffer.append(float(timestamps[positions[0]]), float(values[positions[0]]))
+                else:
+                    stored += buffer.extend(timestamps[positions], values[positions])
+        return stored
+    
+    def latest(self, user_id: str, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Últimas lecturas del usuario como vistas (vacías si no tiene historial).
+        """
+        with self._lock:
+            buffer: Optional[CGMRingBuffer] = self._buffers.get(user_id)
+            if buffer is None:
+                return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+            return buffer.latest(count)
+    
+    def window(
+        self, user_id: str, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lecturas del usuario con timestamp en [start, end] como vistas (vacías si no tiene historial).
+        """
+        with self._lock:
+            buffer: Optional[CGMRingBuffer] = self._buffers.get(user_id)
+            if buffer is None:
+                return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+            return buffer.window(start, end)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Obtiene la ocupación del almacén.
+        """
+        with self._lock:
+            return {
+                "users": len(self._buffers),
+                "max_users": self.max_users,
+                "capacity_per_user": self.capacity,
+                "readings": sum(len(buffer) for buffer in self._buffers.values()),
+                "bytes_used": sum(buffer.nbytes() for buffer in self._buffers.values()),
+                "evictions": self.evictions
+            }
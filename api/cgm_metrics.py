@@ -0,0 +1,416 @@
+"""
+Métricas glucémicas por ventana deslizante (tiempo en rango, media, CV, episodios) por usuario.
+
+Cada usuario tiene un anillo de intervalos de `bucket_seconds` que cubre la ventana más larga;
+cada intervalo guarda la cantidad de lecturas, su suma, la suma de cuadrados, los conteos por
+rango de glucosa y los episodios severos que empiezan en él. Para cada ventana se mantienen
+además los totales de sus intervalos: una lectura nueva se suma al intervalo actual y a los
+totales, y al pasar a un intervalo nuevo se restan los que salen de cada ventana. Así cada
+lectura cuesta O(1) y la consulta de las métricas no recorre lecturas.
+
+Las ventanas se anclan a la lectura más reciente del usuario y abarcan sus últimos intervalos,
+incluido el actual (una ventana de 24 h con intervalos de una hora cubre entre 23 y 24 h). Los
+porcentajes de tiempo se calculan sobre las lecturas, que los sensores toman a intervalos
+regulares. Un episodio severo empieza en una lectura por debajo de SEVERE_HYPO_THRESHOLD o por
+encima de SEVERE_HYPER_THRESHOLD cuando la anterior no estaba en ese rango o está a más de
+`event_gap_seconds`.
+
+Las lecturas atrasadas, los bloques y las repeticiones vuelven a calcular solo los intervalos
+afectados desde el historial, y los usuarios sin métricas en memoria (nuevos, descartados o
+tras un reinicio) se reconstruyen una vez desde el historial.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constants.constants import (
+    IDEAL_LOWER_BOUND,
+    IDEAL_UPPER_BOUND,
+    HYPO_THRESHOLD,
+    HYPER_THRESHOLD,
+    SEVERE_HYPO_THRESHOLD,
+    SEVERE_HYPER_THRESHOLD,
+    CV_LOW_THRESHOLD,
+    CV_ACCEPTABLE_THRESHOLD,
+    CV_HIGH_THRESHOLD,
+    CGM_METRICS_WINDOWS_HOURS,
+    CGM_METRICS_BUCKET_SECONDS,
+    CGM_METRICS_EVENT_GAP_SECONDS,
+    CGM_METRICS_MAX_USERS
+)
+
+# Acumulados de cada intervalo y de cada ventana
+COUNT, TOTAL, SQUARES, VERY_LOW, LOW, IDEAL, HIGH, VERY_HIGH, HYPO_EVENTS, HYPER_EVENTS = range(10)
+NUM_STATS: int = 10
+
+class WindowMetrics(NamedTuple):
+    """
+    Métricas de una ventana; las que dependen de la media son None si la ventana no tiene lecturas.
+    """
+    hours: int
+    start: float
+    readings: int
+    mean: Optional[float]
+    sd: Optional[float]
+    cv: Optional[float]
+    variability: Optional[str]
+    time_in_range: Optional[float]
+    time_below_range: Optional[float]
+    time_very_low: Optional[float]
+    time_above_range: Optional[float]
+    time_very_high: Optional[float]
+    time_in_ideal_range: Optional[float]
+    hypo_events: int
+    hyper_events: int
+
+def classify_variability(cv: float) -> str:
+    """
+    Clasifica el coeficiente de variación (%) según los umbrales CV_*.
+    """
+    if cv < CV_LOW_THRESHOLD:
+        return "baja"
+    if cv < CV_ACCEPTABLE_THRESHOLD:
+        return "aceptable"
+    if cv < CV_HIGH_THRESHOLD:
+        return "alta"
+    return "muy alta"
+
+def _severity(values: np.ndarray) -> np.ndarray:
+    """
+    -1 para hipoglucemia severa, 1 para hiperglucemia severa y 0 para el resto.
+    """
+    return (values > SEVERE_HYPER_THRESHOLD).astype(np.int8) - (values < SEVERE_HYPO_THRESHOLD).astype(np.int8)
+
+def reading_stats(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    previous_timestamp: float = -np.inf,
+    previous_severity: int = 0,
+    event_gap_seconds: float = CGM_METRICS_EVENT_GAP_SECONDS
+) -> np.ndarray:
+    """
+    Aporte de cada lectura a los acumulados de su intervalo.
+    
+    Parámetros:
+    -----------
+    timestamps : np.ndarray
+        Momentos de las lecturas en segundos epoch, en orden creciente.
+    values : np.ndarray
+        Glucosa en mg/dL.
+    previous_timestamp : float
+        Momento de la lectura anterior a la primera (-inf si no hay).
+    previous_severity : int
+        Severidad de la lectura anterior a la primera.
+    event_gap_seconds : float
+        Separación a partir de la cual una lectura severa empieza un episodio nuevo.
+    
+    Retorna:
+    --------
+    np.ndarray
+        Acumulados con forma (N, NUM_STATS).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    severity: np.ndarray = _severity(values)
+    previous_timestamps: np.ndarray = np.concatenate(([previous_timestamp], timestamps[:-1]))
+    previous: np.ndarray = np.concatenate(([previous_severity], severity[:-1]))
+    starts: np.ndarray = (severity != 0) & (
+        (previous != severity) | (timestamps - previous_timestamps > event_gap_seconds)
+    )
+    
+    stats: np.ndarray = np.empty((len(values), NUM_STATS), dtype=np.float64)
+    stats[:, COUNT] = 1.0
+    stats[:, TOTAL] = values
+    stats[:, SQUARES] = values * values
+    stats[:, VERY_LOW] = values < SEVERE_HYPO_THRESHOLD
+    stats[:, LOW] = values < HYPO_THRESHOLD
+    stats[:, IDEAL] = (values >= IDEAL_LOWER_BOUND) & (values <= IDEAL_UPPER_BOUND)
+    stats[:, HIGH] = values > HYPER_THRESHOLD
+    stats[:, VERY_HIGH] = values > SEVERE_HYPER_THRESHOLD
+    stats[:, HYPO_EVENTS] = starts & (severity < 0)
+    stats[:, HYPER_EVENTS] = starts & (severity > 0)
+    return stats
+
+class _UserMetrics:
+    """
+    Anillo de intervalos y totales por ventana de un usuario.
+    """
+    __slots__ = ("buckets", "totals", "head", "last_timestamp", "last_severity")
+    
+    def __init__(self, num_buckets: int, num_windows: int, head: int) -> None:
+        self.buckets: np.ndarray = np.zeros((num_buckets, NUM_STATS), dtype=np.float64)
+        self.totals: np.ndarray = np.zeros((num_windows, NUM_STATS), dtype=np.float64)
+        # Intervalo de la lectura más reciente
+        self.head: int = head
+        self.last_timestamp: float = -np.inf
+        self.last_severity: int = 0
+
+class CGMMetrics:
+    """
+    Métricas glucémicas por ventana deslizante de cada usuario, actualizadas con cada escritura del historial.
+    
+    El historial (`TieredCGMStore`) llama a `add` o `update` después de guardar las lecturas;
+    las consultas con `get` devuelven las métricas ya acumuladas.
+    """
+    
+    def __init__(
+        self,
+        series: Any,
+        windows_hours: Sequence[int] = CGM_METRICS_WINDOWS_HOURS,
+        bucket_seconds: int = CGM_METRICS_BUCKET_SECONDS,
+        event_gap_seconds: int = CGM_METRICS_EVENT_GAP_SECONDS,
+        max_users: int = CGM_METRICS_MAX_USERS
+    ) -> None:
+        """
+        Inicializa las métricas.
+        
+        Parámetros:
+        -----------
+        series : Any
+            Historial con `latest` y `window` (`TieredCGMStore`) desde el que se reconstruyen las métricas.
+        windows_hours : Sequence[int]
+            Duración de cada ventana en horas.
+        bucket_seconds : int
+            Duración de los intervalos; debe dividir a todas las ventanas.
+        event_gap_seconds : int
+            Separación entre lecturas severas a partir de la cual se cuenta un episodio nuevo.
+        max_users : int
+            Usuarios con métricas en memoria (se descarta el de actividad más antigua).
+        """
+        self.windows_hours: Tuple[int, ...] = tuple(int(hours) for hours in windows_hours)
+        if bucket_seconds <= 0 or any(hours <= 0 or hours * 3600 % bucket_seconds for hours in self.windows_hours):
+            raise ValueError("Las ventanas de métricas de CGM deben ser múltiplos positivos del intervalo")
+        self.series: Any = series
+        self.bucket_seconds: int = bucket_seconds
+        self.event_gap_seconds: int = event_gap_seconds
+        self.max_users: int = max_users
+        self.window_buckets: np.ndarray = np.array(
+            [hours * 3600 // bucket_seconds for hours in self.windows_hours], dtype=np.int64
+        )
+        self.num_buckets: int = int(self.window_buckets.max())
+        # Intervalos siguientes a una lectura cuyo primer episodio puede depender de ella
+        self._event_buckets: int = -(-event_gap_seconds // bucket_seconds)
+        self._users: "OrderedDict[str, _UserMetrics]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.evictions: int = 0
+        self.rebuilds: int = 0
+    
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._users
+    
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+    
+    def _advance(self, state: _UserMetrics, head: int) -> None:
+        """
+        Avanza el anillo hasta el intervalo `head`, restando de cada ventana los intervalos que salen.
+        """
+        if head - state.head >= self.num_buckets:
+            state.buckets[:] = 0.0
+            state.totals[:] = 0.0
+        else:
+            for bucket in range(state.head + 1, head + 1):
+                state.totals -= state.buckets[(bucket - self.window_buckets) % self.num_buckets]
+                state.buckets[bucket % self.num_buckets] = 0.0
+        state.head = head
+    
+    def _refresh_totals(self, state: _UserMetrics) -> None:
+        """
+        Vuelve a sumar los totales de cada ventana desde los intervalos.
+        """
+        recent: np.ndarray = state.buckets[(state.head - np.arange(self.num_buckets)) % self.num_buckets]
+        state.totals[:] = np.cumsum(recent, axis=0)[self.window_buckets - 1]
+    
+    def _recompute(self, state: _UserMetrics, user_id: str, first: int, last: int) -> None:
+        """
+        Vuelve a calcular los intervalos [first, last] desde las lecturas del historial.
+        """
+        first = max(first, state.head - self.num_buckets + 1)
+        last = min(last, state.head)
+        if first > last:
+            return
+        start: float = first * self.bucket_seconds
+        end: float = (last + 1) * self.bucket_seconds
+        timestamps, values = self.series.window(user_id, start - self.event_gap_seconds, end)
+        inside: np.ndarray = timestamps < end
+        timestamps, values = timestamps[inside], values[inside]
+        before: int = int(np.searchsorted(timestamps, start, side="left"))
+        previous_timestamp: float = float(timestamps[before - 1]) if before else -np.inf
+        previous_severity: int = int(_severity(values[before - 1:before])[0]) if before else 0
+        timestamps, values = timestamps[before:], values[before:]
+        
+        recomputed: np.ndarray = np.zeros((last - first + 1, NUM_STATS), dtype=np.float64)
+        if len(timestamps):
+            stats: np.ndarray = reading_stats(
+                timestamps, values, previous_timestamp, previous_severity, self.event_gap_seconds
+            )
+            buckets: np.ndarray = np.floor_divide(timestamps, self.bucket_seconds).astype(np.int64) - first
+            starts: np.ndarray = np.concatenate(([0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1))
+            recomputed[buckets[starts]] = np.add.reduceat(stats, starts, axis=0)
+            if last == state.head:
+                state.last_timestamp = float(timestamps[-1])
+                state.last_severity = int(_severity(values[-1:])[0])
+        state.buckets[np.arange(first, last + 1) % self.num_buckets] = recomputed
+    
+    def _load(self, user_id: str) -> Optional[_UserMetrics]:
+        """
+        Reconstruye las métricas del usuario desde el historial. Debe llamarse con el lock tomado.
+        """
+        latest: np.ndarray = self.series.latest(user_id, 1)[0]
+        if len(latest) == 0:
+            return None
+        state: _UserMetrics = _UserMetrics(self.num_buckets, len(self.window_buckets), self._bucket(latest[0]))
+        self._recompute(state, user_id, state.head - self.num_buckets + 1, state.head)
+        self._refresh_totals(state)
+        if len(self._users) >= self.max_users:
+            self._users.popitem(last=False)
+            self.evictions += 1
+        self._users[user_id] = state
+        self.rebuilds += 1
+        return state
+    
+    def add(self, user_id: str, timestamp: float, value: float) -> None:
+        """
+        Registra una lectura ya guardada en el historial.
+        
+        Si es posterior a la última del usuario se suma en O(1); si no, se trata como un bloque.
+        """
+        with self._lock:
+            state: Optional[_UserMetrics] = self._users.get(user_id)
+            if state is None:
+                self._load(user_id)
+                return
+            self._users.move_to_end(user_id)
+            if timestamp <= state.last_timestamp:
+                self._update(state, user_id, timestamp, timestamp)
+                return
+            bucket: int = self._bucket(timestamp)
+            if bucket > state.head:
+                self._advance(state, bucket)
+            severity: int = 1 if value > SEVERE_HYPER_THRESHOLD else (-1 if value < SEVERE_HYPO_THRESHOLD else 0)
+            event: bool = severity != 0 and (
+                severity != state.last_severity or timestamp - state.last_timestamp > self.event_gap_seconds
+            )
+            # Misma fila que `reading_stats`, sin el costo de armar arrays para una sola lectura
+            stats: np.ndarray = np.array((
+                1.0, value, value * value,
+                value < SEVERE_HYPO_THRESHOLD, value < HYPO_THRESHOLD,
+                IDEAL_LOWER_BOUND <= value <= IDEAL_UPPER_BOUND,
+                value > HYPER_THRESHOLD, value > SEVERE_HYPER_THRESHOLD,
+                event and severity < 0, event and severity > 0
+            ), dtype=np.float64)
+            state.buckets[bucket % self.num_buckets] += stats
+            state.totals += stats
+            state.last_timestamp = timestamp
+            state.last_severity = severity
+    
+    def _update(self, state: _UserMetrics, user_id: str, oldest: float, newest: float) -> None:
+        """
+        Refleja lecturas guardadas entre `oldest` y `newest` volviendo a calcular sus intervalos.
+        """
+        head: int = self._bucket(newest)
+        if head > state.head:
+            self._advance(state, head)
+        self._recompute(state, user_id, self._bucket(oldest), head + self._event_buckets)
+        self._refresh_totals(state)
+    
+    def update(self, user_id: str, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """
+        Registra un bloque de lecturas ya guardado en el historial (en cualquier orden).
+        """
+        if len(timestamps) == 1:
+            self.add(user_id, float(timestamps[0]), float(values[0]))
+            return
+        if len(timestamps) == 0:
+            return
+        with self._lock:
+            state: Optional[_UserMetrics] = self._users.get(user_id)
+            if state is None:
+                self._load(user_id)
+                return
+            self._users.move_to_end(user_id)
+            self._update(state, user_id, float(np.min(timestamps)), float(np.max(timestamps)))
+    
+    def update_many(self, user_ids: Sequence[str], timestamps: np.ndarray, values: np.ndarray) -> None:
+        """
+        Registra lecturas intercaladas de varios usuarios ya guardadas en el historial.
+        """
+        positions_by_user: Dict[str, List[int]] = {}
+        for position, user_id in enumerate(user_ids):
+            positions_by_user.setdefault(user_id, []).append(position)
+        for user_id, positions in positions_by_user.items():
+            self.update(user_id, timestamps[positions], values[positions])
+    
+    def get(self, user_id: str) -> Optional[Tuple[float, List[WindowMetrics]]]:
+        """
+        Obtiene las métricas del usuario.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        
+        Retorna:
+        --------
+        Optional[Tuple[float, List[WindowMetrics]]]
+            Momento de la lectura más reciente y métricas de cada ventana, o None si el usuario no tiene lecturas.
+        """
+        with self._lock:
+            state: Optional[_UserMetrics] = self._users.get(user_id)
+            if state is None:
+                state = self._load(user_id)
+                if state is None:
+                    return None
+            totals: np.ndarray = state.totals.copy()
+            head: int = state.head
+            last_timestamp: float = state.last_timestamp
+        
+        count: np.ndarray = totals[:, COUNT]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean: np.ndarray = totals[:, TOTAL] / count
+            sd: np.ndarray = np.sqrt(np.maximum(totals[:, SQUARES] / count - mean * mean, 0.0))
+            percent: np.ndarray = 100.0 * totals / count[:, None]
+        metrics: List[WindowMetrics] = []
+        for index, hours in enumerate(self.windows_hours):
+            start: float = float((head - self.window_buckets[index] + 1) * self.bucket_seconds)
+            hypo_events: int = int(totals[index, HYPO_EVENTS])
+            hyper_events: int = int(totals[index, HYPER_EVENTS])
+            if count[index] == 0:
+                metrics.append(WindowMetrics(hours, start, 0, *([None] * 10), hypo_events, hyper_events))
+                continue
+            cv: float = float(100.0 * sd[index] / mean[index])
+            metrics.append(WindowMetrics(
+                hours=hours,
+                start=start,
+                readings=int(count[index]),
+                mean=float(mean[index]),
+                sd=float(sd[index]),
+                cv=cv,
+                variability=classify_variability(cv),
+                time_in_range=float(100.0 - percent[index, LOW] - percent[index, HIGH]),
+                time_below_range=float(percent[index, LOW]),
+                time_very_low=float(percent[index, VERY_LOW]),
+                time_above_range=float(percent[index, HIGH]),
+                time_very_high=float(percent[index, VERY_HIGH]),
+                time_in_ideal_range=float(percent[index, IDEAL]),
+                hypo_events=hypo_events,
+                hyper_events=hyper_events
+            ))
+        return last_timestamp, metrics
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Ocupación y contadores de las métricas.
+        """
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "windows_hours": list(self.windows_hours),
+                "bucket_seconds": self.bucket_seconds,
+                "bytes_used": sum(state.buckets.nbytes + state.totals.nbytes for state in self._users.values()),
+                "rebuilds": self.rebuilds,
+                "evictions": self.evictions
+            }
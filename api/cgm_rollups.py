@@ -0,0 +1,298 @@
+"""
+Agregados de CGM por intervalos (rollups), retención de lecturas crudas y ruteo de consultas.
+
+Cada nivel de agregación guarda por usuario, para cada intervalo de `width` segundos con
+lecturas, el mínimo, el máximo, la suma y la cantidad de lecturas, en una serie columnar con
+el mismo formato en disco que las lecturas crudas. La compactación agrega los intervalos
+completos y vuelve a calcular los de las últimas `late_seconds` para reflejar lecturas
+atrasadas; después descarta las lecturas crudas más antiguas que la retención configurada.
+
+Las consultas eligen el nivel más grueso cuyo intervalo no supera la resolución pedida: un
+rango de meses a resolución horaria lee una fila por hora en lugar de doce lecturas, y los
+intervalos todavía no compactados se agregan al vuelo desde las lecturas recientes.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cgm_store import Columns, TIMESTAMP_DTYPE, CGMSeriesStore, TieredCGMStore
+from constants.constants import (
+    CGM_ROLLUP_WIDTHS,
+    CGM_RAW_RETENTION_DAYS,
+    CGM_ROLLUP_LATE_SECONDS,
+    CGM_RETENTION_MIN_DROP_SECONDS,
+    CGM_STORE_MAX_OPEN_USERS,
+    CGM_STORE_FSYNC,
+    CGM_COMPACTION_MSG
+)
+
+logger = logging.getLogger(__name__)
+
+# Columnas de un nivel de agregación: inicio del intervalo, mínimo, máximo, suma y cantidad
+ROLLUP_COLUMNS: Columns = (
+    ("ts", TIMESTAMP_DTYPE),
+    ("min", np.dtype(np.float32)),
+    ("max", np.dtype(np.float32)),
+    ("sum", np.dtype(np.float64)),
+    ("count", np.dtype(np.int32))
+)
+
+class RollupSeries(NamedTuple):
+    """
+    Resultado de una consulta: un punto por intervalo (o por lectura si `bucket_seconds` es 0).
+    """
+    bucket_seconds: int
+    timestamps: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    mean: np.ndarray
+    count: np.ndarray
+
+def rollup(timestamps: np.ndarray, values: np.ndarray, width: int) -> Tuple[np.ndarray, ...]:
+    """
+    Agrega lecturas ordenadas en intervalos de `width` segundos alineados a la época.
+    
+    Parámetros:
+    -----------
+    timestamps : np.ndarray
+        Momentos de las lecturas en segundos epoch, en orden creciente.
+    values : np.ndarray
+        Glucosa en mg/dL.
+    width : int
+        Duración de los intervalos en segundos.
+    
+    Retorna:
+    --------
+    Tuple[np.ndarray, ...]
+        Inicio, mínimo, máximo, suma y cantidad de lecturas de cada intervalo con lecturas.
+    """
+    if len(timestamps) == 0:
+        return tuple(np.empty(0, dtype=dtype) for _, dtype in ROLLUP_COLUMNS)
+    buckets: np.ndarray = np.floor_divide(np.floor(timestamps).astype(TIMESTAMP_DTYPE), width) * width
+    starts: np.ndarray = np.concatenate(([0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1))
+    values = np.asarray(values, dtype=np.float32)
+    return (
+        buckets[starts],
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+        np.add.reduceat(values.astype(np.float64), starts),
+        np.diff(np.append(starts, len(values))).astype(np.int32)
+    )
+
+class CGMRollups:
+    """
+    Niveles de agregación de las series de CGM en disco, su compactación y las consultas por resolución.
+    """
+    
+    def __init__(
+        self,
+        series: TieredCGMStore,
+        directory: str,
+        widths: Sequence[int] = CGM_ROLLUP_WIDTHS,
+        raw_retention_days: float = CGM_RAW_RETENTION_DAYS,
+        late_seconds: int = CGM_ROLLUP_LATE_SECONDS,
+        min_drop_seconds: int = CGM_RETENTION_MIN_DROP_SECONDS,
+        max_open_users: int = CGM_STORE_MAX_OPEN_USERS,
+        fsync: bool = CGM_STORE_FSYNC
+    ) -> None:
+        """
+        Inicializa los niveles de agregación.
+        
+        Parámetros:
+        -----------
+        series : TieredCGMStore
+            Historial de lecturas crudas; debe tener nivel en disco.
+        directory : str
+            Directorio de las series en disco; cada nivel usa el subdirectorio rollup_<width>.
+        widths : Sequence[int]
+            Duración en segundos de los intervalos de cada nivel.
+        raw_retention_days : float
+            Días de lecturas crudas que se conservan en disco (0 las conserva todas).
+        late_seconds : int
+            Antigüedad máxima de una lectura atrasada para que se refleje en los agregados.
+        min_drop_seconds : int
+            Lecturas vencidas (en segundos) que deben acumularse antes de reescribir la serie cruda.
+        max_open_users : int
+            Series abiertas a la vez por nivel.
+        fsync : bool
+            Si es True, cada escritura se sincroniza con el disco antes de confirmarse.
+        """
+        if series.disk is None:
+            raise ValueError("Los agregados de CGM requieren las series en disco")
+        self.series: TieredCGMStore = series
+        self.raw: CGMSeriesStore = series.disk
+        self.widths: Tuple[int, ...] = tuple(sorted(int(width) for width in widths))
+        self.raw_retention_seconds: float = raw_retention_days * 24 * 3600
+        self.late_seconds: int = late_seconds
+        self.min_drop_seconds: int = min_drop_seconds
+        if self.raw_retention_seconds and self.widths and self.raw_retention_seconds < late_seconds + self.widths[-1]:
+            raise ValueError("La retención de lecturas crudas debe cubrir la ventana de lecturas atrasadas")
+        self.tiers: Dict[int, CGMSeriesStore] = {
+            width: CGMSeriesStore(os.path.join(directory, f"rollup_{width}"), max_open_users, fsync, ROLLUP_COLUMNS)
+            for width in self.widths
+        }
+        # Una sola compactación a la vez
+        self._compaction_lock: threading.Lock = threading.Lock()
+        
+        # Contadores observables
+        self.compactions: int = 0
+        self.buckets_written: int = 0
+        self.readings_dropped: int = 0
+        self.last_compaction_seconds: float = 0.0
+    
+    def _compact_tier(self, user_id: str, width: int, now: float) -> int:
+        """
+        Agrega los intervalos completos pendientes (y los recientes que cambiaron) de un nivel.
+        """
+        tier: CGMSeriesStore = self.tiers[width]
+        complete_until: int = int(now // width) * width
+        last: np.ndarray = tier.latest(user_id, 1)[0]
+        if len(last):
+            resume: int = (int(last[0]) + width - self.late_seconds) // width * width
+        else:
+            oldest: np.ndarray = self.raw.window(user_id)[0][:1]
+            if not len(oldest):
+                return 0
+            resume = int(oldest[0]) // width * width
+        if resume >= complete_until:
+            return 0
+        
+        rows: Tuple[np.ndarray, ...] = rollup(*self.raw.window(user_id, resume, complete_until - 1), width)
+        if not len(rows[0]):
+            return 0
+        # Se escriben solo los intervalos nuevos o que cambiaron por lecturas atrasadas
+        existing: Tuple[np.ndarray, ...] = tier.window(user_id, resume, complete_until - 1)
+        positions: np.ndarray = np.minimum(np.searchsorted(existing[0], rows[0]), max(len(existing[0]) - 1, 0))
+        unchanged: np.ndarray = np.zeros(len(rows[0]), dtype=bool)
+        if len(existing[0]):
+            unchanged = np.logical_and.reduce([column[positions] == row for column, row in zip(existing, rows)])
+        changed: np.ndarray = ~unchanged
+        if changed.any():
+            tier.extend(user_id, *(column[changed] for column in rows))
+        return int(np.count_nonzero(changed))
+    
+    def compact_user(self, user_id: str, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Actualiza los agregados de un usuario y aplica la retención a sus lecturas crudas.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        now : Optional[float]
+            Momento de referencia en segundos epoch (por defecto, el actual).
+        
+        Retorna:
+        --------
+        Dict[str, int]
+            Intervalos escritos y lecturas crudas descartadas.
+        """
+        now = time.time() if now is None else now
+        written: int = sum(self._compact_tier(user_id, width, now) for width in self.widths)
+        dropped: int = 0
+        if self.raw_retention_seconds:
+            cutoff: float = now - self.raw_retention_seconds
+            oldest: np.ndarray = self.raw.window(user_id)[0][:1]
+            # Reescribir la serie tiene costo lineal: se espera a que se acumule un mínimo vencido
+            if len(oldest) and oldest[0] < cutoff - self.min_drop_seconds:
+                dropped = self.raw.truncate_before(user_id, cutoff)
+        return {"buckets_written": written, "readings_dropped": dropped}
+    
+    def compact_all(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Compacta las series de todos los usuarios con lecturas en disco.
+        
+        Parámetros:
+        -----------
+        now : Optional[float]
+            Momento de referencia en segundos epoch (por defecto, el actual).
+        
+        Retorna:
+        --------
+        Dict[str, int]
+            Usuarios procesados, intervalos escritos y lecturas crudas descartadas.
+        """
+        with self._compaction_lock:
+            start: float = time.perf_counter()
+            totals: Dict[str, int] = {"users": 0, "buckets_written": 0, "readings_dropped": 0}
+            for user_id in self.raw.user_ids():
+                result: Dict[str, int] = self.compact_user(user_id, now)
+                totals["users"] += 1
+                totals["buckets_written"] += result["buckets_written"]
+                totals["readings_dropped"] += result["readings_dropped"]
+            self.compactions += 1
+            self.buckets_written += totals["buckets_written"]
+            self.readings_dropped += totals["readings_dropped"]
+            self.last_compaction_seconds = time.perf_counter() - start
+        logger.info(f"{CGM_COMPACTION_MSG}: {totals} en {self.last_compaction_seconds:.2f} s")
+        return totals
+    
+    def select_width(self, resolution_seconds: Optional[int]) -> int:
+        """
+        Intervalo del nivel más grueso que no supera la resolución pedida (0: lecturas crudas).
+        """
+        if resolution_seconds is None:
+            return 0
+        return max((width for width in self.widths if width <= resolution_seconds), default=0)
+    
+    def query(
+        self,
+        user_id: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        resolution_seconds: Optional[int] = None
+    ) -> RollupSeries:
+        """
+        Obtiene las lecturas de un usuario en [start, end] desde el nivel que corresponde a la resolución.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        start : Optional[float]
+            Inicio del rango en segundos epoch (el intervalo que lo contiene se incluye completo).
+        end : Optional[float]
+            Fin del rango en segundos epoch.
+        resolution_seconds : Optional[int]
+            Separación máxima aceptable entre puntos (None: lecturas crudas).
+        
+        Retorna:
+        --------
+        RollupSeries
+            Un punto por intervalo del nivel elegido, en orden.
+        """
+        width: int = self.select_width(resolution_seconds)
+        if width == 0:
+            timestamps, values = self.series.window(user_id, start, end)
+            return RollupSeries(0, timestamps, values, values, values, np.ones(len(values), dtype=np.int32))
+        
+        tier: CGMSeriesStore = self.tiers[width]
+        aligned_start: Optional[int] = None if start is None else int(start // width) * width
+        rows: Tuple[np.ndarray, ...] = tier.window(user_id, aligned_start, end)
+        # Los intervalos posteriores a la última compactación se agregan desde las lecturas recientes
+        last: np.ndarray = tier.latest(user_id, 1)[0]
+        pending_start: Optional[int] = int(last[0]) + width if len(last) else aligned_start
+        if pending_start is not None and aligned_start is not None:
+            pending_start = max(pending_start, aligned_start)
+        if end is None or pending_start is None or pending_start <= end:
+            pending: Tuple[np.ndarray, ...] = rollup(*self.series.window(user_id, pending_start, end), width)
+            rows = tuple(np.concatenate((stored, new)) for stored, new in zip(rows, pending))
+        timestamps, minimum, maximum, total, count = rows
+        return RollupSeries(width, timestamps, minimum, maximum, (total / np.maximum(count, 1)).astype(np.float32), count)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Configuración y contadores de la compactación.
+        """
+        return {
+            "widths": list(self.widths),
+            "raw_retention_days": self.raw_retention_seconds / (24 * 3600),
+            "compactions": self.compactions,
+            "buckets_written": self.buckets_written,
+            "readings_dropped": self.readings_dropped,
+            "last_compaction_seconds": self.last_compaction_seconds
+        }
@@ -0,0 +1,587 @@
+"""
+Almacén en disco de series de CGM por usuario, en columnas mapeadas en memoria.
+
+Cada usuario tiene dos archivos columnares de solo agregado, timestamps (segundos epoch,
+int64) y valores (mg/dL, float32), más un archivo de confirmación con la generación vigente
+de las columnas y la cantidad de lecturas confirmadas. La confirmación tiene dos registros
+con contador y CRC que se escriben de forma alternada: si una escritura queda a medias, su
+CRC no coincide y vale el registro anterior.
+
+    cgm_<user_id>.meta        generación y longitud confirmada
+    cgm_<user_id>.<gen>.ts    timestamps ordenados
+    cgm_<user_id>.<gen>.val   valores
+
+Las lecturas nuevas se escriben a continuación de la longitud confirmada y recién después se
+escribe la confirmación: si el proceso se interrumpe a mitad de una escritura, los bytes
+sobrantes se ignoran y se sobrescriben en la siguiente. Las lecturas atrasadas reescriben la
+serie completa en la generación siguiente, que se publica con la misma confirmación. Las consultas por rango usan búsqueda binaria sobre los timestamps mapeados
+y devuelven vistas de solo lectura, sin cargar la serie en memoria.
+"""
+import os
+import re
+import zlib
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cgm_history import CGMHistoryStore
+from constants.constants import (
+    CGM_STORE_PREFIX,
+    CGM_USER_ID_PATTERN,
+    CGM_USER_ID_ERROR_MSG,
+    CGM_STORE_WRITE_ERROR_MSG,
+    CGM_STORE_FSYNC,
+    CGM_STORE_MAX_OPEN_USERS,
+    CGM_STORE_TRUNCATED_MSG
+)
+
+logger = logging.getLogger(__name__)
+
+# El identificador del usuario forma parte de los nombres de archivo
+_USER_ID_RE: "re.Pattern[str]" = re.compile(CGM_USER_ID_PATTERN)
+
+def valid_user_id(user_id: str) -> bool:
+    """
+    Indica si el identificador puede usarse en los nombres de archivo de las series.
+    """
+    return _USER_ID_RE.match(user_id) is not None
+
+# Registro de confirmación: contador, generación, lecturas confirmadas y CRC32 de los tres
+_META_RECORD: struct.Struct = struct.Struct("<QQQI")
+_META_SLOT_BYTES: int = 32
+TIMESTAMP_DTYPE: np.dtype = np.dtype(np.int64)
+VALUE_DTYPE: np.dtype = np.dtype(np.float32)
+
+# Columnas de una serie (nombre de archivo y tipo); la primera son los timestamps, que la ordenan
+Columns = Tuple[Tuple[str, np.dtype], ...]
+RAW_COLUMNS: Columns = (("ts", TIMESTAMP_DTYPE), ("val", VALUE_DTYPE))
+
+def _empty_series(columns: Columns = RAW_COLUMNS) -> Tuple[np.ndarray, ...]:
+    return tuple(np.empty(0, dtype=dtype) for _, dtype in columns)
+
+def _sorted_unique(timestamps: np.ndarray, *columns: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Ordena filas por timestamp; ante timestamps repetidos conserva la última recibida.
+    """
+    order: np.ndarray = np.argsort(timestamps, kind="stable")
+    timestamps = timestamps[order]
+    keep: np.ndarray = np.append(timestamps[1:] != timestamps[:-1], True)
+    return (timestamps[keep],) + tuple(column[order][keep] for column in columns)
+
+class CGMSeriesFile:
+    """
+    Serie de CGM en disco de un usuario.
+    
+    Por defecto guarda lecturas (timestamp, valor); con otras `columns` guarda cualquier
+    conjunto de columnas ordenadas por timestamp, como los agregados de `cgm_rollups`.
+    No es segura entre hilos por sí sola: `CGMSeriesStore` serializa las escrituras.
+    """
+    
+    def __init__(
+        self, directory: str, user_id: str, fsync: bool = CGM_STORE_FSYNC, columns: Columns = RAW_COLUMNS
+    ) -> None:
+        """
+        Abre la serie del usuario (vacía si todavía no tiene archivos).
+        
+        Parámetros:
+        -----------
+        directory : str
+            Directorio del almacén.
+        user_id : str
+            Identificador único del usuario.
+        fsync : bool
+            Si es True, las columnas y la confirmación se sincronizan con el disco antes de
+            publicar cada escritura (con False solo se protege ante caídas del proceso).
+        columns : Columns
+            Nombre y tipo de cada columna, empezando por los timestamps.
+        """
+        if not valid_user_id(user_id):
+            raise ValueError(CGM_USER_ID_ERROR_MSG)
+        self.directory: str = directory
+        self.user_id: str = user_id
+        self.fsync: bool = fsync
+        self.columns: Columns = columns
+        self.generation: int = 0
+        self.length: int = 0
+        self._commits: int = 0
+        self._last_timestamp: Optional[int] = None
+        self._mapped: Tuple[np.ndarray, ...] = _empty_series(columns)
+        self._mapped_key: Tuple[int, int] = (0, 0)
+        
+        if os.path.exists(self.meta_path):
+            self._commits, self.generation, self.length = self._read_meta()
+            # Columnas más cortas que lo confirmado (escritura sin fsync perdida): se usa lo que hay
+            available: int = min(
+                self._file_size(self.column_path(name)) // dtype.itemsize for name, dtype in columns
+            )
+            if available < self.length:
+                logger.warning(f"{CGM_STORE_TRUNCATED_MSG} {user_id}: {self.length} -> {available}")
+                self.length = available
+    
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, f"{CGM_STORE_PREFIX}{self.user_id}.meta")
+    
+    def column_path(self, column: str, generation: Optional[int] = None) -> str:
+        """
+        Ruta de una columna (por ejemplo 'ts' o 'val') de la generación indicada (por defecto, la vigente).
+        """
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.directory, f"{CGM_STORE_PREFIX}{self.user_id}.{generation}.{column}")
+    
+    @staticmethod
+    def _file_size(path: str) -> int:
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    def _write_column(self, path: str, offset: int, data: np.ndarray) -> None:
+        """
+        Escribe `data` desde el elemento `offset`, descartando lo que hubiera después.
+        """
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.truncate(offset * data.itemsize)
+            f.seek(offset * data.itemsize)
+            f.write(data.tobytes())
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+    
+    def _read_meta(self) -> Tuple[int, int, int]:
+        """
+        Lee el registro de confirmación válido más reciente (contador, generación, longitud).
+        """
+        with open(self.meta_path, "rb") as f:
+            data: bytes = f.read(2 * _META_SLOT_BYTES)
+        records: List[Tuple[int, int, int]] = []
+        for offset in (0, _META_SLOT_BYTES):
+            chunk: bytes = data[offset:offset + _META_RECORD.size]
+            if len(chunk) < _META_RECORD.size:
+                continue
+            commits, generation, length, checksum = _META_RECORD.unpack(chunk)
+            if zlib.crc32(chunk[:-4]) == checksum:
+                records.append((commits, generation, length))
+        return max(records, default=(0, 0, 0))
+    
+    def _commit(self, generation: int, length: int) -> None:
+        """
+        Publica la generación y la longitud confirmada en el registro que no es el vigente.
+        """
+        commits: int = self._commits + 1
+        record: bytes = _META_RECORD.pack(commits, generation, length, 0)[:-4]
+        record += struct.pack("<I", zlib.crc32(record))
+        fd: int = os.open(self.meta_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, record, (commits % 2) * _META_SLOT_BYTES)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._commits, self.generation, self.length = commits, generation, length
+    
+    def arrays(self) -> Tuple[np.ndarray, ...]:
+        """
+        Columnas confirmadas (timestamps primero), mapeadas en memoria y de solo lectura.
+        """
+        if self._mapped_key != (self.generation, self.length):
+            if self.length == 0:
+                self._mapped = _empty_series(self.columns)
+            else:
+                self._mapped = tuple(
+                    np.memmap(self.column_path(name), dtype=dtype, mode="r", shape=(self.length,))
+                    for name, dtype in self.columns
+                )
+            self._mapped_key = (self.generation, self.length)
+        return self._mapped
+    
+    def _rewrite(self, arrays: Sequence[np.ndarray]) -> None:
+        """
+        Escribe la serie completa en la generación siguiente, la publica y borra la anterior.
+        """
+        previous: int = self.generation
+        for (name, _), data in zip(self.columns, arrays):
+            self._write_column(self.column_path(name, previous + 1), 0, np.ascontiguousarray(data))
+        self._commit(previous + 1, len(arrays[0]))
+        self._last_timestamp = int(arrays[0][-1]) if len(arrays[0]) else None
+        for name, _ in self.columns:
+            try:
+                os.remove(self.column_path(name, previous))
+            except OSError:
+                pass
+    
+    def extend(self, timestamps: np.ndarray, *values: np.ndarray) -> int:
+        """
+        Agrega lecturas en cualquier orden.
+        
+        Las posteriores a la última guardada se agregan al final de las columnas; si hay
+        atrasadas, la serie se reescribe en una generación nueva.
+        
+        Parámetros:
+        -----------
+        timestamps : np.ndarray
+            Momentos de las lecturas en segundos epoch con forma (N,).
+        *values : np.ndarray
+            Una columna con forma (N,) por cada columna de la serie después de los timestamps
+            (en la serie de lecturas, la glucosa en mg/dL).
+        
+        Retorna:
+        --------
+        int
+            Lecturas distintas del bloque guardadas (ante timestamps iguales prevalece la más reciente).
+        """
+        timestamps = np.floor(np.asarray(timestamps, dtype=np.float64)).astype(TIMESTAMP_DTYPE)
+        if len(timestamps) == 0:
+            return 0
+        rows: Tuple[np.ndarray, ...] = _sorted_unique(
+            timestamps, *(np.asarray(column, dtype=dtype) for column, (_, dtype) in zip(values, self.columns[1:]))
+        )
+        timestamps = rows[0]
+        if self._last_timestamp is None and self.length:
+            self._last_timestamp = int(self.arrays()[0][-1])
+        
+        if self._last_timestamp is None or timestamps[0] > self._last_timestamp:
+            # Camino habitual: agregar al final sin volver a mapear las columnas
+            os.makedirs(self.directory, exist_ok=True)
+            for (name, _), column in zip(self.columns, rows):
+                self._write_column(self.column_path(name), self.length, column)
+            self._commit(self.generation, self.length + len(timestamps))
+            self._last_timestamp = int(timestamps[-1])
+            return len(timestamps)
+        
+        # Lecturas atrasadas: mezcla completa en la generación siguiente (las nuevas prevalecen)
+        self._rewrite(_sorted_unique(*(
+            np.concatenate((stored, new)) for stored, new in zip(self.arrays(), rows)
+        )))
+        return len(timestamps)
+    
+    def truncate_before(self, timestamp: float) -> int:
+        """
+        Descarta las lecturas anteriores a `timestamp` reescribiendo el resto en una generación nueva.
+        
+        Retorna:
+        --------
+        int
+            Lecturas descartadas.
+        """
+        arrays: Tuple[np.ndarray, ...] = self.arrays()
+        dropped: int = int(np.searchsorted(arrays[0], np.ceil(timestamp), side="left"))
+        if dropped:
+            self._rewrite([column[dropped:] for column in arrays])
+        return dropped
+    
+    def latest(self, count: int) -> Tuple[np.ndarray, ...]:
+        """
+        Últimas `count` lecturas como vistas de solo lectura.
+        """
+        count = max(0, min(count, self.length))
+        return tuple(column[self.length - count:] for column in self.arrays())
+    
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[np.ndarray, ...]:
+        """
+        Lecturas con timestamp en [start, end] como vistas de solo lectura (búsqueda binaria).
+        """
+        arrays: Tuple[np.ndarray, ...] = self.arrays()
+        low: int = 0 if start is None else int(np.searchsorted(arrays[0], np.ceil(start), side="left"))
+        high: int = self.length if end is None else int(np.searchsorted(arrays[0], np.floor(end), side="right"))
+        return tuple(column[low:high] for column in arrays)
+    
+    def close(self) -> None:
+        self._mapped = _empty_series(self.columns)
+        self._mapped_key = (0, 0)
+
+class CGMSeriesStore:
+    """
+    Series de CGM en disco de todos los usuarios, con la misma interfaz que `CGMHistoryStore`.
+    
+    Mantiene abiertas (mapeadas) a lo sumo `max_open_users` series; las demás se vuelven a
+    abrir desde su archivo de confirmación cuando se consultan.
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        max_open_users: int = CGM_STORE_MAX_OPEN_USERS,
+        fsync: bool = CGM_STORE_FSYNC,
+        columns: Columns = RAW_COLUMNS
+    ) -> None:
+        """
+        Inicializa el almacén.
+        
+        Parámetros:
+        -----------
+        directory : str
+            Directorio de las series (se crea con la primera escritura).
+        max_open_users : int
+            Series abiertas a la vez.
+        fsync : bool
+            Si es True, cada escritura se sincroniza con el disco antes de confirmarse.
+        columns : Columns
+            Columnas de las series (por defecto, lecturas de glucosa).
+        """
+        self.directory: str = directory
+        self.max_open_users: int = max(1, max_open_users)
+        self.fsync: bool = fsync
+        self.columns: Columns = columns
+        self._series: "OrderedDict[str, CGMSeriesFile]" = OrderedDict()
+        self._lock: threading.RLock = threading.RLock()
+    
+    def _open(self, user_id: str) -> CGMSeriesFile:
+        """
+        Obtiene (o abre) la serie del usuario. Debe llamarse con el lock tomado.
+        """
+        series: Optional[CGMSeriesFile] = self._series.get(user_id)
+        if series is None:
+            if len(self._series) >= self.max_open_users:
+                _, closed = self._series.popitem(last=False)
+                closed.close()
+            series = self._series[user_id] = CGMSeriesFile(self.directory, user_id, self.fsync, self.columns)
+        else:
+            self._series.move_to_end(user_id)
+        return series
+    
+    def __contains__(self, user_id: str) -> bool:
+        if not valid_user_id(user_id):
+            return False
+        with self._lock:
+            return user_id in self._series or os.path.exists(
+                os.path.join(self.directory, f"{CGM_STORE_PREFIX}{user_id}.meta")
+            )
+    
+    def user_ids(self) -> List[str]:
+        """
+        Usuarios con serie en disco.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            file_name[len(CGM_STORE_PREFIX):-len(".meta")]
+            for file_name in os.listdir(self.directory)
+            if file_name.startswith(CGM_STORE_PREFIX) and file_name.endswith(".meta")
+        )
+    
+    def size(self, user_id: str) -> int:
+        """
+        Lecturas confirmadas del usuario.
+        """
+        with self._lock:
+            return len(self._open(user_id))
+    
+    def append(self, user_id: str, timestamp: float, *values: float) -> int:
+        """
+        Agrega una lectura a la serie del usuario.
+        
+        Retorna:
+        --------
+        int
+            Lecturas en la serie del usuario.
+        """
+        with self._lock:
+            series: CGMSeriesFile = self._open(user_id)
+            series.extend(np.array([timestamp]), *(np.array([value]) for value in values))
+            return len(series)
+    
+    def extend(self, user_id: str, timestamps: np.ndarray, *values: np.ndarray) -> Tuple[int, int]:
+        """
+        Agrega un bloque de lecturas en cualquier orden a la serie del usuario.
+        
+        Retorna:
+        --------
+        Tuple[int, int]
+            Lecturas del bloque guardadas y lecturas totales de la serie.
+        """
+        with self._lock:
+            series: CGMSeriesFile = self._open(user_id)
+            stored: int = series.extend(timestamps, *values)
+            return stored, len(series)
+    
+    def truncate_before(self, user_id: str, timestamp: float) -> int:
+        """
+        Descarta las lecturas del usuario anteriores a `timestamp`.
+        
+        Retorna:
+        --------
+        int
+            Lecturas descartadas.
+        """
+        with self._lock:
+            return self._open(user_id).truncate_before(timestamp)
+    
+    def extend_many(self, user_ids: Sequence[str], timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Agrega lecturas intercaladas de varios usuarios, con una escritura por usuario.
+        
+        Un error al escribir la serie de un usuario se registra y no impide guardar las de los demás.
+        
+        Retorna:
+        --------
+        int
+            Lecturas guardadas.
+        """
+        positions_by_user: Dict[str, List[int]] = {}
+        for position, user_id in enumerate(user_ids):
+            positions_by_user.setdefault(user_id, []).append(position)
+        
+        stored: int = 0
+        with self._lock:
+            for user_id, positions in positions_by_user.items():
+                try:
+                    stored += self._open(user_id).extend(timestamps[positions], values[positions])
+                except (OSError, ValueError) as e:
+                    logger.error(f"{CGM_STORE_WRITE_ERROR_MSG} {user_id!r}: {e}")
+        return stored
+    
+    def latest(self, user_id: str, count: int) -> Tuple[np.ndarray, ...]:
+        """
+        Últimas lecturas del usuario como vistas del archivo mapeado (vacías si no tiene serie).
+        """
+        if not valid_user_id(user_id):
+            return _empty_series(self.columns)
+        with self._lock:
+            return self._open(user_id).latest(count)
+    
+    def window(
+        self, user_id: str, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Tuple[np.ndarray, ...]:
+        """
+        Lecturas del usuario con timestamp en [start, end] como vistas del archivo mapeado.
+        """
+        if not valid_user_id(user_id):
+            return _empty_series(self.columns)
+        with self._lock:
+            return self._open(user_id).window(start, end)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene la ocupación del almacén.
+        """
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "open_users": len(self._series),
+                "max_open_users": self.max_open_users,
+                "open_readings": sum(len(series) for series in self._series.values())
+            }
+
+class TieredCGMStore:
+    """
+    Historial de CGM en dos niveles: los buffers circulares en memoria y las series en disco.
+    
+    Las escrituras van a ambos niveles. Las consultas se responden desde memoria cuando el
+    buffer del usuario cubre todo lo pedido y, si no, desde disco. Si se asignan `metrics`
+    (`CGMMetrics`), cada escritura las actualiza una vez guardadas las lecturas.
+    """
+    
+    def __init__(self, memory: CGMHistoryStore, disk: Optional[CGMSeriesStore] = None) -> None:
+        """
+        Inicializa el historial.
+        
+        Parámetros:
+        -----------
+        memory : CGMHistoryStore
+            Lecturas recientes por usuario.
+        disk : Optional[CGMSeriesStore]
+            Series completas por usuario (None: solo memoria).
+        """
+        self.memory: CGMHistoryStore = memory
+        self.disk: Optional[CGMSeriesStore] = disk
+        self.metrics: Optional[Any] = None
+        # Las métricas ven las escrituras en el mismo orden que los niveles
+        self._write_lock: threading.Lock = threading.Lock()
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.memory or (self.disk is not None and user_id in self.disk)
+    
+    def append(self, user_id: str, timestamp: float, value: float) -> int:
+        with self._write_lock:
+            size: int = self.memory.append(user_id, timestamp, value)
+            if self.disk is not None:
+                size = self.disk.append(user_id, timestamp, value)
+            if self.metrics is not None:
+                self.metrics.add(user_id, timestamp, value)
+            return size
+    
+    def extend(self, user_id: str, timestamps: np.ndarray, values: np.ndarray) -> Tuple[int, int]:
+        with self._write_lock:
+            result: Tuple[int, int] = self.memory.extend(user_id, timestamps, values)
+            if self.disk is not None:
+                result = self.disk.extend(user_id, timestamps, values)
+            if self.metrics is not None:
+                self.metrics.update(user_id, np.asarray(timestamps, dtype=np.float64), values)
+            return result
+    
+    def extend_many(self, user_ids: Sequence[str], timestamps: np.ndarray, values: np.ndarray) -> int:
+        with self._write_lock:
+            stored: int = self.memory.extend_many(user_ids, timestamps, values)
+            if self.disk is not None:
+                stored = self.disk.extend_many(user_ids, timestamps, values)
+            if self.metrics is not None:
+                self.metrics.update_many(user_ids, np.asarray(timestamps, dtype=np.float64), values)
+            return stored
+    
+    def latest(self, user_id: str, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Últimas lecturas del usuario (de memoria si el buffer tiene suficientes).
+        """
+        timestamps, values = self.memory.latest(user_id, count)
+        if len(values) >= count or self.disk is None:
+            return timestamps, values
+        return self.disk.latest(user_id, count)
+    
+    def window(
+        self, user_id: str, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lecturas del usuario con timestamp en [start, end] (de memoria si el buffer cubre desde `start`).
+        """
+        if self.disk is None:
+            return self.memory.window(user_id, start, end)
+        oldest: np.ndarray = self.memory.latest(user_id, self.memory.capacity)[0][:1]
+        if start is not None and len(oldest) and oldest[0] <= start:
+            return self.memory.window(user_id, start, end)
+        return self.disk.window(user_id, start, end)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.get_stats(),
+            "disk": None if self.disk is None else self.disk.get_stats()
+        }
+
+def sliding_windows(
+    store: Any, user_id: str, length: int, start: Optional[float] = None, end: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ventanas deslizantes de `length` lecturas consecutivas, por ejemplo para armar datos de entrenamiento.
+    
+    Funciona con cualquier almacén con `window` (memoria, disco o ambos niveles) y no copia:
+    las ventanas son vistas con strides sobre las lecturas devueltas por el almacén.
+    
+    Parámetros:
+    -----------
+    store : Any
+        `CGMHistoryStore`, `CGMSeriesStore` o `TieredCGMStore`.
+    user_id : str
+        Identificador único del usuario.
+    length : int
+        Lecturas por ventana.
+    start : Optional[float]
+        Inicio del rango en segundos epoch.
+    end : Optional[float]
+        Fin del rango en segundos epoch.
+    
+    Retorna:
+    --------
+    Tuple[np.ndarray, np.ndarray]
+        Timestamps y valores con forma (max(0, N - length + 1), length).
+    """
+    timestamps, values = store.window(user_id, start, end)
+    if len(values) < length:
+        return np.empty((0, length), dtype=timestamps.dtype), np.empty((0, length), dtype=values.dtype)
+    return (
+        np.lib.stride_tricks.sliding_window_view(timestamps, length),
+        np.lib.stride_tricks.sliding_window_view(values, length)
+    )
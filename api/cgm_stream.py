@@ -0,0 +1,312 @@
+"""
+Ingesta continua de lecturas de CGM de muchos usuarios desde un gateway de sensores.
+
+Cada lectura es una línea JSON (NDJSON) con número de secuencia asignado por el gateway:
+
+    {"seq": 17, "user_id": "u1", "cgm_value": 132.0, "timestamp": "2025-06-19T08:05:00"}
+
+`timestamp` puede ser ISO 8601 o segundos epoch (si se omite se usa el momento de recepción).
+Las líneas se validan por lotes (columnas de NumPy en lugar de un modelo de pydantic por
+lectura) y se agregan a los historiales con una sola toma del lock por lote. Cada lote se
+confirma con el mayor número de secuencia procesado; las lecturas con un número ya procesado
+(reenvíos del gateway tras perder una confirmación) se ignoran.
+"""
+import json
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+from cgm_history import CGMHistoryStore
+from cgm_store import TieredCGMStore, valid_user_id
+from response_models import CGMStreamAck, CGMStreamRejection
+from constants.constants import (
+    CGM_STREAM_MAX_LINE_BYTES,
+    CGM_STREAM_MAX_REPORTED_REJECTIONS,
+    CGM_STREAM_LINE_TOO_LONG_MSG,
+    CGM_RANGE_ERROR_MSG,
+    CGM_USER_ID_ERROR_MSG
+)
+
+# Los números de secuencia se guardan como int64
+MAX_SEQUENCE: int = np.iinfo(np.int64).max
+
+class ParsedReadings(NamedTuple):
+    """
+    Columnas de las lecturas de un lote con número de secuencia legible, en el orden recibido.
+    
+    `errors` indica, por lectura, el motivo por el que no es válida (None si lo es); las
+    líneas sin número de secuencia legible van aparte en `unreadable`.
+    """
+    sequences: np.ndarray
+    user_ids: List[str]
+    timestamps: np.ndarray
+    values: np.ndarray
+    valid: np.ndarray
+    errors: List[Optional[str]]
+    unreadable: List[CGMStreamRejection]
+
+class NDJSONLineSplitter:
+    """
+    Separa en líneas completas un cuerpo NDJSON recibido en fragmentos arbitrarios.
+    """
+    
+    def __init__(self, max_line_bytes: int = CGM_STREAM_MAX_LINE_BYTES) -> None:
+        """
+        Inicializa el separador.
+        
+        Parámetros:
+        -----------
+        max_line_bytes : int
+            Tamaño máximo de una línea sin terminar que se retiene entre fragmentos.
+        """
+        self.max_line_bytes: int = max_line_bytes
+        self._pending: bytes = b""
+    
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Agrega un fragmento y devuelve las líneas que quedaron completas.
+        
+        Parámetros:
+        -----------
+        chunk : bytes
+            Fragmento del cuerpo.
+        
+        Retorna:
+        --------
+        List[bytes]
+            Líneas completas y no vacías, en orden.
+        
+        Raises:
+        -------
+        ValueError
+            Si la línea sin terminar supera `max_line_bytes`.
+        """
+        lines: List[bytes] = (self._pending + chunk).split(b"\n")
+        self._pending = lines.pop()
+        if len(self._pending) > self.max_line_bytes:
+            raise ValueError(CGM_STREAM_LINE_TOO_LONG_MSG)
+        return [line for line in lines if line.strip()]
+    
+    def flush(self) -> List[bytes]:
+        """
+        Devuelve la última línea si el cuerpo no terminaba en salto de línea.
+        """
+        line: bytes = self._pending
+        self._pending = b""
+        return [line] if line.strip() else []
+
+def _parse_timestamp(value: Any, received_at: float) -> float:
+    """
+    Convierte el timestamp de una lectura a segundos epoch.
+    """
+    if value is None:
+        return received_at
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return float(value)
+    raise ValueError("timestamp debe ser ISO 8601 o segundos epoch")
+
+def parse_readings(
+    lines: Sequence[Union[str, bytes]], max_line_bytes: int = CGM_STREAM_MAX_LINE_BYTES
+) -> ParsedReadings:
+    """
+    Valida un lote de líneas NDJSON y separa sus columnas.
+    
+    Los campos se revisan por línea con comprobaciones de tipo simples; el rango de glucosa
+    se valida sobre la columna completa.
+    
+    Parámetros:
+    -----------
+    lines : Sequence[Union[str, bytes]]
+        Líneas del lote, cada una con una lectura.
+    max_line_bytes : int
+        Tamaño máximo de una línea.
+    
+    Retorna:
+    --------
+    ParsedReadings
+        Columnas del lote y motivo de descarte de cada lectura inválida.
+    """
+    received_at: float = time.time()
+    sequences: List[int] = []
+    user_ids: List[str] = []
+    timestamps: List[float] = []
+    values: List[float] = []
+    errors: List[Optional[str]] = []
+    unreadable: List[CGMStreamRejection] = []
+    
+    for line in lines:
+        if len(line) > max_line_bytes:
+            unreadable.append(CGMStreamRejection(error=CGM_STREAM_LINE_TOO_LONG_MSG))
+            continue
+        try:
+            record: Any = json.loads(line)
+        except ValueError:
+            unreadable.append(CGMStreamRejection(error="JSON inválido"))
+            continue
+        sequence: Any = record.get("seq") if isinstance(record, dict) else None
+        if type(sequence) is not int or not 0 <= sequence <= MAX_SEQUENCE:
+            unreadable.append(CGMStreamRejection(error="seq debe ser un entero no negativo"))
+            continue
+        
+        user_id: Any = record.get("user_id")
+        value: Any = record.get("cgm_value")
+        timestamp: float = 0.0
+        error: Optional[str] = None
+        if not isinstance(user_id, str) or not user_id:
+            error = "user_id requerido"
+        elif not valid_user_id(user_id):
+            error = CGM_USER_ID_ERROR_MSG
+        elif not isinstance(value, (int, float)) or isinstance(value, bool):
+            error = "cgm_value debe ser numérico"
+        else:
+            try:
+                timestamp = _parse_timestamp(record.get("timestamp"), received_at)
+            except ValueError as e:
+                error = str(e)
+        sequences.append(sequence)
+        user_ids.append(user_id if error is None else "")
+        timestamps.append(timestamp)
+        values.append(value if error is None else math.nan)
+        errors.append(error)
+    
+    value_array: np.ndarray = np.asarray(values, dtype=np.float64)
+    # NaN no cumple ninguna de las dos comparaciones: las lecturas ya inválidas siguen siéndolo
+    valid: np.ndarray = (value_array >= 40.0) & (value_array <= 400.0)
+    for position in np.flatnonzero(~valid).tolist():
+        if errors[position] is None:
+            errors[position] = CGM_RANGE_ERROR_MSG
+    return ParsedReadings(
+        sequences=np.asarray(sequences, dtype=np.int64),
+        user_ids=user_ids,
+        timestamps=np.asarray(timestamps, dtype=np.float64),
+        values=value_array.astype(np.float32),
+        valid=valid,
+        errors=errors,
+        unreadable=unreadable
+    )
+
+class CGMStreamSession:
+    """
+    Estado de una conexión de ingesta: último número de secuencia procesado y totales.
+    
+    El gateway numera las lecturas de la conexión en orden creciente (no necesariamente
+    consecutivo). Una lectura con número menor o igual a uno ya procesado se cuenta como
+    repetida y no se vuelve a agregar.
+    """
+    
+    def __init__(
+        self,
+        store: Union[CGMHistoryStore, TieredCGMStore],
+        max_line_bytes: int = CGM_STREAM_MAX_LINE_BYTES,
+        max_reported_rejections: int = CGM_STREAM_MAX_REPORTED_REJECTIONS
+    ) -> None:
+        """
+        Inicializa la sesión.
+        
+        Parámetros:
+        -----------
+        store : Union[CGMHistoryStore, TieredCGMStore]
+            Historiales donde se agregan las lecturas.
+        max_line_bytes : int
+            Tamaño máximo de una línea.
+        max_reported_rejections : int
+            Descartes detallados por confirmación (el total se informa siempre).
+        """
+        self.store: Union[CGMHistoryStore, TieredCGMStore] = store
+        self.max_line_bytes: int = max_line_bytes
+        self.max_reported_rejections: int = max_reported_rejections
+        self.last_sequence: Optional[int] = None
+        
+        # Totales de la conexión
+        self.num_batches: int = 0
+        self.num_received: int = 0
+        self.num_accepted: int = 0
+        self.num_duplicates: int = 0
+        self.num_rejected: int = 0
+        self._rejected: List[CGMStreamRejection] = []
+    
+    def ingest(self, lines: Sequence[Union[str, bytes]]) -> CGMStreamAck:
+        """
+        Valida un lote de líneas, agrega las lecturas nuevas a los historiales y arma su confirmación.
+        
+        Parámetros:
+        -----------
+        lines : Sequence[Union[str, bytes]]
+            Líneas NDJSON del lote, en el orden del flujo.
+        
+        Retorna:
+        --------
+        CGMStreamAck
+            Confirmación del lote.
+        """
+        parsed: ParsedReadings = parse_readings(lines, self.max_line_bytes)
+        previous: int = -1 if self.last_sequence is None else self.last_sequence
+        # Una lectura es nueva si su número supera a todos los procesados antes que ella
+        processed_before: np.ndarray = np.maximum.accumulate(
+            np.concatenate((np.array([previous], dtype=np.int64), parsed.sequences))
+        )[:-1]
+        fresh: np.ndarray = parsed.sequences > processed_before
+        accepted: np.ndarray = fresh & parsed.valid
+        accepted_positions: List[int] = np.flatnonzero(accepted).tolist()
+        if accepted_positions:
+            self.store.extend_many(
+                [parsed.user_ids[position] for position in accepted_positions],
+                parsed.timestamps[accepted],
+                parsed.values[accepted]
+            )
+        rejected: List[CGMStreamRejection] = parsed.unreadable + [
+            CGMStreamRejection(seq=int(parsed.sequences[position]), error=parsed.errors[position])
+            for position in np.flatnonzero(fresh & ~parsed.valid).tolist()
+        ]
+        if len(parsed.sequences):
+            self.last_sequence = max(previous, int(parsed.sequences.max()))
+        
+        num_accepted: int = len(accepted_positions)
+        num_duplicates: int = int(np.count_nonzero(~fresh))
+        self.num_batches += 1
+        self.num_received += len(lines)
+        self.num_accepted += num_accepted
+        self.num_duplicates += num_duplicates
+        self.num_rejected += len(rejected)
+        room: int = self.max_reported_rejections - len(self._rejected)
+        self._rejected.extend(rejected[:max(0, room)])
+        
+        return CGMStreamAck(
+            ack=self.last_sequence,
+            num_received=len(lines),
+            num_accepted=num_accepted,
+            num_duplicates=num_duplicates,
+            num_rejected=len(rejected),
+            rejected=rejected[:self.max_reported_rejections]
+        )
+    
+    def summary(self) -> CGMStreamAck:
+        """
+        Confirmación acumulada de todos los lotes de la conexión.
+        """
+        return CGMStreamAck(
+            ack=self.last_sequence,
+            num_received=self.num_received,
+            num_accepted=self.num_accepted,
+            num_duplicates=self.num_duplicates,
+            num_rejected=self.num_rejected,
+            rejected=list(self._rejected)
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Totales de la conexión para los logs.
+        """
+        return {
+            "batches": self.num_batches,
+            "received": self.num_received,
+            "accepted": self.num_accepted,
+            "duplicates": self.num_duplicates,
+            "rejected": self.num_rejected,
+            "last_sequence": self.last_sequence
+        }
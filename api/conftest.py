@@ -0,0 +1,23 @@
+import os
+import shutil
+
+import pytest
+
+from model_manager import ModelManager
+from constants.constants import POPULATION_ACTOR_FILE, POPULATION_CRITIC_FILE
+
+REPO_MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+
+@pytest.fixture
+def models_dir(tmp_path):
+    """Directorio temporal de modelos con los modelos poblacionales del repositorio."""
+    for file_name in (POPULATION_ACTOR_FILE, POPULATION_CRITIC_FILE):
+        shutil.copy(os.path.join(REPO_MODELS_DIR, file_name), tmp_path / file_name)
+    return str(tmp_path)
+
+@pytest.fixture
+def make_manager(models_dir):
+    """Crea ModelManager sobre `models_dir`; los argumentos se pasan al constructor."""
+    def make(**kwargs):
+        return ModelManager(models_directory=str(models_dir), **kwargs)
+    return make
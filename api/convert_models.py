@@ -0,0 +1,110 @@
+"""
+Convierte los modelos guardados con torch.save (.pth) al formato empaquetado del almacén.
+
+Uso:
+    python api/convert_models.py --models-dir models [--dtype float16] [--remove-legacy]
+"""
+import os
+import sys
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.models import Critic, load_actor_model
+from model_store import ModelStore
+from constants.constants import (
+    STATE_DIM,
+    ACTION_DIM,
+    POPULATION_ACTOR_FILE,
+    POPULATION_CRITIC_FILE,
+    PERSONALIZED_ACTOR_PREFIX,
+    PERSONALIZED_CRITIC_PREFIX,
+    MODEL_EXTENSION,
+    MODEL_STORE_DTYPE
+)
+
+logger = logging.getLogger(__name__)
+
+def _load_module(module: torch.nn.Module, path: str) -> torch.nn.Module:
+    module.load_state_dict(torch.load(path, map_location="cpu", weights_only=True))
+    return module.eval()
+
+def _load_optional_critic(path: str) -> Optional[Critic]:
+    return _load_module(Critic(STATE_DIM, ACTION_DIM), path) if os.path.exists(path) else None
+
+def convert_directory(models_dir: str, dtype: str = MODEL_STORE_DTYPE, remove_legacy: bool = False) -> List[str]:
+    """
+    Convierte todos los modelos .pth de un directorio a archivos empaquetados.
+    
+    Parámetros:
+    -----------
+    models_dir : str
+        Directorio con los modelos .pth.
+    dtype : str
+        Precisión de almacenamiento ('float32' o 'float16').
+    remove_legacy : bool
+        Si es True, elimina los .pth una vez convertidos.
+    
+    Retorna:
+    --------
+    List[str]
+        Rutas de los archivos empaquetados generados.
+    """
+    store: ModelStore = ModelStore(models_dir, storage_dtype=dtype)
+    written: List[str] = []
+    converted: List[str] = []
+    
+    population_actor_path: str = os.path.join(models_dir, POPULATION_ACTOR_FILE)
+    if os.path.exists(population_actor_path):
+        population_critic_path: str = os.path.join(models_dir, POPULATION_CRITIC_FILE)
+        store.save_population_models(
+            load_actor_model(population_actor_path, STATE_DIM, ACTION_DIM),
+            _load_optional_critic(population_critic_path)
+        )
+        written.append(store.population_path())
+        converted += [population_actor_path, population_critic_path]
+    
+    user_actor_paths: Dict[str, str] = {
+        name[len(PERSONALIZED_ACTOR_PREFIX):-len(MODEL_EXTENSION)]: os.path.join(models_dir, name)
+        for name in sorted(os.listdir(models_dir))
+        if name.startswith(PERSONALIZED_ACTOR_PREFIX) and name.endswith(MODEL_EXTENSION)
+    }
+    for user_id, actor_path in user_actor_paths.items():
+        critic_path: str = os.path.join(models_dir, f"{PERSONALIZED_CRITIC_PREFIX}{user_id}{MODEL_EXTENSION}")
+        store.save_user_models(
+            user_id,
+            load_actor_model(actor_path, STATE_DIM, ACTION_DIM),
+            _load_optional_critic(critic_path)
+        )
+        written.append(store.user_path(user_id))
+        converted += [actor_path, critic_path]
+    
+    if remove_legacy:
+        for path in converted:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    for path in written:
+        logger.info(f"Modelo empaquetado: {path}")
+    return written
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convierte modelos .pth al formato empaquetado")
+    parser.add_argument("--models-dir", action="append", required=True,
+                        help="Directorio con modelos .pth (puede repetirse)")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=MODEL_STORE_DTYPE,
+                        help="Precisión de almacenamiento")
+    parser.add_argument("--remove-legacy", action="store_true",
+                        help="Eliminar los .pth después de convertirlos")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    for models_dir in args.models_dir:
+        convert_directory(models_dir, dtype=args.dtype, remove_legacy=args.remove_legacy)
+
+if __name__ == "__main__":
+    main()
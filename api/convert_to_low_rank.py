@@ -0,0 +1,168 @@
+"""
+Convierte los pesos personalizados completos del almacén en correcciones de bajo rango sobre la población.
+
+Para cada usuario con pesos completos, la diferencia con los pesos poblacionales de cada capa
+se trunca a rango r con una SVD. Se reporta el error relativo de los pesos por red y la máxima
+desviación de dosis del actor aproximado sobre la grilla de referencia; solo se reemplazan los
+pesos de los usuarios cuya desviación no supera el umbral.
+
+Uso:
+    python api/convert_to_low_rank.py --models-dir models [--rank 8] [--max-dose-deviation 0.1] [--dry-run]
+"""
+import os
+import sys
+import argparse
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_manager import ModelManager
+from model_manifest import ManifestEntry
+from model_quantization import max_dose_deviation
+from low_rank import is_low_rank, low_rank_from_full, personalization_metadata
+from constants.constants import (
+    LOW_RANK_RANK,
+    LOW_RANK_MAX_DOSE_DEVIATION,
+    MODEL_VERSION_METADATA_KEY,
+    LOW_RANK_CONVERTED_MSG,
+    LOW_RANK_REJECTED_MSG
+)
+
+logger = logging.getLogger(__name__)
+
+# Resultado de la conversión de un usuario
+ConversionReport = Dict[str, Union[str, float, bool]]
+
+def convert_user(
+    manager: ModelManager,
+    user_id: str,
+    rank: int,
+    max_deviation: float,
+    dry_run: bool = False
+) -> Optional[ConversionReport]:
+    """
+    Aproxima los pesos completos de un usuario por correcciones de bajo rango y los guarda si pasan la validación.
+    
+    Parámetros:
+    -----------
+    manager : ModelManager
+        Administrador con los modelos poblacionales cargados.
+    user_id : str
+        Identificador único del usuario.
+    rank : int
+        Rango de las correcciones.
+    max_deviation : float
+        Desviación máxima de dosis (Unidades) admitida para reemplazar los pesos.
+    dry_run : bool
+        Si es True, solo se reporta, sin guardar.
+    
+    Retorna:
+    --------
+    Optional[ConversionReport]
+        Errores relativos, desviación de dosis y si se convirtió, o None si el usuario no tiene pesos completos.
+    """
+    user_models: Optional[Dict[str, torch.nn.Module]] = manager.get_user_models(user_id, trainable=True)
+    if user_models is None or "critic" not in user_models or is_low_rank(user_models["actor"]):
+        return None
+    
+    actor, actor_errors = low_rank_from_full(manager.population_actor, user_models["actor"], rank)
+    critic, critic_errors = low_rank_from_full(manager.population_critic, user_models["critic"], rank)
+    deviation: float = max_dose_deviation(user_models["actor"], actor.eval(), manager._predict_bolus_array)
+    converted: bool = deviation <= max_deviation and not dry_run
+    
+    if converted:
+        # Versión nueva: los pesos servidos cambian (dentro de la tolerancia)
+        version: int = manager.model_versions.get(user_id, 0) + 1
+        manager.model_store.save_user_models(
+            user_id, actor, critic, {MODEL_VERSION_METADATA_KEY: str(version), **personalization_metadata(actor)}
+        )
+        manager.model_versions[user_id] = version
+        logger.info(f"{LOW_RANK_CONVERTED_MSG} {user_id}: {deviation:.4f}")
+    elif deviation > max_deviation:
+        logger.warning(f"{LOW_RANK_REJECTED_MSG} {user_id}: {deviation:.4f}")
+    
+    return {
+        "user_id": user_id,
+        "actor_weight_error": max(actor_errors),
+        "critic_weight_error": max(critic_errors),
+        "max_dose_deviation": deviation,
+        "converted": converted
+    }
+
+def convert_directory(
+    models_dir: str,
+    rank: int = LOW_RANK_RANK,
+    max_deviation: float = LOW_RANK_MAX_DOSE_DEVIATION,
+    dry_run: bool = False
+) -> List[ConversionReport]:
+    """
+    Convierte a bajo rango a todos los usuarios del almacén con pesos completos empaquetados.
+    
+    Los usuarios con archivos .pth separados se omiten: primero deben pasar por convert_models.py.
+    
+    Parámetros:
+    -----------
+    models_dir : str
+        Directorio de modelos con los poblacionales y los personalizados.
+    rank : int
+        Rango de las correcciones.
+    max_deviation : float
+        Desviación máxima de dosis (Unidades) admitida para reemplazar los pesos de un usuario.
+    dry_run : bool
+        Si es True, solo se reporta, sin guardar.
+    
+    Retorna:
+    --------
+    List[ConversionReport]
+        Reporte de cada usuario considerado.
+    """
+    manager: ModelManager = ModelManager(
+        models_directory=models_dir,
+        inference_max_workers=1,
+        prediction_cache_max_entries=0,
+        serving_precision="float32",
+        serve_distilled_population=False,
+        dose_table_population=False,
+        dose_table_personalized=False,
+        stacked_inference_max_actors=0
+    )
+    if manager.population_actor is None or manager.population_critic is None:
+        raise ValueError(f"No se encontraron los modelos poblacionales en {models_dir}")
+    
+    reports: List[ConversionReport] = []
+    entries: List[Tuple[str, ManifestEntry]] = sorted(manager.model_store.manifest.items())
+    for user_id, entry in entries:
+        if entry.legacy:
+            continue
+        report: Optional[ConversionReport] = convert_user(manager, user_id, rank, max_deviation, dry_run)
+        # Se liberan los modelos del usuario antes de pasar al siguiente
+        manager.loaded_models.pop(user_id)
+        if report is not None:
+            reports.append(report)
+    return reports
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convierte pesos personalizados completos a correcciones de bajo rango")
+    parser.add_argument("--models-dir", default="models", help="Directorio de modelos")
+    parser.add_argument("--rank", type=int, default=LOW_RANK_RANK, help="Rango de las correcciones por capa")
+    parser.add_argument("--max-dose-deviation", type=float, default=LOW_RANK_MAX_DOSE_DEVIATION,
+                        help="Desviación máxima de dosis (U) para reemplazar los pesos de un usuario")
+    parser.add_argument("--dry-run", action="store_true", help="Solo reportar errores, sin guardar")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    reports: List[ConversionReport] = convert_directory(
+        args.models_dir, rank=args.rank, max_deviation=args.max_dose_deviation, dry_run=args.dry_run
+    )
+    print(f"{'user_id':<24} {'actor_err':>10} {'critic_err':>10} {'dose_dev':>10} converted")
+    for report in reports:
+        print(
+            f"{report['user_id']:<24} {report['actor_weight_error']:>10.4g} {report['critic_weight_error']:>10.4g}"
+            f" {report['max_dose_deviation']:>10.4g} {report['converted']}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Destila el actor poblacional en un actor compacto (por defecto 64x64).
+
+El estudiante se entrena para reproducir las ganancias del maestro sobre el dominio
+clínico válido de las solicitudes (rangos de validación de BolusRequest). Se reporta el
+error de dosis después de las restricciones de seguridad y `compute_bolus`, junto con la
+latencia de ambos modelos, y se guarda el estudiante en el archivo empaquetado que
+ModelManager sirve a los usuarios poblacionales.
+
+Uso:
+    python api/distill_population_actor.py --models-dir models [--hidden-dims 64 64] [--steps 4000]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_manager import ModelManager
+from inference_backends import BACKENDS, InferenceBackend, create_backend
+from model_quantization import max_dose_deviation
+from models.models import Actor
+from constants.constants import (
+    STATE_DIM,
+    ACTION_DIM,
+    SEED,
+    DISTILLED_ACTOR_HIDDEN_DIMS,
+    MIN_CGM_INPUT,
+    MAX_CGM_INPUT,
+    MAX_CARBS_INPUT,
+    MAX_IOB_INPUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Fracción de muestras en ayunas (sin carbohidratos) y con IOB en rango habitual (0-10 U)
+FASTING_FRACTION: float = 0.4
+TYPICAL_IOB_FRACTION: float = 0.8
+TYPICAL_MAX_IOB: float = 10.0
+
+def sample_inputs(rng: np.random.Generator, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Muestrea entradas dentro del dominio clínico válido de las solicitudes.
+    
+    Parámetros:
+    -----------
+    rng : np.random.Generator
+        Generador de números aleatorios.
+    size : int
+        Cantidad de muestras.
+    
+    Retorna:
+    --------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        CGM, carbohidratos, IOB y minutos desde medianoche, cada uno con forma (size,).
+    """
+    cgm: np.ndarray = rng.uniform(MIN_CGM_INPUT, MAX_CGM_INPUT, size)
+    carbs: np.ndarray = np.where(rng.random(size) < FASTING_FRACTION, 0.0, rng.uniform(0.0, MAX_CARBS_INPUT, size))
+    iob: np.ndarray = np.where(
+        rng.random(size) < TYPICAL_IOB_FRACTION,
+        rng.uniform(0.0, TYPICAL_MAX_IOB, size),
+        rng.uniform(0.0, MAX_IOB_INPUT, size)
+    )
+    minutes: np.ndarray = rng.integers(0, 24 * 60, size).astype(np.float64)
+    return cgm, carbs, iob, minutes
+
+def fold_input_normalization(student: Actor, mean: torch.Tensor, std: torch.Tensor) -> None:
+    """
+    Incorpora la normalización de entradas a la primera capa, para que el estudiante reciba estados crudos.
+    
+    Parámetros:
+    -----------
+    student : Actor
+        Actor entrenado sobre estados normalizados ((x - mean) / std).
+    mean : torch.Tensor
+        Media de cada componente del estado.
+    std : torch.Tensor
+        Desviación estándar de cada componente del estado.
+    """
+    first_layer: nn.Linear = student.net[0]
+    with torch.no_grad():
+        weight: torch.Tensor = first_layer.weight / std
+        first_layer.bias.sub_(weight @ mean)
+        first_layer.weight.copy_(weight)
+
+def distill(
+    manager: ModelManager,
+    hidden_dims: Tuple[int, ...],
+    steps: int,
+    batch_size: int,
+    learning_rate: float,
+    seed: int
+) -> Actor:
+    """
+    Entrena un actor compacto que imita las ganancias del actor poblacional.
+    
+    Parámetros:
+    -----------
+    manager : ModelManager
+        Administrador con el actor poblacional cargado (maestro).
+    hidden_dims : Tuple[int, ...]
+        Capas ocultas del estudiante.
+    steps : int
+        Pasos de optimización (cada uno con muestras nuevas).
+    batch_size : int
+        Muestras por paso.
+    learning_rate : float
+        Tasa de aprendizaje inicial (con decaimiento coseno).
+    seed : int
+        Semilla de muestreo e inicialización.
+    
+    Retorna:
+    --------
+    Actor
+        Estudiante que recibe estados crudos, en modo evaluación.
+    """
+    torch.manual_seed(seed)
+    rng: np.random.Generator = np.random.default_rng(seed)
+    teacher: Actor = manager.population_actor
+    
+    # Estadísticas de normalización del dominio de entrada
+    reference_states: torch.Tensor = torch.from_numpy(manager._build_states(*sample_inputs(rng, 100_000)))
+    mean: torch.Tensor = reference_states.mean(dim=0)
+    std: torch.Tensor = reference_states.std(dim=0).clamp_min(1e-6)
+    
+    student: Actor = Actor(STATE_DIM, ACTION_DIM, hidden_dims)
+    optimizer: torch.optim.Optimizer = torch.optim.Adam(student.parameters(), lr=learning_rate)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=steps)
+    
+    for step in range(steps):
+        states: torch.Tensor = torch.from_numpy(manager._build_states(*sample_inputs(rng, batch_size)))
+        with torch.no_grad():
+            target_gains: torch.Tensor = teacher(states)
+        loss: torch.Tensor = nn.functional.mse_loss(student((states - mean) / std), target_gains)
+        
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        scheduler.step()
+        if step % 500 == 0 or step == steps - 1:
+            logger.info(f"Paso {step}: MSE de ganancias {loss.item():.3e}")
+    
+    fold_input_normalization(student, mean, std)
+    return student.eval()
+
+def latency_us(run: Callable[[], object], iterations: int = 1000) -> float:
+    """
+    Mide la latencia mediana (microsegundos) de una función.
+    """
+    for _ in range(50):
+        run()
+    timings: np.ndarray = np.empty(iterations)
+    for i in range(iterations):
+        start: float = time.perf_counter()
+        run()
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings) * 1e6)
+
+def evaluate(manager: ModelManager, student: Actor, samples: int, seed: int) -> Dict[str, float]:
+    """
+    Compara el estudiante con el maestro en dosis (tras restricciones de seguridad) y en latencia.
+    
+    Parámetros:
+    -----------
+    manager : ModelManager
+        Administrador con el actor poblacional (maestro).
+    student : Actor
+        Actor destilado.
+    samples : int
+        Muestras de evaluación (independientes de las de entrenamiento).
+    seed : int
+        Semilla de muestreo.
+    
+    Retorna:
+    --------
+    Dict[str, float]
+        Métricas de error de dosis (U), de ganancias y de latencia.
+    """
+    teacher: Actor = manager.population_actor
+    inputs = sample_inputs(np.random.default_rng(seed + 1), samples)
+    dose_error: np.ndarray = np.abs(
+        manager._predict_bolus_array(student, *inputs) - manager._predict_bolus_array(teacher, *inputs)
+    )
+    states: torch.Tensor = torch.from_numpy(manager._build_states(*inputs))
+    with torch.no_grad():
+        gain_error: torch.Tensor = (student(states) - teacher(states)).abs()
+    
+    metrics: Dict[str, float] = {
+        "gain_mae": float(gain_error.mean()),
+        "dose_mae_u": float(dose_error.mean()),
+        "dose_p99_u": float(np.percentile(dose_error, 99)),
+        "dose_max_u": float(dose_error.max()),
+        "grid_dose_max_u": max_dose_deviation(teacher, student, manager._predict_bolus_array),
+        "teacher_params": float(sum(p.numel() for p in teacher.parameters())),
+        "student_params": float(sum(p.numel() for p in student.parameters())),
+    }
+    # Latencia de la pasada del actor con cada backend y de la predicción de bolos completa
+    backends: Dict[str, InferenceBackend] = {name: create_backend(name) for name in BACKENDS}
+    for batch_size in (1, 21):
+        batch_inputs = sample_inputs(np.random.default_rng(0), batch_size)
+        batch_states: np.ndarray = manager._build_states(*batch_inputs)
+        for role, actor in (("teacher", teacher), ("student", student)):
+            for backend_name, backend in backends.items():
+                metrics[f"{role}_{backend_name}_forward_b{batch_size}_us"] = latency_us(
+                    lambda: backend.run(actor, batch_states)
+                )
+            metrics[f"{role}_bolus_pipeline_b{batch_size}_us"] = latency_us(
+                lambda: manager._predict_bolus_array(actor, *batch_inputs)
+            )
+    return metrics
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Destila el actor poblacional en un actor compacto")
+    parser.add_argument("--models-dir", default="models", help="Directorio con el actor poblacional")
+    parser.add_argument("--hidden-dims", type=int, nargs="+", default=list(DISTILLED_ACTOR_HIDDEN_DIMS))
+    parser.add_argument("--steps", type=int, default=4000)
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--learning-rate", type=float, default=3e-3)
+    parser.add_argument("--eval-samples", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--no-save", action="store_true", help="Solo reportar métricas, sin guardar el estudiante")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    torch.set_num_threads(1)
+    # Solo se necesita el maestro float32 y el pipeline de dosis
+    manager: ModelManager = ModelManager(
+        models_directory=args.models_dir, serving_precision="float32", serve_distilled_population=False
+    )
+    if manager.population_actor is None:
+        raise SystemExit(f"No se encontró el actor poblacional en {args.models_dir}")
+    
+    student: Actor = distill(
+        manager, tuple(args.hidden_dims), args.steps, args.batch_size, args.learning_rate, args.seed
+    )
+    metrics: Dict[str, float] = evaluate(manager, student, args.eval_samples, args.seed)
+    for name, value in metrics.items():
+        print(f"{name:<28} {value:.6g}")
+    
+    if not args.no_save:
+        manager.model_store.save_distilled_population(
+            student, {name: f"{value:.6g}" for name, value in metrics.items()}
+        )
+        print(f"Actor destilado guardado en {manager.model_store.distilled_population_path()}")
+
+if __name__ == "__main__":
+    main()
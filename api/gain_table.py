@@ -0,0 +1,165 @@
+"""
+Tablas de ganancias precalculadas para responder predicciones sin evaluar el actor.
+
+La red del actor se evalúa una sola vez en los nodos de una grilla uniforme del estado
+(CGM, tasa de carbohidratos, minutos desde medianoche, IOB); luego cada consulta cuesta
+una interpolación multilineal sobre 16 vértices. ModelManager valida cada tabla contra la
+red antes de servirla y la descarta si el error de dosis supera el límite configurado.
+"""
+import itertools
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+class GainTable:
+    """
+    Tabla precalculada de las ganancias de un actor sobre una grilla uniforme del espacio de estados.
+    
+    Las consultas se responden por interpolación multilineal entre los 2^D vértices de la
+    celda que contiene cada estado, sin evaluar la red. Los estados fuera de la grilla no
+    están cubiertos y deben evaluarse con el actor.
+    """
+    
+    def __init__(self, lower: Sequence[float], steps: Sequence[float], values: np.ndarray) -> None:
+        """
+        Inicializa la tabla.
+        
+        Parámetros:
+        -----------
+        lower : Sequence[float]
+            Valor inicial de cada eje del estado.
+        steps : Sequence[float]
+            Paso de la grilla en cada eje.
+        values : np.ndarray
+            Ganancias en los nodos con forma (n_1, ..., n_D, ACTION_DIM).
+        """
+        self.lower: np.ndarray = np.asarray(lower, dtype=np.float64)
+        self.steps: np.ndarray = np.asarray(steps, dtype=np.float64)
+        self.shape: tuple = values.shape[:-1]
+        self.upper: np.ndarray = self.lower + self.steps * (np.asarray(self.shape) - 1)
+        self.values: np.ndarray = np.ascontiguousarray(values, dtype=np.float32)
+        self._flat: np.ndarray = self.values.reshape(-1, values.shape[-1])
+        
+        # Desplazamientos en el índice plano: por eje y de los 2^D vértices de una celda
+        strides: np.ndarray = np.array(
+            [int(np.prod(self.shape[d + 1:])) for d in range(len(self.shape))], dtype=np.intp
+        )
+        self._strides: np.ndarray = strides
+        corner_bits: np.ndarray = np.array(list(itertools.product((0, 1), repeat=len(self.shape))), dtype=np.intp)
+        self._corner_offsets: np.ndarray = corner_bits @ strides
+        
+        # Error máximo medido contra la red (se completa al validar)
+        self.max_gain_error: Optional[float] = None
+        self.max_dose_error: Optional[float] = None
+    
+    @staticmethod
+    def axes(lower: Sequence[float], upper: Sequence[float], steps: Sequence[float]) -> list:
+        """
+        Construye los ejes uniformes de una grilla (incluyendo el extremo superior).
+        """
+        return [
+            lo + step * np.arange(int(np.ceil((hi - lo) / step - 1e-9)) + 1)
+            for lo, hi, step in zip(lower, upper, steps)
+        ]
+    
+    @classmethod
+    def build(
+        cls,
+        gains_fn: Callable[[np.ndarray], np.ndarray],
+        lower: Sequence[float],
+        upper: Sequence[float],
+        steps: Sequence[float],
+        chunk_size: int = 8192
+    ) -> "GainTable":
+        """
+        Evalúa el actor en todos los nodos de la grilla.
+        
+        Parámetros:
+        -----------
+        gains_fn : Callable[[np.ndarray], np.ndarray]
+            Función que devuelve las ganancias (N, ACTION_DIM) para estados (N, D) en float32.
+        lower : Sequence[float]
+            Extremo inferior de cada eje.
+        upper : Sequence[float]
+            Extremo superior de cada eje (se redondea hacia arriba al múltiplo del paso).
+        steps : Sequence[float]
+            Paso de la grilla en cada eje.
+        chunk_size : int
+            Estados evaluados por llamada.
+        
+        Retorna:
+        --------
+        GainTable
+            Tabla con las ganancias en los nodos.
+        """
+        axes: list = cls.axes(lower, upper, steps)
+        nodes: np.ndarray = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+        nodes = nodes.astype(np.float32)
+        values: np.ndarray = np.concatenate(
+            [gains_fn(nodes[start:start + chunk_size]) for start in range(0, nodes.shape[0], chunk_size)]
+        )
+        return cls(lower, steps, values.reshape(*[len(axis) for axis in axes], -1))
+    
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+    
+    def covers(self, states: np.ndarray) -> np.ndarray:
+        """
+        Indica qué estados están dentro de la grilla.
+        
+        Parámetros:
+        -----------
+        states : np.ndarray
+            Estados con forma (N, D).
+        
+        Retorna:
+        --------
+        np.ndarray
+            Máscara booleana con forma (N,).
+        """
+        return np.all((states >= self.lower) & (states <= self.upper), axis=1)
+    
+    def lookup(self, states: np.ndarray) -> np.ndarray:
+        """
+        Interpola las ganancias de estados cubiertos por la grilla.
+        
+        Parámetros:
+        -----------
+        states : np.ndarray
+            Estados con forma (N, D) dentro de la grilla.
+        
+        Retorna:
+        --------
+        np.ndarray
+            Ganancias interpoladas con forma (N, ACTION_DIM) en float32.
+        """
+        position: np.ndarray = (np.asarray(states, dtype=np.float64) - self.lower) / self.steps
+        # En el borde superior se usa la última celda (fracción 1)
+        cell: np.ndarray = np.minimum(np.floor(position).astype(np.intp), np.asarray(self.shape) - 2)
+        fraction: np.ndarray = position - cell
+        
+        # Peso de cada vértice: producto de (1 - t) o t por eje, en el orden de _corner_offsets
+        factors: np.ndarray = np.stack((1.0 - fraction, fraction), axis=2).astype(np.float32)
+        weights: np.ndarray = factors[:, 0]
+        for d in range(1, factors.shape[1]):
+            weights = (weights[:, :, None] * factors[:, d, None, :]).reshape(factors.shape[0], -1)
+        
+        corners: np.ndarray = np.take(
+            self._flat, (cell @ self._strides)[:, None] + self._corner_offsets[None, :], axis=0
+        )
+        return np.matmul(weights[:, None, :], corners)[:, 0]
+    
+    def cell_centers(self) -> np.ndarray:
+        """
+        Obtiene el centro de cada celda, donde el error de la interpolación suele ser máximo.
+        
+        Retorna:
+        --------
+        np.ndarray
+            Estados con forma (número de celdas, D) en float32.
+        """
+        centers: list = [
+            self.lower[d] + self.steps[d] * (np.arange(self.shape[d] - 1) + 0.5) for d in range(len(self.shape))
+        ]
+        return np.stack(np.meshgrid(*centers, indexing="ij"), axis=-1).reshape(-1, len(self.shape)).astype(np.float32)
@@ -0,0 +1,243 @@
+"""
+Backends de inferencia para los actores.
+
+- 'torch': ejecuta el módulo de PyTorch (modo inferencia).
+- 'numpy': ejecuta directamente los pesos extraídos con NumPy/BLAS. Para las redes
+  pequeñas del actor y lotes chicos evita el costo de despacho de PyTorch, que domina
+  frente a las operaciones aritméticas.
+
+El motor NumPy interpreta el `nn.Sequential` del atributo `net` del actor (Linear,
+LayerNorm, ReLU, Tanh, Sigmoid) seguido de las operaciones de salida declaradas en el
+atributo de clase `OUTPUT_OPS`. Los pesos son vistas de los parámetros del módulo, por
+lo que las actualizaciones en el lugar (optimizador, load_state_dict) se reflejan sin
+recompilar. Los módulos que no puede interpretar se ejecutan con PyTorch.
+"""
+import logging
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional, Type
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+# Operación compilada: toma y devuelve un arreglo (N, features) en float32
+_Op = Callable[[np.ndarray], np.ndarray]
+
+class InferenceBackend:
+    """
+    Interfaz común de los backends de inferencia.
+    """
+    name: str = ""
+    
+    def __init__(self, device: str = "cpu") -> None:
+        """
+        Inicializa el backend.
+        
+        Parámetros:
+        -----------
+        device : str
+            Dispositivo donde residen los modelos ('cpu' o 'cuda').
+        """
+        self.device: str = device
+    
+    def run(self, actor_model: nn.Module, states: np.ndarray) -> np.ndarray:
+        """
+        Evalúa el actor sobre un lote de estados.
+        
+        Parámetros:
+        -----------
+        actor_model : nn.Module
+            Modelo de actor.
+        states : np.ndarray
+            Estados con forma (N, state_dim) en float32.
+        
+        Retorna:
+        --------
+        np.ndarray
+            Ganancias de acción con forma (N, action_dim) en float32.
+        """
+        raise NotImplementedError
+
+class TorchBackend(InferenceBackend):
+    """
+    Ejecuta el actor con PyTorch.
+    """
+    name: str = "torch"
+    
+    def run(self, actor_model: nn.Module, states: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            action_gains: torch.Tensor = actor_model(torch.from_numpy(states).to(self.device))
+        return action_gains.cpu().numpy()
+
+def _linear(weight_t: np.ndarray, bias: Optional[np.ndarray]) -> _Op:
+    def op(x: np.ndarray) -> np.ndarray:
+        y: np.ndarray = x @ weight_t
+        if bias is not None:
+            y += bias
+        return y
+    return op
+
+def _layer_norm(weight: Optional[np.ndarray], bias: Optional[np.ndarray], eps: float) -> _Op:
+    def op(x: np.ndarray) -> np.ndarray:
+        x = x - x.mean(axis=-1, keepdims=True)
+        variance: np.ndarray = np.mean(np.square(x), axis=-1, keepdims=True)
+        x *= 1.0 / np.sqrt(variance + np.float32(eps))
+        if weight is not None:
+            x *= weight
+        if bias is not None:
+            x += bias
+        return x
+    return op
+
+def _relu(x: np.ndarray) -> np.ndarray:
+    return np.maximum(x, 0, out=x)
+
+def _tanh(x: np.ndarray) -> np.ndarray:
+    return np.tanh(x, out=x)
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1.0
+    return np.reciprocal(x, out=x)
+
+def _scale(value: float) -> _Op:
+    factor: np.float32 = np.float32(value)
+    def op(x: np.ndarray) -> np.ndarray:
+        x *= factor
+        return x
+    return op
+
+def _shift(value: float) -> _Op:
+    offset: np.float32 = np.float32(value)
+    def op(x: np.ndarray) -> np.ndarray:
+        x += offset
+        return x
+    return op
+
+_ACTIVATIONS: Dict[Type[nn.Module], _Op] = {
+    nn.ReLU: _relu,
+    nn.Tanh: _tanh,
+    nn.Sigmoid: _sigmoid,
+}
+
+_OUTPUT_OPS: Dict[str, Callable[[Optional[float]], _Op]] = {
+    "relu": lambda _: _relu,
+    "tanh": lambda _: _tanh,
+    "sigmoid": lambda _: _sigmoid,
+    "scale": _scale,
+    "shift": _shift,
+}
+
+def _param_view(param: Optional[torch.Tensor]) -> Optional[np.ndarray]:
+    return None if param is None else param.detach().numpy()
+
+def compile_numpy_actor(actor_model: nn.Module) -> Optional[List[_Op]]:
+    """
+    Traduce un actor a una secuencia de operaciones NumPy que comparten memoria con sus parámetros.
+    
+    Parámetros:
+    -----------
+    actor_model : nn.Module
+        Actor con un `nn.Sequential` en `net` y operaciones de salida en `OUTPUT_OPS`.
+    
+    Retorna:
+    --------
+    Optional[List[Callable]]
+        Operaciones a aplicar en orden, o None si el módulo no se puede interpretar.
+    """
+    net: Optional[nn.Module] = getattr(actor_model, "net", None)
+    output_ops = getattr(type(actor_model), "OUTPUT_OPS", None)
+    if not isinstance(net, nn.Sequential) or output_ops is None:
+        return None
+    
+    ops: List[_Op] = []
+    for layer in net:
+        parameters: List[torch.Tensor] = list(layer.parameters())
+        if any(p.device.type != "cpu" or p.dtype != torch.float32 for p in parameters):
+            return None
+        if type(layer) is nn.Linear:
+            ops.append(_linear(_param_view(layer.weight).T, _param_view(layer.bias)))
+        elif type(layer) is nn.LayerNorm and len(layer.normalized_shape) == 1:
+            ops.append(_layer_norm(_param_view(layer.weight), _param_view(layer.bias), layer.eps))
+        elif type(layer) in _ACTIVATIONS:
+            ops.append(_ACTIVATIONS[type(layer)])
+        else:
+            return None
+    
+    for op_name, value in output_ops:
+        if op_name not in _OUTPUT_OPS:
+            return None
+        ops.append(_OUTPUT_OPS[op_name](value))
+    return ops
+
+class NumpyBackend(InferenceBackend):
+    """
+    Ejecuta los actores con NumPy/BLAS sobre vistas de sus pesos.
+    """
+    name: str = "numpy"
+    
+    def __init__(self, device: str = "cpu") -> None:
+        if device != "cpu":
+            raise ValueError(f"El backend numpy solo admite el dispositivo 'cpu', no '{device}'")
+        super().__init__(device)
+        self._compiled: "weakref.WeakKeyDictionary[nn.Module, Optional[List[_Op]]]" = weakref.WeakKeyDictionary()
+        self._lock: threading.Lock = threading.Lock()
+        self._fallback: TorchBackend = TorchBackend(device)
+    
+    def _get_compiled(self, actor_model: nn.Module) -> Optional[List[_Op]]:
+        try:
+            return self._compiled[actor_model]
+        except KeyError:
+            pass
+        with self._lock:
+            if actor_model not in self._compiled:
+                ops: Optional[List[_Op]] = compile_numpy_actor(actor_model)
+                if ops is None:
+                    logger.info(f"Actor {type(actor_model).__name__} no soportado por el backend numpy; se usa torch")
+                self._compiled[actor_model] = ops
+            return self._compiled[actor_model]
+    
+    def invalidate(self, actor_model: nn.Module) -> None:
+        """
+        Descarta la versión compilada de un actor cuyos tensores de parámetros fueron reemplazados.
+        """
+        with self._lock:
+            self._compiled.pop(actor_model, None)
+    
+    def run(self, actor_model: nn.Module, states: np.ndarray) -> np.ndarray:
+        ops: Optional[List[_Op]] = self._get_compiled(actor_model)
+        if ops is None:
+            return self._fallback.run(actor_model, states)
+        x: np.ndarray = np.asarray(states, dtype=np.float32)
+        for op in ops:
+            x = op(x)
+        return x
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    TorchBackend.name: TorchBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+
+def create_backend(name: str, device: str = "cpu") -> InferenceBackend:
+    """
+    Crea un backend de inferencia por nombre.
+    
+    Parámetros:
+    -----------
+    name : str
+        Nombre del backend ('torch' o 'numpy').
+    device : str
+        Dispositivo de los modelos.
+    
+    Retorna:
+    --------
+    InferenceBackend
+        Backend inicializado.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de inferencia no soportado: {name} (opciones: {', '.join(BACKENDS)})")
+    return BACKENDS[name](device)
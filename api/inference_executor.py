@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from constants.constants import INFERENCE_QUEUE_FULL_MSG
+
+logger = logging.getLogger(__name__)
+
+class InferenceQueueFullError(RuntimeError):
+    """
+    Se lanza cuando la cola del ejecutor de inferencia está llena.
+    """
+
+class InferenceExecutor:
+    """
+    Ejecutor dedicado para inferencia y E/S de modelos, fuera del event loop de la API.
+    
+    Usa un pool de hilos de tamaño fijo y una cola acotada: si hay más de
+    `max_workers + max_queue_size` tareas en curso, las nuevas se rechazan. El pool se crea
+    con `start` (al iniciar la API), no al construir el ejecutor.
+    """
+    
+    def __init__(
+        self, max_workers: int, max_queue_size: int, initializer: Optional[Callable[[], Any]] = None
+    ) -> None:
+        """
+        Inicializa el ejecutor de inferencia.
+        
+        Parámetros:
+        -----------
+        max_workers : int
+            Cantidad de hilos del pool.
+        max_queue_size : int
+            Cantidad máxima de tareas esperando un hilo libre.
+        initializer : Optional[Callable[[], Any]]
+            Función que se ejecuta una vez en cada hilo del pool al crearse (configuración por hilo).
+        """
+        self.max_workers: int = max(1, max_workers)
+        self.max_queue_size: int = max(0, max_queue_size)
+        self.initializer: Optional[Callable[[], Any]] = initializer
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock: threading.Lock = threading.Lock()
+        
+        # Métricas observables
+        self._in_flight: int = 0
+        self._running: int = 0
+        self.completed: int = 0
+        self.rejected: int = 0
+        self._total_wait_ms: float = 0.0
+        self.max_wait_ms: float = 0.0
+        self.last_wait_ms: float = 0.0
+    
+    def start(self) -> None:
+        """
+        Crea el pool de hilos si todavía no existe.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="inference", initializer=self.initializer
+                )
+    
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Ejecuta una función en el pool y espera su resultado sin bloquear el event loop.
+        
+        Parámetros:
+        -----------
+        fn : Callable[..., Any]
+            Función a ejecutar (inferencia, carga o guardado de modelos).
+        *args, **kwargs : Any
+            Argumentos de la función.
+            
+        Retorna:
+        --------
+        Any
+            Resultado de la función.
+            
+        Raises:
+        -------
+        InferenceQueueFullError
+            Si la cola del ejecutor está llena.
+        RuntimeError
+            Si el ejecutor no se inició con `start`.
+        """
+        with self._lock:
+            pool: Optional[ThreadPoolExecutor] = self._pool
+            if pool is None:
+                raise RuntimeError("El ejecutor de inferencia no está iniciado")
+            if self._in_flight >= self.max_workers + self.max_queue_size:
+                self.rejected += 1
+                raise InferenceQueueFullError(INFERENCE_QUEUE_FULL_MSG)
+            self._in_flight += 1
+        
+        submitted_at: float = time.perf_counter()
+        
+        def task() -> Any:
+            wait_ms: float = (time.perf_counter() - submitted_at) * 1000.0
+            with self._lock:
+                self._running += 1
+                self._total_wait_ms += wait_ms
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                self.last_wait_ms = wait_ms
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+        
+        try:
+            future: Future = pool.submit(task)
+        except BaseException:
+            self._release()
+            raise
+        # La tarea se libera al terminar o cancelarse en el pool, no cuando se cancela quien la espera:
+        # una tarea ya encolada sigue ocupando su lugar hasta ejecutarse
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+    
+    def _release(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene la configuración y las métricas del ejecutor.
+        
+        Retorna:
+        --------
+        Dict[str, Any]
+            Tamaño del pool, profundidad de cola y tiempos de espera.
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "running": self._running,
+                "queue_depth": self._in_flight - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "last_wait_ms": self.last_wait_ms,
+                "mean_wait_ms": self._total_wait_ms / max(1, self.completed),
+                "max_wait_ms": self.max_wait_ms
+            }
+    
+    def shutdown(self) -> None:
+        """
+        Detiene el pool esperando a que terminen las tareas en curso (no hace nada si no se inició).
+        """
+        with self._lock:
+            pool: Optional[ThreadPoolExecutor] = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,224 @@
+"""
+Personalización de bajo rango sobre las redes poblacionales compartidas.
+
+Cada capa lineal de un modelo personalizado se expresa como la capa poblacional más una
+corrección de rango r: y = W x + b + B (A x) + db, con A de forma [r, entrada], B de forma
+[salida, r] y db un ajuste del sesgo. El usuario solo guarda A, B y db; los pesos poblacionales
+se comparten entre todos los usuarios en memoria y no forman parte de su state_dict.
+"""
+import copy
+import itertools
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from constants.constants import PERSONALIZATION_METADATA_KEY
+
+# Modos de personalización: pesos completos por usuario o correcciones de bajo rango
+PERSONALIZATION_MODES: Tuple[str, ...] = ("full", "low_rank")
+
+# Sufijo de la matriz A en el state_dict de una capa de bajo rango
+LOW_RANK_A_SUFFIX: str = "lora_a"
+
+class LowRankLinear(nn.Module):
+    """
+    Capa lineal compartida más una corrección de bajo rango propia del usuario.
+    
+    La capa base se guarda como atributo sin registrar: no aparece en `parameters()` ni en
+    `state_dict()`, no recibe gradientes y se comparte (no se duplica) al copiar el módulo.
+    """
+    
+    def __init__(self, base: nn.Linear, rank: int) -> None:
+        """
+        Inicializa la corrección en cero: la capa equivale a la base hasta que se entrena.
+        
+        Parámetros:
+        -----------
+        base : nn.Linear
+            Capa poblacional compartida.
+        rank : int
+            Rango de la corrección.
+        """
+        super().__init__()
+        object.__setattr__(self, "base", base)
+        factory: Dict[str, object] = {"device": base.weight.device, "dtype": base.weight.dtype}
+        self.lora_a: nn.Parameter = nn.Parameter(torch.empty(rank, base.in_features, **factory))
+        self.lora_b: nn.Parameter = nn.Parameter(torch.zeros(base.out_features, rank, **factory))
+        self.bias_delta: nn.Parameter = nn.Parameter(torch.zeros(base.out_features, **factory))
+        # Misma inicialización que nn.Linear para A; con B en cero la corrección inicial es nula
+        nn.init.kaiming_uniform_(self.lora_a, a=math.sqrt(5))
+    
+    @property
+    def rank(self) -> int:
+        return self.lora_a.shape[0]
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        base_output: torch.Tensor = F.linear(x, self.base.weight.detach(), self.base.bias.detach())
+        return base_output + F.linear(F.linear(x, self.lora_a), self.lora_b, self.bias_delta)
+    
+    def __deepcopy__(self, memo: Dict[int, object]) -> "LowRankLinear":
+        # La capa base se comparte entre las copias (redes objetivo, exportación)
+        memo.setdefault(id(self.base), self.base)
+        copied: LowRankLinear = self.__class__.__new__(self.__class__)
+        memo[id(self)] = copied
+        for name, value in self.__dict__.items():
+            copied.__dict__[name] = copy.deepcopy(value, memo)
+        return copied
+    
+    def extra_repr(self) -> str:
+        return f"in_features={self.base.in_features}, out_features={self.base.out_features}, rank={self.rank}"
+
+def attach_low_rank(base_model: nn.Module, rank: int) -> nn.Module:
+    """
+    Crea un modelo personalizado de bajo rango sobre un modelo poblacional.
+    
+    El resultado tiene la misma clase y `forward` que la base, con cada `nn.Linear`
+    reemplazada por una `LowRankLinear` que comparte sus pesos.
+    
+    Parámetros:
+    -----------
+    base_model : nn.Module
+        Actor o critic poblacional (no se modifica).
+    rank : int
+        Rango de las correcciones.
+    
+    Retorna:
+    --------
+    nn.Module
+        Modelo cuyos únicos parámetros son las correcciones, inicialmente equivalente a la base.
+    """
+    # Copiar solo la estructura: los tensores de la base se reutilizan y las capas lineales se reemplazan
+    memo: Dict[int, object] = {
+        id(tensor): tensor for tensor in itertools.chain(base_model.parameters(), base_model.buffers())
+    }
+    model: nn.Module = copy.deepcopy(base_model, memo)
+    base_modules: Dict[str, nn.Module] = dict(base_model.named_modules())
+    for parent_name, parent in list(model.named_modules()):
+        for child_name, child in list(parent.named_children()):
+            if type(child) is nn.Linear:
+                qualified_name: str = f"{parent_name}.{child_name}" if parent_name else child_name
+                setattr(parent, child_name, LowRankLinear(base_modules[qualified_name], rank))
+    return model
+
+def is_low_rank(model: nn.Module) -> bool:
+    """
+    Indica si el modelo tiene capas de bajo rango.
+    """
+    return any(isinstance(module, LowRankLinear) for module in model.modules())
+
+def base_layers(model: nn.Module) -> Tuple[nn.Linear, ...]:
+    """
+    Capas base compartidas de un modelo de bajo rango, en orden.
+    """
+    return tuple(module.base for module in model.modules() if isinstance(module, LowRankLinear))
+
+def state_rank(state: Dict[str, torch.Tensor]) -> Optional[int]:
+    """
+    Rango de las correcciones guardadas en un state_dict, o None si contiene pesos completos.
+    """
+    for name, tensor in state.items():
+        if name.endswith(LOW_RANK_A_SUFFIX):
+            return tensor.shape[0]
+    return None
+
+def personalization_metadata(model: nn.Module) -> Dict[str, str]:
+    """
+    Metadatos que identifican el modo de personalización de los pesos guardados.
+    """
+    return {PERSONALIZATION_METADATA_KEY: PERSONALIZATION_MODES[1] if is_low_rank(model) else PERSONALIZATION_MODES[0]}
+
+def low_rank_from_full(base_model: nn.Module, full_model: nn.Module, rank: int) -> Tuple[nn.Module, List[float]]:
+    """
+    Aproxima un modelo con pesos completos por correcciones de bajo rango sobre la base.
+    
+    La diferencia de pesos de cada capa se trunca a rango r con una SVD (la mejor aproximación
+    en norma de Frobenius); la diferencia de sesgos se guarda completa.
+    
+    Parámetros:
+    -----------
+    base_model : nn.Module
+        Modelo poblacional.
+    full_model : nn.Module
+        Modelo personalizado con la misma arquitectura y pesos completos.
+    rank : int
+        Rango de las correcciones.
+    
+    Retorna:
+    --------
+    Tuple[nn.Module, List[float]]
+        Modelo de bajo rango y, por capa, el error relativo de los pesos en norma de Frobenius.
+    """
+    model: nn.Module = attach_low_rank(base_model, rank)
+    full_layers: Dict[str, nn.Module] = dict(full_model.named_modules())
+    errors: List[float] = []
+    with torch.no_grad():
+        for name, layer in model.named_modules():
+            if not isinstance(layer, LowRankLinear):
+                continue
+            full_layer: nn.Linear = full_layers[name]
+            full_weight: torch.Tensor = full_layer.weight.detach().double()
+            delta: torch.Tensor = full_weight - layer.base.weight.double()
+            u, s, vh = torch.linalg.svd(delta, full_matrices=False)
+            kept: int = min(rank, s.shape[0])
+            sqrt_s: torch.Tensor = s[:kept].sqrt()
+            # Las columnas que exceden el rango de la diferencia quedan en cero
+            layer.lora_a.zero_()
+            layer.lora_b.zero_()
+            layer.lora_a[:kept].copy_(sqrt_s[:, None] * vh[:kept])
+            layer.lora_b[:, :kept].copy_(u[:, :kept] * sqrt_s[None, :])
+            layer.bias_delta.copy_(full_layer.bias.detach() - layer.base.bias)
+            
+            approximation: torch.Tensor = layer.base.weight.double() + layer.lora_b.double() @ layer.lora_a.double()
+            # Escala de la capa: la mayor norma entre los pesos completos y los poblacionales
+            reference_norm: torch.Tensor = torch.maximum(
+                torch.linalg.norm(full_weight), torch.linalg.norm(layer.base.weight.double())
+            )
+            errors.append(float(torch.linalg.norm(full_weight - approximation) / reference_norm))
+    return model, errors
+
+def low_rank_actor_gains(actor_models: Sequence[nn.Module], states: Sequence[np.ndarray]) -> List[np.ndarray]:
+    """
+    Evalúa actores de bajo rango con la misma base compartiendo el producto por la base entre todos.
+    
+    Las filas de todos los actores se multiplican por los pesos poblacionales en un único
+    producto por capa; la corrección de cada actor se suma con productos por lotes de rango r.
+    
+    Parámetros:
+    -----------
+    actor_models : Sequence[nn.Module]
+        Actores de bajo rango con las mismas capas base (ver `base_layers`).
+    states : Sequence[np.ndarray]
+        Estados de cada actor con forma (N_i, STATE_DIM) en float32.
+    
+    Retorna:
+    --------
+    List[np.ndarray]
+        Ganancias de cada actor con forma (N_i, ACTION_DIM) en float32.
+    """
+    counts: List[int] = [len(actor_states) for actor_states in states]
+    layers_by_actor: List[List[nn.Module]] = [list(actor_model.net) for actor_model in actor_models]
+    x: torch.Tensor = torch.zeros(len(actor_models), max(counts), states[0].shape[1])
+    for position, (actor_states, count) in enumerate(zip(states, counts)):
+        x[position, :count] = torch.from_numpy(np.asarray(actor_states, dtype=np.float32))
+    
+    with torch.inference_mode():
+        for depth, layer in enumerate(layers_by_actor[0]):
+            if not isinstance(layer, LowRankLinear):
+                x = torch.relu_(x) if type(layer) is nn.ReLU else layer(x)
+                continue
+            adapters: List[LowRankLinear] = [layers[depth] for layers in layers_by_actor]
+            lora_a: torch.Tensor = torch.stack([adapter.lora_a for adapter in adapters]).transpose(1, 2)
+            lora_b: torch.Tensor = torch.stack([adapter.lora_b for adapter in adapters]).transpose(1, 2)
+            bias_delta: torch.Tensor = torch.stack([adapter.bias_delta for adapter in adapters]).unsqueeze(1)
+            # Producto compartido por la base (pesos leídos una sola vez) más la corrección de cada actor
+            x = F.linear(x, layer.base.weight, layer.base.bias).add_(
+                torch.baddbmm(bias_delta, torch.bmm(x, lora_a), lora_b)
+            )
+        for op, value in getattr(type(actor_models[0]), "OUTPUT_OPS", ()):
+            x = x.mul_(value) if op == "scale" else x.add_(value)
+    output: np.ndarray = x.numpy()
+    return [output[position, :count] for position, count in enumerate(counts)]
@@ -0,0 +1,157 @@
+import asyncio
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from inference_executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Agrupa solicitudes concurrentes en micro-lotes y resuelve el futuro de cada llamador por separado.
+    
+    Un lote se procesa cuando alcanza `max_batch_size` elementos o cuando pasan `max_wait_ms`
+    desde que llegó su primer elemento, lo que ocurra primero.
+    """
+    
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Union[Any, Exception]]],
+        max_wait_ms: float,
+        max_batch_size: int,
+        executor: Optional[InferenceExecutor] = None
+    ) -> None:
+        """
+        Inicializa el micro-batcher.
+        
+        Parámetros:
+        -----------
+        process_batch : Callable[[List[Any]], List[Union[Any, Exception]]]
+            Función que procesa un lote y devuelve, por elemento y en el mismo orden,
+            el resultado o la excepción correspondiente.
+        max_wait_ms : float
+            Espera máxima (milisegundos) antes de procesar un lote incompleto.
+        max_batch_size : int
+            Cantidad máxima de elementos por lote.
+        executor : Optional[InferenceExecutor]
+            Ejecutor donde procesar los lotes; si es None se procesan en el event loop.
+        """
+        self.process_batch: Callable[[List[Any]], List[Union[Any, Exception]]] = process_batch
+        self.max_wait_ms: float = max_wait_ms
+        self.max_batch_size: int = max(1, max_batch_size)
+        self.executor: Optional[InferenceExecutor] = executor
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        
+        # Métricas observables
+        self.batches_processed: int = 0
+        self.items_processed: int = 0
+        self.max_observed_batch_size: int = 0
+        self.last_batch_latency_ms: float = 0.0
+        self._total_batch_latency_ms: float = 0.0
+        self.max_batch_latency_ms: float = 0.0
+        self._total_queue_wait_ms: float = 0.0
+    
+    async def submit(self, item: Any) -> Any:
+        """
+        Encola un elemento y espera su resultado.
+        
+        Parámetros:
+        -----------
+        item : Any
+            Elemento a procesar dentro de un micro-lote.
+            
+        Retorna:
+        --------
+        Any
+            Resultado del elemento; si su procesamiento falló, se relanza la excepción.
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        """
+        Toma los elementos pendientes (hasta `max_batch_size`) y lanza su procesamiento.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        while self._pending:
+            batch: List[Tuple[Any, asyncio.Future, float]] = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+    
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        """
+        Procesa un lote y resuelve el futuro de cada elemento.
+        
+        Parámetros:
+        -----------
+        batch : List[Tuple[Any, asyncio.Future, float]]
+            Elementos del lote con su futuro y el instante en que fueron encolados.
+        """
+        start: float = time.perf_counter()
+        items: List[Any] = [item for item, _, _ in batch]
+        
+        try:
+            results: List[Union[Any, Exception]] = (
+                await self.executor.run(self.process_batch, items)
+                if self.executor is not None else self.process_batch(items)
+            )
+        except Exception as e:
+            logger.error(f"Error al procesar micro-lote de {len(items)} elementos: {e}")
+            results = [e] * len(items)
+        
+        end: float = time.perf_counter()
+        latency_ms: float = (end - start) * 1000.0
+        self.batches_processed += 1
+        self.items_processed += len(items)
+        self.max_observed_batch_size = max(self.max_observed_batch_size, len(items))
+        self.last_batch_latency_ms = latency_ms
+        self._total_batch_latency_ms += latency_ms
+        self.max_batch_latency_ms = max(self.max_batch_latency_ms, latency_ms)
+        self._total_queue_wait_ms += sum((start - enqueued_at) * 1000.0 for _, _, enqueued_at in batch)
+        logger.debug(f"Micro-lote procesado: {len(items)} elementos en {latency_ms:.2f} ms")
+        
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene la configuración y las métricas del micro-batcher.
+        
+        Retorna:
+        --------
+        Dict[str, Any]
+            Configuración, tamaño de lotes, latencia por lote y espera en cola.
+        """
+        batches: int = max(1, self.batches_processed)
+        items: int = max(1, self.items_processed)
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "pending": len(self._pending),
+            "batches_processed": self.batches_processed,
+            "items_processed": self.items_processed,
+            "mean_batch_size": self.items_processed / batches,
+            "max_observed_batch_size": self.max_observed_batch_size,
+            "last_batch_latency_ms": self.last_batch_latency_ms,
+            "mean_batch_latency_ms": self._total_batch_latency_ms / batches,
+            "max_batch_latency_ms": self.max_batch_latency_ms,
+            "mean_queue_wait_ms": self._total_queue_wait_ms / items
+        }
@@ -0,0 +1,240 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+def _tensors(models: Dict[str, torch.nn.Module]) -> Iterable[torch.Tensor]:
+    """
+    Recorre los parámetros y buffers de todos los modelos de una entrada.
+    """
+    for model in models.values():
+        if isinstance(model, torch.nn.Module):
+            yield from model.parameters()
+            yield from model.buffers()
+            # Capas cuantizadas: los pesos empaquetados no son parámetros ni buffers
+            for module in model.modules():
+                packed_params = getattr(module, "_packed_params", None)
+                if isinstance(packed_params, torch.nn.Module) and hasattr(packed_params, "_weight_bias"):
+                    yield from (tensor for tensor in packed_params._weight_bias() if tensor is not None)
+
+def models_size_bytes(models: Dict[str, torch.nn.Module], exclude_ptrs: Optional[Set[int]] = None) -> int:
+    """
+    Calcula el tamaño en bytes de los tensores de una entrada, contando una vez cada almacenamiento.
+    
+    Parámetros:
+    -----------
+    models : Dict[str, torch.nn.Module]
+        Modelos de la entrada (actor, critic, ...).
+    exclude_ptrs : Optional[Set[int]]
+        Punteros de almacenamiento que no se cuentan (por ejemplo, tensores compartidos ya contabilizados).
+        
+    Retorna:
+    --------
+    int
+        Bytes ocupados por los tensores propios de la entrada.
+    """
+    seen: Set[int] = set(exclude_ptrs or ())
+    total: int = 0
+    for tensor in _tensors(models):
+        storage = tensor.untyped_storage()
+        if storage.data_ptr() in seen:
+            continue
+        seen.add(storage.data_ptr())
+        total += storage.nbytes()
+    return total
+
+class ModelCache:
+    """
+    Caché LRU de modelos por usuario con presupuesto de memoria en bytes y expiración por inactividad.
+    
+    Las entradas fijadas (por ejemplo, los modelos poblacionales) cuentan para el presupuesto
+    pero nunca se desalojan.
+    """
+    
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        """
+        Inicializa la caché de modelos.
+        
+        Parámetros:
+        -----------
+        max_bytes : int
+            Presupuesto de memoria para los tensores de todas las entradas.
+        ttl_seconds : float
+            Tiempo de inactividad tras el cual una entrada se desaloja en `evict_expired`.
+        """
+        self.max_bytes: int = max_bytes
+        self.ttl_seconds: float = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, torch.nn.Module]]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._pinned: Dict[str, Dict[str, torch.nn.Module]] = {}
+        self._pinned_ptrs: Set[int] = set()
+        self._pinned_bytes: int = 0
+        self._entries_bytes: int = 0
+        self._lock: threading.RLock = threading.RLock()
+        
+        # Contadores observables
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+    
+    def pin(self, key: str, models: Dict[str, torch.nn.Module]) -> None:
+        """
+        Fija una entrada que nunca se desaloja.
+        
+        Parámetros:
+        -----------
+        key : str
+            Clave de la entrada fijada.
+        models : Dict[str, torch.nn.Module]
+            Modelos de la entrada.
+        """
+        with self._lock:
+            self._pinned[key] = models
+            self._pinned_ptrs = {
+                tensor.untyped_storage().data_ptr()
+                for pinned_models in self._pinned.values() for tensor in _tensors(pinned_models)
+            }
+            self._pinned_bytes = sum(models_size_bytes(pinned) for pinned in self._pinned.values())
+            self._evict_over_budget()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Obtiene una entrada actualizando su uso y los contadores de aciertos y fallos.
+        
+        Parámetros:
+        -----------
+        key : str
+            Clave de la entrada (identificador de usuario).
+        default : Any
+            Valor a devolver si la entrada no existe.
+            
+        Retorna:
+        --------
+        Any
+            Modelos de la entrada o `default`.
+        """
+        with self._lock:
+            models: Optional[Dict[str, torch.nn.Module]] = self._entries.get(key)
+            if models is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            self._last_access[key] = time.monotonic()
+            return models
+    
+    def __getitem__(self, key: str) -> Dict[str, torch.nn.Module]:
+        models: Optional[Dict[str, torch.nn.Module]] = self.get(key)
+        if models is None:
+            raise KeyError(key)
+        return models
+    
+    def __setitem__(self, key: str, models: Dict[str, torch.nn.Module]) -> None:
+        with self._lock:
+            self._remove(key)
+            size: int = models_size_bytes(models, self._pinned_ptrs)
+            self._entries[key] = models
+            self._last_access[key] = time.monotonic()
+            self._sizes[key] = size
+            self._entries_bytes += size
+            self._evict_over_budget(keep=key)
+    
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def pop(self, key: str, default: Any = None) -> Any:
+        """
+        Elimina una entrada sin contarla como desalojo.
+        
+        Parámetros:
+        -----------
+        key : str
+            Clave de la entrada.
+        default : Any
+            Valor a devolver si la entrada no existe.
+            
+        Retorna:
+        --------
+        Any
+            Modelos eliminados o `default`.
+        """
+        with self._lock:
+            models: Optional[Dict[str, torch.nn.Module]] = self._remove(key)
+            return default if models is None else models
+    
+    def _remove(self, key: str) -> Optional[Dict[str, torch.nn.Module]]:
+        """
+        Elimina una entrada y descuenta su tamaño. Debe llamarse con el lock tomado.
+        """
+        models: Optional[Dict[str, torch.nn.Module]] = self._entries.pop(key, None)
+        if models is not None:
+            self._entries_bytes -= self._sizes.pop(key, 0)
+            self._last_access.pop(key, None)
+        return models
+    
+    def _evict_over_budget(self, keep: Optional[str] = None) -> None:
+        """
+        Desaloja las entradas menos usadas recientemente hasta respetar el presupuesto.
+        Debe llamarse con el lock tomado.
+        """
+        while self._pinned_bytes + self._entries_bytes > self.max_bytes and self._entries:
+            oldest_key: str = next(iter(self._entries))
+            if oldest_key == keep:
+                break
+            self._remove(oldest_key)
+            self.evictions += 1
+            logger.debug(f"Modelos de {oldest_key} desalojados de memoria por presupuesto")
+    
+    def evict_expired(self) -> int:
+        """
+        Desaloja las entradas sin uso durante más de `ttl_seconds`.
+        
+        Retorna:
+        --------
+        int
+            Cantidad de entradas desalojadas.
+        """
+        with self._lock:
+            deadline: float = time.monotonic() - self.ttl_seconds
+            expired_keys = [key for key in self._entries if self._last_access[key] < deadline]
+            for key in expired_keys:
+                self._remove(key)
+            self.expirations += len(expired_keys)
+            return len(expired_keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene los contadores y el uso de memoria de la caché.
+        
+        Retorna:
+        --------
+        Dict[str, Any]
+            Entradas, bytes usados, presupuesto y contadores de aciertos, fallos y desalojos.
+        """
+        with self._lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "pinned_entries": len(self._pinned),
+                "bytes_used": self._pinned_bytes + self._entries_bytes,
+                "pinned_bytes": self._pinned_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
@@ -0,0 +1,265 @@
+import os
+import logging
+from typing import Dict, Optional
+
+import torch
+
+from models.models import (
+    Actor,
+    Critic,
+    infer_actor_hidden_dims,
+    flush_subnormal_parameters,
+    load_actor_model,
+    load_critic_model
+)
+from model_store import ModelStore, load_module_state
+from model_manifest import ManifestEntry
+from low_rank import PERSONALIZATION_MODES, attach_low_rank, state_rank
+from constants.constants import (
+    STATE_DIM,
+    ACTION_DIM,
+    DEFAULT_DEVICE,
+    POPULATION_ACTOR_FILE,
+    POPULATION_CRITIC_FILE,
+    POPULATION_MODEL_LOADED_MSG,
+    POPULATION_MODEL_ERROR_MSG,
+    POPULATION_MODEL_NOT_FOUND_MSG,
+    MODEL_VERSION_METADATA_KEY,
+    PERSONALIZATION_MODE,
+    LOW_RANK_RANK
+)
+
+logger = logging.getLogger(__name__)
+
+class ModelLoader:
+    """
+    Carga de modelos float32 (poblacionales y personalizados) desde el directorio de modelos.
+    
+    No tiene cachés, ejecutores ni variantes de inferencia: lo usan tanto `ModelManager`, que
+    agrega todo lo necesario para servir, como el proceso de entrenamiento, que solo necesita
+    leer y escribir pesos en el almacén.
+    """
+    
+    def __init__(
+        self,
+        models_directory: str,
+        device: str = DEFAULT_DEVICE,
+        personalization_mode: str = PERSONALIZATION_MODE,
+        low_rank_rank: int = LOW_RANK_RANK
+    ) -> None:
+        """
+        Inicializa el cargador (sin cargar los modelos poblacionales).
+        
+        Parámetros:
+        -----------
+        models_directory : str
+            Directorio donde se almacenan los modelos.
+        device : str
+            Dispositivo de los modelos cargados ('cpu' o 'cuda').
+        personalization_mode : str
+            Cómo se materializan los modelos de un usuario sin pesos propios ('full' o 'low_rank').
+        low_rank_rank : int
+            Rango de las correcciones por capa en el modo 'low_rank'.
+        """
+        if personalization_mode not in PERSONALIZATION_MODES:
+            raise ValueError(f"Modo de personalización no soportado: {personalization_mode}")
+        self.models_directory: str = models_directory
+        self.device: str = device
+        self.personalization_mode: str = personalization_mode
+        self.low_rank_rank: int = low_rank_rank
+        self.model_store: ModelStore = ModelStore(models_directory)
+        # Versión de los pesos personalizados de cada usuario (metadatos del archivo empaquetado)
+        self.model_versions: Dict[str, int] = {}
+        self.population_actor: Optional[Actor] = None
+        self.population_critic: Optional[Critic] = None
+    
+    def build_models_from_state(
+        self,
+        actor_state: Dict[str, torch.Tensor],
+        critic_state: Optional[Dict[str, torch.Tensor]]
+    ) -> Dict[str, torch.nn.Module]:
+        """
+        Construye actor y critic a partir de state_dict del almacén empaquetado sin copiar los pesos.
+        
+        Parámetros:
+        -----------
+        actor_state : Dict[str, torch.Tensor]
+            state_dict del actor (vistas del archivo mapeado).
+        critic_state : Optional[Dict[str, torch.Tensor]]
+            state_dict del critic o None si no se guardó.
+        
+        Retorna:
+        --------
+        Dict[str, torch.nn.Module]
+            Modelos listos para inferencia.
+        """
+        if state_rank(actor_state) is not None:
+            return self._build_low_rank_models(actor_state, critic_state)
+        
+        # Construir en el dispositivo 'meta' evita inicializar pesos que se reemplazan enseguida
+        with torch.device("meta"):
+            actor: Actor = Actor(STATE_DIM, ACTION_DIM, infer_actor_hidden_dims(actor_state))
+        models: Dict[str, torch.nn.Module] = {"actor": load_module_state(actor, actor_state).to(self.device).eval()}
+        flush_subnormal_parameters(models["actor"])
+        
+        if critic_state is not None:
+            with torch.device("meta"):
+                critic: Critic = Critic(STATE_DIM, ACTION_DIM)
+            models["critic"] = load_module_state(critic, critic_state).to(self.device).eval()
+        return models
+    
+    def _build_low_rank_models(
+        self,
+        actor_state: Dict[str, torch.Tensor],
+        critic_state: Optional[Dict[str, torch.Tensor]]
+    ) -> Dict[str, torch.nn.Module]:
+        """
+        Construye actor y critic de bajo rango sobre los modelos poblacionales a partir de sus correcciones.
+        
+        Parámetros:
+        -----------
+        actor_state : Dict[str, torch.Tensor]
+            Correcciones del actor (vistas del archivo mapeado).
+        critic_state : Optional[Dict[str, torch.Tensor]]
+            Correcciones del critic o None si no se guardaron.
+        
+        Retorna:
+        --------
+        Dict[str, torch.nn.Module]
+            Modelos listos para inferencia que comparten los pesos poblacionales.
+        """
+        if self.population_actor is None or (critic_state is not None and self.population_critic is None):
+            raise ValueError("Modelos poblacionales no disponibles para aplicar las correcciones de bajo rango")
+        models: Dict[str, torch.nn.Module] = {
+            "actor": load_module_state(
+                attach_low_rank(self.population_actor, state_rank(actor_state)), actor_state
+            ).eval()
+        }
+        if critic_state is not None:
+            models["critic"] = load_module_state(
+                attach_low_rank(self.population_critic, state_rank(critic_state)), critic_state
+            ).eval()
+        return models
+    
+    def load_population_models(self) -> None:
+        """
+        Carga los modelos poblacionales (actor y critic) por defecto desde el directorio de modelos.
+        
+        Se prefiere el archivo empaquetado; si no existe se usan los archivos .pth.
+        """
+        if os.path.exists(self.model_store.population_path()):
+            try:
+                actor_state, critic_state, _ = self.model_store.load_population_state()
+                population_models: Dict[str, torch.nn.Module] = self.build_models_from_state(actor_state, critic_state)
+                self.population_actor = population_models["actor"]
+                self.population_critic = population_models.get("critic")
+                logger.info(f"{POPULATION_MODEL_LOADED_MSG} ({self.model_store.population_path()})")
+                return
+            except Exception as e:
+                logger.error(f"{POPULATION_MODEL_ERROR_MSG} ({self.model_store.population_path()}): {e}")
+        
+        population_actor_path: str = os.path.join(self.models_directory, POPULATION_ACTOR_FILE)
+        population_critic_path: str = os.path.join(self.models_directory, POPULATION_CRITIC_FILE)
+        
+        # Cargar actor poblacional
+        if os.path.exists(population_actor_path):
+            try:
+                self.population_actor = load_actor_model(
+                    population_actor_path, STATE_DIM, ACTION_DIM, self.device
+                )
+                logger.info(f"{POPULATION_MODEL_LOADED_MSG} (Actor)")
+            except Exception as e:
+                logger.error(f"{POPULATION_MODEL_ERROR_MSG} (Actor): {e}")
+                self.population_actor = None
+        else:
+            logger.warning(f"{POPULATION_MODEL_NOT_FOUND_MSG} (Actor)")
+            self.population_actor = None
+        
+        # Cargar critic poblacional
+        if os.path.exists(population_critic_path):
+            try:
+                self.population_critic = load_critic_model(population_critic_path, STATE_DIM, ACTION_DIM, self.device)
+                self.population_critic.eval()
+                logger.info(f"{POPULATION_MODEL_LOADED_MSG} (Critic)")
+            except Exception as e:
+                logger.error(f"{POPULATION_MODEL_ERROR_MSG} (Critic): {e}")
+                self.population_critic = None
+        else:
+            logger.warning(f"{POPULATION_MODEL_NOT_FOUND_MSG} (Critic)")
+            self.population_critic = None
+    
+    def load_user_models(self, user_id: str) -> Optional[Dict[str, torch.nn.Module]]:
+        """
+        Carga del almacén los modelos float32 de un usuario y registra su versión.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        
+        Retorna:
+        --------
+        Optional[Dict[str, torch.nn.Module]]
+            Actor y critic del usuario, o None si no tiene pesos propios en el almacén.
+        
+        Raises:
+        -------
+        Exception
+            Si el archivo existe pero no se puede leer.
+        """
+        # El índice del almacén indica si hay modelos en disco sin tener que consultarlo
+        entry: Optional[ManifestEntry] = self.model_store.user_entry(user_id)
+        if entry is None:
+            return None
+        if entry.legacy:
+            # Formato anterior: archivos .pth separados para actor y critic
+            personalized_actor_path, personalized_critic_path = entry.paths
+            actor: Actor = load_actor_model(personalized_actor_path, STATE_DIM, ACTION_DIM, self.device)
+            critic: Critic = load_critic_model(personalized_critic_path, STATE_DIM, ACTION_DIM, self.device)
+            self.model_versions.setdefault(user_id, 0)
+            return {"actor": actor, "critic": critic}
+        
+        # Formato empaquetado: un único mapeo por usuario
+        actor_state, critic_state, metadata = self.model_store.load_user_state(user_id)
+        user_models: Dict[str, torch.nn.Module] = self.build_models_from_state(actor_state, critic_state)
+        self.model_versions[user_id] = int(metadata.get(MODEL_VERSION_METADATA_KEY, 0))
+        return user_models
+    
+    def clone_population_models(self) -> Dict[str, torch.nn.Module]:
+        """
+        Crea modelos propios y entrenables para un usuario a partir de los poblacionales.
+        
+        En el modo 'low_rank' solo las correcciones son nuevas; los pesos poblacionales se comparten.
+        
+        Retorna:
+        --------
+        Dict[str, torch.nn.Module]
+            Actor y critic en modo entrenamiento.
+        
+        Raises:
+        -------
+        ValueError
+            Si los modelos poblacionales no están disponibles.
+        """
+        if self.population_actor is None or self.population_critic is None:
+            raise ValueError("Modelos poblacionales no disponibles")
+        
+        if self.personalization_mode == "low_rank":
+            return {
+                "actor": attach_low_rank(self.population_actor, self.low_rank_rank).train(),
+                "critic": attach_low_rank(self.population_critic, self.low_rank_rank).train()
+            }
+        
+        # Clonar actor poblacional
+        population_actor_state: Dict[str, torch.Tensor] = self.population_actor.state_dict()
+        cloned_actor: Actor = Actor(
+            STATE_DIM, ACTION_DIM, infer_actor_hidden_dims(population_actor_state)
+        ).to(self.device)
+        cloned_actor.load_state_dict(population_actor_state)
+        cloned_actor.train()  # Configurar para entrenamiento
+        
+        # Clonar critic poblacional
+        cloned_critic: Critic = Critic(STATE_DIM, ACTION_DIM).to(self.device)
+        cloned_critic.load_state_dict(self.population_critic.state_dict())
+        cloned_critic.train()  # Configurar para entrenamiento
+        return {"actor": cloned_actor, "critic": cloned_critic}
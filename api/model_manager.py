@@ -1,10 +1,19 @@
 import os
+import threading
+import time
+import weakref
 import torch
 import numpy as np
 from datetime import datetime
-from typing import Dict, Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple, List, Union
 
-from models.models import Actor, Critic, load_actor_model, load_critic_model, apply_safety_constraints, compute_bolus
+from models.models import (
+    Actor,
+    Critic,
+    apply_safety_constraints_batch,
+    compute_bolus_batch
+)
 from constants.constants import (
     STATE_DIM,
     ACTION_DIM,
@@ -17,18 +26,11 @@ from constants.constants import (
     CONFIDENCE_UPPER_PERCENTILE,
     DEFAULT_DEVICE,
     DEFAULT_MODELS_DIR,
-    POPULATION_ACTOR_FILE,
-    POPULATION_CRITIC_FILE,
-    PERSONALIZED_ACTOR_PREFIX,
-    PERSONALIZED_CRITIC_PREFIX,
-    MODEL_EXTENSION,
-    POPULATION_MODEL_LOADED_MSG,
-    POPULATION_MODEL_ERROR_MSG,
-    POPULATION_MODEL_NOT_FOUND_MSG,
     USER_REGISTERED_MSG,
     USER_REGISTER_ERROR_MSG,
-    MODEL_CLONE_DURING_REGISTRATION_MSG,
-    MODEL_CLONE_ERROR_DURING_REGISTRATION_MSG,
+    PERSONALIZED_MODEL_CLONED_MSG,
+    PERSONALIZED_MODEL_CLONE_ERROR_MSG,
+    SHARED_POPULATION_WEIGHTS_MSG,
     MODEL_SAVED_MSG,
     PERSONALIZED_MODEL_LOADED_MSG,
     PERSONALIZED_MODEL_ERROR_MSG,
@@ -44,6 +46,14 @@ from constants.constants import (
     HYPER_WARNING_MSG,
     HYPER_SEVERE_MSG,
     CLEANUP_MODELS_MSG,
+    MODEL_MANIFEST_REFRESHED_MSG,
+    WARMUP_MAX_MODELS,
+    WARMUP_MAX_WORKERS,
+    WARMUP_USERS_FILE,
+    WARMUP_STARTED_MSG,
+    WARMUP_FINISHED_MSG,
+    WARMUP_USERS_FILE_ERROR_MSG,
+    WARMUP_MODEL_ERROR_MSG,
     NUM_UNCERTAINTY_SAMPLES,
     HIGH_BOLUS_WARNING,
     HIGH_BOLUS_SEVERE,
@@ -53,11 +63,100 @@ from constants.constants import (
     SEVERE_HYPO_THRESHOLD,
     HYPO_THRESHOLD,
     SEVERE_HYPER_THRESHOLD,
-    HYPER_THRESHOLD
+    HYPER_THRESHOLD,
+    TARGET_BG,
+    MIN_BOLUS,
+    MIN_CGM_INPUT,
+    MAX_CGM_INPUT,
+    MIN_CARBS_INPUT,
+    MAX_CARBS_INPUT,
+    MIN_IOB_INPUT,
+    MAX_IOB_INPUT,
+    CGM_RANGE_ERROR_MSG,
+    CARBS_RANGE_ERROR_MSG,
+    IOB_RANGE_ERROR_MSG,
+    MICRO_BATCH_MAX_WAIT_MS,
+    MICRO_BATCH_MAX_SIZE,
+    INFERENCE_MAX_WORKERS,
+    INFERENCE_MAX_QUEUE_SIZE,
+    INFERENCE_BACKEND,
+    INFERENCE_FLUSH_DENORMAL,
+    MODEL_SERVING_PRECISION,
+    QUANTIZATION_MAX_DOSE_DEVIATION,
+    SERVING_VARIANT_ACCEPTED_MSG,
+    SERVING_VARIANT_REJECTED_MSG,
+    DISTILLED_POPULATION_ENABLED,
+    DISTILLED_MAX_DOSE_DEVIATION,
+    DISTILLED_POPULATION_ACCEPTED_MSG,
+    DISTILLED_POPULATION_REJECTED_MSG,
+    POPULATION_SERVING_ACTOR_MSG,
+    DOSE_TABLE_POPULATION_ENABLED,
+    DOSE_TABLE_PERSONALIZED_ENABLED,
+    DOSE_TABLE_MAX_DOSE_ERROR,
+    DOSE_TABLE_CGM_STEP,
+    DOSE_TABLE_CARBS_STEP,
+    DOSE_TABLE_MINUTES_STEP,
+    DOSE_TABLE_IOB_STEP,
+    DOSE_TABLE_LOWER,
+    DOSE_TABLE_UPPER,
+    DOSE_TABLE_VALIDATION_SAMPLES,
+    DOSE_TABLE_ACCEPTED_MSG,
+    DOSE_TABLE_REJECTED_MSG,
+    DOSE_TABLE_ERROR_MSG,
+    MODEL_CACHE_MAX_BYTES,
+    MODEL_CACHE_TTL_SECONDS,
+    REPLAY_BUFFER_DIR,
+    REPLAY_BUFFER_CAPACITY,
+    REPLAY_BUFFER_MAX_BYTES,
+    FEEDBACK_RECORDED_MSG,
+    MODEL_VERSION_METADATA_KEY,
+    PERSONALIZED_MODEL_VERSION_PREFIX,
+    MODEL_VERSION_PUBLISHED_MSG,
+    MODEL_VERSION_SWAP_ERROR_MSG,
+    TRAINING_QUEUE_FULL_MSG,
+    PREDICTION_CACHE_MAX_ENTRIES,
+    PREDICTION_CACHE_CGM_RESOLUTION,
+    PREDICTION_CACHE_CARBS_RESOLUTION,
+    PREDICTION_CACHE_IOB_RESOLUTION,
+    PREDICTION_CACHE_MINUTES_RESOLUTION,
+    POPULATION_CACHE_KEY,
+    STACKED_INFERENCE_MAX_ACTORS,
+    PERSONALIZATION_MODE,
+    LOW_RANK_RANK,
+    CGM_HISTORY_CAPACITY,
+    CGM_HISTORY_MAX_USERS,
+    CGM_STORE_ENABLED,
+    CGM_STORE_DIR
+)
+from micro_batcher import MicroBatcher
+from inference_executor import InferenceExecutor
+from model_cache import ModelCache
+from prediction_cache import PredictionCache, PredictionResult
+from replay_buffer import ReplayBufferPool
+from cgm_history import CGMHistoryStore
+from cgm_store import CGMSeriesStore, TieredCGMStore
+from cgm_rollups import CGMRollups
+from cgm_metrics import CGMMetrics
+from model_loader import ModelLoader
+from model_store import ModelStore
+from inference_backends import InferenceBackend, create_backend
+from model_quantization import SERVING_PRECISIONS, make_serving_variant, max_dose_deviation
+from gain_table import GainTable
+from stacked_actors import StackedActorPool
+from low_rank import (
+    PERSONALIZATION_MODES,
+    base_layers,
+    is_low_rank,
+    low_rank_actor_gains,
+    personalization_metadata
 )
-from response_models import UserProfile, BolusRequest, BolusResponse
+from pydantic import ValidationError
+from response_models import UserProfile, BolusRequest, BolusResponse, BolusBatchColumns
 import logging
 
+if TYPE_CHECKING:
+    from training_worker import TrainingWorker
+
 logger = logging.getLogger(__name__)
 
 class ModelManager:
@@ -65,7 +164,33 @@ class ModelManager:
     Administrador de modelos DRL para múltiples usuarios.
     """
     
-    def __init__(self, models_directory: str = DEFAULT_MODELS_DIR, device: str = DEFAULT_DEVICE) -> None:
+    def __init__(
+        self,
+        models_directory: str = DEFAULT_MODELS_DIR,
+        device: str = DEFAULT_DEVICE,
+        micro_batch_max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+        micro_batch_max_size: int = MICRO_BATCH_MAX_SIZE,
+        inference_max_workers: int = INFERENCE_MAX_WORKERS,
+        inference_max_queue_size: int = INFERENCE_MAX_QUEUE_SIZE,
+        model_cache_max_bytes: int = MODEL_CACHE_MAX_BYTES,
+        model_cache_ttl_seconds: float = MODEL_CACHE_TTL_SECONDS,
+        prediction_cache_max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        inference_backend: str = INFERENCE_BACKEND,
+        flush_denormal: bool = INFERENCE_FLUSH_DENORMAL,
+        serving_precision: str = MODEL_SERVING_PRECISION,
+        max_dose_deviation: float = QUANTIZATION_MAX_DOSE_DEVIATION,
+        serve_distilled_population: bool = DISTILLED_POPULATION_ENABLED,
+        distilled_max_dose_deviation: float = DISTILLED_MAX_DOSE_DEVIATION,
+        dose_table_population: bool = DOSE_TABLE_POPULATION_ENABLED,
+        dose_table_personalized: bool = DOSE_TABLE_PERSONALIZED_ENABLED,
+        dose_table_max_dose_error: float = DOSE_TABLE_MAX_DOSE_ERROR,
+        stacked_inference_max_actors: int = STACKED_INFERENCE_MAX_ACTORS,
+        personalization_mode: str = PERSONALIZATION_MODE,
+        low_rank_rank: int = LOW_RANK_RANK,
+        cgm_history_capacity: int = CGM_HISTORY_CAPACITY,
+        cgm_history_max_users: int = CGM_HISTORY_MAX_USERS,
+        cgm_store_enabled: bool = CGM_STORE_ENABLED
+    ) -> None:
         """
         Inicializa el administrador de modelos.
         
@@ -75,59 +200,303 @@ class ModelManager:
             Directorio donde se almacenan los modelos.
         device : str
             Dispositivo para la inferencia ('cpu' o 'cuda').
+        micro_batch_max_wait_ms : float
+            Espera máxima (milisegundos) para agrupar predicciones concurrentes.
+        micro_batch_max_size : int
+            Cantidad máxima de solicitudes por micro-lote.
+        inference_max_workers : int
+            Hilos del ejecutor de inferencia y E/S de modelos.
+        inference_max_queue_size : int
+            Tareas que pueden esperar en la cola del ejecutor antes de rechazar nuevas.
+        model_cache_max_bytes : int
+            Presupuesto de memoria para los modelos cargados.
+        model_cache_ttl_seconds : float
+            Tiempo de inactividad tras el cual se liberan los modelos de un usuario.
+        prediction_cache_max_entries : int
+            Predicciones guardadas para solicitudes repetidas con entradas cuantizadas (0 la deshabilita).
+        inference_backend : str
+            Backend que evalúa los actores ('torch' o 'numpy').
+        flush_denormal : bool
+            Si es True, los hilos del ejecutor de inferencia tratan los subnormales como cero; el
+            resto del proceso conserva su configuración.
+        serving_precision : str
+            Precisión de los actores servidos ('float32', 'float16' o 'int8').
+        max_dose_deviation : float
+            Desviación máxima de dosis (Unidades) admitida para servir una variante de precisión reducida.
+        serve_distilled_population : bool
+            Si es True y existe un actor poblacional destilado válido, se sirve a los usuarios poblacionales.
+        distilled_max_dose_deviation : float
+            Desviación máxima de dosis (Unidades) admitida para servir el actor destilado.
+        dose_table_population : bool
+            Si es True, la precarga construye la tabla de ganancias del actor poblacional servido.
+        dose_table_personalized : bool
+            Si es True, se construye en segundo plano la tabla de ganancias de cada actor personalizado cargado.
+        dose_table_max_dose_error : float
+            Error máximo de dosis (Unidades) de la tabla frente al actor para servirla.
+        stacked_inference_max_actors : int
+            Actores float32 con pesos apilados para evaluar lotes de varios usuarios juntos (0 lo deshabilita).
+        personalization_mode : str
+            Cómo se materializan los modelos de un usuario nuevo: 'full' (copia completa de los
+            poblacionales) o 'low_rank' (correcciones de bajo rango sobre los poblacionales compartidos).
+            Los pesos ya guardados se cargan en el modo con el que se guardaron.
+        low_rank_rank : int
+            Rango de las correcciones por capa en el modo 'low_rank'.
+        cgm_history_capacity : int
+            Lecturas de CGM que se conservan por usuario.
+        cgm_history_max_users : int
+            Usuarios con historial de CGM en memoria.
+        cgm_store_enabled : bool
+            Si es True, las lecturas de CGM también se guardan en disco (series completas por usuario).
         """
+        if serving_precision not in SERVING_PRECISIONS:
+            raise ValueError(f"Precisión de inferencia no soportada: {serving_precision}")
+        if personalization_mode not in PERSONALIZATION_MODES:
+            raise ValueError(f"Modo de personalización no soportado: {personalization_mode}")
         self.models_directory: str = models_directory
         self.device: str = device
-        self.loaded_models: Dict[str, Dict[str, torch.nn.Module]] = {}
+        self.loaded_models: ModelCache = ModelCache(model_cache_max_bytes, model_cache_ttl_seconds)
         self.user_profiles: Dict[str, UserProfile] = {}
-        self.population_actor: Optional[Actor] = None
-        self.population_critic: Optional[Critic] = None
+        
+        # Almacén, modelos poblacionales float32 y versiones de los pesos personalizados
+        self.loader: ModelLoader = ModelLoader(models_directory, device, personalization_mode, low_rank_rank)
+        self.population_serving_actor: Optional[torch.nn.Module] = None
+        self.serving_precision: str = serving_precision
+        self.personalization_mode: str = personalization_mode
+        self.low_rank_rank: int = low_rank_rank
+        self.max_dose_deviation: float = max_dose_deviation
+        self.serve_distilled_population: bool = serve_distilled_population
+        self.distilled_max_dose_deviation: float = distilled_max_dose_deviation
+        self.dose_table_population: bool = dose_table_population
+        self.dose_table_personalized: bool = dose_table_personalized
+        self.dose_table_max_dose_error: float = dose_table_max_dose_error
+        self.dose_table_steps: Tuple[float, ...] = (
+            DOSE_TABLE_CGM_STEP,
+            DOSE_TABLE_CARBS_STEP / MEAL_DURATION_FOR_RATE_CALCULATION,
+            DOSE_TABLE_MINUTES_STEP,
+            DOSE_TABLE_IOB_STEP
+        )
         self.rng: np.random.Generator = np.random.default_rng(seed=SEED)
         
-        # Crear directorio de modelos si no existe
-        os.makedirs(models_directory, exist_ok=True)
+        # Ruido de CGM para estimar incertidumbre (misma semilla en cada predicción, se calcula una sola vez)
+        self.uncertainty_noise: np.ndarray = np.random.default_rng(seed=SEED).normal(
+            0, CGM_NOISE_STD, size=NUM_UNCERTAINTY_SAMPLES
+        )
+        
+        # Caché de predicciones: no cachea celdas de CGM cuyas variaciones cruzan un umbral clínico
+        self.prediction_cache: PredictionCache = PredictionCache(
+            prediction_cache_max_entries,
+            PREDICTION_CACHE_CGM_RESOLUTION,
+            PREDICTION_CACHE_CARBS_RESOLUTION,
+            PREDICTION_CACHE_IOB_RESOLUTION,
+            PREDICTION_CACHE_MINUTES_RESOLUTION,
+            cgm_thresholds=(SEVERE_HYPO_THRESHOLD, HYPO_THRESHOLD, TARGET_BG),
+            cgm_margin=float(np.abs(self.uncertainty_noise).max(initial=0.0))
+        )
+        
+        # Backend que evalúa los actores (seleccionable por despliegue)
+        self.backend: InferenceBackend = create_backend(inference_backend, device)
+        
+        # Ejecutor dedicado para inferencia y E/S de modelos (fuera del event loop), iniciado por
+        # `start`. Tratar las activaciones subnormales como cero evita el camino lento de la CPU;
+        # el ajuste es por hilo
+        self.executor: InferenceExecutor = InferenceExecutor(
+            inference_max_workers,
+            inference_max_queue_size,
+            initializer=(lambda: torch.set_flush_denormal(True)) if flush_denormal else None
+        )
+        
+        # Agrupador de predicciones concurrentes en micro-lotes
+        self.bolus_batcher: MicroBatcher = MicroBatcher(
+            self.predict_bolus_with_confidence_batch,
+            micro_batch_max_wait_ms,
+            micro_batch_max_size,
+            executor=self.executor
+        )
+        
+        # Tablas de ganancias validadas por actor servido; se liberan junto con el actor
+        self.gain_tables: "weakref.WeakKeyDictionary[torch.nn.Module, GainTable]" = weakref.WeakKeyDictionary()
+        self._gain_table_versions: "weakref.WeakKeyDictionary[torch.nn.Module, int]" = weakref.WeakKeyDictionary()
+        self._gain_tables_scheduled: "weakref.WeakSet[torch.nn.Module]" = weakref.WeakSet()
+        self._gain_tables_lock: threading.Lock = threading.Lock()
+        # Un solo hilo construye las tablas en orden, sin competir con la inferencia (se crea en `start`)
+        self.gain_table_builder: Optional[ThreadPoolExecutor] = None
+        
+        # Disponibilidad para recibir tráfico (se activa al terminar la precarga)
+        self.ready: threading.Event = threading.Event()
+        self.warmup_stats: Dict[str, Union[int, float]] = {}
+        
+        # Transiciones de retroalimentación por usuario para el entrenamiento en línea
+        self.replay_buffers: ReplayBufferPool = ReplayBufferPool(
+            os.path.join(models_directory, REPLAY_BUFFER_DIR), REPLAY_BUFFER_MAX_BYTES, REPLAY_BUFFER_CAPACITY
+        )
+        # Historial de CGM por usuario (lecturas individuales y cargas retroactivas)
+        self.cgm_history: CGMHistoryStore = CGMHistoryStore(cgm_history_capacity, cgm_history_max_users)
+        self.cgm_store: Optional[CGMSeriesStore] = (
+            CGMSeriesStore(os.path.join(models_directory, CGM_STORE_DIR)) if cgm_store_enabled else None
+        )
+        # Punto de acceso único al historial: escribe en ambos niveles y consulta el que cubre el rango
+        self.cgm_series: TieredCGMStore = TieredCGMStore(self.cgm_history, self.cgm_store)
+        # Agregados por intervalos y retención de las series en disco
+        self.cgm_rollups: Optional[CGMRollups] = (
+            CGMRollups(self.cgm_series, self.cgm_store.directory) if self.cgm_store is not None else None
+        )
+        # Métricas glucémicas por ventana deslizante, actualizadas con cada escritura del historial
+        self.cgm_metrics: CGMMetrics = CGMMetrics(self.cgm_series)
+        self.cgm_series.metrics = self.cgm_metrics
+        
+        # Proceso de entrenamiento en segundo plano (opcional); si existe, recibe las transiciones
+        self.training_worker: Optional["TrainingWorker"] = None
+        
+        # Cargar modelos poblacionales por defecto y fijarlos en la caché
+        self.loader.load_population_models()
+        if self.population_actor is not None:
+            distilled_actor: Optional[Actor] = self._load_distilled_population_actor()
+            self.population_serving_actor = distilled_actor or self._serving_actor(
+                POPULATION_CACHE_KEY, self.population_actor
+            )
+            if distilled_actor is not None:
+                serving_variant: str = "destilado"
+            elif self.population_serving_actor is self.population_actor:
+                serving_variant = "float32"
+            else:
+                serving_variant = self.serving_precision
+            logger.info(f"{POPULATION_SERVING_ACTOR_MSG} {serving_variant}")
+            self.loaded_models.pin(
+                POPULATION_CACHE_KEY,
+                {
+                    "actor": self.population_actor,
+                    "critic": self.population_critic,
+                    "serving_actor": self.population_serving_actor
+                }
+            )
         
-        # Cargar modelos poblacionales por defecto
-        self._load_population_models()
+        # Pesos apilados de los actores activos con la arquitectura poblacional (lotes de varios usuarios)
+        self.stacked_actors: Optional[StackedActorPool] = None
+        if stacked_inference_max_actors > 0 and isinstance(self.population_actor, Actor):
+            self.stacked_actors = StackedActorPool(self.population_actor, stacked_inference_max_actors)
     
-    def _load_population_models(self) -> None:
+    def start(self) -> None:
         """
-        Carga los modelos poblacionales (actor y critic) por defecto desde el directorio de modelos.
+        Inicia los hilos del ejecutor de inferencia y del constructor de tablas de ganancias.
+        
+        Lo llama el `lifespan` de la API: crear un ModelManager (en scripts o pruebas) no deja
+        hilos en ejecución. Sin iniciar, las tablas de ganancias no se construyen en segundo plano.
+        """
+        self.executor.start()
+        if self.gain_table_builder is None:
+            self.gain_table_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gain-table")
+    
+    def shutdown(self) -> None:
+        """
+        Detiene los hilos iniciados por `start` y guarda en disco los buffers de repetición cargados.
+        """
+        self.executor.shutdown()
+        self.replay_buffers.flush()
+        if self.gain_table_builder is not None:
+            self.gain_table_builder.shutdown(wait=False, cancel_futures=True)
+            self.gain_table_builder = None
+    
+    @property
+    def model_store(self) -> ModelStore:
+        return self.loader.model_store
+    
+    @property
+    def model_versions(self) -> Dict[str, int]:
+        return self.loader.model_versions
+    
+    @property
+    def population_actor(self) -> Optional[Actor]:
+        return self.loader.population_actor
+    
+    @population_actor.setter
+    def population_actor(self, actor: Optional[Actor]) -> None:
+        self.loader.population_actor = actor
+    
+    @property
+    def population_critic(self) -> Optional[Critic]:
+        return self.loader.population_critic
+    
+    @population_critic.setter
+    def population_critic(self, critic: Optional[Critic]) -> None:
+        self.loader.population_critic = critic
+    
+    def _build_models_from_state(
+        self,
+        actor_state: Dict[str, torch.Tensor],
+        critic_state: Optional[Dict[str, torch.Tensor]]
+    ) -> Dict[str, torch.nn.Module]:
         """
-        population_actor_path: str = os.path.join(self.models_directory, POPULATION_ACTOR_FILE)
-        population_critic_path: str = os.path.join(self.models_directory, POPULATION_CRITIC_FILE)
+        Construye actor y critic a partir de state_dict del almacén empaquetado (ver `ModelLoader`).
+        """
+        return self.loader.build_models_from_state(actor_state, critic_state)
+    
+    def _serving_actor(self, owner: str, actor: Actor) -> torch.nn.Module:
+        """
+        Obtiene el actor a servir en la precisión configurada, validado contra el actor float32.
         
-        # Cargar actor poblacional
-        if os.path.exists(population_actor_path):
-            try:
-                self.population_actor = load_actor_model(
-                    population_actor_path, STATE_DIM, ACTION_DIM, self.device
-                )
-                logger.info(f"{POPULATION_MODEL_LOADED_MSG} (Actor)")
-            except Exception as e:
-                logger.error(f"{POPULATION_MODEL_ERROR_MSG} (Actor): {e}")
-                self.population_actor = None
-        else:
-            logger.warning(f"{POPULATION_MODEL_NOT_FOUND_MSG} (Actor)")
-            self.population_actor = None
+        La variante solo se sirve si la máxima desviación de dosis sobre la grilla de referencia
+        no supera el umbral; en caso contrario se sirve el actor float32.
         
-        # Cargar critic poblacional
-        if os.path.exists(population_critic_path):
-            try:
-                self.population_critic = Critic(STATE_DIM, ACTION_DIM).to(self.device)
-                self.population_critic = load_critic_model(population_critic_path, STATE_DIM, ACTION_DIM, self.device)
-                self.population_critic.eval()
-                logger.info(f"{POPULATION_MODEL_LOADED_MSG} (Critic)")
-            except Exception as e:
-                logger.error(f"{POPULATION_MODEL_ERROR_MSG} (Critic): {e}")
-                self.population_critic = None
-        else:
-            logger.warning(f"{POPULATION_MODEL_NOT_FOUND_MSG} (Critic)")
-            self.population_critic = None
+        Parámetros:
+        -----------
+        owner : str
+            Usuario (o 'population') dueño del actor, para los logs.
+        actor : Actor
+            Actor float32 de referencia.
+            
+        Retorna:
+        --------
+        torch.nn.Module
+            Variante validada o el actor original.
+        """
+        if self.serving_precision == "float32":
+            return actor
+        
+        try:
+            variant: torch.nn.Module = make_serving_variant(actor, self.serving_precision)
+            deviation: float = max_dose_deviation(actor, variant, self._predict_bolus_array)
+        except Exception as e:
+            logger.error(f"{SERVING_VARIANT_REJECTED_MSG} {owner} ({self.serving_precision}): {e}")
+            return actor
+        
+        if deviation > self.max_dose_deviation:
+            logger.warning(f"{SERVING_VARIANT_REJECTED_MSG} {owner} ({self.serving_precision}): {deviation:.4f}")
+            return actor
+        logger.info(f"{SERVING_VARIANT_ACCEPTED_MSG} {owner} ({self.serving_precision}): {deviation:.4f}")
+        return variant
+    
+    def _load_distilled_population_actor(self) -> Optional[Actor]:
+        """
+        Carga el actor poblacional destilado si existe y sus dosis coinciden con las del actor completo.
+        
+        Retorna:
+        --------
+        Optional[Actor]
+            Actor destilado validado, o None si no está habilitado, no existe o no pasa la validación.
+        """
+        if not self.serve_distilled_population or not os.path.exists(self.model_store.distilled_population_path()):
+            return None
+        
+        try:
+            actor_state, _ = self.model_store.load_distilled_population_state()
+            distilled_actor: Actor = self._build_models_from_state(actor_state, None)["actor"]
+            deviation: float = max_dose_deviation(self.population_actor, distilled_actor, self._predict_bolus_array)
+        except Exception as e:
+            logger.error(f"{DISTILLED_POPULATION_REJECTED_MSG} {e}")
+            return None
+        
+        if deviation > self.distilled_max_dose_deviation:
+            logger.warning(f"{DISTILLED_POPULATION_REJECTED_MSG} {deviation:.4f}")
+            return None
+        logger.info(f"{DISTILLED_POPULATION_ACCEPTED_MSG} {deviation:.4f}")
+        return distilled_actor
     
     def register_user(self, user_profile: UserProfile) -> bool:
         """
-        Registra un nuevo usuario en el sistema de gestión de modelos y clona modelos poblacionales.
+        Registra un nuevo usuario en el sistema de gestión de modelos.
+        
+        Los usuarios personalizados comparten los pesos poblacionales (en memoria y en disco)
+        hasta que una actualización los modifica; recién entonces se materializa su copia propia.
         
         Parámetros:
         -----------
@@ -142,22 +511,17 @@ class ModelManager:
         try:
             # Registrar perfil del usuario
             self.user_profiles[user_profile.user_id] = user_profile
-            
-            # Clonar modelos poblacionales inmediatamente durante el registro
-            if user_profile.model_type == "personalized":
-                models_cloned: bool = self._clone_population_models_for_user(user_profile.user_id)
-                if not models_cloned:
-                    logger.warning(f"Usuario {user_profile.user_id} registrado pero sin modelos personalizados")
-            
+            # Un perfil nuevo invalida las predicciones guardadas del usuario
+            self.prediction_cache.invalidate_user(user_profile.user_id)
             logger.info(f"Usuario {user_profile.user_id} {USER_REGISTERED_MSG}")
             return True
         except Exception as e:
             logger.error(f"{USER_REGISTER_ERROR_MSG} {user_profile.user_id}: {e}")
             return False
     
-    def _clone_population_models_for_user(self, user_id: str) -> bool:
+    def has_personalized_models(self, user_id: str) -> bool:
         """
-        Clona los modelos poblacionales para crear modelos personalizados específicos del usuario.
+        Indica si el usuario tiene pesos propios o si todavía comparte los poblacionales.
         
         Parámetros:
         -----------
@@ -167,96 +531,130 @@ class ModelManager:
         Retorna:
         --------
         bool
-            True si el clonado fue exitoso, False en caso contrario.
+            True si existen modelos personalizados materializados en memoria o en disco.
+        """
+        # El índice del almacén responde sin acceder al disco
+        return user_id in self.loaded_models or self.model_store.has_user_models(user_id)
+    
+    def _materialize_user_models(self, user_id: str) -> Optional[Dict[str, torch.nn.Module]]:
         """
+        Obtiene modelos propios y entrenables del usuario, copiando los poblacionales si todavía los comparte.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+            
+        Retorna:
+        --------
+        Optional[Dict[str, torch.nn.Module]]
+            Modelos personalizados del usuario o None si no se pudieron materializar.
+        """
+        if self.has_personalized_models(user_id):
+            return self.get_user_models(user_id, trainable=True)
+        
         if self.population_actor is None or self.population_critic is None:
             logger.error(f"No se pueden clonar modelos para {user_id}: modelos poblacionales no disponibles")
-            return False
+            return None
         
         try:
-            # Clonar actor poblacional
-            cloned_actor: Actor = Actor(STATE_DIM, ACTION_DIM).to(self.device)
-            cloned_actor.load_state_dict(self.population_actor.state_dict())
-            cloned_actor.train()  # Configurar para entrenamiento
-            
-            # Clonar critic poblacional
-            cloned_critic: Critic = Critic(STATE_DIM, ACTION_DIM).to(self.device)
-            cloned_critic.load_state_dict(self.population_critic.state_dict())
-            cloned_critic.train()  # Configurar para entrenamiento
-            
-            # Guardar en memoria
-            self.loaded_models[user_id] = {"actor": cloned_actor, "critic": cloned_critic}
-            
-            # Guardar modelos clonados en disco para persistencia
-            self._save_user_models(user_id, cloned_actor, cloned_critic)
-            
-            logger.info(f"{MODEL_CLONE_DURING_REGISTRATION_MSG} {user_id}")
-            return True
+            # La copia se guarda en disco antes de publicarse en la caché: si se desaloja, la
+            # próxima carga la recupera del almacén en lugar de volver a compartir los poblacionales
+            user_models: Dict[str, torch.nn.Module] = self.loader.clone_population_models()
+            self.model_versions[user_id] = 0
+            self.model_store.save_user_models(
+                user_id,
+                user_models["actor"],
+                user_models["critic"],
+                {MODEL_VERSION_METADATA_KEY: "0", **personalization_metadata(user_models["actor"])}
+            )
+            self.loaded_models[user_id] = user_models
+            logger.info(f"{PERSONALIZED_MODEL_CLONED_MSG} {user_id} ({self.personalization_mode})")
+            return user_models
             
         except Exception as e:
-            logger.error(f"{MODEL_CLONE_ERROR_DURING_REGISTRATION_MSG} {user_id}: {e}")
-            return False
+            logger.error(f"{PERSONALIZED_MODEL_CLONE_ERROR_MSG} {user_id}: {e}")
+            return None
+    
+    def _serving_models(self, user_id: str, user_models: Dict[str, torch.nn.Module]) -> Dict[str, torch.nn.Module]:
+        """
+        Reduce los modelos float32 de un usuario a lo necesario para servir inferencia.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        user_models : Dict[str, torch.nn.Module]
+            Modelos float32 (actor y critic).
+            
+        Retorna:
+        --------
+        Dict[str, torch.nn.Module]
+            Los mismos modelos en precisión float32, o solo el actor servido en otra precisión.
+        """
+        # Las correcciones de bajo rango ya son pequeñas y la base es la poblacional en float32
+        if self.serving_precision == "float32" or is_low_rank(user_models["actor"]):
+            return user_models
+        return {"actor": self._serving_actor(user_id, user_models["actor"])}
     
-    def get_user_models(self, user_id: str) -> Optional[Dict[str, torch.nn.Module]]:
+    def get_user_models(self, user_id: str, trainable: bool = False) -> Optional[Dict[str, torch.nn.Module]]:
         """
         Obtiene los modelos específicos (actor y critic) para un usuario.
         
+        Con una precisión de inferencia reducida, la caché guarda solo el actor servido
+        (variante validada) para ocupar menos memoria; los modelos float32 con critic se
+        vuelven a cargar del almacén cuando se piden para entrenar.
+        
         Parámetros:
         -----------
         user_id : str
             Identificador único del usuario.
+        trainable : bool
+            Si es True, devuelve los modelos float32 con critic, aptos para entrenar.
             
         Retorna:
         --------
         Optional[Dict[str, torch.nn.Module]]
-            Diccionario con modelos del usuario o None si no existe.
+            Diccionario con modelos del usuario (o los poblacionales compartidos) o None si no existe ninguno.
         """
         # Verificar si los modelos ya están cargados en memoria
-        if user_id in self.loaded_models:
-            return self.loaded_models[user_id]
-        
-        # Intentar cargar modelos personalizados específicos del usuario desde disco
-        personalized_actor_path: str = os.path.join(
-            self.models_directory, f"{PERSONALIZED_ACTOR_PREFIX}{user_id}{MODEL_EXTENSION}"
-        )
-        personalized_critic_path: str = os.path.join(
-            self.models_directory, f"{PERSONALIZED_CRITIC_PREFIX}{user_id}{MODEL_EXTENSION}"
-        )
+        cached_models: Optional[Dict[str, torch.nn.Module]] = self.loaded_models.get(user_id)
+        if cached_models is not None and (not trainable or "critic" in cached_models):
+            return cached_models
         
-        if os.path.exists(personalized_actor_path) and os.path.exists(personalized_critic_path):
+        # El índice del almacén indica si hay modelos en disco sin tener que consultarlo
+        if self.model_store.has_user_models(user_id):
             try:
-                # Cargar modelos personalizados existentes
-                actor: Actor = load_actor_model(
-                    personalized_actor_path, STATE_DIM, ACTION_DIM, self.device
-                )
-                
-                critic: Critic = load_critic_model(personalized_critic_path, STATE_DIM, ACTION_DIM, self.device)
-                self.loaded_models[user_id] = {"actor": actor, "critic": critic}
+                user_models: Dict[str, torch.nn.Module] = self.loader.load_user_models(user_id)
                 logger.info(f"{PERSONALIZED_MODEL_LOADED_MSG} {user_id}")
-                return self.loaded_models[user_id]
+                if not trainable:
+                    user_models = self._serving_models(user_id, user_models)
+                self.loaded_models[user_id] = user_models
+                if self.dose_table_personalized and not trainable:
+                    self._schedule_gain_table(user_id, user_models["actor"])
+                return user_models
             except Exception as e:
+                # No se reintenta en cada solicitud; el índice lo vuelve a considerar si el archivo cambia
+                self.model_store.manifest.mark_failed(user_id)
                 logger.error(f"{PERSONALIZED_MODEL_ERROR_MSG} {user_id}: {e}")
         
-        # Verificar tipo de modelo del usuario
-        if user_id in self.user_profiles:
-            user_profile: UserProfile = self.user_profiles[user_id]
-            if user_profile.model_type == "personalized":
-                # Si debe tener modelo personalizado pero no existe, crearlo ahora
-                models_cloned: bool = self._clone_population_models_for_user(user_id)
-                if models_cloned:
-                    return self.loaded_models[user_id]
-        
-        # Usar modelos poblacionales como fallback (solo para inferencia)
+        # Usuarios sin pesos propios (poblacionales o personalizados aún no actualizados) comparten
+        # los modelos poblacionales, solo para inferencia
         if self.population_actor is not None:
-            logger.info(f"{USING_POPULATION_MODEL_MSG} {user_id}")
-            return {"actor": self.population_actor, "critic": self.population_critic}
+            logger.debug(f"{USING_POPULATION_MODEL_MSG} {user_id}")
+            return {
+                "actor": self.population_actor if trainable else self.population_serving_actor,
+                "critic": self.population_critic
+            }
         
         logger.error(f"{NO_MODEL_AVAILABLE_MSG} {user_id}")
         return None
     
     def _save_user_models(self, user_id: str, actor: Actor, critic: Critic) -> None:
         """
-        Guarda los modelos personalizados de un usuario en disco.
+        Guarda los modelos personalizados de un usuario en disco en un único archivo empaquetado.
+        
+        Los modelos de bajo rango guardan solo sus correcciones (los pesos poblacionales no se repiten).
         
         Parámetros:
         -----------
@@ -268,19 +666,275 @@ class ModelManager:
             Modelo critic a guardar.
         """
         try:
-            actor_path: str = os.path.join(
-                self.models_directory, f"{PERSONALIZED_ACTOR_PREFIX}{user_id}{MODEL_EXTENSION}"
+            self.model_store.save_user_models(
+                user_id,
+                actor,
+                critic,
+                {MODEL_VERSION_METADATA_KEY: str(self.model_versions.get(user_id, 0)), **personalization_metadata(actor)}
             )
-            critic_path: str = os.path.join(
-                self.models_directory, f"{PERSONALIZED_CRITIC_PREFIX}{user_id}{MODEL_EXTENSION}"
-            )
-            
-            torch.save(actor.state_dict(), actor_path)
-            torch.save(critic.state_dict(), critic_path)
             logger.info(f"{MODEL_SAVED_MSG} {user_id}")
         except Exception as e:
             logger.error(f"Error al guardar modelos para {user_id}: {e}")
     
+    def _build_states(
+        self,
+        cgm: np.ndarray,
+        carb_intake_grams: np.ndarray,
+        iob: np.ndarray,
+        minutes_since_midnight: np.ndarray
+    ) -> np.ndarray:
+        """
+        Construye la matriz de estados para el modelo de actor.
+        
+        Parámetros:
+        -----------
+        cgm : np.ndarray
+            Lecturas de glucosa (mg/dL) con forma (N,).
+        carb_intake_grams : np.ndarray
+            Gramos de carbohidratos con forma (N,).
+        iob : np.ndarray
+            Insulina activa (Unidades) con forma (N,).
+        minutes_since_midnight : np.ndarray
+            Minutos transcurridos desde medianoche con forma (N,).
+            
+        Retorna:
+        --------
+        np.ndarray
+            Matriz de estados con forma (N, STATE_DIM) y tipo float32.
+        """
+        cho_rate: np.ndarray = np.where(
+            carb_intake_grams > 0, carb_intake_grams / MEAL_DURATION_FOR_RATE_CALCULATION, 0.0
+        )
+        
+        # Estado: [cgm, cho_rate, minutes_since_midnight, iob]
+        return np.stack([cgm, cho_rate, minutes_since_midnight, iob], axis=1).astype(np.float32)
+    
+    def _predict_bolus_array(
+        self,
+        actor_model: Actor,
+        cgm: np.ndarray,
+        carb_intake_grams: np.ndarray,
+        iob: np.ndarray,
+        minutes_since_midnight: np.ndarray
+    ) -> np.ndarray:
+        """
+        Predice bolos para un lote de estados con una única pasada del modelo de actor.
+        
+        Parámetros:
+        -----------
+        actor_model : Actor
+            El modelo de actor preentrenado y cargado.
+        cgm : np.ndarray
+            Lecturas de glucosa (mg/dL) con forma (N,).
+        carb_intake_grams : np.ndarray
+            Gramos de carbohidratos con forma (N,).
+        iob : np.ndarray
+            Insulina activa (Unidades) con forma (N,).
+        minutes_since_midnight : np.ndarray
+            Minutos transcurridos desde medianoche con forma (N,).
+            
+        Retorna:
+        --------
+        np.ndarray
+            Bolos predichos en Unidades con forma (N,).
+        """
+        cgm = np.asarray(cgm, dtype=np.float64)
+        carb_intake_grams = np.asarray(carb_intake_grams, dtype=np.float64)
+        iob = np.asarray(iob, dtype=np.float64)
+        
+        states: np.ndarray = self._build_states(cgm, carb_intake_grams, iob, minutes_since_midnight)
+        
+        # Obtener action_gains del modelo de actor (sin ruido para inferencia)
+        action_gains: np.ndarray = self._actor_gains(actor_model, states)
+        return self._bolus_from_gains(action_gains, cgm, carb_intake_grams, iob)
+    
+    def _bolus_from_gains(
+        self,
+        action_gains: np.ndarray,
+        cgm: np.ndarray,
+        carb_intake_grams: np.ndarray,
+        iob: np.ndarray
+    ) -> np.ndarray:
+        """
+        Aplica las restricciones de seguridad a las ganancias del actor y calcula los bolos del lote.
+        
+        Parámetros:
+        -----------
+        action_gains : np.ndarray
+            Ganancias del actor con forma (N, ACTION_DIM).
+        cgm : np.ndarray
+            Lecturas de glucosa (mg/dL) con forma (N,).
+        carb_intake_grams : np.ndarray
+            Gramos de carbohidratos con forma (N,).
+        iob : np.ndarray
+            Insulina activa (Unidades) con forma (N,).
+            
+        Retorna:
+        --------
+        np.ndarray
+            Bolos en Unidades con forma (N,).
+        """
+        action_gains = apply_safety_constraints_batch(action_gains, cgm)
+        
+        return compute_bolus_batch(
+            gains=action_gains,
+            cho=carb_intake_grams,
+            cgm=cgm,
+            iob=iob,
+            mealtime=carb_intake_grams > 0
+        )
+    
+    def _actor_gains(self, actor_model: torch.nn.Module, states: np.ndarray) -> np.ndarray:
+        """
+        Obtiene las ganancias del actor, interpolando en su tabla precalculada cuando existe.
+        
+        Los estados fuera de la grilla de la tabla se evalúan con el backend de inferencia.
+        
+        Parámetros:
+        -----------
+        actor_model : torch.nn.Module
+            Actor servido.
+        states : np.ndarray
+            Estados con forma (N, STATE_DIM) en float32.
+            
+        Retorna:
+        --------
+        np.ndarray
+            Ganancias con forma (N, ACTION_DIM) en float32.
+        """
+        table: Optional[GainTable] = self.gain_tables.get(actor_model)
+        if table is None:
+            return self.backend.run(actor_model, states)
+        
+        covered: np.ndarray = table.covers(states)
+        if covered.all():
+            return table.lookup(states)
+        action_gains: np.ndarray = np.empty((states.shape[0], ACTION_DIM), dtype=np.float32)
+        action_gains[covered] = table.lookup(states[covered])
+        action_gains[~covered] = self.backend.run(actor_model, states[~covered])
+        return action_gains
+    
+    def build_gain_table(self, owner: str, actor_model: torch.nn.Module) -> Optional[GainTable]:
+        """
+        Construye la tabla de ganancias de un actor, la valida contra la red y la publica.
+        
+        El error se mide en el centro de cada celda (donde la interpolación se aleja más de
+        los nodos) y en estados aleatorios de la grilla; la tabla solo se sirve si el error
+        máximo de dosis, tras las restricciones de seguridad, no supera el umbral.
+        
+        Parámetros:
+        -----------
+        owner : str
+            Usuario (o 'population') dueño del actor, para los logs.
+        actor_model : torch.nn.Module
+            Actor servido.
+            
+        Retorna:
+        --------
+        Optional[GainTable]
+            Tabla publicada, o None si falló la construcción, no pasó la validación o los pesos cambiaron mientras se construía.
+        """
+        with self._gain_tables_lock:
+            version: int = self._gain_table_versions.get(actor_model, 0)
+        
+        try:
+            table: GainTable = GainTable.build(
+                lambda states: self.backend.run(actor_model, states),
+                DOSE_TABLE_LOWER,
+                DOSE_TABLE_UPPER,
+                self.dose_table_steps
+            )
+            rng: np.random.Generator = np.random.default_rng(SEED)
+            states: np.ndarray = np.concatenate((
+                table.cell_centers(),
+                rng.uniform(table.lower, table.upper, size=(DOSE_TABLE_VALIDATION_SAMPLES, STATE_DIM)).astype(np.float32)
+            ))
+            expected: np.ndarray = self.backend.run(actor_model, states)
+            actual: np.ndarray = table.lookup(states)
+            
+            cgm: np.ndarray = states[:, 0].astype(np.float64)
+            carb_intake_grams: np.ndarray = states[:, 1].astype(np.float64) * MEAL_DURATION_FOR_RATE_CALCULATION
+            iob: np.ndarray = states[:, 3].astype(np.float64)
+            table.max_gain_error = float(np.max(np.abs(actual - expected)))
+            table.max_dose_error = float(np.max(np.abs(
+                self._bolus_from_gains(actual, cgm, carb_intake_grams, iob)
+                - self._bolus_from_gains(expected, cgm, carb_intake_grams, iob)
+            )))
+        except Exception as e:
+            logger.error(f"{DOSE_TABLE_ERROR_MSG} {owner}: {e}")
+            return None
+        
+        if table.max_dose_error > self.dose_table_max_dose_error:
+            logger.warning(f"{DOSE_TABLE_REJECTED_MSG} {owner}: {table.max_dose_error:.4f}")
+            return None
+        
+        with self._gain_tables_lock:
+            # Si los pesos cambiaron durante la construcción, la tabla ya no corresponde al actor
+            if self._gain_table_versions.get(actor_model, 0) != version:
+                return None
+            self.gain_tables[actor_model] = table
+        logger.info(
+            f"{DOSE_TABLE_ACCEPTED_MSG} {owner}: {table.max_dose_error:.4f} "
+            f"({table.values.shape[:-1]}, {table.nbytes / 1e6:.1f} MB)"
+        )
+        return table
+    
+    def _schedule_gain_table(self, owner: str, actor_model: torch.nn.Module) -> None:
+        """
+        Encola la construcción de la tabla de ganancias de un actor si todavía no tiene una.
+        """
+        builder: Optional[ThreadPoolExecutor] = self.gain_table_builder
+        if builder is None:
+            return
+        with self._gain_tables_lock:
+            if actor_model in self.gain_tables or actor_model in self._gain_tables_scheduled:
+                return
+            self._gain_tables_scheduled.add(actor_model)
+        
+        def build() -> None:
+            try:
+                self.build_gain_table(owner, actor_model)
+            finally:
+                with self._gain_tables_lock:
+                    self._gain_tables_scheduled.discard(actor_model)
+        
+        builder.submit(build)
+    
+    def invalidate_gain_table(self, actor_model: torch.nn.Module) -> None:
+        """
+        Descarta la tabla de ganancias de un actor cuyos pesos cambiaron (también las que se estén construyendo).
+        """
+        with self._gain_tables_lock:
+            self.gain_tables.pop(actor_model, None)
+            self._gain_table_versions[actor_model] = self._gain_table_versions.get(actor_model, 0) + 1
+    
+    def wait_for_gain_tables(self, timeout: Optional[float] = None) -> None:
+        """
+        Espera a que terminen las construcciones de tablas encoladas hasta el momento.
+        """
+        # El constructor tiene un solo hilo: una tarea vacía termina después de las anteriores
+        if self.gain_table_builder is not None:
+            self.gain_table_builder.submit(lambda: None).result(timeout)
+    
+    def get_gain_table_stats(self) -> Dict[str, Union[int, float, None]]:
+        """
+        Obtiene estadísticas de las tablas de ganancias publicadas.
+        
+        Retorna:
+        --------
+        Dict[str, Union[int, float, None]]
+            Cantidad de tablas, memoria ocupada y el mayor error de dosis validado.
+        """
+        with self._gain_tables_lock:
+            tables: List[GainTable] = list(self.gain_tables.values())
+            pending: int = len(self._gain_tables_scheduled)
+        return {
+            "tables": len(tables),
+            "pending": pending,
+            "bytes": sum(table.nbytes for table in tables),
+            "max_dose_error": max((table.max_dose_error for table in tables), default=None),
+        }
+    
     def predict_bolus(
         self,
         actor_model: Actor,
@@ -323,44 +977,253 @@ class ModelManager:
             logger.error("Modelo de actor no cargado. No se puede predecir el bolo.")
             return 0.0
 
-        # Preparar estado para el modelo de actor
-        cho_rate: float
-        if carb_intake_grams > 0:
-            cho_rate = carb_intake_grams / MEAL_DURATION_FOR_RATE_CALCULATION
-        else:
-            cho_rate = 0.0
-
-        minutes_since_midnight: int = current_time.hour * 60 + current_time.minute
-
-        # Estado: [cgm, cho_rate, minutes_since_midnight, iob]
-        state_np: np.ndarray = np.array([cgm, cho_rate, minutes_since_midnight, iob], dtype=np.float32)
-        state_tensor: torch.Tensor = torch.FloatTensor(state_np).unsqueeze(0).to(self.device)
-
-        # Obtener action_gains del modelo de actor (sin ruido para inferencia)
-        with torch.no_grad():
-            action_gains_tensor: torch.Tensor = actor_model(state_tensor)
-        action_gains: np.ndarray = action_gains_tensor.cpu().numpy()[0]
-
-        # Aplicar restricciones de seguridad a las ganancias
-        action_gains = apply_safety_constraints(action_gains, cgm)
-
         # Marcador de posición para ajustes heurísticos basados en parámetros opcionales
         if sleep_quality is not None or exercise_intensity is not None or work_stress_intensity is not None:
             # Aquí se podrían implementar reglas heurísticas para ajustar action_gains
             logger.debug(f"Parámetros opcionales: Sleep={sleep_quality}, Exercise={exercise_intensity}, Stress={work_stress_intensity}")
 
-        # Llamar a compute_bolus con las ganancias
-        mealtime: bool = carb_intake_grams > 0
+        minutes_since_midnight: int = current_time.hour * 60 + current_time.minute
         
-        predicted_bolus_U: float = compute_bolus(
-            gains=action_gains,
-            cho=carb_intake_grams,
-            cgm=cgm,
-            iob=iob,
-            mealtime=mealtime
+        predicted_bolus_U: np.ndarray = self._predict_bolus_array(
+            actor_model=actor_model,
+            cgm=np.array([cgm]),
+            carb_intake_grams=np.array([carb_intake_grams]),
+            iob=np.array([iob]),
+            minutes_since_midnight=np.array([minutes_since_midnight])
         )
 
-        return predicted_bolus_U
+        return float(predicted_bolus_U[0])
+    
+    def _predict_bolus_with_uncertainty(
+        self,
+        actor_model: Actor,
+        cgm: np.ndarray,
+        carb_intake_grams: np.ndarray,
+        iob: np.ndarray,
+        minutes_since_midnight: np.ndarray
+    ) -> np.ndarray:
+        """
+        Predice la dosis base y las variaciones de CGM de varias solicitudes en una única pasada del actor.
+        
+        Parámetros:
+        -----------
+        actor_model : Actor
+            El modelo de actor compartido por todas las solicitudes.
+        cgm : np.ndarray
+            Lecturas de glucosa (mg/dL) con forma (K,).
+        carb_intake_grams : np.ndarray
+            Gramos de carbohidratos con forma (K,).
+        iob : np.ndarray
+            Insulina activa (Unidades) con forma (K,).
+        minutes_since_midnight : np.ndarray
+            Minutos transcurridos desde medianoche con forma (K,).
+            
+        Retorna:
+        --------
+        np.ndarray
+            Bolos con forma (K, 1 + NUM_UNCERTAINTY_SAMPLES); la columna 0 es la predicción base.
+        """
+        cgm_samples, carbs_samples, iob_samples, minutes_samples = self._uncertainty_inputs(
+            cgm, carb_intake_grams, iob, minutes_since_midnight
+        )
+        predictions: np.ndarray = self._predict_bolus_array(
+            actor_model=actor_model,
+            cgm=cgm_samples,
+            carb_intake_grams=carbs_samples,
+            iob=iob_samples,
+            minutes_since_midnight=minutes_samples
+        )
+        return predictions.reshape(len(cgm), -1)
+    
+    def _uncertainty_inputs(
+        self,
+        cgm: np.ndarray,
+        carb_intake_grams: np.ndarray,
+        iob: np.ndarray,
+        minutes_since_midnight: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Expande cada solicitud en la entrada base y sus variaciones de CGM para estimar la incertidumbre.
+        
+        Retorna:
+        --------
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            CGM, carbohidratos, IOB y minutos con forma (K * (1 + NUM_UNCERTAINTY_SAMPLES),), en orden por solicitud.
+        """
+        cgm = np.asarray(cgm, dtype=np.float64)
+        samples_per_request: int = 1 + self.uncertainty_noise.shape[0]
+        
+        # Columna 0: sin variación; columnas 1..N: pequeña variación en CGM para estimar incertidumbre
+        noisy_cgm: np.ndarray = np.clip(
+            cgm[:, None] + self.uncertainty_noise[None, :], MIN_CGM_VALUE, MAX_CGM_VALUE
+        )
+        cgm_samples: np.ndarray = np.concatenate((cgm[:, None], noisy_cgm), axis=1)
+        return (
+            cgm_samples.reshape(-1),
+            np.repeat(np.asarray(carb_intake_grams, dtype=np.float64), samples_per_request),
+            np.repeat(np.asarray(iob, dtype=np.float64), samples_per_request),
+            np.repeat(np.asarray(minutes_since_midnight), samples_per_request)
+        )
+    
+    def _stacked_actor_gains(
+        self, actor_models: List[torch.nn.Module], states: List[np.ndarray]
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Evalúa juntos los actores de un lote que no se sirven con tabla de ganancias.
+        
+        Los actores con pesos completos se evalúan con los pesos apilados; los de bajo rango sobre
+        el actor poblacional comparten el producto por la base y suman cada uno su corrección.
+        
+        Parámetros:
+        -----------
+        actor_models : List[torch.nn.Module]
+            Actores distintos del lote.
+        states : List[np.ndarray]
+            Estados de cada actor.
+            
+        Retorna:
+        --------
+        List[Optional[np.ndarray]]
+            Ganancias de cada actor, o None para los que deben evaluarse por separado.
+        """
+        gains: List[Optional[np.ndarray]] = [None] * len(actor_models)
+        if self.stacked_actors is None:
+            return gains
+        pending: List[int] = [
+            position for position, actor_model in enumerate(actor_models) if actor_model not in self.gain_tables
+        ]
+        population_layers: Tuple[torch.nn.Module, ...] = tuple(
+            layer for layer in self.population_actor.net if isinstance(layer, torch.nn.Linear)
+        )
+        low_rank: List[int] = [
+            position for position in pending
+            if is_low_rank(actor_models[position]) and base_layers(actor_models[position]) == population_layers
+        ]
+        full: List[int] = [position for position in pending if self.stacked_actors.supports(actor_models[position])]
+        
+        # Con un solo actor la pasada directa ya es un único producto por capa
+        for eligible, evaluate in ((full, self.stacked_actors.run), (low_rank, low_rank_actor_gains)):
+            if len(eligible) < 2:
+                continue
+            stacked: List[Optional[np.ndarray]] = evaluate(
+                [actor_models[position] for position in eligible], [states[position] for position in eligible]
+            )
+            for position, action_gains in zip(eligible, stacked):
+                gains[position] = action_gains
+        return gains
+    
+    def predict_bolus_with_confidence_batch(
+        self, requests: List[BolusRequest]
+    ) -> List[Union[Tuple[float, float, float, List[str]], Exception]]:
+        """
+        Predice bolos con intervalo de confianza para un lote de solicitudes.
+        
+        Las solicitudes se agrupan por modelo de actor resuelto y cada grupo se evalúa
+        con una única pasada del modelo. Los errores se reportan por fila.
+        
+        Con la caché de predicciones habilitada, las entradas cuantizadas forman la clave y las
+        solicitudes repetidas se responden sin evaluar el actor. Las dosis se calculan siempre con
+        las entradas recibidas; las filas cuya celda contiene un umbral clínico de CGM, o cuya dosis
+        queda en el redondeo a MIN_BOLUS, no pasan por la caché. Las alertas de seguridad se
+        calculan siempre con la solicitud recibida.
+        
+        Parámetros:
+        -----------
+        requests : List[BolusRequest]
+            Solicitudes de predicción con parámetros clínicos.
+            
+        Retorna:
+        --------
+        List[Union[Tuple[float, float, float, List[str]], Exception]]
+            Por cada solicitud, en el mismo orden: (bolo, límite inferior, límite superior, alertas)
+            o la excepción que impidió la predicción.
+        """
+        results: List[Union[Tuple[float, float, float, List[str]], Exception]] = [None] * len(requests)
+        actors_by_user: Dict[str, Optional[Actor]] = {}
+        # Por actor: filas, entradas (cgm, carbohidratos, iob, minutos) y claves de la caché
+        groups: Dict[int, Tuple[Actor, List[int], List[Tuple[float, float, float, float]], List[tuple]]] = {}
+        
+        # Resolver el actor de cada usuario una sola vez y agrupar filas por actor
+        for index, request in enumerate(requests):
+            if request.user_id not in actors_by_user:
+                user_models: Optional[Dict[str, torch.nn.Module]] = self.get_user_models(request.user_id)
+                actors_by_user[request.user_id] = user_models.get("actor") if user_models else None
+            
+            actor_model: Optional[Actor] = actors_by_user[request.user_id]
+            if actor_model is None:
+                results[index] = ValueError(f"No hay modelo disponible para usuario {request.user_id}")
+                continue
+            
+            inputs: Tuple[float, float, float, float] = (
+                request.cgm_value,
+                request.carb_intake_grams,
+                request.iob,
+                request.timestamp.hour * 60 + request.timestamp.minute
+            )
+            key: Optional[tuple] = None
+            if self.prediction_cache.enabled:
+                steps: Tuple[int, ...] = self.prediction_cache.quantize(*inputs)
+                if not self.prediction_cache.crosses_threshold(steps):
+                    key = self.prediction_cache.key(request.user_id, actor_model, steps)
+                    cached: Optional[PredictionResult] = self.prediction_cache.get(key)
+                    if cached is not None:
+                        results[index] = cached + (self._generate_safety_alerts(request, cached[0]),)
+                        continue
+            
+            group = groups.setdefault(id(actor_model), (actor_model, [], [], []))
+            group[1].append(index)
+            group[2].append(inputs)
+            group[3].append(key)
+        
+        # Entradas expandidas y estados de cada grupo; los actores de varios usuarios se evalúan juntos
+        group_list: List[Tuple[Actor, List[int], List[Tuple[float, float, float, float]], List[tuple]]] = list(
+            groups.values()
+        )
+        expanded: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+        group_states: List[np.ndarray] = []
+        for _, _, group_inputs, _ in group_list:
+            columns: np.ndarray = np.array(group_inputs, dtype=np.float64)
+            expanded.append(self._uncertainty_inputs(columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3]))
+            group_states.append(self._build_states(*expanded[-1]))
+        try:
+            stacked_gains: List[Optional[np.ndarray]] = self._stacked_actor_gains(
+                [group[0] for group in group_list], group_states
+            )
+        except Exception as e:
+            logger.error(f"Error en la evaluación apilada de actores: {e}")
+            stacked_gains = [None] * len(group_list)
+        
+        for (actor_model, indices, _, keys), inputs, states, action_gains in zip(
+            group_list, expanded, group_states, stacked_gains
+        ):
+            group_requests: List[BolusRequest] = [requests[index] for index in indices]
+            cgm_samples, carbs_samples, iob_samples, _ = inputs
+            try:
+                if action_gains is None:
+                    action_gains = self._actor_gains(actor_model, states)
+                predictions: np.ndarray = self._bolus_from_gains(
+                    action_gains, cgm_samples, carbs_samples, iob_samples
+                ).reshape(len(indices), -1)
+            except Exception as e:
+                logger.error(f"Error en predicción por lotes: {e}")
+                for index in indices:
+                    results[index] = e
+                continue
+            
+            # Calcular intervalos de confianza usando percentiles sobre las variaciones
+            confidence_lower: np.ndarray = np.percentile(predictions[:, 1:], CONFIDENCE_LOWER_PERCENTILE, axis=1)
+            confidence_upper: np.ndarray = np.percentile(predictions[:, 1:], CONFIDENCE_UPPER_PERCENTILE, axis=1)
+            
+            for row, (index, request) in enumerate(zip(indices, group_requests)):
+                prediction: PredictionResult = (
+                    float(predictions[row, 0]), float(confidence_lower[row]), float(confidence_upper[row])
+                )
+                # Entre 0 y MIN_BOLUS la dosis salta por el redondeo: otra entrada de la celda podría diferir
+                if keys[row] is not None and predictions[row].min() > MIN_BOLUS:
+                    self.prediction_cache.put(keys[row], prediction)
+                results[index] = prediction + (self._generate_safety_alerts(request, prediction[0]),)
+        
+        return results
     
     def predict_bolus_with_confidence(
         self, request: BolusRequest
@@ -368,6 +1231,9 @@ class ModelManager:
         """
         Predice el bolo con intervalo de confianza y alertas de seguridad.
         
+        La predicción base y las NUM_UNCERTAINTY_SAMPLES variaciones de CGM se evalúan
+        en una única pasada del modelo de actor.
+        
         Parámetros:
         -----------
         request : BolusRequest
@@ -378,54 +1244,121 @@ class ModelManager:
         Tuple[float, float, float, List[str]]
             Bolo predicho, límite inferior, límite superior, lista de alertas.
         """
-        user_models: Optional[Dict[str, torch.nn.Module]] = self.get_user_models(request.user_id)
-        if user_models is None or "actor" not in user_models:
-            raise ValueError(f"No hay modelo disponible para usuario {request.user_id}")
-        
-        actor_model: Actor = user_models["actor"]
+        if request.sleep_quality is not None or request.exercise_intensity is not None or request.work_stress_intensity is not None:
+            logger.debug(f"Parámetros opcionales: Sleep={request.sleep_quality}, Exercise={request.exercise_intensity}, Stress={request.work_stress_intensity}")
         
-        # Predicción base sin variación
-        base_prediction: float = self.predict_bolus(
-            actor_model=actor_model,
-            cgm=request.cgm_value,
-            carb_intake_grams=request.carb_intake_grams,
-            iob=request.iob,
-            current_time=request.timestamp,
-            sleep_quality=request.sleep_quality,
-            exercise_intensity=request.exercise_intensity,
-            work_stress_intensity=request.work_stress_intensity
+        result: Union[Tuple[float, float, float, List[str]], Exception] = (
+            self.predict_bolus_with_confidence_batch([request])[0]
         )
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    async def predict_bolus_with_confidence_async(
+        self, request: BolusRequest
+    ) -> Tuple[float, float, float, List[str]]:
+        """
+        Predice el bolo con intervalo de confianza agrupando llamadas concurrentes en micro-lotes.
         
-        # Generar múltiples predicciones para estimar incertidumbre
-        predictions: List[float] = []
-        rng_uncertainty: np.random.Generator = np.random.default_rng(seed=SEED)
-        
-        for _ in range(NUM_UNCERTAINTY_SAMPLES):
-            # Añadir pequeña variación en CGM para estimar incertidumbre
-            noise_cgm: float = rng_uncertainty.normal(0, CGM_NOISE_STD)
-            noisy_cgm: float = max(MIN_CGM_VALUE, min(MAX_CGM_VALUE, request.cgm_value + noise_cgm))
-            
-            pred: float = self.predict_bolus(
-                actor_model=actor_model,
-                cgm=noisy_cgm,
-                carb_intake_grams=request.carb_intake_grams,
-                iob=request.iob,
-                current_time=request.timestamp,
-                sleep_quality=request.sleep_quality,
-                exercise_intensity=request.exercise_intensity,
-                work_stress_intensity=request.work_stress_intensity
-            )
-            predictions.append(pred)
+        Parámetros:
+        -----------
+        request : BolusRequest
+            Solicitud de predicción con parámetros clínicos.
+            
+        Retorna:
+        --------
+        Tuple[float, float, float, List[str]]
+            Bolo predicho, límite inferior, límite superior, lista de alertas.
+        """
+        return await self.bolus_batcher.submit(request)
+    
+    def requests_from_rows(self, rows: List[Dict[str, Any]]) -> List[Union[BolusRequest, str]]:
+        """
+        Valida cada fila de un lote en formato lista como una solicitud individual.
+        
+        Parámetros:
+        -----------
+        rows : List[Dict[str, Any]]
+            Campos de BolusRequest por fila, sin validar.
+            
+        Retorna:
+        --------
+        List[Union[BolusRequest, str]]
+            Por cada fila, la solicitud validada o el mensaje de error de validación.
+        """
+        requests: List[Union[BolusRequest, str]] = []
+        for row in rows:
+            try:
+                requests.append(BolusRequest.model_validate(row))
+            except ValidationError as e:
+                # Los validadores propios ya nombran el campo; el resto de los errores se prefija con él
+                requests.append("; ".join(
+                    str(error["ctx"]["error"]) if "error" in error.get("ctx", {})
+                    else f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                ))
+        return requests
+    
+    def requests_from_columns(self, columns: BolusBatchColumns) -> List[Union[BolusRequest, str]]:
+        """
+        Convierte solicitudes columnares en solicitudes individuales validando rangos de forma vectorizada.
+        
+        Parámetros:
+        -----------
+        columns : BolusBatchColumns
+            Arrays paralelos de user_id, cgm_value, carb_intake_grams, iob y timestamp.
+            
+        Retorna:
+        --------
+        List[Union[BolusRequest, str]]
+            Por cada fila, la solicitud construida o el mensaje de error de validación.
+        """
+        num_rows: int = len(columns.user_id)
+        cgm: np.ndarray = np.asarray(columns.cgm_value, dtype=np.float64)
+        carbs: np.ndarray = (
+            np.asarray(columns.carb_intake_grams, dtype=np.float64)
+            if columns.carb_intake_grams is not None else np.zeros(num_rows)
+        )
+        iob: np.ndarray = (
+            np.asarray(columns.iob, dtype=np.float64)
+            if columns.iob is not None else np.zeros(num_rows)
+        )
+        timestamps: List[datetime] = (
+            columns.timestamp if columns.timestamp is not None else [datetime.now()] * num_rows
+        )
         
-        # Calcular intervalo de confianza usando percentiles
-        predictions_array: np.ndarray = np.array(predictions)
-        confidence_lower: float = np.percentile(predictions_array, CONFIDENCE_LOWER_PERCENTILE)
-        confidence_upper: float = np.percentile(predictions_array, CONFIDENCE_UPPER_PERCENTILE)
+        # Mismas reglas que los validadores de BolusRequest, evaluadas sobre todo el lote
+        invalid_cgm: np.ndarray = ~((cgm >= MIN_CGM_INPUT) & (cgm <= MAX_CGM_INPUT))
+        invalid_carbs: np.ndarray = ~((carbs >= MIN_CARBS_INPUT) & (carbs <= MAX_CARBS_INPUT))
+        invalid_iob: np.ndarray = ~((iob >= MIN_IOB_INPUT) & (iob <= MAX_IOB_INPUT))
+        invalid_rows: np.ndarray = invalid_cgm | invalid_carbs | invalid_iob
         
-        # Generar alertas de seguridad basadas en parámetros clínicos
-        safety_alerts: List[str] = self._generate_safety_alerts(request, base_prediction)
+        rows: List[Union[BolusRequest, str]] = []
+        for index in range(num_rows):
+            if invalid_rows[index]:
+                errors: List[str] = [
+                    message for message, invalid in (
+                        (CGM_RANGE_ERROR_MSG, invalid_cgm[index]),
+                        (CARBS_RANGE_ERROR_MSG, invalid_carbs[index]),
+                        (IOB_RANGE_ERROR_MSG, invalid_iob[index])
+                    ) if invalid
+                ]
+                rows.append("; ".join(errors))
+                continue
+            
+            # Las filas ya fueron validadas: construir sin repetir la validación de pydantic
+            rows.append(BolusRequest.model_construct(
+                user_id=columns.user_id[index],
+                cgm_value=float(cgm[index]),
+                carb_intake_grams=float(carbs[index]),
+                iob=float(iob[index]),
+                sleep_quality=None,
+                exercise_intensity=None,
+                work_stress_intensity=None,
+                timestamp=timestamps[index]
+            ))
         
-        return base_prediction, confidence_lower, confidence_upper, safety_alerts
+        return rows
     
     def _generate_safety_alerts(
         self, request: BolusRequest, predicted_bolus: float
@@ -487,9 +1420,13 @@ class ModelManager:
         reward: float, 
         next_state: np.ndarray, 
         done: bool
-    ) -> None:
+    ) -> int:
         """
-        Actualiza el modelo personalizado del usuario con retroalimentación del mundo real.
+        Registra retroalimentación del mundo real para el entrenamiento del modelo del usuario.
+        
+        El entrenamiento nunca corre en el camino de la solicitud: si el proceso de entrenamiento
+        está activo, la transición se le envía sin esperar; si no, se guarda en el buffer de
+        repetición local del usuario. Los pesos nuevos llegan luego por `apply_published_models`.
         
         Parámetros:
         -----------
@@ -505,24 +1442,215 @@ class ModelManager:
             Nuevo estado.
         done : bool
             Si el episodio terminó.
+            
+        Retorna:
+        --------
+        int
+            Transiciones registradas para el usuario (enviadas al proceso o guardadas en el buffer).
         """
-        user_models: Optional[Dict[str, torch.nn.Module]] = self.get_user_models(user_id)
-        if user_models is None:
-            logger.error(f"No se pueden actualizar modelos para usuario {user_id}: no existen")
-            return
+        if self.training_worker is not None and self.training_worker.is_alive():
+            if not self.training_worker.submit(user_id, state, action, reward, next_state, done):
+                logger.warning(f"{TRAINING_QUEUE_FULL_MSG} {user_id}")
+            registered: int = self.training_worker.submitted_count(user_id)
+        else:
+            registered = self.replay_buffers.add(user_id, state, action, reward, next_state, done)
+        logger.info(f"{FEEDBACK_RECORDED_MSG} {user_id}: reward={reward}, transiciones={registered}")
+        
+        # Sin cambios en los pesos, un usuario que comparte los modelos poblacionales no necesita copia propia
+        if not self.has_personalized_models(user_id):
+            logger.info(f"{SHARED_POPULATION_WEIGHTS_MSG} {user_id}")
+        return registered
+    
+    def apply_published_models(self, user_id: str, version: int, size: int, checksum: str) -> bool:
+        """
+        Incorpora una versión de pesos publicada por el proceso de entrenamiento.
+        
+        Los modelos nuevos se cargan y validan fuera del camino de inferencia y se publican con
+        una única asignación en la caché: las predicciones en curso terminan con la referencia
+        que ya tenían y las siguientes usan la versión nueva, sin bloquear la inferencia.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        version : int
+            Versión de los pesos publicados.
+        size : int
+            Tamaño en bytes del archivo escrito.
+        checksum : str
+            Checksum del archivo escrito.
+            
+        Retorna:
+        --------
+        bool
+            True si la versión quedó en servicio (o se cargará en la próxima solicitud).
+        """
+        if version <= self.model_versions.get(user_id, -1):
+            return True
+        self.model_store.manifest.record_write(user_id, self.model_store.user_path(user_id), size, checksum)
+        previous_models: Optional[Dict[str, torch.nn.Module]] = self.loaded_models.get(user_id)
+        
+        if previous_models is None:
+            # Usuario sin modelos en memoria: la próxima solicitud carga la versión nueva del almacén
+            self.model_versions[user_id] = version
+            self.prediction_cache.invalidate_user(user_id)
+            logger.info(f"{MODEL_VERSION_PUBLISHED_MSG} {user_id}: v{version}")
+            return True
+        
+        try:
+            actor_state, critic_state, metadata = self.model_store.load_user_state(user_id)
+            user_models: Dict[str, torch.nn.Module] = self._build_models_from_state(actor_state, critic_state)
+            serving_models: Dict[str, torch.nn.Module] = self._serving_models(user_id, user_models)
+        except Exception as e:
+            logger.error(f"{MODEL_VERSION_SWAP_ERROR_MSG} {user_id}: {e}")
+            return False
         
-        # Aquí implementarías la lógica de entrenamiento online
-        # Por ahora, solo registramos la experiencia
-        logger.info(f"Retroalimentación recibida para usuario {user_id}: reward={reward}")
+        # Intercambio atómico de la referencia publicada
+        self.loaded_models[user_id] = serving_models
+        self.model_versions[user_id] = int(metadata.get(MODEL_VERSION_METADATA_KEY, version))
+        # La tabla de ganancias y las predicciones del actor anterior ya no corresponden a los pesos
+        self.invalidate_gain_table(previous_models["actor"])
+        self.prediction_cache.invalidate_actor(previous_models["actor"])
+        if self.stacked_actors is not None:
+            self.stacked_actors.discard(previous_models["actor"])
+        self.prediction_cache.invalidate_user(user_id)
+        if self.dose_table_personalized:
+            self._schedule_gain_table(user_id, serving_models["actor"])
+        logger.info(f"{MODEL_VERSION_PUBLISHED_MSG} {user_id}: v{self.model_versions[user_id]}")
+        return True
+    
+    def get_model_version(self, user_id: str) -> str:
+        """
+        Obtiene la versión de los pesos que sirven las predicciones de un usuario.
         
-        # Guardar modelos actualizados
-        if "actor" in user_models and "critic" in user_models:
-            self._save_user_models(user_id, user_models["actor"], user_models["critic"])
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+            
+        Retorna:
+        --------
+        str
+            'personalized-v<n>' para pesos propios o 'population' si comparte los poblacionales.
+        """
+        version: Optional[int] = self.model_versions.get(user_id)
+        if version is None and not self.has_personalized_models(user_id):
+            return POPULATION_CACHE_KEY
+        return f"{PERSONALIZED_MODEL_VERSION_PREFIX}{version or 0}"
     
     def cleanup_unused_models(self) -> None:
         """
         Limpia modelos no utilizados de la memoria para optimizar recursos.
         """
-        logger.info(CLEANUP_MODELS_MSG)
-        # En una implementación futura, aquí se liberarían modelos no usados recientemente
-        # Por ejemplo, modelos que no se han usado en las últimas N horas
\ No newline at end of file
+        expired: int = self.loaded_models.evict_expired()
+        logger.info(f"{CLEANUP_MODELS_MSG}: {expired} usuarios liberados")
+    
+    def refresh_model_manifest(self) -> None:
+        """
+        Vuelve a indexar el directorio de modelos para detectar archivos añadidos por otros procesos.
+        """
+        entries: int = self.model_store.manifest.refresh()
+        logger.info(f"{MODEL_MANIFEST_REFRESHED_MSG} {entries}")
+    
+    def _select_warmup_users(self, max_models: int, users_file: str) -> List[str]:
+        """
+        Selecciona los usuarios cuyos modelos se precargan.
+        
+        Parámetros:
+        -----------
+        max_models : int
+            Cantidad máxima de usuarios a precargar.
+        users_file : str
+            Archivo con un user_id por línea; si está vacío se eligen los modelos modificados más recientemente.
+            
+        Retorna:
+        --------
+        List[str]
+            Usuarios con modelos personalizados en disco, en orden de prioridad.
+        """
+        if users_file:
+            try:
+                with open(users_file, "r", encoding="utf-8") as f:
+                    listed: List[str] = [line.strip() for line in f if line.strip()]
+                return [user_id for user_id in listed if self.model_store.has_user_models(user_id)][:max_models]
+            except OSError as e:
+                logger.error(f"{WARMUP_USERS_FILE_ERROR_MSG} {users_file}: {e}")
+        
+        # Los modelos actualizados más recientemente corresponden a los usuarios más activos
+        recent: List[Tuple[str, ManifestEntry]] = sorted(
+            self.model_store.manifest.items(), key=lambda item: item[1].mtime, reverse=True
+        )
+        return [user_id for user_id, _ in recent[:max_models]]
+    
+    def _warm_up_actor(self, actor_model: Actor) -> None:
+        """
+        Ejecuta una predicción ficticia para inicializar el asignador de memoria y los kernels.
+        """
+        self._predict_bolus_with_uncertainty(
+            actor_model, np.array([120.0]), np.zeros(1), np.zeros(1), np.array([720.0])
+        )
+    
+    def _warm_up_user(self, user_id: str) -> bool:
+        """
+        Carga los modelos de un usuario en la caché y ejecuta una predicción ficticia con el actor servido.
+        """
+        try:
+            # Sin `trainable`, el actor es la variante en la precisión de inferencia, como en las solicitudes
+            user_models: Optional[Dict[str, torch.nn.Module]] = self.get_user_models(user_id)
+            if user_models is None or user_id not in self.loaded_models:
+                return False
+            self._warm_up_actor(user_models["actor"])
+            return True
+        except Exception as e:
+            logger.error(f"{WARMUP_MODEL_ERROR_MSG} {user_id}: {e}")
+            return False
+    
+    def warm_up(
+        self,
+        max_models: int = WARMUP_MAX_MODELS,
+        max_workers: int = WARMUP_MAX_WORKERS,
+        users_file: str = WARMUP_USERS_FILE
+    ) -> Dict[str, Union[int, float]]:
+        """
+        Precarga en paralelo los modelos de los usuarios más activos y marca el servicio como listo.
+        
+        Parámetros:
+        -----------
+        max_models : int
+            Cantidad máxima de modelos personalizados a precargar (0 para solo los poblacionales).
+        max_workers : int
+            Hilos usados para la precarga.
+        users_file : str
+            Archivo opcional con los usuarios a precargar, uno por línea.
+            
+        Retorna:
+        --------
+        Dict[str, Union[int, float]]
+            Usuarios seleccionados, modelos precargados y duración de la precarga en segundos.
+        """
+        start: float = time.perf_counter()
+        try:
+            if self.population_serving_actor is not None:
+                # La variante que atiende las solicitudes (int8, float16 o destilada), no la float32
+                self._warm_up_actor(self.population_serving_actor)
+                if self.dose_table_population:
+                    self.build_gain_table(POPULATION_CACHE_KEY, self.population_serving_actor)
+            
+            user_ids: List[str] = self._select_warmup_users(max_models, users_file) if max_models > 0 else []
+            logger.info(f"{WARMUP_STARTED_MSG} {len(user_ids)}")
+            
+            warmed: int = 0
+            if user_ids:
+                with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="warmup") as pool:
+                    warmed = sum(pool.map(self._warm_up_user, user_ids))
+            
+            self.warmup_stats = {
+                "selected": len(user_ids),
+                "warmed": warmed,
+                "duration_seconds": round(time.perf_counter() - start, 3),
+            }
+            logger.info(f"{WARMUP_FINISHED_MSG}: {self.warmup_stats}")
+            return self.warmup_stats
+        finally:
+            # Un fallo en la precarga no debe dejar el servicio fuera de rotación indefinidamente
+            self.ready.set()
@@ -0,0 +1,216 @@
+import os
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from packed_format import CHECKSUM_KEY, read_header
+from constants.constants import (
+    PACKED_MODEL_EXTENSION,
+    PACKED_PERSONALIZED_PREFIX,
+    PERSONALIZED_ACTOR_PREFIX,
+    PERSONALIZED_CRITIC_PREFIX,
+    MODEL_EXTENSION,
+    MODEL_MANIFEST_SCAN_ERROR_MSG
+)
+
+logger = logging.getLogger(__name__)
+
+class ManifestEntry(NamedTuple):
+    """
+    Modelos personalizados de un usuario presentes en disco.
+    
+    `paths` contiene el archivo empaquetado o, en el formato anterior, las rutas del
+    actor y del critic (.pth). `checksum` es None para el formato anterior.
+    """
+    paths: Tuple[str, ...]
+    size: int
+    mtime: float
+    checksum: Optional[str]
+    legacy: bool
+
+class ModelManifest:
+    """
+    Índice en memoria de los modelos personalizados del directorio de modelos.
+    
+    Se construye una vez al inicio y se mantiene actualizado con las escrituras del
+    propio almacén, de modo que consultar si un usuario tiene modelos no toca el
+    sistema de archivos. Los archivos que fallaron al cargarse no se vuelven a
+    intentar hasta que cambian en disco.
+    """
+    
+    def __init__(self, directory: str) -> None:
+        """
+        Inicializa el índice (vacío hasta llamar a `refresh`).
+        
+        Parámetros:
+        -----------
+        directory : str
+            Directorio de modelos a indexar.
+        """
+        self.directory: str = directory
+        self._entries: Dict[str, ManifestEntry] = {}
+        self._failed: Dict[str, ManifestEntry] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._scans: int = 0
+    
+    def _scan(self) -> Dict[str, ManifestEntry]:
+        """
+        Recorre el directorio con un único listado y lee solo los encabezados empaquetados.
+        """
+        packed: Dict[str, ManifestEntry] = {}
+        legacy_files: Dict[str, os.DirEntry] = {}
+        if not os.path.isdir(self.directory):
+            # El directorio se crea al guardar el primer modelo
+            return {}
+        
+        with os.scandir(self.directory) as directory_entries:
+            for directory_entry in directory_entries:
+                name: str = directory_entry.name
+                if name.endswith(MODEL_EXTENSION):
+                    legacy_files[name] = directory_entry
+                    continue
+                if not (name.startswith(PACKED_PERSONALIZED_PREFIX) and name.endswith(PACKED_MODEL_EXTENSION)):
+                    continue
+                user_id: str = name[len(PACKED_PERSONALIZED_PREFIX):-len(PACKED_MODEL_EXTENSION)]
+                try:
+                    stat: os.stat_result = directory_entry.stat()
+                    _, metadata = read_header(directory_entry.path)
+                except Exception as e:
+                    logger.error(f"{MODEL_MANIFEST_SCAN_ERROR_MSG} {directory_entry.path}: {e}")
+                    continue
+                packed[user_id] = ManifestEntry(
+                    paths=(directory_entry.path,),
+                    size=stat.st_size,
+                    mtime=stat.st_mtime,
+                    checksum=metadata.get(CHECKSUM_KEY),
+                    legacy=False
+                )
+        
+        # Formato anterior: se requiere el par actor/critic completo
+        entries: Dict[str, ManifestEntry] = {}
+        for name, actor_entry in legacy_files.items():
+            if not name.startswith(PERSONALIZED_ACTOR_PREFIX):
+                continue
+            user_id = name[len(PERSONALIZED_ACTOR_PREFIX):-len(MODEL_EXTENSION)]
+            critic_entry: Optional[os.DirEntry] = legacy_files.get(
+                f"{PERSONALIZED_CRITIC_PREFIX}{user_id}{MODEL_EXTENSION}"
+            )
+            if critic_entry is None:
+                continue
+            actor_stat: os.stat_result = actor_entry.stat()
+            critic_stat: os.stat_result = critic_entry.stat()
+            entries[user_id] = ManifestEntry(
+                paths=(actor_entry.path, critic_entry.path),
+                size=actor_stat.st_size + critic_stat.st_size,
+                mtime=max(actor_stat.st_mtime, critic_stat.st_mtime),
+                checksum=None,
+                legacy=True
+            )
+        
+        # El formato empaquetado tiene prioridad sobre el anterior
+        entries.update(packed)
+        return entries
+    
+    def refresh(self) -> int:
+        """
+        Reconstruye el índice a partir del directorio (al inicio o para detectar cambios externos).
+        
+        Retorna:
+        --------
+        int
+            Número de usuarios con modelos personalizados en disco.
+        """
+        entries: Dict[str, ManifestEntry] = self._scan()
+        with self._lock:
+            # Los archivos que fallaron solo se reintentan si cambiaron desde el fallo
+            for user_id, failed_entry in list(self._failed.items()):
+                current: Optional[ManifestEntry] = entries.get(user_id)
+                if current is None or (current.size, current.mtime) != (failed_entry.size, failed_entry.mtime):
+                    del self._failed[user_id]
+                else:
+                    del entries[user_id]
+            self._entries = entries
+            self._scans += 1
+            return len(entries)
+    
+    def get(self, user_id: str) -> Optional[ManifestEntry]:
+        """
+        Obtiene la entrada de un usuario sin acceder al disco.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        
+        Retorna:
+        --------
+        Optional[ManifestEntry]
+            Entrada del usuario o None si no tiene modelos personalizados en disco.
+        """
+        return self._entries.get(user_id)
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def items(self) -> List[Tuple[str, ManifestEntry]]:
+        """
+        Obtiene una copia de las entradas del índice.
+        """
+        with self._lock:
+            return list(self._entries.items())
+    
+    def record_write(self, user_id: str, path: str, size: int, checksum: str) -> None:
+        """
+        Registra un archivo empaquetado recién escrito por el almacén.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        path : str
+            Ruta del archivo escrito.
+        size : int
+            Tamaño del archivo en bytes.
+        checksum : str
+            Suma SHA-256 de los datos.
+        """
+        entry: ManifestEntry = ManifestEntry(
+            paths=(path,), size=size, mtime=os.path.getmtime(path), checksum=checksum, legacy=False
+        )
+        with self._lock:
+            self._failed.pop(user_id, None)
+            self._entries[user_id] = entry
+    
+    def mark_failed(self, user_id: str) -> None:
+        """
+        Retira del índice un usuario cuyos archivos no se pudieron cargar.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        """
+        with self._lock:
+            entry: Optional[ManifestEntry] = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._failed[user_id] = entry
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Obtiene estadísticas del índice.
+        
+        Retorna:
+        --------
+        Dict[str, int]
+            Usuarios indexados, usuarios con archivos fallidos y número de recorridos del directorio.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "legacy_entries": sum(1 for entry in self._entries.values() if entry.legacy),
+                "failed_entries": len(self._failed),
+                "scans": self._scans,
+            }
@@ -0,0 +1,113 @@
+"""
+Variantes de precisión reducida de los actores para servir inferencia.
+
+- 'int8': cuantización dinámica de las capas Linear (pesos int8, activaciones float32).
+- 'float16': copia del actor en media precisión.
+
+Ninguna variante se sirve sin antes comparar sus dosis con las del actor float32
+sobre una grilla de entradas de referencia.
+"""
+import copy
+import logging
+import warnings
+from typing import Callable, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from constants.constants import (
+    QUANTIZATION_GRID_CGM,
+    QUANTIZATION_GRID_CARBS,
+    QUANTIZATION_GRID_IOB,
+    QUANTIZATION_GRID_MINUTES
+)
+
+logger = logging.getLogger(__name__)
+
+SERVING_PRECISIONS: Tuple[str, ...] = ("float32", "float16", "int8")
+
+# Función que predice bolos con un actor: (actor, cgm, carbohidratos, iob, minutos) -> bolos
+BolusPredictor = Callable[[nn.Module, np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+class HalfPrecisionActor(nn.Module):
+    """
+    Actor con pesos en float16 que recibe y devuelve tensores float32.
+    """
+    
+    def __init__(self, actor: nn.Module) -> None:
+        super().__init__()
+        self.actor: nn.Module = copy.deepcopy(actor).half().eval()
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.actor(x.half()).float()
+
+def make_serving_variant(actor: nn.Module, precision: str) -> nn.Module:
+    """
+    Construye una variante de precisión reducida de un actor (el original no se modifica).
+    
+    Parámetros:
+    -----------
+    actor : nn.Module
+        Actor float32 de referencia.
+    precision : str
+        Precisión de la variante ('float32', 'float16' o 'int8').
+    
+    Retorna:
+    --------
+    nn.Module
+        Variante en modo evaluación (el mismo actor si la precisión es 'float32').
+    """
+    if precision == "float32":
+        return actor
+    if precision == "float16":
+        return HalfPrecisionActor(actor)
+    if precision == "int8":
+        with warnings.catch_warnings():
+            # La API de cuantización dinámica emite avisos de obsolescencia en versiones recientes de torch
+            warnings.simplefilter("ignore")
+            return torch.ao.quantization.quantize_dynamic(
+                copy.deepcopy(actor).eval(), {nn.Linear}, dtype=torch.qint8
+            )
+    raise ValueError(f"Precisión de inferencia no soportada: {precision} (opciones: {', '.join(SERVING_PRECISIONS)})")
+
+def reference_grid() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Construye la grilla de entradas de referencia (producto cartesiano de CGM, carbohidratos, IOB y hora).
+    
+    Retorna:
+    --------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        CGM, carbohidratos, IOB y minutos desde medianoche, cada uno con forma (N,).
+    """
+    cgm, carbs, iob, minutes = np.meshgrid(
+        np.asarray(QUANTIZATION_GRID_CGM, dtype=np.float64),
+        np.asarray(QUANTIZATION_GRID_CARBS, dtype=np.float64),
+        np.asarray(QUANTIZATION_GRID_IOB, dtype=np.float64),
+        np.asarray(QUANTIZATION_GRID_MINUTES, dtype=np.float64),
+        indexing="ij"
+    )
+    return cgm.ravel(), carbs.ravel(), iob.ravel(), minutes.ravel()
+
+def max_dose_deviation(reference: nn.Module, variant: nn.Module, predict_bolus: BolusPredictor) -> float:
+    """
+    Calcula la máxima diferencia absoluta de dosis entre una variante y su actor de referencia.
+    
+    Parámetros:
+    -----------
+    reference : nn.Module
+        Actor float32.
+    variant : nn.Module
+        Variante a validar.
+    predict_bolus : BolusPredictor
+        Función que calcula bolos (con las restricciones de seguridad) para un actor.
+    
+    Retorna:
+    --------
+    float
+        Máxima desviación de dosis en Unidades sobre la grilla de referencia.
+    """
+    grid: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] = reference_grid()
+    expected: np.ndarray = predict_bolus(reference, *grid)
+    actual: np.ndarray = predict_bolus(variant, *grid)
+    return float(np.max(np.abs(actual - expected)))
@@ -0,0 +1,223 @@
+import os
+import logging
+from typing import Dict, Optional, Tuple
+
+import torch
+
+from packed_format import read_packed, write_packed
+from model_manifest import ManifestEntry, ModelManifest
+from constants.constants import (
+    PACKED_MODEL_EXTENSION,
+    PACKED_POPULATION_FILE,
+    PACKED_DISTILLED_POPULATION_FILE,
+    PACKED_PERSONALIZED_PREFIX,
+    MODEL_STORE_DTYPE
+)
+
+logger = logging.getLogger(__name__)
+
+ACTOR_PREFIX: str = "actor."
+CRITIC_PREFIX: str = "critic."
+
+_STORAGE_DTYPES: Dict[str, torch.dtype] = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+}
+
+def split_state(tensors: Dict[str, torch.Tensor], prefix: str) -> Dict[str, torch.Tensor]:
+    """
+    Extrae del archivo empaquetado el state_dict de un modelo a partir de su prefijo.
+    
+    Parámetros:
+    -----------
+    tensors : Dict[str, torch.Tensor]
+        Tensores del archivo empaquetado.
+    prefix : str
+        Prefijo del modelo ('actor.' o 'critic.').
+        
+    Retorna:
+    --------
+    Dict[str, torch.Tensor]
+        state_dict del modelo sin el prefijo.
+    """
+    return {name[len(prefix):]: tensor for name, tensor in tensors.items() if name.startswith(prefix)}
+
+def load_module_state(module: torch.nn.Module, state: Dict[str, torch.Tensor]) -> torch.nn.Module:
+    """
+    Carga un state_dict en un módulo reutilizando los tensores recibidos en lugar de copiarlos.
+    
+    Parámetros:
+    -----------
+    module : torch.nn.Module
+        Módulo con la arquitectura correspondiente.
+    state : Dict[str, torch.Tensor]
+        Tensores a asignar (por ejemplo, vistas de un archivo mapeado en memoria).
+        
+    Retorna:
+    --------
+    torch.nn.Module
+        El mismo módulo con los tensores asignados.
+    """
+    reference: Dict[str, torch.Tensor] = module.state_dict()
+    # Los tensores guardados en otra precisión se convierten al tipo del módulo (esto sí copia)
+    state = {
+        name: tensor if tensor.dtype == reference[name].dtype else tensor.to(reference[name].dtype)
+        for name, tensor in state.items()
+    }
+    module.load_state_dict(state, assign=True)
+    return module
+
+class ModelStore:
+    """
+    Almacén de modelos en archivos empaquetados mapeados en memoria.
+    
+    Cada usuario ocupa un único archivo con su actor y su critic, de modo que cargarlo
+    es un solo mapeo cuyos tensores son vistas del archivo.
+    """
+    
+    def __init__(self, directory: str, storage_dtype: str = MODEL_STORE_DTYPE) -> None:
+        """
+        Inicializa el almacén de modelos.
+        
+        Parámetros:
+        -----------
+        directory : str
+            Directorio de los archivos empaquetados.
+        storage_dtype : str
+            Precisión de almacenamiento de los pesos ('float32' o 'float16').
+        """
+        if storage_dtype not in _STORAGE_DTYPES:
+            raise ValueError(f"Precisión de almacenamiento no soportada: {storage_dtype}")
+        self.directory: str = directory
+        self.storage_dtype: torch.dtype = _STORAGE_DTYPES[storage_dtype]
+        self.manifest: ModelManifest = ModelManifest(directory)
+        self.manifest.refresh()
+    
+    def user_path(self, user_id: str) -> str:
+        """
+        Obtiene la ruta del archivo empaquetado de un usuario.
+        """
+        return os.path.join(self.directory, f"{PACKED_PERSONALIZED_PREFIX}{user_id}{PACKED_MODEL_EXTENSION}")
+    
+    def population_path(self) -> str:
+        """
+        Obtiene la ruta del archivo empaquetado de los modelos poblacionales.
+        """
+        return os.path.join(self.directory, PACKED_POPULATION_FILE)
+    
+    def distilled_population_path(self) -> str:
+        """
+        Obtiene la ruta del archivo empaquetado del actor poblacional destilado.
+        """
+        return os.path.join(self.directory, PACKED_DISTILLED_POPULATION_FILE)
+    
+    def has_user_models(self, user_id: str) -> bool:
+        """
+        Indica, según el índice en memoria, si el usuario tiene modelos personalizados en disco.
+        """
+        return user_id in self.manifest
+    
+    def user_entry(self, user_id: str) -> Optional[ManifestEntry]:
+        """
+        Obtiene la entrada del índice de un usuario sin acceder al disco.
+        """
+        return self.manifest.get(user_id)
+    
+    def _save(
+        self, path: str, actor: torch.nn.Module, critic: Optional[torch.nn.Module], metadata: Dict[str, str]
+    ) -> Tuple[int, str]:
+        os.makedirs(self.directory, exist_ok=True)
+        tensors: Dict[str, torch.Tensor] = {
+            f"{ACTOR_PREFIX}{name}": tensor for name, tensor in actor.state_dict().items()
+        }
+        if critic is not None:
+            tensors.update({f"{CRITIC_PREFIX}{name}": tensor for name, tensor in critic.state_dict().items()})
+        return write_packed(path, tensors, metadata, dtype=self.storage_dtype)
+    
+    def _load(self, path: str) -> Tuple[Dict[str, torch.Tensor], Optional[Dict[str, torch.Tensor]], Dict[str, str]]:
+        tensors, metadata = read_packed(path)
+        critic_state: Dict[str, torch.Tensor] = split_state(tensors, CRITIC_PREFIX)
+        return split_state(tensors, ACTOR_PREFIX), critic_state or None, metadata
+    
+    def save_user_models(
+        self,
+        user_id: str,
+        actor: torch.nn.Module,
+        critic: Optional[torch.nn.Module],
+        metadata: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, str]:
+        """
+        Guarda actor y critic de un usuario en su archivo empaquetado.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        actor : torch.nn.Module
+            Modelo actor.
+        critic : Optional[torch.nn.Module]
+            Modelo critic (opcional).
+        metadata : Optional[Dict[str, str]]
+            Metadatos adicionales del archivo.
+            
+        Retorna:
+        --------
+        Tuple[int, str]
+            Tamaño en bytes y checksum del archivo escrito.
+        """
+        path: str = self.user_path(user_id)
+        size, checksum = self._save(path, actor, critic, {"user_id": user_id, **(metadata or {})})
+        self.manifest.record_write(user_id, path, size, checksum)
+        return size, checksum
+    
+    def load_user_state(
+        self, user_id: str
+    ) -> Tuple[Dict[str, torch.Tensor], Optional[Dict[str, torch.Tensor]], Dict[str, str]]:
+        """
+        Mapea el archivo de un usuario y devuelve los state_dict de actor y critic como vistas sin copia.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+            
+        Retorna:
+        --------
+        Tuple[Dict[str, torch.Tensor], Optional[Dict[str, torch.Tensor]], Dict[str, str]]
+            state_dict del actor, state_dict del critic (None si no se guardó) y metadatos.
+        """
+        return self._load(self.user_path(user_id))
+    
+    def save_population_models(self, actor: torch.nn.Module, critic: Optional[torch.nn.Module]) -> None:
+        """
+        Guarda los modelos poblacionales en su archivo empaquetado.
+        """
+        self._save(self.population_path(), actor, critic, {"user_id": "population"})
+    
+    def load_population_state(
+        self
+    ) -> Tuple[Dict[str, torch.Tensor], Optional[Dict[str, torch.Tensor]], Dict[str, str]]:
+        """
+        Mapea el archivo poblacional y devuelve los state_dict de actor y critic.
+        """
+        return self._load(self.population_path())
+    
+    def save_distilled_population(self, actor: torch.nn.Module, metadata: Optional[Dict[str, str]] = None) -> None:
+        """
+        Guarda el actor poblacional destilado (sin critic; solo se usa para inferencia).
+        
+        Parámetros:
+        -----------
+        actor : torch.nn.Module
+            Actor destilado.
+        metadata : Optional[Dict[str, str]]
+            Metadatos adicionales (por ejemplo, métricas de la destilación).
+        """
+        self._save(self.distilled_population_path(), actor, None, {"user_id": "population_distilled", **(metadata or {})})
+    
+    def load_distilled_population_state(self) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+        """
+        Mapea el archivo del actor poblacional destilado y devuelve su state_dict y metadatos.
+        """
+        actor_state, _, metadata = self._load(self.distilled_population_path())
+        return actor_state, metadata
@@ -1,6 +1,7 @@
 import os
 import sys
 import logging
+import numpy as np
 import torch
 import torch.nn as nn
 
@@ -28,20 +29,25 @@ from constants.constants import (
     ISF_DEFAULT,
     TARGET_BG,
     MIN_BOLUS,
-    MAX_BOLUS
+    MAX_BOLUS,
+    ACTOR_HIDDEN_DIMS
 )
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
 class Actor(nn.Module):
-    def __init__(self, state_dim, action_dim):
+    # Operaciones aplicadas tras `net` en forward (las usa el backend de inferencia numpy)
+    OUTPUT_OPS = (("scale", 0.5), ("shift", 1.0))
+
+    def __init__(self, state_dim, action_dim, hidden_dims=ACTOR_HIDDEN_DIMS):
         super().__init__()
-        self.net = nn.Sequential(
-            nn.Linear(state_dim, 400), nn.ReLU(),
-            nn.Linear(400, 300), nn.ReLU(),
-            nn.Linear(300, action_dim), nn.Tanh()
-        )
+        layers = []
+        in_dim = state_dim
+        for hidden_dim in hidden_dims:
+            layers += [nn.Linear(in_dim, hidden_dim), nn.ReLU()]
+            in_dim = hidden_dim
+        self.net = nn.Sequential(*layers, nn.Linear(in_dim, action_dim), nn.Tanh())
 
     def forward(self, x):
         return self.net(x) * 0.5 + 1.0
@@ -58,6 +64,54 @@ class Critic(nn.Module):
     def forward(self, state, action):
         return self.net1(torch.cat([state, action], dim=1))
 
+def infer_actor_hidden_dims(state_dict: dict) -> tuple:
+    """
+    Obtiene las dimensiones de las capas ocultas de un actor a partir de su state_dict.
+    
+    Parámetros:
+    -----------
+    state_dict : dict
+        Pesos del actor (claves 'net.<índice>.weight').
+        
+    Retorna:
+    --------
+    tuple
+        Dimensiones de las capas ocultas, por ejemplo (400, 300).
+    """
+    linear_weights = sorted(
+        (int(name.split(".")[1]), tensor) for name, tensor in state_dict.items()
+        if name.startswith("net.") and name.endswith(".weight")
+    )
+    return tuple(int(tensor.shape[0]) for _, tensor in linear_weights[:-1])
+
+def flush_subnormal_parameters(module: nn.Module) -> int:
+    """
+    Pone a cero los parámetros subnormales de un módulo.
+    
+    Los pesos muy pequeños que deja el weight decay quedan como números subnormales, y la
+    aritmética con ellos es órdenes de magnitud más lenta en CPU; su aporte a la salida es
+    despreciable (< 1e-38).
+    
+    Parámetros:
+    -----------
+    module : nn.Module
+        Módulo a sanear (se modifica en el lugar).
+        
+    Retorna:
+    --------
+    int
+        Cantidad de parámetros puestos a cero.
+    """
+    flushed: int = 0
+    with torch.no_grad():
+        for parameter in module.parameters():
+            if not parameter.is_floating_point():
+                continue
+            subnormal: torch.Tensor = (parameter != 0) & (parameter.abs() < torch.finfo(parameter.dtype).tiny)
+            flushed += int(subnormal.sum())
+            parameter.masked_fill_(subnormal, 0.0)
+    return flushed
+
 def load_actor_model(
     model_path: str, 
     state_dim: int, 
@@ -106,12 +160,13 @@ def load_actor_model(
             # logger.error(f"{ACTOR_MODEL_FILE_NOT_FOUND_MSG}: {model_path}")
             raise FileNotFoundError(f"{ACTOR_MODEL_FILE_NOT_FOUND_MSG}: {model_path}")
         
-        # Crear instancia del modelo Actor
-        actor_model: Actor = Actor(state_dim, action_dim).to(device)
-        
         # Cargar los parámetros del modelo
         state_dict: dict = torch.load(model_path, map_location=device)
+        
+        # Crear instancia del modelo Actor con la arquitectura guardada (completa o destilada)
+        actor_model: Actor = Actor(state_dim, action_dim, infer_actor_hidden_dims(state_dict)).to(device)
         actor_model.load_state_dict(state_dict)
+        flush_subnormal_parameters(actor_model)
         
         # Configurar para evaluación (deshabilitar dropout, batchnorm, etc.)
         actor_model.eval()
@@ -291,4 +346,95 @@ def compute_bolus(
     # Aplicar límite máximo
     bolus_total = min(bolus_total, MAX_BOLUS)
     
-    return bolus_total
\ No newline at end of file
+    return bolus_total
+
+def apply_safety_constraints_batch(action_gains: np.ndarray, cgm: np.ndarray) -> np.ndarray:
+    """
+    Versión vectorizada de `apply_safety_constraints` para un lote de estados.
+    
+    Parámetros:
+    -----------
+    action_gains : np.ndarray
+        Ganancias de acción del modelo actor con forma (N, ACTION_DIM).
+    cgm : np.ndarray
+        Valores de glucosa (mg/dL) con forma (N,).
+        
+    Retorna:
+    --------
+    np.ndarray
+        Ganancias con restricciones de seguridad aplicadas, misma forma y tipo que la entrada.
+    """
+    gains: np.ndarray = np.asarray(action_gains)
+    cgm_values: np.ndarray = np.asarray(cgm, dtype=np.float64)
+    
+    # Mismo orden de ramas que la versión escalar
+    factors: np.ndarray = np.where(
+        cgm_values < HYPO_THRESHOLD,
+        HYPOGLYCEMIA_GAIN_FACTOR,
+        np.where(cgm_values < SEVERE_HYPO_THRESHOLD, LOW_GLUCOSE_GAIN_FACTOR, 1.0)
+    ).astype(gains.dtype)
+    
+    safe_gains: np.ndarray = gains * factors[:, None]
+    return np.clip(safe_gains, MIN_GAIN_VALUE, MAX_GAIN_VALUE).astype(gains.dtype, copy=False)
+
+def compute_bolus_batch(
+    gains: np.ndarray,
+    cho: np.ndarray,
+    cgm: np.ndarray,
+    iob: np.ndarray,
+    mealtime: np.ndarray
+) -> np.ndarray:
+    """
+    Versión vectorizada de `compute_bolus` para un lote de estados.
+    
+    Parámetros:
+    -----------
+    gains : np.ndarray
+        Ganancias del modelo actor con forma (N, ACTION_DIM).
+    cho : np.ndarray
+        Carbohidratos a consumir (gramos) con forma (N,).
+    cgm : np.ndarray
+        Valores de glucosa (mg/dL) con forma (N,).
+    iob : np.ndarray
+        Insulina activa (Unidades) con forma (N,).
+    mealtime : np.ndarray
+        Indicadores booleanos de momento de comida con forma (N,).
+        
+    Retorna:
+    --------
+    np.ndarray
+        Dosis de bolo calculadas (Unidades) con forma (N,).
+    """
+    # Las ganancias se operan en doble precisión, igual que `.item()` en la versión escalar
+    gains_64: np.ndarray = np.asarray(gains).astype(np.float64)
+    cho_values: np.ndarray = np.asarray(cho, dtype=np.float64)
+    cgm_values: np.ndarray = np.asarray(cgm, dtype=np.float64)
+    iob_values: np.ndarray = np.asarray(iob, dtype=np.float64)
+    mealtime_mask: np.ndarray = np.asarray(mealtime, dtype=bool)
+    
+    # Componente de comida
+    bolus_total: np.ndarray = np.where(
+        mealtime_mask & (cho_values > 0), (cho_values / ICR_DEFAULT) * gains_64[:, 0], 0.0
+    )
+    
+    # Componente de corrección
+    bolus_total = np.where(
+        cgm_values > TARGET_BG,
+        bolus_total + ((cgm_values - TARGET_BG) / ISF_DEFAULT) * gains_64[:, 1],
+        bolus_total
+    )
+    
+    # Ajuste por insulina activa
+    bolus_total = np.where(
+        iob_values > 0, np.maximum(0.0, bolus_total - iob_values * gains_64[:, 2]), bolus_total
+    )
+    
+    # Aplicar restricciones de seguridad
+    bolus_total = np.where(cgm_values < HYPO_THRESHOLD, 0.0, bolus_total)
+    
+    # Redondear a bolo mínimo si es muy pequeño
+    bolus_total = np.where((bolus_total > 0) & (bolus_total < MIN_BOLUS), MIN_BOLUS, bolus_total)
+    bolus_total = np.where(bolus_total < 0, 0.0, bolus_total)
+    
+    # Aplicar límite máximo
+    return np.minimum(bolus_total, MAX_BOLUS)
@@ -0,0 +1,159 @@
+"""
+Formato empaquetado de tensores compatible con safetensors.
+
+Estructura del archivo:
+    [8 bytes: longitud N del encabezado, u64 little-endian]
+    [N bytes: encabezado JSON con nombre -> {dtype, shape, data_offsets} y "__metadata__"]
+    [bloques binarios contiguos de cada tensor]
+
+La lectura mapea el archivo en memoria y devuelve tensores que son vistas directas
+del mapeo (sin copia): cada página se carga bajo demanda al acceder a ella.
+"""
+import os
+import json
+import mmap
+import hashlib
+import struct
+from typing import Dict, Optional, Tuple
+
+import torch
+
+METADATA_KEY: str = "__metadata__"
+CHECKSUM_KEY: str = "sha256"
+HEADER_ALIGNMENT: int = 8
+
+_DTYPE_TO_CODE: Dict[torch.dtype, str] = {
+    torch.float64: "F64",
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.int64: "I64",
+    torch.int32: "I32",
+    torch.int16: "I16",
+    torch.int8: "I8",
+    torch.uint8: "U8",
+    torch.bool: "BOOL",
+}
+_CODE_TO_DTYPE: Dict[str, torch.dtype] = {code: dtype for dtype, code in _DTYPE_TO_CODE.items()}
+
+def write_packed(
+    path: str,
+    tensors: Dict[str, torch.Tensor],
+    metadata: Optional[Dict[str, str]] = None,
+    dtype: Optional[torch.dtype] = None
+) -> Tuple[int, str]:
+    """
+    Escribe tensores en un archivo empaquetado de forma atómica (archivo temporal + os.replace).
+    
+    La suma SHA-256 de los datos se guarda en los metadatos para poder conocerla
+    leyendo solo el encabezado.
+    
+    Parámetros:
+    -----------
+    path : str
+        Ruta del archivo de destino.
+    tensors : Dict[str, torch.Tensor]
+        Tensores a guardar por nombre.
+    metadata : Optional[Dict[str, str]]
+        Metadatos de texto a guardar en el encabezado.
+    dtype : Optional[torch.dtype]
+        Tipo al que convertir los tensores de punto flotante (por ejemplo torch.float16).
+        
+    Retorna:
+    --------
+    Tuple[int, str]
+        Tamaño del archivo escrito en bytes y suma SHA-256 de los datos.
+    """
+    header: Dict[str, object] = {}
+    blobs = []
+    offset: int = 0
+    digest = hashlib.sha256()
+    for name in sorted(tensors):
+        tensor: torch.Tensor = tensors[name].detach().cpu()
+        if dtype is not None and tensor.is_floating_point():
+            tensor = tensor.to(dtype)
+        tensor = tensor.contiguous()
+        blob: bytes = tensor.reshape(-1).view(torch.uint8).numpy().tobytes()
+        header[name] = {
+            "dtype": _DTYPE_TO_CODE[tensor.dtype],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + len(blob)],
+        }
+        blobs.append(blob)
+        digest.update(blob)
+        offset += len(blob)
+    checksum: str = digest.hexdigest()
+    header[METADATA_KEY] = {**{key: str(value) for key, value in (metadata or {}).items()}, CHECKSUM_KEY: checksum}
+    
+    # El encabezado se rellena con espacios para alinear el inicio de los datos
+    header_bytes: bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % HEADER_ALIGNMENT)
+    
+    tmp_path: str = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return 8 + len(header_bytes) + offset, checksum
+
+def read_header(path: str) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Lee solo el encabezado de un archivo empaquetado, sin tocar los datos.
+    
+    Parámetros:
+    -----------
+    path : str
+        Ruta del archivo empaquetado.
+        
+    Retorna:
+    --------
+    Tuple[Dict[str, dict], Dict[str, str]]
+        Descripción de los tensores por nombre y metadatos.
+    """
+    with open(path, "rb") as f:
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header: Dict[str, dict] = json.loads(f.read(header_length))
+    metadata: Dict[str, str] = header.pop(METADATA_KEY, {})
+    return header, metadata
+
+def read_packed(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """
+    Mapea un archivo empaquetado en memoria y devuelve sus tensores como vistas sin copia.
+    
+    El mapeo es privado (copy-on-write): modificar un tensor no altera el archivo.
+    
+    Parámetros:
+    -----------
+    path : str
+        Ruta del archivo empaquetado.
+        
+    Retorna:
+    --------
+    Tuple[Dict[str, torch.Tensor], Dict[str, str]]
+        Tensores por nombre y metadatos.
+    """
+    with open(path, "rb") as f:
+        mapped: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    
+    (header_length,) = struct.unpack("<Q", mapped[:8])
+    header: Dict[str, dict] = json.loads(mapped[8:8 + header_length])
+    metadata: Dict[str, str] = header.pop(METADATA_KEY, {})
+    data_start: int = 8 + header_length
+    
+    tensors: Dict[str, torch.Tensor] = {}
+    for name, info in header.items():
+        dtype: torch.dtype = _CODE_TO_DTYPE[info["dtype"]]
+        start, end = info["data_offsets"]
+        shape = tuple(info["shape"])
+        if end == start:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+        # El tensor mantiene viva la referencia al mapeo
+        tensors[name] = torch.frombuffer(
+            mapped, dtype=dtype, count=(end - start) // dtype.itemsize, offset=data_start + start
+        ).reshape(shape)
+    return tensors, metadata
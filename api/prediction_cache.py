@@ -0,0 +1,247 @@
+import sys
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+import torch
+
+# Resultado de una predicción: (bolo, límite inferior, límite superior)
+PredictionResult = Tuple[float, float, float]
+
+class PredictionCache:
+    """
+    Caché LRU acotada de predicciones indexada por usuario, versión del actor y entradas cuantizadas.
+    
+    Las entradas cuantizadas a la resolución configurada solo forman la clave: la predicción se
+    calcula siempre con las entradas recibidas, y un acierto devuelve la de otra solicitud de la
+    misma celda. Las celdas de CGM que contienen un umbral clínico (ampliadas por el ruido de las
+    variaciones de incertidumbre) no se cachean, porque ahí la dosis cambia de forma discontinua
+    dentro de la celda. Cada objeto de actor recibe un identificador único que no se reutiliza, de modo que un actor
+    recargado o reemplazado nunca coincide con entradas anteriores.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int,
+        cgm_resolution: float,
+        carbs_resolution: float,
+        iob_resolution: float,
+        minutes_resolution: float,
+        cgm_thresholds: Tuple[float, ...] = (),
+        cgm_margin: float = 0.0
+    ) -> None:
+        """
+        Inicializa la caché de predicciones.
+        
+        Parámetros:
+        -----------
+        max_entries : int
+            Cantidad máxima de predicciones guardadas (0 deshabilita la caché).
+        cgm_resolution : float
+            Resolución de cuantización de CGM (mg/dL).
+        carbs_resolution : float
+            Resolución de cuantización de carbohidratos (gramos).
+        iob_resolution : float
+            Resolución de cuantización de IOB (Unidades).
+        minutes_resolution : float
+            Resolución de cuantización de los minutos desde medianoche.
+        cgm_thresholds : Tuple[float, ...]
+            Umbrales de CGM (mg/dL) donde la dosis es discontinua; sus celdas no se cachean.
+        cgm_margin : float
+            Margen (mg/dL) que se agrega a cada celda de CGM al buscar umbrales, para cubrir las
+            variaciones de incertidumbre que se evalúan alrededor de la lectura.
+        """
+        self.max_entries: int = max_entries
+        self.resolutions: Tuple[float, float, float, float] = (
+            cgm_resolution, carbs_resolution, iob_resolution, minutes_resolution
+        )
+        self.cgm_thresholds: Tuple[float, ...] = tuple(cgm_thresholds)
+        self.cgm_margin: float = cgm_margin
+        self._entries: "OrderedDict[Tuple[Hashable, ...], PredictionResult]" = OrderedDict()
+        self._sizes: Dict[Tuple[Hashable, ...], int] = {}
+        self._keys_by_user: Dict[str, Set[Tuple[Hashable, ...]]] = {}
+        self._actor_tokens: "weakref.WeakKeyDictionary[torch.nn.Module, int]" = weakref.WeakKeyDictionary()
+        self._token_counter = itertools.count()
+        self._bytes: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        
+        # Contadores observables
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    def quantize(
+        self, cgm: float, carb_intake_grams: float, iob: float, minutes_since_midnight: float
+    ) -> Tuple[int, int, int, int]:
+        """
+        Cuantiza las entradas de una predicción a la resolución de la caché.
+        
+        Parámetros:
+        -----------
+        cgm : float
+            Lectura de glucosa (mg/dL).
+        carb_intake_grams : float
+            Gramos de carbohidratos.
+        iob : float
+            Insulina activa (Unidades).
+        minutes_since_midnight : float
+            Minutos transcurridos desde medianoche.
+        
+        Retorna:
+        --------
+        Tuple[int, int, int, int]
+            Índices enteros de la cuantización (parte de la clave).
+        """
+        return tuple(
+            int(round(value / resolution))
+            for value, resolution in zip((cgm, carb_intake_grams, iob, minutes_since_midnight), self.resolutions)
+        )
+    
+    def crosses_threshold(self, steps: Tuple[int, ...]) -> bool:
+        """
+        Indica si la celda de CGM de una clave, ampliada por el margen, contiene un umbral clínico.
+        
+        Parámetros:
+        -----------
+        steps : Tuple[int, ...]
+            Índices de cuantización devueltos por `quantize`.
+        
+        Retorna:
+        --------
+        bool
+            True si las predicciones de la celda no deben cachearse.
+        """
+        cgm_resolution: float = self.resolutions[0]
+        reach: float = cgm_resolution / 2 + self.cgm_margin
+        return any(abs(threshold - steps[0] * cgm_resolution) <= reach for threshold in self.cgm_thresholds)
+    
+    def key(self, user_id: str, actor_model: torch.nn.Module, steps: Tuple[int, ...]) -> Tuple[Hashable, ...]:
+        """
+        Construye la clave de una predicción.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        actor_model : torch.nn.Module
+            Actor que calcula la predicción.
+        steps : Tuple[int, ...]
+            Índices de cuantización devueltos por `quantize`.
+        
+        Retorna:
+        --------
+        Tuple[Hashable, ...]
+            Clave de la caché.
+        """
+        with self._lock:
+            token: Optional[int] = self._actor_tokens.get(actor_model)
+            if token is None:
+                token = next(self._token_counter)
+                self._actor_tokens[actor_model] = token
+        return (user_id, token) + tuple(steps)
+    
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[PredictionResult]:
+        """
+        Obtiene una predicción guardada actualizando su uso y los contadores.
+        """
+        with self._lock:
+            result: Optional[PredictionResult] = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return result
+    
+    def put(self, key: Tuple[Hashable, ...], result: PredictionResult) -> None:
+        """
+        Guarda una predicción, desalojando las menos usadas recientemente si se supera el máximo.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._discard(key)
+            size: int = (
+                sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+                + sys.getsizeof(result) + sum(sys.getsizeof(value) for value in result)
+            )
+            self._entries[key] = result
+            self._sizes[key] = size
+            self._bytes += size
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def invalidate_actor(self, actor_model: torch.nn.Module) -> None:
+        """
+        Asigna un nuevo identificador a un actor cuyos pesos cambiaron en el lugar.
+        
+        Las entradas anteriores dejan de coincidir y se desalojan por antigüedad.
+        """
+        with self._lock:
+            if actor_model in self._actor_tokens:
+                self._actor_tokens[actor_model] = next(self._token_counter)
+    
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        Elimina las predicciones guardadas de un usuario (modelo o perfil actualizado).
+        
+        Retorna:
+        --------
+        int
+            Cantidad de entradas eliminadas.
+        """
+        with self._lock:
+            keys: Set[Tuple[Hashable, ...]] = self._keys_by_user.pop(user_id, set())
+            for key in keys:
+                self._discard(key)
+            self.invalidations += len(keys)
+            return len(keys)
+    
+    def _discard(self, key: Tuple[Hashable, ...]) -> None:
+        """
+        Elimina una entrada y descuenta su tamaño. Debe llamarse con el lock tomado.
+        """
+        if self._entries.pop(key, None) is None:
+            return
+        self._bytes -= self._sizes.pop(key)
+        user_keys: Optional[Set[Tuple[Hashable, ...]]] = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene los contadores y el uso de memoria de la caché.
+        
+        Retorna:
+        --------
+        Dict[str, Any]
+            Entradas, bytes estimados, resolución y contadores de aciertos, fallos, desalojos e invalidaciones.
+        """
+        with self._lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes_used": self._bytes,
+                "resolution": dict(zip(("cgm", "carbs", "iob", "minutes"), self.resolutions)),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
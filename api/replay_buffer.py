@@ -0,0 +1,422 @@
+"""
+Buffer de repetición priorizado por usuario para el entrenamiento en línea.
+
+Las transiciones se guardan en arreglos NumPy preasignados (buffer circular) y las
+prioridades en un árbol de sumas, con muestreo proporcional a p^alpha y actualización
+de prioridades en O(log n). El conjunto de buffers de todos los usuarios respeta un
+presupuesto de memoria: los menos usados recientemente se vuelcan a disco en el formato
+empaquetado y se vuelven a cargar al recibir nuevas transiciones.
+"""
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+import torch
+
+from packed_format import read_packed, write_packed
+from constants.constants import (
+    STATE_DIM,
+    ACTION_DIM,
+    BUFFER_SIZE,
+    PRIORITY_ALPHA,
+    PRIORITY_BETA,
+    PRIORITY_EPS,
+    PACKED_MODEL_EXTENSION,
+    REPLAY_BUFFER_PREFIX,
+    REPLAY_BUFFER_SPILLED_MSG,
+    REPLAY_BUFFER_RESTORE_ERROR_MSG
+)
+
+logger = logging.getLogger(__name__)
+
+class SumTree:
+    """
+    Árbol binario de sumas sobre un arreglo: cada nodo interno guarda la suma de sus hijos.
+    
+    Las hojas ocupan las posiciones [size, 2 * size) con `size` potencia de dos, lo que
+    permite recorrer todos los niveles de un lote de consultas con operaciones vectorizadas.
+    """
+    
+    def __init__(self, capacity: int) -> None:
+        """
+        Inicializa el árbol con todas las prioridades en cero.
+        
+        Parámetros:
+        -----------
+        capacity : int
+            Cantidad de hojas utilizables.
+        """
+        self.capacity: int = capacity
+        self.size: int = 1 << max(0, int(capacity - 1).bit_length())
+        self.depth: int = self.size.bit_length() - 1
+        self.nodes: np.ndarray = np.zeros(2 * self.size, dtype=np.float64)
+    
+    @property
+    def total(self) -> float:
+        return float(self.nodes[1])
+    
+    def update(self, indices: np.ndarray, priorities: np.ndarray) -> None:
+        """
+        Asigna prioridades a hojas y actualiza las sumas de sus ancestros.
+        
+        Parámetros:
+        -----------
+        indices : np.ndarray
+            Posiciones de las hojas (0 .. capacity - 1).
+        priorities : np.ndarray
+            Nuevas prioridades (no negativas).
+        """
+        nodes: np.ndarray = np.asarray(indices, dtype=np.intp) + self.size
+        self.nodes[nodes] = priorities
+        # Subir nivel por nivel recalculando cada padre a partir de sus dos hijos
+        for _ in range(self.depth):
+            nodes = np.unique(nodes >> 1)
+            self.nodes[nodes] = self.nodes[2 * nodes] + self.nodes[2 * nodes + 1]
+    
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """
+        Encuentra, para cada valor acumulado, la hoja cuyo intervalo de suma lo contiene.
+        
+        Parámetros:
+        -----------
+        values : np.ndarray
+            Valores en [0, total).
+        
+        Retorna:
+        --------
+        np.ndarray
+            Posiciones de las hojas (0 .. capacity - 1).
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes: np.ndarray = np.ones(values.shape[0], dtype=np.intp)
+        for _ in range(self.depth):
+            left: np.ndarray = 2 * nodes
+            left_sum: np.ndarray = self.nodes[left]
+            go_right: np.ndarray = values >= left_sum
+            values = np.where(go_right, values - left_sum, values)
+            nodes = np.where(go_right, left + 1, left)
+        # El redondeo puede llevar a una hoja sin prioridad a la derecha del último elemento
+        return np.minimum(nodes - self.size, self.capacity - 1)
+    
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        return self.nodes[np.asarray(indices, dtype=np.intp) + self.size]
+
+class PrioritizedReplayBuffer:
+    """
+    Buffer circular de transiciones (s, a, r, s', done) con muestreo priorizado.
+    """
+    
+    def __init__(
+        self,
+        capacity: int = BUFFER_SIZE,
+        state_dim: int = STATE_DIM,
+        action_dim: int = ACTION_DIM,
+        alpha: float = PRIORITY_ALPHA,
+        beta: float = PRIORITY_BETA,
+        eps: float = PRIORITY_EPS
+    ) -> None:
+        """
+        Inicializa el buffer con arreglos preasignados.
+        
+        Parámetros:
+        -----------
+        capacity : int
+            Transiciones máximas; las más antiguas se sobrescriben.
+        state_dim : int
+            Dimensión del estado.
+        action_dim : int
+            Dimensión de la acción.
+        alpha : float
+            Grado de priorización (0 = muestreo uniforme).
+        beta : float
+            Exponente de la corrección por muestreo importante.
+        eps : float
+            Constante sumada al error TD para evitar prioridad cero.
+        """
+        self.capacity: int = capacity
+        self.alpha: float = alpha
+        self.beta: float = beta
+        self.eps: float = eps
+        self.states: np.ndarray = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions: np.ndarray = np.zeros((capacity, action_dim), dtype=np.float32)
+        self.rewards: np.ndarray = np.zeros(capacity, dtype=np.float32)
+        self.next_states: np.ndarray = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.dones: np.ndarray = np.zeros(capacity, dtype=np.bool_)
+        self.tree: SumTree = SumTree(capacity)
+        self.position: int = 0
+        self.size: int = 0
+        # Las transiciones nuevas reciben la mayor prioridad vista para muestrearse al menos una vez
+        self.max_priority: float = 1.0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.states.nbytes + self.actions.nbytes + self.rewards.nbytes
+            + self.next_states.nbytes + self.dones.nbytes + self.tree.nodes.nbytes
+        )
+    
+    def add(self, state: np.ndarray, action: np.ndarray, reward: float, next_state: np.ndarray, done: bool) -> int:
+        """
+        Agrega una transición con la prioridad máxima actual.
+        
+        Retorna:
+        --------
+        int
+            Posición donde se guardó la transición.
+        """
+        index: int = self.position
+        self.states[index] = state
+        self.actions[index] = action
+        self.rewards[index] = reward
+        self.next_states[index] = next_state
+        self.dones[index] = done
+        self.tree.update(np.array([index]), np.array([self.max_priority]))
+        
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return index
+    
+    def sample(
+        self, batch_size: int, rng: np.random.Generator, beta: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Muestrea un lote proporcional a las prioridades (estratificado por segmentos de la suma total).
+        
+        Parámetros:
+        -----------
+        batch_size : int
+            Transiciones del lote.
+        rng : np.random.Generator
+            Generador de números aleatorios.
+        beta : Optional[float]
+            Exponente de la corrección por muestreo importante (por defecto el del buffer).
+        
+        Retorna:
+        --------
+        Dict[str, np.ndarray]
+            'states', 'actions', 'rewards', 'next_states', 'dones', 'indices' y 'weights'
+            (pesos de muestreo importante normalizados por su máximo).
+        """
+        if self.size == 0:
+            raise ValueError("No hay transiciones para muestrear")
+        beta = self.beta if beta is None else beta
+        total: float = self.tree.total
+        segment: float = total / batch_size
+        values: np.ndarray = (np.arange(batch_size) + rng.random(batch_size)) * segment
+        indices: np.ndarray = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+        
+        probabilities: np.ndarray = self.tree.get(indices) / total
+        weights: np.ndarray = np.power(self.size * probabilities, -beta)
+        weights /= weights.max()
+        return {
+            "states": self.states[indices],
+            "actions": self.actions[indices],
+            "rewards": self.rewards[indices],
+            "next_states": self.next_states[indices],
+            "dones": self.dones[indices],
+            "indices": indices,
+            "weights": weights.astype(np.float32),
+        }
+    
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray) -> None:
+        """
+        Actualiza las prioridades de transiciones muestreadas a partir de su error TD.
+        
+        Parámetros:
+        -----------
+        indices : np.ndarray
+            Posiciones devueltas por `sample`.
+        td_errors : np.ndarray
+            Errores TD de cada transición.
+        """
+        priorities: np.ndarray = np.power(np.abs(np.asarray(td_errors, dtype=np.float64)) + self.eps, self.alpha)
+        self.tree.update(indices, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+    
+    def save(self, path: str) -> None:
+        """
+        Guarda el buffer en un archivo empaquetado (escritura atómica).
+        """
+        tensors: Dict[str, torch.Tensor] = {
+            "states": torch.from_numpy(self.states[:self.size]),
+            "actions": torch.from_numpy(self.actions[:self.size]),
+            "rewards": torch.from_numpy(self.rewards[:self.size]),
+            "next_states": torch.from_numpy(self.next_states[:self.size]),
+            "dones": torch.from_numpy(self.dones[:self.size]),
+            "priorities": torch.from_numpy(self.tree.get(np.arange(self.size))),
+        }
+        write_packed(path, tensors, {
+            "capacity": str(self.capacity),
+            "position": str(self.position),
+            "max_priority": repr(self.max_priority),
+        })
+    
+    def load(self, path: str) -> None:
+        """
+        Restaura un buffer guardado con `save` sobre los arreglos preasignados.
+        """
+        tensors, metadata = read_packed(path)
+        size: int = tensors["rewards"].shape[0]
+        if size > self.capacity:
+            raise ValueError(f"El buffer guardado tiene {size} transiciones y la capacidad es {self.capacity}")
+        for name in ("states", "actions", "rewards", "next_states", "dones"):
+            getattr(self, name)[:size] = tensors[name].numpy()
+        self.tree.update(np.arange(size), tensors["priorities"].numpy())
+        self.size = size
+        self.position = int(metadata["position"]) % self.capacity
+        self.max_priority = float(metadata["max_priority"])
+
+class ReplayBufferPool:
+    """
+    Buffers de repetición por usuario con presupuesto de memoria y volcado a disco.
+    
+    Cuando la memoria de los buffers cargados supera `max_bytes`, los menos usados
+    recientemente se guardan en `directory` y se liberan.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, capacity: int = BUFFER_SIZE) -> None:
+        """
+        Inicializa el conjunto de buffers.
+        
+        Parámetros:
+        -----------
+        directory : str
+            Directorio donde se vuelcan los buffers desalojados de memoria (se crea al primer volcado).
+        max_bytes : int
+            Presupuesto de memoria de los buffers cargados.
+        capacity : int
+            Transiciones por usuario.
+        """
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.capacity: int = capacity
+        self._buffers: "OrderedDict[str, PrioritizedReplayBuffer]" = OrderedDict()
+        self._lock: threading.RLock = threading.RLock()
+        
+        # Contadores observables
+        self.spills: int = 0
+        self.restores: int = 0
+    
+    def path(self, user_id: str) -> str:
+        """
+        Obtiene la ruta del buffer volcado de un usuario.
+        """
+        return os.path.join(self.directory, f"{REPLAY_BUFFER_PREFIX}{user_id}{PACKED_MODEL_EXTENSION}")
+    
+    def get(self, user_id: str) -> PrioritizedReplayBuffer:
+        """
+        Obtiene el buffer de un usuario, restaurándolo de disco o creándolo si no existe.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        
+        Retorna:
+        --------
+        PrioritizedReplayBuffer
+            Buffer del usuario (marcado como el más usado recientemente).
+        """
+        with self._lock:
+            buffer: Optional[PrioritizedReplayBuffer] = self._buffers.get(user_id)
+            if buffer is not None:
+                self._buffers.move_to_end(user_id)
+                return buffer
+            
+            buffer = PrioritizedReplayBuffer(self.capacity)
+            path: str = self.path(user_id)
+            if os.path.exists(path):
+                try:
+                    buffer.load(path)
+                    self.restores += 1
+                except Exception as e:
+                    logger.error(f"{REPLAY_BUFFER_RESTORE_ERROR_MSG} {user_id}: {e}")
+            self._buffers[user_id] = buffer
+            self._spill_over_budget(keep=user_id)
+            return buffer
+    
+    def add(
+        self, user_id: str, state: np.ndarray, action: np.ndarray, reward: float, next_state: np.ndarray, done: bool
+    ) -> int:
+        """
+        Agrega una transición al buffer de un usuario.
+        
+        Retorna:
+        --------
+        int
+            Transiciones guardadas para el usuario.
+        """
+        with self._lock:
+            buffer: PrioritizedReplayBuffer = self.get(user_id)
+            buffer.add(state, action, reward, next_state, done)
+            return len(buffer)
+    
+    def spill(self, user_id: str) -> bool:
+        """
+        Guarda en disco el buffer de un usuario y lo libera de memoria.
+        
+        Retorna:
+        --------
+        bool
+            True si el buffer estaba cargado.
+        """
+        with self._lock:
+            buffer: Optional[PrioritizedReplayBuffer] = self._buffers.pop(user_id, None)
+            if buffer is None:
+                return False
+            os.makedirs(self.directory, exist_ok=True)
+            buffer.save(self.path(user_id))
+            self.spills += 1
+            logger.debug(f"{REPLAY_BUFFER_SPILLED_MSG} {user_id}")
+            return True
+    
+    def flush(self) -> None:
+        """
+        Guarda en disco todos los buffers cargados (por ejemplo, al cerrar el servicio).
+        """
+        with self._lock:
+            if self._buffers:
+                os.makedirs(self.directory, exist_ok=True)
+            for user_id, buffer in self._buffers.items():
+                buffer.save(self.path(user_id))
+    
+    def _spill_over_budget(self, keep: str) -> None:
+        """
+        Vuelca los buffers menos usados recientemente hasta respetar el presupuesto.
+        Debe llamarse con el lock tomado.
+        """
+        while sum(buffer.nbytes for buffer in self._buffers.values()) > self.max_bytes:
+            oldest_user: str = next(iter(self._buffers))
+            if oldest_user == keep:
+                break
+            self.spill(oldest_user)
+    
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._buffers or os.path.exists(self.path(user_id))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el uso de memoria y los contadores de volcado.
+        
+        Retorna:
+        --------
+        Dict[str, Any]
+            Buffers cargados, transiciones y bytes en memoria, presupuesto y contadores.
+        """
+        with self._lock:
+            return {
+                "loaded_users": len(self._buffers),
+                "loaded_transitions": sum(len(buffer) for buffer in self._buffers.values()),
+                "bytes_used": sum(buffer.nbytes for buffer in self._buffers.values()),
+                "max_bytes": self.max_bytes,
+                "capacity_per_user": self.capacity,
+                "spills": self.spills,
+                "restores": self.restores
+            }
@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field, validator
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, validator, model_validator
+
+from constants.constants import CGM_USER_ID_PATTERN
 
 class UserProfile(BaseModel):
     """
@@ -38,7 +40,7 @@ class CGMReading(BaseModel):
     """
     Lectura del monitor continuo de glucosa.
     """
-    user_id: str = Field(..., description="Identificador del usuario")
+    user_id: str = Field(..., pattern=CGM_USER_ID_PATTERN, description="Identificador del usuario")
     cgm_value: float = Field(..., description="Valor de glucosa en mg/dL")
     timestamp: datetime = Field(default_factory=datetime.now)
     trend: Optional[str] = Field(None, description="Tendencia: 'rising', 'falling', 'stable'")
@@ -49,6 +51,102 @@ class CGMReading(BaseModel):
             raise ValueError('Valor de CGM debe estar entre 40.0 y 400.0 mg/dL')
         return v
 
+class CGMBulkReadings(BaseModel):
+    """
+    Bloque de lecturas de CGM de un usuario en formato columnar (por ejemplo, una carga retroactiva).
+    """
+    user_id: str = Field(..., pattern=CGM_USER_ID_PATTERN, description="Identificador del usuario")
+    timestamp: List[datetime] = Field(..., min_length=1, max_length=50000, description="Momento de cada lectura")
+    cgm_value: List[float] = Field(..., min_length=1, max_length=50000, description="Valores de glucosa en mg/dL")
+
+    @model_validator(mode='after')
+    def validate_columns(self) -> 'CGMBulkReadings':
+        if len(self.timestamp) != len(self.cgm_value):
+            raise ValueError(f'La columna cgm_value debe tener {len(self.timestamp)} elementos')
+        invalid: List[int] = [index for index, value in enumerate(self.cgm_value) if not 40.0 <= value <= 400.0]
+        if invalid:
+            raise ValueError(f'Valores de CGM fuera de 40.0-400.0 mg/dL en las posiciones {invalid[:10]}')
+        return self
+
+class CGMBulkResponse(BaseModel):
+    """
+    Resultado de la carga de un bloque de lecturas de CGM.
+    """
+    user_id: str = Field(..., description="Identificador del usuario")
+    num_received: int = Field(..., description="Lecturas recibidas")
+    num_stored: int = Field(..., description="Lecturas del bloque que quedaron en el historial")
+    history_size: int = Field(..., description="Lecturas en el historial del usuario")
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+class CGMHistoryResponse(BaseModel):
+    """
+    Ventana del historial de CGM de un usuario.
+    """
+    user_id: str = Field(..., description="Identificador del usuario")
+    timestamp: List[datetime] = Field(default_factory=list, description="Momento de cada lectura, en orden")
+    cgm_value: List[float] = Field(default_factory=list, description="Valores de glucosa en mg/dL")
+
+class CGMRollupResponse(BaseModel):
+    """
+    Serie de CGM de un usuario a la resolución pedida: un punto por intervalo del nivel elegido.
+    """
+    user_id: str = Field(..., description="Identificador del usuario")
+    bucket_seconds: int = Field(..., description="Duración de los intervalos (0: lecturas sin agregar)")
+    timestamp: List[datetime] = Field(default_factory=list, description="Inicio de cada intervalo")
+    mean: List[float] = Field(default_factory=list, description="Glucosa media del intervalo en mg/dL")
+    min: List[float] = Field(default_factory=list, description="Glucosa mínima del intervalo en mg/dL")
+    max: List[float] = Field(default_factory=list, description="Glucosa máxima del intervalo en mg/dL")
+    count: List[int] = Field(default_factory=list, description="Lecturas del intervalo")
+
+class CGMWindowMetrics(BaseModel):
+    """
+    Métricas glucémicas de una ventana; las de glucosa son None si la ventana no tiene lecturas.
+    """
+    hours: int = Field(..., description="Duración de la ventana en horas")
+    start: datetime = Field(..., description="Inicio de la ventana")
+    readings: int = Field(..., description="Lecturas de la ventana")
+    mean: Optional[float] = Field(None, description="Glucosa media en mg/dL")
+    sd: Optional[float] = Field(None, description="Desvío estándar de la glucosa en mg/dL")
+    cv: Optional[float] = Field(None, description="Coeficiente de variación (%)")
+    variability: Optional[str] = Field(None, description="Variabilidad según los umbrales de CV")
+    time_in_range: Optional[float] = Field(None, description="Tiempo entre 70 y 180 mg/dL (%)")
+    time_below_range: Optional[float] = Field(None, description="Tiempo por debajo de 70 mg/dL (%)")
+    time_very_low: Optional[float] = Field(None, description="Tiempo por debajo de 54 mg/dL (%)")
+    time_above_range: Optional[float] = Field(None, description="Tiempo por encima de 180 mg/dL (%)")
+    time_very_high: Optional[float] = Field(None, description="Tiempo por encima de 250 mg/dL (%)")
+    time_in_ideal_range: Optional[float] = Field(None, description="Tiempo entre 100 y 140 mg/dL (%)")
+    hypo_events: int = Field(..., description="Episodios de hipoglucemia severa iniciados en la ventana")
+    hyper_events: int = Field(..., description="Episodios de hiperglucemia severa iniciados en la ventana")
+
+class CGMMetricsResponse(BaseModel):
+    """
+    Métricas glucémicas de un usuario por ventana deslizante, ancladas a su lectura más reciente.
+    """
+    user_id: str = Field(..., description="Identificador del usuario")
+    last_reading: datetime = Field(..., description="Momento de la lectura más reciente")
+    windows: List[CGMWindowMetrics] = Field(default_factory=list, description="Métricas de cada ventana")
+
+class CGMStreamRejection(BaseModel):
+    """
+    Lectura del flujo de CGM descartada por no pasar la validación.
+    """
+    seq: Optional[int] = Field(None, description="Número de secuencia de la lectura (None si no se pudo leer)")
+    error: str = Field(..., description="Motivo del descarte")
+
+class CGMStreamAck(BaseModel):
+    """
+    Confirmación de un lote del flujo de lecturas de CGM.
+    
+    `ack` es el mayor número de secuencia procesado: todas las lecturas hasta él quedaron
+    guardadas, repetidas o descartadas (estas últimas se informan en `rejected`).
+    """
+    ack: Optional[int] = Field(None, description="Mayor número de secuencia procesado")
+    num_received: int = Field(..., description="Lecturas recibidas")
+    num_accepted: int = Field(..., description="Lecturas agregadas a los historiales")
+    num_duplicates: int = Field(..., description="Lecturas con número de secuencia ya procesado")
+    num_rejected: int = Field(..., description="Lecturas descartadas por validación")
+    rejected: List[CGMStreamRejection] = Field(default_factory=list, description="Detalle de los descartes")
+
 class BolusRequest(BaseModel):
     """
     Solicitud de predicción de bolo de insulina.
@@ -98,6 +196,32 @@ class BolusRequest(BaseModel):
             raise ValueError('Intensidad del estrés debe estar entre 0 y 10')
         return v
 
+class FeedbackRequest(BaseModel):
+    """
+    Transición observada tras aplicar una dosis, para el entrenamiento en línea.
+    
+    Los estados siguen el formato del actor: [cgm, tasa de carbohidratos, minutos desde medianoche, iob].
+    """
+    user_id: str = Field(..., description="Identificador del usuario")
+    state: List[float] = Field(..., description="Estado antes de la acción")
+    action: List[float] = Field(..., description="Ganancias aplicadas (g_ICR, g_ISF, g_IOB)")
+    reward: float = Field(..., description="Recompensa obtenida")
+    next_state: List[float] = Field(..., description="Estado observado después de la acción")
+    done: bool = Field(False, description="Si el episodio terminó")
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+    @validator('state', 'next_state')
+    def validate_state(cls, v: List[float]) -> List[float]:
+        if len(v) != 4:
+            raise ValueError('El estado debe tener 4 componentes: cgm, tasa de carbohidratos, minutos e iob')
+        return v
+
+    @validator('action')
+    def validate_action(cls, v: List[float]) -> List[float]:
+        if len(v) != 3:
+            raise ValueError('La acción debe tener 3 ganancias: g_ICR, g_ISF y g_IOB')
+        return v
+
 class BolusResponse(BaseModel):
     """
     Respuesta con la predicción de bolo de insulina.
@@ -111,6 +235,56 @@ class BolusResponse(BaseModel):
     ml_model_version: str = Field(..., description="Versión del modelo utilizado")
     timestamp: datetime = Field(default_factory=datetime.now)
     
+class BolusBatchColumns(BaseModel):
+    """
+    Solicitudes de predicción de bolo en formato columnar (arrays paralelos).
+    """
+    user_id: List[str] = Field(..., description="Identificadores de usuario por fila")
+    cgm_value: List[float] = Field(..., description="Valores de glucosa en mg/dL por fila")
+    carb_intake_grams: Optional[List[float]] = Field(None, description="Gramos de carbohidratos por fila (0.0 si se omite)")
+    iob: Optional[List[float]] = Field(None, description="Insulina activa en unidades por fila (0.0 si se omite)")
+    timestamp: Optional[List[datetime]] = Field(None, description="Momento de cada solicitud (ahora si se omite)")
+
+    @model_validator(mode='after')
+    def validate_lengths(self) -> 'BolusBatchColumns':
+        num_rows: int = len(self.user_id)
+        for name in ('cgm_value', 'carb_intake_grams', 'iob', 'timestamp'):
+            column: Optional[list] = getattr(self, name)
+            if column is not None and len(column) != num_rows:
+                raise ValueError(f'La columna {name} debe tener {num_rows} elementos')
+        return self
+
+class BolusBatchRequest(BaseModel):
+    """
+    Solicitud de predicción de bolo por lotes: lista de solicitudes o formato columnar.
+    """
+    # Las filas se validan una por una al predecir, para que una fila inválida no rechace el lote
+    requests: Optional[List[Dict[str, Any]]] = Field(None, description="Lista de solicitudes individuales (BolusRequest)")
+    columns: Optional[BolusBatchColumns] = Field(None, description="Solicitudes en formato columnar")
+
+    @model_validator(mode='after')
+    def validate_single_format(self) -> 'BolusBatchRequest':
+        if (self.requests is None) == (self.columns is None):
+            raise ValueError('Debe indicarse exactamente uno de requests o columns')
+        return self
+
+class BolusBatchItem(BaseModel):
+    """
+    Resultado de una fila de una predicción por lotes.
+    """
+    index: int = Field(..., description="Posición de la fila en la solicitud")
+    result: Optional[BolusResponse] = Field(None, description="Predicción de la fila si fue exitosa")
+    error: Optional[str] = Field(None, description="Error de la fila si falló")
+
+class BolusBatchResponse(BaseModel):
+    """
+    Respuesta de una predicción de bolo por lotes.
+    """
+    results: List[BolusBatchItem] = Field(default_factory=list, description="Resultados por fila, en el orden de la solicitud")
+    num_succeeded: int = Field(0, description="Cantidad de filas predichas")
+    num_failed: int = Field(0, description="Cantidad de filas con error")
+    timestamp: datetime = Field(default_factory=datetime.now)
+
 class ErrorResponse(BaseModel):
     """
     Respuesta de error estándar.
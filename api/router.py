@@ -1,18 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import numpy as np
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any, AsyncGenerator
+from typing import Callable, Dict, Any, AsyncGenerator, List, Optional, Tuple, Union
 import logging
 
 from response_models import (
     UserProfile, 
     BolusRequest, 
     BolusResponse, 
+    BolusBatchRequest,
+    BolusBatchItem,
+    BolusBatchResponse,
     ErrorResponse,
-    CGMReading
+    CGMReading,
+    CGMBulkReadings,
+    CGMBulkResponse,
+    CGMHistoryResponse,
+    CGMStreamAck,
+    CGMRollupResponse,
+    CGMMetricsResponse,
+    CGMWindowMetrics,
+    FeedbackRequest
 )
 from model_manager import ModelManager
+from cgm_stream import CGMStreamSession, NDJSONLineSplitter
+from cgm_rollups import RollupSeries
+from cgm_metrics import WindowMetrics
+from training_worker import TrainingWorker
+from inference_executor import InferenceQueueFullError
 from constants.constants import (
     API_TITLE, 
     API_DESCRIPTION, 
@@ -27,8 +46,18 @@ from constants.constants import (
     USER_ID_MISMATCH_MSG,
     UPDATE_SUCCESS_MSG,
     CGM_RECORD_MSG,
+    CGM_BULK_RECORD_MSG,
+    CGM_STREAM_OPENED_MSG,
+    CGM_STREAM_CLOSED_MSG,
+    CGM_STREAM_MAX_BATCH_READINGS,
+    CGM_STREAM_MAX_PENDING_MESSAGES,
+    CGM_STREAM_MAX_LINE_BYTES,
+    FEEDBACK_RECORDED_MSG,
+    TRAINING_WORKER_ENABLED,
     INTERNAL_ERROR_CODE, 
-    INTERNAL_ERROR_MSG
+    INTERNAL_ERROR_MSG,
+    MODEL_CLEANUP_INTERVAL_SECONDS,
+    CGM_COMPACTION_INTERVAL_SECONDS
 )
 
 # Configurar logging
@@ -38,6 +67,34 @@ logger = logging.getLogger(__name__)
 # Variable global para el administrador de modelos
 model_manager: ModelManager
 
+async def _periodic_model_cleanup() -> None:
+    """
+    Libera periódicamente los modelos de usuarios inactivos y vuelve a indexar el directorio de modelos.
+    """
+    while True:
+        await asyncio.sleep(MODEL_CLEANUP_INTERVAL_SECONDS)
+        # Un fallo no debe detener la tarea: la caché dejaría de liberar modelos
+        try:
+            await asyncio.to_thread(model_manager.cleanup_unused_models)
+        except Exception as e:
+            logger.error(f"Error en la limpieza de modelos: {e}")
+        try:
+            # El recorrido del directorio no debe ocupar el pool de inferencia
+            await asyncio.to_thread(model_manager.refresh_model_manifest)
+        except Exception as e:
+            logger.error(f"Error al actualizar el índice de modelos: {e}")
+
+async def _periodic_cgm_compaction() -> None:
+    """
+    Actualiza periódicamente los agregados de CGM y aplica la retención de lecturas crudas.
+    """
+    while True:
+        await asyncio.sleep(CGM_COMPACTION_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(model_manager.cgm_rollups.compact_all)
+        except Exception as e:
+            logger.error(f"Error en la compactación de CGM: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
@@ -56,12 +113,32 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Eventos de inicio
     global model_manager
     model_manager = ModelManager()
+    model_manager.start()
+    if TRAINING_WORKER_ENABLED:
+        # El entrenamiento corre en otro proceso; las versiones nuevas se intercambian al publicarse
+        model_manager.training_worker = TrainingWorker(
+            model_manager.models_directory, model_manager.apply_published_models
+        )
+        model_manager.training_worker.start()
+    cleanup_task: asyncio.Task = asyncio.create_task(_periodic_model_cleanup())
+    compaction_task: Optional[asyncio.Task] = (
+        asyncio.create_task(_periodic_cgm_compaction()) if model_manager.cgm_rollups is not None else None
+    )
+    # La precarga corre en segundo plano; /ready informa cuándo terminó
+    warmup_task: asyncio.Task = asyncio.create_task(asyncio.to_thread(model_manager.warm_up))
     logger.info(STARTUP_MESSAGE)
     
     yield
     
     # Eventos de cierre
+    cleanup_task.cancel()
+    warmup_task.cancel()
+    if compaction_task is not None:
+        compaction_task.cancel()
     model_manager.cleanup_unused_models()
+    if model_manager.training_worker is not None:
+        await asyncio.to_thread(model_manager.training_worker.stop)
+    model_manager.shutdown()
     logger.info(SHUTDOWN_MESSAGE)
 
 # Inicializar FastAPI con lifespan
@@ -112,9 +189,45 @@ async def health_check() -> Dict[str, Any]:
         "status": SUCCESS_STATUS,
         "timestamp": datetime.now().isoformat(),
         "models_loaded": len(model_manager.loaded_models),
-        "users_registered": len(model_manager.user_profiles)
+        "users_registered": len(model_manager.user_profiles),
+        "model_cache": model_manager.loaded_models.get_stats(),
+        "model_manifest": model_manager.model_store.manifest.get_stats(),
+        "gain_tables": model_manager.get_gain_table_stats(),
+        "prediction_cache": model_manager.prediction_cache.get_stats(),
+        "stacked_actors": (
+            model_manager.stacked_actors.get_stats() if model_manager.stacked_actors is not None else None
+        ),
+        "replay_buffers": model_manager.replay_buffers.get_stats(),
+        "cgm_history": model_manager.cgm_series.get_stats(),
+        "cgm_rollups": model_manager.cgm_rollups.get_stats() if model_manager.cgm_rollups is not None else None,
+        "cgm_metrics": model_manager.cgm_metrics.get_stats(),
+        "training_worker": (
+            model_manager.training_worker.get_stats() if model_manager.training_worker is not None else None
+        ),
+        "micro_batching": model_manager.bolus_batcher.get_stats(),
+        "inference_executor": model_manager.executor.get_stats()
     }
 
+@app.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """
+    Endpoint de disponibilidad: indica si terminó la precarga de modelos.
+
+    Retorna:
+    --------
+    JSONResponse
+        Estado de disponibilidad (503 mientras la precarga está en curso).
+    """
+    ready: bool = model_manager.ready.is_set()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "timestamp": datetime.now().isoformat(),
+            "warmup": model_manager.warmup_stats
+        }
+    )
+
 @app.post("/users/register", response_model=Dict[str, str])
 async def register_user(user_profile: UserProfile) -> Dict[str, str]:
     """
@@ -131,7 +244,7 @@ async def register_user(user_profile: UserProfile) -> Dict[str, str]:
         Mensaje de confirmación del registro.
     """
     try:
-        success: bool = model_manager.register_user(user_profile)
+        success: bool = await model_manager.executor.run(model_manager.register_user, user_profile)
         if success:
             return {
                 "message": f"Usuario {user_profile.user_id} {REGISTER_SUCCESS_MSG}",
@@ -140,6 +253,8 @@ async def register_user(user_profile: UserProfile) -> Dict[str, str]:
             }
         else:
             raise HTTPException(status_code=400, detail=REGISTER_ERROR_MSG)
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error en registro de usuario: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -186,6 +301,7 @@ async def update_user_profile(user_id: str, user_profile: UserProfile) -> Dict[s
     
     user_profile.updated_at = datetime.now()
     model_manager.user_profiles[user_id] = user_profile
+    model_manager.prediction_cache.invalidate_user(user_id)
     
     return {
         "message": f"Perfil de usuario {user_id} {UPDATE_SUCCESS_MSG}",
@@ -213,7 +329,7 @@ async def predict_bolus_dose(request: BolusRequest) -> BolusResponse:
             raise HTTPException(status_code=404, detail=USER_NOT_FOUND_MSG)
         
         # Realizar predicción con intervalo de confianza
-        bolus, conf_lower, conf_upper, alerts = model_manager.predict_bolus_with_confidence(request)
+        bolus, conf_lower, conf_upper, alerts = await model_manager.predict_bolus_with_confidence_async(request)
         
         return BolusResponse(
             user_id=request.user_id,
@@ -221,20 +337,121 @@ async def predict_bolus_dose(request: BolusRequest) -> BolusResponse:
             confidence_lower=conf_lower,
             confidence_upper=conf_upper,
             safety_alerts=alerts,
-            model_version=API_VERSION,
+            ml_model_version=model_manager.get_model_version(request.user_id),
             timestamp=datetime.now()
         )
         
     except HTTPException:
         raise
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error en predicción de bolo: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
+@app.post("/predict/bolus/batch", response_model=BolusBatchResponse)
+async def predict_bolus_dose_batch(batch: BolusBatchRequest) -> BolusBatchResponse:
+    """
+    Predice dosis de bolo para un lote de solicitudes (lista o formato columnar).
+    
+    Las filas se agrupan por modelo de actor y se evalúan con una pasada del modelo por grupo.
+    Una fila inválida o fallida no invalida el resto del lote.
+    
+    Parámetros:
+    -----------
+    batch : BolusBatchRequest
+        Lote de solicitudes como lista de BolusRequest o como arrays paralelos; cada fila se valida por separado.
+        
+    Retorna:
+    --------
+    BolusBatchResponse
+        Resultado o error por fila, en el orden de la solicitud.
+    """
+    try:
+        rows: List[Union[BolusRequest, str]] = (
+            await model_manager.executor.run(model_manager.requests_from_rows, batch.requests)
+            if batch.requests is not None
+            else await model_manager.executor.run(model_manager.requests_from_columns, batch.columns)
+        )
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    items: List[BolusBatchItem] = [None] * len(rows)
+    valid_indices: List[int] = []
+    for index, row in enumerate(rows):
+        if isinstance(row, str):
+            items[index] = BolusBatchItem(index=index, error=row)
+        elif row.user_id not in model_manager.user_profiles:
+            items[index] = BolusBatchItem(index=index, error=USER_NOT_FOUND_MSG)
+        else:
+            valid_indices.append(index)
+    
+    try:
+        predictions: List[Union[Tuple[float, float, float, List[str]], Exception]] = await model_manager.executor.run(
+            model_manager.predict_bolus_with_confidence_batch, [rows[index] for index in valid_indices]
+        )
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error en predicción de bolo por lotes: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+    
+    timestamp: datetime = datetime.now()
+    for index, prediction in zip(valid_indices, predictions):
+        if isinstance(prediction, Exception):
+            items[index] = BolusBatchItem(index=index, error=str(prediction))
+            continue
+        
+        bolus, conf_lower, conf_upper, alerts = prediction
+        items[index] = BolusBatchItem(
+            index=index,
+            result=BolusResponse(
+                user_id=rows[index].user_id,
+                recommended_bolus=bolus,
+                confidence_lower=conf_lower,
+                confidence_upper=conf_upper,
+                safety_alerts=alerts,
+                ml_model_version=model_manager.get_model_version(rows[index].user_id),
+                timestamp=timestamp
+            )
+        )
+    
+    num_failed: int = sum(1 for item in items if item.error is not None)
+    return BolusBatchResponse(
+        results=items,
+        num_succeeded=len(items) - num_failed,
+        num_failed=num_failed,
+        timestamp=timestamp
+    )
+
+async def _run_cgm_io(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Ejecuta una operación del historial de CGM (memoria y disco) en el ejecutor acotado.
+    
+    Así la E/S de CGM comparte la contrapresión de la inferencia: si la cola está llena se
+    responde 503 en lugar de acumular hilos.
+    
+    Parámetros:
+    -----------
+    fn : Callable[..., Any]
+        Operación a ejecutar.
+    *args : Any
+        Argumentos de la operación.
+        
+    Retorna:
+    --------
+    Any
+        Resultado de la operación.
+    """
+    try:
+        return await model_manager.executor.run(fn, *args)
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 @app.post("/cgm/reading", response_model=Dict[str, str])
 async def record_cgm_reading(reading: CGMReading) -> Dict[str, str]:
     """
-    Registra una lectura de CGM para futuro historial del usuario.
+    Registra una lectura de CGM en el historial del usuario.
     
     Parámetros:
     -----------
@@ -246,8 +463,10 @@ async def record_cgm_reading(reading: CGMReading) -> Dict[str, str]:
     Dict[str, str]
         Mensaje de confirmación del registro.
     """
-    # En una implementación completa, esto se guardaría en una base de datos
-    logger.info(f"Lectura CGM registrada para usuario {reading.user_id}: {reading.cgm_value} mg/dL")
+    await _run_cgm_io(
+        model_manager.cgm_series.append, reading.user_id, reading.timestamp.timestamp(), reading.cgm_value
+    )
+    logger.debug(f"Lectura CGM registrada para usuario {reading.user_id}: {reading.cgm_value} mg/dL")
     
     return {
         "message": CGM_RECORD_MSG,
@@ -255,6 +474,297 @@ async def record_cgm_reading(reading: CGMReading) -> Dict[str, str]:
         "timestamp": reading.timestamp.isoformat()
     }
 
+@app.post("/cgm/readings/bulk", response_model=CGMBulkResponse)
+async def record_cgm_readings_bulk(readings: CGMBulkReadings) -> CGMBulkResponse:
+    """
+    Registra un bloque de lecturas de CGM (por ejemplo, una carga retroactiva) en el historial del usuario.
+    
+    Las lecturas pueden llegar en cualquier orden y mezclarse con las ya registradas; ante
+    timestamps repetidos prevalece la lectura del bloque.
+    
+    Parámetros:
+    -----------
+    readings : CGMBulkReadings
+        Timestamps y valores de glucosa en columnas paralelas.
+        
+    Retorna:
+    --------
+    CGMBulkResponse
+        Lecturas recibidas, guardadas y el tamaño del historial.
+    """
+    timestamps: np.ndarray = np.fromiter(
+        (timestamp.timestamp() for timestamp in readings.timestamp), dtype=np.float64, count=len(readings.timestamp)
+    )
+    stored, history_size = await _run_cgm_io(
+        model_manager.cgm_series.extend,
+        readings.user_id, timestamps, np.asarray(readings.cgm_value, dtype=np.float32)
+    )
+    logger.info(f"{CGM_BULK_RECORD_MSG} para usuario {readings.user_id}: {stored}/{len(timestamps)}")
+    
+    return CGMBulkResponse(
+        user_id=readings.user_id,
+        num_received=len(timestamps),
+        num_stored=stored,
+        history_size=history_size
+    )
+
+async def _receive_stream_messages(websocket: WebSocket, queue: "asyncio.Queue[Optional[List[str]]]") -> None:
+    """
+    Lee los mensajes de un WebSocket de ingesta y encola sus líneas; al cerrarse encola None.
+    
+    Con la cola llena se deja de leer el socket: el gateway queda frenado por el control de
+    flujo de TCP hasta que se procesen los lotes pendientes.
+    """
+    while True:
+        message: Dict[str, Any] = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            break
+        text: Optional[str] = message.get("text")
+        if text is None:
+            text = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+        await queue.put(text.splitlines())
+    await queue.put(None)
+
+@app.websocket("/cgm/stream")
+async def stream_cgm_readings(websocket: WebSocket) -> None:
+    """
+    Recibe lecturas de CGM de muchos usuarios intercaladas en una conexión persistente.
+    
+    Cada mensaje contiene una o más líneas NDJSON (ver `cgm_stream`). Los mensajes que llegan
+    mientras se procesa un lote se agrupan, hasta CGM_STREAM_MAX_BATCH_READINGS lecturas, en el
+    lote siguiente; cada lote se responde con un CGMStreamAck. A lo sumo se retienen
+    CGM_STREAM_MAX_PENDING_MESSAGES mensajes sin procesar. Si el ejecutor está saturado la
+    conexión se cierra con el código 1013 (reintentar más tarde).
+    
+    Parámetros:
+    -----------
+    websocket : WebSocket
+        Conexión con el gateway.
+    """
+    await websocket.accept()
+    session: CGMStreamSession = CGMStreamSession(model_manager.cgm_series)
+    queue: "asyncio.Queue[Optional[List[str]]]" = asyncio.Queue(maxsize=CGM_STREAM_MAX_PENDING_MESSAGES)
+    receiver: asyncio.Task = asyncio.create_task(_receive_stream_messages(websocket, queue))
+    logger.info(CGM_STREAM_OPENED_MSG)
+    
+    try:
+        closed: bool = False
+        while not closed:
+            lines: Optional[List[str]] = await queue.get()
+            if lines is None:
+                break
+            # Agrupar lo que se acumuló mientras se procesaba el lote anterior
+            while len(lines) < CGM_STREAM_MAX_BATCH_READINGS and not queue.empty():
+                pending: Optional[List[str]] = queue.get_nowait()
+                if pending is None:
+                    closed = True
+                    break
+                lines.extend(pending)
+            try:
+                ack: CGMStreamAck = await model_manager.executor.run(session.ingest, lines)
+            except InferenceQueueFullError as e:
+                # Servicio saturado: se cierra la conexión y el gateway reenvía desde el último ack
+                logger.warning(f"{CGM_STREAM_CLOSED_MSG}: {e}")
+                await websocket.close(code=1013, reason=str(e))
+                break
+            if not closed:
+                await websocket.send_text(ack.model_dump_json())
+    finally:
+        receiver.cancel()
+        logger.info(f"{CGM_STREAM_CLOSED_MSG}: {session.get_stats()}")
+
+@app.post("/cgm/stream", response_model=CGMStreamAck)
+async def ingest_cgm_stream(request: Request) -> CGMStreamAck:
+    """
+    Recibe lecturas de CGM de muchos usuarios como un cuerpo NDJSON enviado por partes.
+    
+    El cuerpo se lee de a fragmentos y se procesa en lotes de CGM_STREAM_MAX_BATCH_READINGS
+    lecturas; el fragmento siguiente no se lee hasta agregar el lote, de modo que el envío del
+    gateway queda limitado por el ritmo de procesamiento.
+    
+    Parámetros:
+    -----------
+    request : Request
+        Solicitud con el cuerpo NDJSON (una lectura por línea).
+        
+    Retorna:
+    --------
+    CGMStreamAck
+        Totales de la solicitud y mayor número de secuencia procesado.
+    """
+    session: CGMStreamSession = CGMStreamSession(model_manager.cgm_series)
+    splitter: NDJSONLineSplitter = NDJSONLineSplitter(CGM_STREAM_MAX_LINE_BYTES)
+    lines: List[bytes] = []
+    try:
+        async for chunk in request.stream():
+            lines.extend(splitter.feed(chunk))
+            if len(lines) >= CGM_STREAM_MAX_BATCH_READINGS:
+                await _run_cgm_io(session.ingest, lines)
+                lines = []
+        lines.extend(splitter.flush())
+    except ValueError as e:
+        # Las lecturas anteriores a la línea excedida se guardan y se informa hasta dónde se procesó
+        if lines:
+            await _run_cgm_io(session.ingest, lines)
+        raise HTTPException(status_code=413, detail={"message": str(e), "ack": session.last_sequence})
+    if lines:
+        await _run_cgm_io(session.ingest, lines)
+    logger.info(f"{CGM_BULK_RECORD_MSG}: {session.get_stats()}")
+    
+    return session.summary()
+
+@app.get("/cgm/{user_id}/history", response_model=CGMHistoryResponse)
+async def get_cgm_history(
+    user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> CGMHistoryResponse:
+    """
+    Obtiene las lecturas de CGM registradas de un usuario dentro de una ventana de tiempo.
+    
+    Parámetros:
+    -----------
+    user_id : str
+        Identificador único del usuario.
+    start : Optional[datetime]
+        Inicio de la ventana (desde la lectura más antigua si se omite).
+    end : Optional[datetime]
+        Fin de la ventana (hasta la lectura más reciente si se omite).
+        
+    Retorna:
+    --------
+    CGMHistoryResponse
+        Lecturas de la ventana en orden cronológico.
+    """
+    timestamps, values = await _run_cgm_io(
+        model_manager.cgm_series.window,
+        user_id,
+        start.timestamp() if start is not None else None,
+        end.timestamp() if end is not None else None
+    )
+    return CGMHistoryResponse(
+        user_id=user_id,
+        timestamp=[datetime.fromtimestamp(timestamp) for timestamp in timestamps.tolist()],
+        cgm_value=values.tolist()
+    )
+
+@app.get("/cgm/{user_id}/rollup", response_model=CGMRollupResponse)
+async def get_cgm_rollup(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[int] = None
+) -> CGMRollupResponse:
+    """
+    Obtiene la serie de CGM de un usuario agregada a la resolución pedida.
+    
+    Se usa el nivel de agregación más grueso cuyo intervalo no supera `resolution`; sin
+    resolución, o si es menor que el nivel más fino, se devuelven las lecturas sin agregar.
+    
+    Parámetros:
+    -----------
+    user_id : str
+        Identificador único del usuario.
+    start : Optional[datetime]
+        Inicio de la ventana (el intervalo que lo contiene se incluye completo).
+    end : Optional[datetime]
+        Fin de la ventana.
+    resolution : Optional[int]
+        Separación máxima aceptable entre puntos, en segundos.
+        
+    Retorna:
+    --------
+    CGMRollupResponse
+        Media, mínimo, máximo y cantidad de lecturas por intervalo, en orden.
+    """
+    if model_manager.cgm_rollups is None:
+        raise HTTPException(status_code=404, detail="Las series de CGM en disco están deshabilitadas")
+    series: RollupSeries = await _run_cgm_io(
+        model_manager.cgm_rollups.query,
+        user_id,
+        start.timestamp() if start is not None else None,
+        end.timestamp() if end is not None else None,
+        resolution
+    )
+    return CGMRollupResponse(
+        user_id=user_id,
+        bucket_seconds=series.bucket_seconds,
+        timestamp=[datetime.fromtimestamp(timestamp) for timestamp in series.timestamps.tolist()],
+        mean=series.mean.tolist(),
+        min=series.minimum.tolist(),
+        max=series.maximum.tolist(),
+        count=series.count.tolist()
+    )
+
+@app.get("/cgm/{user_id}/metrics", response_model=CGMMetricsResponse)
+async def get_cgm_metrics(user_id: str) -> CGMMetricsResponse:
+    """
+    Obtiene las métricas glucémicas del usuario (tiempo en rango, media, CV, episodios) por ventana.
+    
+    Las métricas se mantienen al registrar cada lectura, por lo que la consulta no recorre el
+    historial (salvo la primera vez tras un reinicio, que las reconstruye).
+    
+    Parámetros:
+    -----------
+    user_id : str
+        Identificador único del usuario.
+        
+    Retorna:
+    --------
+    CGMMetricsResponse
+        Métricas de cada ventana configurada (CGM_METRICS_WINDOWS_HOURS).
+    """
+    result: Optional[Tuple[float, List[WindowMetrics]]] = await _run_cgm_io(
+        model_manager.cgm_metrics.get, user_id
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No hay lecturas de CGM para el usuario {user_id}")
+    last_timestamp, windows = result
+    return CGMMetricsResponse(
+        user_id=user_id,
+        last_reading=datetime.fromtimestamp(last_timestamp),
+        windows=[
+            CGMWindowMetrics(**{**window._asdict(), "start": datetime.fromtimestamp(window.start)})
+            for window in windows
+        ]
+    )
+
+@app.post("/feedback", response_model=Dict[str, Any])
+async def record_feedback(feedback: FeedbackRequest) -> Dict[str, Any]:
+    """
+    Registra una transición de retroalimentación en el buffer de repetición del usuario.
+    
+    Parámetros:
+    -----------
+    feedback : FeedbackRequest
+        Estado, acción, recompensa y estado siguiente observados.
+        
+    Retorna:
+    --------
+    Dict[str, Any]
+        Confirmación con la cantidad de transiciones guardadas para el usuario.
+    """
+    if feedback.user_id not in model_manager.user_profiles:
+        raise HTTPException(status_code=404, detail=USER_NOT_FOUND_MSG)
+    
+    try:
+        buffered: int = await model_manager.executor.run(
+            model_manager.update_user_model_with_feedback,
+            feedback.user_id,
+            np.asarray(feedback.state, dtype=np.float32),
+            np.asarray(feedback.action, dtype=np.float32),
+            feedback.reward,
+            np.asarray(feedback.next_state, dtype=np.float32),
+            feedback.done
+        )
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "message": FEEDBACK_RECORDED_MSG,
+        "user_id": feedback.user_id,
+        "buffered_transitions": buffered,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/models/status/{user_id}")
 async def get_model_status(user_id: str) -> Dict[str, Any]:
     """
@@ -274,13 +784,15 @@ async def get_model_status(user_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=404, detail=USER_NOT_FOUND_MSG)
     
     user_profile: UserProfile = model_manager.user_profiles[user_id]
-    has_personalized: bool = user_id in model_manager.loaded_models
+    has_personalized: bool = model_manager.has_personalized_models(user_id)
     
     return {
         "user_id": user_id,
-        "model_type": user_profile.model_type,
+        "model_type": user_profile.ml_model_type,
         "has_personalized_model": has_personalized,
-        "model_loaded": has_personalized or model_manager.population_model is not None,
+        "shares_population_weights": not has_personalized,
+        "model_version": model_manager.get_model_version(user_id),
+        "model_loaded": has_personalized or model_manager.population_actor is not None,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -0,0 +1,211 @@
+import heapq
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from models.models import Actor
+
+# Ranuras intermedias que se evalúan de más antes de partir un rango en dos llamadas
+STACKED_MAX_SLOT_GAP: int = 2
+
+class StackedActorPool:
+    """
+    Pesos de muchos actores con la misma arquitectura apilados por ranura, para evaluar lotes mixtos.
+    
+    Cada capa lineal guarda sus pesos transpuestos con forma [ranuras, entrada, salida]. Un lote
+    con filas de varios usuarios se agrupa por actor (rellenando hasta la cantidad máxima de filas)
+    y se evalúa con un `baddbmm` por capa sobre vistas del rango de ranuras que ocupan, sin copiar
+    los pesos: en CPU copiar los pesos del grupo cuesta tanto como el producto. Las ranuras libres
+    se reutilizan de menor a mayor para mantener compactos los actores activos, y los huecos
+    cortos entre ranuras se evalúan junto con el rango en lugar de partirlo.
+    
+    Agregar o desalojar un actor solo copia los pesos de su ranura. Las ranuras se asocian al
+    objeto del actor: un actor reemplazado ocupa una ranura nueva y la anterior se libera cuando
+    el actor deja de existir o por antigüedad. Las ranuras en uso por una evaluación no se desalojan.
+    """
+    
+    def __init__(self, template: Actor, capacity: int) -> None:
+        """
+        Inicializa los tensores apilados.
+        
+        Parámetros:
+        -----------
+        template : Actor
+            Actor con la arquitectura común (sus pesos no se usan).
+        capacity : int
+            Actores que pueden ocupar ranuras al mismo tiempo.
+        """
+        self.capacity: int = capacity
+        self.shapes: List[torch.Size] = [layer.weight.shape for layer in template.net if isinstance(layer, nn.Linear)]
+        self.weights: List[torch.Tensor] = [
+            torch.zeros(capacity, shape[1], shape[0]) for shape in self.shapes
+        ]
+        self.biases: List[torch.Tensor] = [torch.zeros(capacity, 1, shape[0]) for shape in self.shapes]
+        # id(actor) -> (referencia débil al actor, ranura), en orden de uso
+        self._slots: "OrderedDict[int, Tuple[weakref.ref, int]]" = OrderedDict()
+        self._free: List[int] = list(range(capacity))
+        self._pins: Counter = Counter()
+        self._lock: threading.Lock = threading.Lock()
+        
+        # Contadores observables
+        self.assignments: int = 0
+        self.evictions: int = 0
+    
+    def supports(self, actor_model: nn.Module) -> bool:
+        """
+        Indica si el actor tiene exactamente la arquitectura de los pesos apilados.
+        """
+        if type(actor_model) is not Actor:
+            return False
+        layers: List[nn.Module] = list(actor_model.net)
+        linear: List[nn.Linear] = [layer for layer in layers if isinstance(layer, nn.Linear)]
+        return (
+            [layer.weight.shape for layer in linear] == self.shapes
+            and all(layer.weight.dtype == torch.float32 for layer in linear)
+            and len(layers) == 2 * len(linear)
+        )
+    
+    def __contains__(self, actor_model: nn.Module) -> bool:
+        with self._lock:
+            entry: Optional[Tuple[weakref.ref, int]] = self._slots.get(id(actor_model))
+            return entry is not None and entry[0]() is actor_model
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._slots)
+    
+    def _slot(self, actor_model: Actor) -> Optional[int]:
+        """
+        Obtiene la ranura del actor, copiando sus pesos en una libre si no la tiene. Debe llamarse con el lock tomado.
+        
+        Retorna None si todas las ranuras están en uso por evaluaciones en curso.
+        """
+        key: int = id(actor_model)
+        entry: Optional[Tuple[weakref.ref, int]] = self._slots.get(key)
+        if entry is not None and entry[0]() is actor_model:
+            self._slots.move_to_end(key)
+            return entry[1]
+        if entry is not None:
+            # El id pertenecía a un actor que ya no existe
+            self._release(key)
+        
+        if not self._free:
+            # Primero se recuperan ranuras de actores liberados, luego se desaloja el menos usado
+            for dead_key in [k for k, (ref, slot) in self._slots.items() if ref() is None and not self._pins[slot]]:
+                self._release(dead_key)
+        if not self._free:
+            victim: Optional[int] = next((k for k, (_, slot) in self._slots.items() if not self._pins[slot]), None)
+            if victim is None:
+                return None
+            self._release(victim)
+            self.evictions += 1
+        
+        slot: int = heapq.heappop(self._free)
+        with torch.no_grad():
+            for layer, weight, bias in zip(
+                (module for module in actor_model.net if isinstance(module, nn.Linear)), self.weights, self.biases
+            ):
+                weight[slot].copy_(layer.weight.t())
+                bias[slot, 0].copy_(layer.bias)
+        self._slots[key] = (weakref.ref(actor_model), slot)
+        self.assignments += 1
+        return slot
+    
+    def _release(self, key: int) -> None:
+        heapq.heappush(self._free, self._slots.pop(key)[1])
+    
+    def discard(self, actor_model: nn.Module) -> None:
+        """
+        Libera la ranura de un actor (por ejemplo, si sus pesos cambiaron en el lugar).
+        """
+        with self._lock:
+            entry: Optional[Tuple[weakref.ref, int]] = self._slots.get(id(actor_model))
+            if entry is not None and entry[0]() is actor_model and not self._pins[entry[1]]:
+                self._release(id(actor_model))
+    
+    def run(self, actor_models: Sequence[Actor], states: Sequence[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """
+        Evalúa varios actores, cada uno sobre sus estados, con productos por lotes por capa.
+        
+        Parámetros:
+        -----------
+        actor_models : Sequence[Actor]
+            Actores distintos, todos soportados por el pool.
+        states : Sequence[np.ndarray]
+            Estados de cada actor con forma (N_i, STATE_DIM) en float32.
+            
+        Retorna:
+        --------
+        List[Optional[np.ndarray]]
+            Ganancias de cada actor con forma (N_i, ACTION_DIM) en float32, o None para los actores
+            que no obtuvieron ranura (todas ocupadas por evaluaciones en curso).
+        """
+        slots: List[Optional[int]] = []
+        with self._lock:
+            for actor in actor_models:
+                # Se fija cada ranura al obtenerla para que las siguientes del lote no la desalojen
+                slots.append(self._slot(actor))
+                if slots[-1] is not None:
+                    self._pins[slots[-1]] += 1
+        
+        results: List[Optional[np.ndarray]] = [None] * len(actor_models)
+        try:
+            order: List[int] = sorted((i for i, slot in enumerate(slots) if slot is not None), key=slots.__getitem__)
+            start: int = 0
+            for end in range(1, len(order) + 1):
+                # Se corta el rango cuando el hueco hasta la próxima ranura es más caro que otra llamada
+                if end == len(order) or slots[order[end]] - slots[order[end - 1]] > STACKED_MAX_SLOT_GAP + 1:
+                    self._run_range([order[i] for i in range(start, end)], slots, states, results)
+                    start = end
+        finally:
+            with self._lock:
+                for slot in slots:
+                    if slot is not None:
+                        self._pins[slot] -= 1
+        return results
+    
+    def _run_range(
+        self,
+        positions: List[int],
+        slots: List[Optional[int]],
+        states: Sequence[np.ndarray],
+        results: List[Optional[np.ndarray]]
+    ) -> None:
+        """
+        Evalúa los actores de un rango de ranuras con un `baddbmm` por capa sobre vistas de los pesos.
+        """
+        low: int = slots[positions[0]]
+        high: int = slots[positions[-1]] + 1
+        counts: List[int] = [len(states[position]) for position in positions]
+        x: torch.Tensor = torch.zeros(high - low, max(counts), self.shapes[0][1])
+        for position, count in zip(positions, counts):
+            x[slots[position] - low, :count] = torch.from_numpy(np.asarray(states[position], dtype=np.float32))
+        
+        with torch.inference_mode():
+            last: int = len(self.weights) - 1
+            for layer, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+                x = torch.baddbmm(bias[low:high], x, weight[low:high])
+                x = torch.relu_(x) if layer < last else torch.tanh_(x)
+            for op, value in Actor.OUTPUT_OPS:
+                x = x.mul_(value) if op == "scale" else x.add_(value)
+        output: np.ndarray = x.numpy()
+        for position, count in zip(positions, counts):
+            results[position] = output[slots[position] - low, :count]
+    
+    def get_stats(self) -> dict:
+        """
+        Obtiene la ocupación y los contadores del pool.
+        """
+        with self._lock:
+            return {
+                "actors": len(self._slots),
+                "capacity": self.capacity,
+                "bytes_used": sum(t.numel() * t.element_size() for t in self.weights + self.biases),
+                "assignments": self.assignments,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,308 @@
+import copy
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from torch.func import functional_call, vmap
+
+from constants.constants import GAMMA, TAU, LR_ACTOR, LR_CRITIC
+
+# Parámetros apilados por nombre: cada tensor tiene forma [ranuras, *forma del parámetro]
+StackedParams = Dict[str, torch.Tensor]
+# Ranuras de un grupo: un rango contiguo (vistas sin copia) o índices arbitrarios
+Rows = Union[slice, torch.Tensor]
+
+# Coeficientes de Adam (los mismos valores por defecto de torch.optim.Adam)
+ADAM_BETAS: Tuple[float, float] = (0.9, 0.999)
+ADAM_EPS: float = 1e-8
+
+class _StackedNetwork:
+    """
+    Pesos de una red para muchos usuarios, con su red objetivo y los momentos de Adam.
+    """
+    
+    def __init__(self, template: torch.nn.Module, capacity: int) -> None:
+        # Módulo sin datos: solo aporta la estructura para functional_call
+        self.module: torch.nn.Module = copy.deepcopy(template).to("meta")
+        shapes: Dict[str, torch.Size] = {name: param.shape for name, param in template.named_parameters()}
+        self.names: List[str] = list(shapes)
+        
+        def stacked() -> StackedParams:
+            return {name: torch.zeros((capacity, *shape)) for name, shape in shapes.items()}
+        
+        self.params: StackedParams = stacked()
+        self.target: StackedParams = stacked()
+        self.exp_avg: StackedParams = stacked()
+        self.exp_avg_sq: StackedParams = stacked()
+        # Módulo reutilizable para exportar los pesos de una ranura
+        self.export: torch.nn.Module = copy.deepcopy(template)
+    
+    def matches(self, module: torch.nn.Module) -> bool:
+        """
+        Indica si el módulo tiene la misma arquitectura que los pesos apilados.
+        """
+        return {name: param.shape for name, param in module.named_parameters()} == {
+            name: tensor.shape[1:] for name, tensor in self.params.items()
+        }
+    
+    def assign(self, slot: int, module: torch.nn.Module) -> None:
+        """
+        Copia los pesos de un módulo en una ranura, con la red objetivo igual y los momentos en cero.
+        """
+        state: Dict[str, torch.Tensor] = dict(module.named_parameters())
+        with torch.no_grad():
+            for name in self.names:
+                self.params[name][slot].copy_(state[name])
+                self.target[name][slot].copy_(state[name])
+                self.exp_avg[name][slot].zero_()
+                self.exp_avg_sq[name][slot].zero_()
+    
+    def gather(self, stacked: StackedParams, rows: Rows) -> List[torch.Tensor]:
+        """
+        Filas del grupo: vistas de los tensores apilados si las ranuras son contiguas, copias si no.
+        """
+        if isinstance(rows, slice):
+            return [stacked[name][rows] for name in self.names]
+        return [stacked[name].index_select(0, rows) for name in self.names]
+    
+    def scatter(self, stacked: StackedParams, rows: Rows, values: Sequence[torch.Tensor]) -> None:
+        """
+        Guarda las filas del grupo en sus ranuras (las vistas ya se modificaron en el lugar).
+        """
+        if isinstance(rows, slice):
+            return
+        for name, value in zip(self.names, values):
+            stacked[name].index_copy_(0, rows, value.detach())
+    
+    def module_for(self, slot: int) -> torch.nn.Module:
+        with torch.no_grad():
+            for name, param in self.export.named_parameters():
+                param.copy_(self.params[name][slot])
+        return self.export
+
+class StackedDDPG:
+    """
+    Entrenamiento DDPG vectorizado para muchos usuarios con la misma arquitectura.
+    
+    Los pesos de actor y critic, sus redes objetivo y el estado de Adam de cada usuario ocupan
+    una ranura de tensores apilados. Un paso evalúa las redes de todos los usuarios del grupo con
+    `vmap` sobre `functional_call`, y las actualizaciones de Adam y de las redes objetivo se
+    aplican a todo el grupo con operaciones `_foreach`. Como Adam opera elemento a elemento, el
+    resultado equivale a entrenar a cada usuario por separado con `torch.optim.Adam`.
+    """
+    
+    def __init__(
+        self,
+        actor_template: torch.nn.Module,
+        critic_template: torch.nn.Module,
+        capacity: int,
+        lr_actor: float = LR_ACTOR,
+        lr_critic: float = LR_CRITIC,
+        gamma: float = GAMMA,
+        tau: float = TAU
+    ) -> None:
+        """
+        Inicializa los tensores apilados.
+        
+        Parámetros:
+        -----------
+        actor_template : torch.nn.Module
+            Actor con la arquitectura común (sus pesos no se usan).
+        critic_template : torch.nn.Module
+            Critic con la arquitectura común (sus pesos no se usan).
+        capacity : int
+            Usuarios que pueden ocupar ranuras al mismo tiempo.
+        lr_actor : float
+            Tasa de aprendizaje del actor.
+        lr_critic : float
+            Tasa de aprendizaje del critic.
+        gamma : float
+            Factor de descuento.
+        tau : float
+            Tasa de actualización suave de las redes objetivo.
+        """
+        self.capacity: int = capacity
+        self.lr_actor: float = lr_actor
+        self.lr_critic: float = lr_critic
+        self.gamma: float = gamma
+        self.tau: float = tau
+        self.actor: _StackedNetwork = _StackedNetwork(actor_template, capacity)
+        self.critic: _StackedNetwork = _StackedNetwork(critic_template, capacity)
+        # Pasos de Adam por ranura (corrección de sesgo independiente por usuario)
+        self.steps: torch.Tensor = torch.zeros(capacity, dtype=torch.float64)
+        self.slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.slots
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def add(self, user_id: str, actor: torch.nn.Module, critic: torch.nn.Module) -> Optional[str]:
+        """
+        Ocupa una ranura con los pesos de un usuario, desalojando al menos usado recientemente si no hay lugar.
+        
+        Parámetros:
+        -----------
+        user_id : str
+            Identificador único del usuario.
+        actor : torch.nn.Module
+            Actor del usuario.
+        critic : torch.nn.Module
+            Critic del usuario.
+        
+        Retorna:
+        --------
+        Optional[str]
+            Usuario desalojado, si lo hubo.
+        """
+        if not (self.actor.matches(actor) and self.critic.matches(critic)):
+            raise ValueError(f"La arquitectura de los modelos de {user_id} no coincide con la de los pesos apilados")
+        evicted: Optional[str] = None
+        if user_id in self.slots:
+            slot: int = self.slots[user_id]
+        elif self._free:
+            slot = self._free.pop()
+        else:
+            evicted, slot = self.slots.popitem(last=False)
+        self.actor.assign(slot, actor)
+        self.critic.assign(slot, critic)
+        self.steps[slot] = 0
+        self.slots[user_id] = slot
+        self.slots.move_to_end(user_id)
+        return evicted
+    
+    def remove(self, user_id: str) -> None:
+        slot: Optional[int] = self.slots.pop(user_id, None)
+        if slot is not None:
+            self._free.append(slot)
+    
+    def export(self, user_id: str) -> Tuple[torch.nn.Module, torch.nn.Module]:
+        """
+        Devuelve actor y critic con los pesos actuales del usuario (módulos reutilizados, válidos hasta la próxima llamada).
+        """
+        slot: int = self.slots[user_id]
+        return self.actor.module_for(slot), self.critic.module_for(slot)
+    
+    def _adam_step(
+        self,
+        network: _StackedNetwork,
+        rows: Rows,
+        steps: torch.Tensor,
+        params: List[torch.Tensor],
+        grads: Sequence[torch.Tensor],
+        lr: float
+    ) -> None:
+        """
+        Aplica Adam en el lugar a las filas del grupo y guarda parámetros y momentos en sus ranuras.
+        """
+        beta1, beta2 = ADAM_BETAS
+        grads = list(grads)
+        exp_avg: List[torch.Tensor] = network.gather(network.exp_avg, rows)
+        exp_avg_sq: List[torch.Tensor] = network.gather(network.exp_avg_sq, rows)
+        torch._foreach_lerp_(exp_avg, grads, 1 - beta1)
+        torch._foreach_mul_(exp_avg_sq, beta2)
+        torch._foreach_addcmul_(exp_avg_sq, grads, grads, 1 - beta2)
+        
+        # Corrección de sesgo con el paso de cada usuario, difundida sobre sus parámetros
+        step_size: torch.Tensor = (lr / (1 - beta1 ** steps)).float()
+        bias_correction2_sqrt: torch.Tensor = (1 - beta2 ** steps).sqrt().float()
+        with torch.no_grad():
+            updates: List[torch.Tensor] = torch._foreach_sqrt(exp_avg_sq)
+            for update, param in zip(updates, params):
+                view: Tuple[int, ...] = (-1,) + (1,) * (param.dim() - 1)
+                update.div_(bias_correction2_sqrt.view(view))
+            torch._foreach_add_(updates, ADAM_EPS)
+            torch._foreach_div_(updates, exp_avg)
+            torch._foreach_reciprocal_(updates)
+            for update, param in zip(updates, params):
+                update.mul_(step_size.view((-1,) + (1,) * (param.dim() - 1)))
+            torch._foreach_sub_(params, updates)
+        network.scatter(network.exp_avg, rows, exp_avg)
+        network.scatter(network.exp_avg_sq, rows, exp_avg_sq)
+        network.scatter(network.params, rows, params)
+    
+    def _soft_update(self, network: _StackedNetwork, rows: Rows, params: List[torch.Tensor]) -> None:
+        targets: List[torch.Tensor] = network.gather(network.target, rows)
+        with torch.no_grad():
+            torch._foreach_lerp_(targets, params, self.tau)
+        network.scatter(network.target, rows, targets)
+    
+    def update(self, user_ids: Sequence[str], batches: Sequence[Dict[str, np.ndarray]]) -> np.ndarray:
+        """
+        Ejecuta un paso de DDPG para varios usuarios a la vez, cada uno con su lote del buffer priorizado.
+        
+        Parámetros:
+        -----------
+        user_ids : Sequence[str]
+            Usuarios del grupo (deben ocupar ranuras).
+        batches : Sequence[Dict[str, np.ndarray]]
+            Lotes de igual tamaño devueltos por `PrioritizedReplayBuffer.sample`, uno por usuario.
+        
+        Retorna:
+        --------
+        np.ndarray
+            Errores TD absolutos con forma [usuarios, lote], para actualizar las prioridades.
+        """
+        slots: List[int] = [self.slots[user_id] for user_id in user_ids]
+        for user_id in user_ids:
+            self.slots.move_to_end(user_id)
+        # Con ranuras consecutivas se trabaja sobre vistas de los tensores apilados, sin copiar
+        rows: Rows = (
+            slice(slots[0], slots[-1] + 1) if slots == list(range(slots[0], slots[0] + len(slots)))
+            else torch.tensor(slots, dtype=torch.long)
+        )
+        self.steps[rows] += 1
+        steps: torch.Tensor = self.steps[rows]
+        
+        def stack(key: str) -> torch.Tensor:
+            return torch.from_numpy(np.stack([batch[key] for batch in batches]).astype(np.float32))
+        
+        states, actions, next_states = stack("states"), stack("actions"), stack("next_states")
+        rewards, dones, weights = stack("rewards")[..., None], stack("dones")[..., None], stack("weights")[..., None]
+        
+        actor_names, critic_names = self.actor.names, self.critic.names
+        
+        def act(params: List[torch.Tensor], states: torch.Tensor) -> torch.Tensor:
+            return functional_call(self.actor.module, dict(zip(actor_names, params)), (states,))
+        
+        def value(params: List[torch.Tensor], states: torch.Tensor, actions: torch.Tensor) -> torch.Tensor:
+            return functional_call(self.critic.module, dict(zip(critic_names, params)), (states, actions))
+        
+        batched_act, batched_value = vmap(act), vmap(value)
+        
+        # Objetivo de Bellman con las redes objetivo de cada usuario
+        with torch.no_grad():
+            target_q: torch.Tensor = rewards + self.gamma * (1.0 - dones) * batched_value(
+                self.critic.gather(self.critic.target, rows),
+                next_states,
+                batched_act(self.actor.gather(self.actor.target, rows), next_states)
+            )
+        
+        # Critic: error cuadrático ponderado por importancia; la suma de pérdidas separa los gradientes por usuario
+        critic_params: List[torch.Tensor] = [
+            param.detach().requires_grad_() for param in self.critic.gather(self.critic.params, rows)
+        ]
+        td_errors: torch.Tensor = target_q - batched_value(critic_params, states, actions)
+        critic_loss: torch.Tensor = (weights * td_errors.pow(2)).mean(dim=(1, 2)).sum()
+        critic_grads: Tuple[torch.Tensor, ...] = torch.autograd.grad(critic_loss, critic_params)
+        self._adam_step(self.critic, rows, steps, critic_params, critic_grads, self.lr_critic)
+        critic_params = [param.detach() for param in critic_params]
+        
+        # Actor: maximizar el valor estimado por el critic ya actualizado
+        actor_params: List[torch.Tensor] = [
+            param.detach().requires_grad_() for param in self.actor.gather(self.actor.params, rows)
+        ]
+        actor_loss: torch.Tensor = -batched_value(critic_params, states, batched_act(actor_params, states)).mean(
+            dim=(1, 2)
+        ).sum()
+        actor_grads: Tuple[torch.Tensor, ...] = torch.autograd.grad(actor_loss, actor_params)
+        self._adam_step(self.actor, rows, steps, actor_params, actor_grads, self.lr_actor)
+        actor_params = [param.detach() for param in actor_params]
+        
+        # Redes objetivo de todo el grupo en una sola operación por lista de tensores
+        self._soft_update(self.actor, rows, actor_params)
+        self._soft_update(self.critic, rows, critic_params)
+        return td_errors.detach().abs().squeeze(2).numpy()
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from cgm_history import CGMHistoryStore, CGMRingBuffer
+from model_manager import ModelManager
+
+def test_ring_buffer_keeps_the_latest_readings_as_views():
+    buffer = CGMRingBuffer(capacity=5)
+    for minute in range(8):
+        buffer.append(minute * 300.0, 100.0 + minute)
+
+    timestamps, values = buffer.latest(10)
+
+    assert timestamps.tolist() == [900.0, 1200.0, 1500.0, 1800.0, 2100.0]
+    assert values.tolist() == [103.0, 104.0, 105.0, 106.0, 107.0]
+    # La ventana es contigua aunque el buffer haya dado la vuelta, y no se copia
+    assert np.shares_memory(values, buffer._values) and not values.flags.writeable
+    assert buffer.window(1000.0, 1800.0)[1].tolist() == [104.0, 105.0, 106.0]
+    assert len(buffer) == 5 and buffer.last_timestamp == 2100.0
+
+def test_backfill_merges_out_of_order_readings():
+    buffer = CGMRingBuffer(capacity=6)
+    for minute in (0, 2, 4):
+        buffer.append(minute * 300.0, 100.0)
+
+    stored = buffer.extend(np.array([1500.0, 300.0, 900.0, 600.0]), np.array([150.0, 110.0, 130.0, 120.0]))
+
+    timestamps, values = buffer.latest(6)
+    assert stored == 4
+    assert timestamps.tolist() == [0.0, 300.0, 600.0, 900.0, 1200.0, 1500.0]
+    # Ante timestamps repetidos prevalece la lectura recibida después
+    assert values.tolist() == [100.0, 110.0, 120.0, 130.0, 100.0, 150.0]
+
+    # Un bloque mayor que la capacidad conserva solo sus lecturas más recientes
+    assert buffer.extend(np.arange(20.0) * 300.0 + 3000.0, np.full(20, 90.0)) == 6
+    assert buffer.latest(1)[0].tolist() == [3000.0 + 19 * 300.0]
+
+def test_store_evicts_least_recent_users():
+    store = CGMHistoryStore(capacity=4, max_users=2)
+    store.append("u1", 0.0, 100.0)
+    store.append("u2", 0.0, 110.0)
+    store.append("u1", 300.0, 105.0)
+    store.append("u3", 0.0, 120.0)
+
+    assert "u1" in store and "u3" in store and "u2" not in store
+    assert store.latest("u2", 4)[1].size == 0
+    assert store.get_stats()["evictions"] == 1 and store.get_stats()["readings"] == 3
+
+def test_cgm_endpoints_record_and_return_history(monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "ModelManager", lambda: ModelManager(models_directory=str(tmp_path)))
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+    start = datetime(2025, 6, 19, 8, 0)
+    backfill = {
+        "user_id": "u1",
+        "timestamp": [(start + timedelta(minutes=5 * i)).isoformat() for i in range(2000)],
+        "cgm_value": [100.0 + (i % 50) for i in range(2000)]
+    }
+
+    with TestClient(router.app) as client:
+        response = client.post("/cgm/readings/bulk", json=backfill)
+        live = client.post(
+            "/cgm/reading",
+            json={"user_id": "u1", "cgm_value": 180.0, "timestamp": (start + timedelta(days=7)).isoformat()}
+        )
+        invalid = client.post("/cgm/readings/bulk", json={**backfill, "cgm_value": [500.0] * 2000})
+        history = client.get(
+            "/cgm/u1/history", params={"start": (start + timedelta(minutes=5 * 1997)).isoformat()}
+        ).json()
+
+    assert response.status_code == 200 and live.status_code == 200
+    assert response.json()["num_received"] == 2000
+    # La serie en disco conserva todo el bloque; el buffer en memoria, solo las últimas lecturas
+    assert response.json()["num_stored"] == response.json()["history_size"] == 2000
+    assert len(router.model_manager.cgm_history.latest("u1", 5000)[1]) == router.model_manager.cgm_history.capacity
+    assert invalid.status_code == 422
+    assert history["cgm_value"] == [147.0, 148.0, 149.0, 180.0]
+    assert datetime.fromisoformat(history["timestamp"][-1]) == start + timedelta(days=7)
+
+@pytest.mark.parametrize("capacity", [1, 7])
+def test_single_appends_match_a_bounded_list(capacity):
+    rng = np.random.default_rng(capacity)
+    buffer = CGMRingBuffer(capacity)
+    expected = []
+    for minute, value in enumerate(rng.uniform(40, 400, 30).astype(np.float32)):
+        buffer.append(minute * 60.0, value)
+        expected = (expected + [value])[-capacity:]
+        assert buffer.latest(capacity)[1].tolist() == expected
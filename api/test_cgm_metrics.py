@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from cgm_history import CGMHistoryStore
+from cgm_metrics import CGMMetrics
+from cgm_store import CGMSeriesStore, TieredCGMStore
+from model_manager import ModelManager
+
+HOUR = 3600
+
+def _series(tmp_path, **kwargs):
+    series = TieredCGMStore(CGMHistoryStore(capacity=12, max_users=4), CGMSeriesStore(str(tmp_path)))
+    series.metrics = CGMMetrics(series, windows_hours=(2, 6), event_gap_seconds=1800, **kwargs)
+    return series
+
+def _expected(series, user_id, hours):
+    timestamps, values = series.window(user_id)
+    head = int(timestamps[-1] // HOUR)
+    inside = timestamps >= (head - hours + 1) * HOUR
+    values = values[inside].astype(np.float64)
+    return len(values), values.mean(), 100.0 * values.std() / values.mean(), 100.0 * np.mean((values >= 70) & (values <= 180))
+
+def test_incremental_metrics_match_a_full_recomputation(tmp_path):
+    series = _series(tmp_path)
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(0, 12 * HOUR, 300, dtype=np.float64)
+    values = rng.uniform(40, 300, len(timestamps)).astype(np.float32)
+    series.extend("u1", timestamps[:20], values[:20])
+    for timestamp, value in zip(timestamps[20:], values[20:]):
+        series.append("u1", timestamp, value)
+        if rng.random() < 0.1:
+            # Lecturas atrasadas y repetidas dentro de las ventanas
+            series.append("u1", timestamp - 3 * HOUR + 7, float(rng.uniform(40, 300)))
+            series.extend("u1", np.array([timestamp - 300, timestamp - 4500]), np.array([150.0, 60.0]))
+
+    _, windows = series.metrics.get("u1")
+    rebuilt = CGMMetrics(series, windows_hours=(2, 6), event_gap_seconds=1800).get("u1")
+
+    for window, hours in zip(windows, (2, 6)):
+        readings, mean, cv, time_in_range = _expected(series, "u1", hours)
+        assert window.readings == readings
+        assert window.mean == pytest.approx(mean) and window.cv == pytest.approx(cv)
+        assert window.time_in_range == pytest.approx(time_in_range)
+    assert [window._asdict() for window in rebuilt[1]] == [pytest.approx(window._asdict()) for window in windows]
+    assert rebuilt[0] == timestamps[-1]
+
+def test_windows_slide_and_count_severe_episodes(tmp_path):
+    series = _series(tmp_path)
+    # Dos episodios de hipoglucemia severa, separados por una lectura normal, y dos de hiperglucemia
+    # separados por más de 30 min
+    for minutes, value in [(0, 50.0), (5, 45.0), (10, 100.0), (15, 50.0), (20, 300.0), (90, 300.0)]:
+        series.append("u1", minutes * 60.0, value)
+    # Lectura atrasada: empieza un episodio y la siguiente, a menos de 30 min, deja de hacerlo
+    series.append("u1", 4000.0, 310.0)
+
+    first = series.metrics.get("u1")[1][0]
+    assert first.hypo_events == 2 and first.hyper_events == 2
+    assert first.time_very_low == pytest.approx(300 / 7) and first.variability == "muy alta"
+
+    # Al pasar al intervalo 2 la ventana de 2 h deja de incluir el intervalo 0
+    series.append("u1", 2 * HOUR + 10, 120.0)
+    short, long = series.metrics.get("u1")[1]
+    assert short.readings == 3 and short.hyper_events == 1 and short.start == HOUR
+    assert long.readings == 8 and long.hypo_events == 2
+    # Un salto mayor que la ventana más larga la vacía
+    series.append("u1", 20 * HOUR, 100.0)
+    short, long = series.metrics.get("u1")[1]
+    assert long.readings == 1 and long.time_in_ideal_range == 100.0 and short.time_below_range == 0.0
+
+def test_metrics_are_rebuilt_for_evicted_users(tmp_path):
+    series = _series(tmp_path, max_users=1)
+    series.extend("u1", np.arange(0, HOUR, 300, dtype=np.float64), np.full(12, 100.0))
+    series.append("u2", 0.0, 200.0)
+    series.append("u1", HOUR, 200.0)
+
+    assert series.metrics.evictions == 2
+    assert series.metrics.get("u1")[1][0].readings == 13
+    assert series.metrics.get("u3") is None
+
+def test_metrics_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "ModelManager", lambda: ModelManager(models_directory=str(tmp_path)))
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+    start = datetime(2025, 6, 19).timestamp()
+    values = np.tile(np.array([60.0, 120.0, 160.0, 200.0], dtype=np.float32), 72)
+
+    with TestClient(router.app) as client:
+        client.post("/cgm/readings/bulk", json={
+            "user_id": "u1",
+            "timestamp": [datetime.fromtimestamp(start + 300 * index).isoformat() for index in range(len(values))],
+            "cgm_value": values.tolist()
+        })
+        response = client.get("/cgm/u1/metrics").json()
+        missing = client.get("/cgm/unknown/metrics")
+
+    day = response["windows"][0]
+    assert response["last_reading"] == datetime.fromtimestamp(start + 300 * 287).isoformat()
+    assert [window["hours"] for window in response["windows"]] == [24, 168, 336]
+    assert day["readings"] == 288 and day["mean"] == pytest.approx(135.0)
+    assert day["time_in_range"] == 50.0 and day["time_below_range"] == 25.0 and day["time_above_range"] == 25.0
+    assert missing.status_code == 404
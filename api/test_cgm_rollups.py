@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from cgm_history import CGMHistoryStore
+from cgm_rollups import CGMRollups, rollup
+from cgm_store import CGMSeriesStore, TieredCGMStore
+from model_manager import ModelManager
+
+DAY = 24 * 3600
+
+def _rollups(tmp_path, **kwargs):
+    series = TieredCGMStore(CGMHistoryStore(capacity=12, max_users=4), CGMSeriesStore(str(tmp_path)))
+    return series, CGMRollups(series, str(tmp_path), widths=(900, 3600), **kwargs)
+
+def _readings(days):
+    timestamps = np.arange(0, days * DAY, 300, dtype=np.float64)
+    rng = np.random.default_rng(days)
+    return timestamps, rng.uniform(60, 250, len(timestamps)).astype(np.float32)
+
+def test_rollup_matches_per_bucket_statistics():
+    timestamps, values = _readings(1)
+
+    starts, minimum, maximum, total, count = rollup(timestamps, values, 3600)
+
+    by_hour = values.reshape(24, 12)
+    assert starts.tolist() == list(range(0, DAY, 3600)) and count.tolist() == [12] * 24
+    np.testing.assert_array_equal(minimum, by_hour.min(axis=1))
+    np.testing.assert_array_equal(maximum, by_hour.max(axis=1))
+    np.testing.assert_allclose(total, by_hour.astype(np.float64).sum(axis=1))
+
+def test_compaction_is_incremental_and_reflects_late_readings(tmp_path):
+    series, rollups = _rollups(tmp_path, raw_retention_days=0, late_seconds=3 * 3600)
+    timestamps, values = _readings(2)
+    series.extend("u1", timestamps[:-36], values[:-36])
+
+    first = rollups.compact_user("u1", now=2 * DAY - 3 * 3600)
+    assert first == {"buckets_written": 45 * 4 + 45, "readings_dropped": 0}
+    series.extend("u1", timestamps[-36:], values[-36:])
+    # Solo los intervalos nuevos; los ya agregados que no cambiaron no se reescriben
+    assert rollups.compact_user("u1", now=2 * DAY)["buckets_written"] == 12 + 3
+    assert rollups.compact_user("u1", now=2 * DAY)["buckets_written"] == 0
+
+    # Una lectura atrasada dentro de la ventana cambia un intervalo de cada nivel
+    series.append("u1", 2 * DAY - 3600 + 1, 400.0)
+    assert rollups.compact_user("u1", now=2 * DAY)["buckets_written"] == 2
+    hourly = rollups.query("u1", 2 * DAY - 3600, None, resolution_seconds=3600)
+    assert hourly.maximum.tolist() == [400.0] and hourly.count.tolist() == [13]
+
+def test_retention_drops_raw_readings_but_keeps_rollups(tmp_path):
+    series, rollups = _rollups(tmp_path, raw_retention_days=7, late_seconds=3600, min_drop_seconds=DAY)
+    timestamps, values = _readings(30)
+    series.extend("u1", timestamps, values)
+    before = rollups.query("u1", None, None, resolution_seconds=3600)
+
+    result = rollups.compact_all(now=30 * DAY)
+
+    assert result["readings_dropped"] == 23 * 288
+    assert series.disk.window("u1")[0][0] == 23 * DAY
+    after = rollups.query("u1", None, None, resolution_seconds=7200)
+    assert after.bucket_seconds == 3600 and len(after.timestamps) == 30 * 24
+    np.testing.assert_allclose(after.mean, before.mean, rtol=1e-6)
+    # Dentro del mínimo a acumular no se vuelve a reescribir la serie cruda
+    assert rollups.compact_all(now=30 * DAY + 3600)["readings_dropped"] == 0
+
+@pytest.mark.parametrize("resolution, width", [(None, 0), (600, 0), (900, 900), (3599, 900), (86400, 3600)])
+def test_queries_use_the_coarsest_tier_within_the_resolution(tmp_path, resolution, width):
+    series, rollups = _rollups(tmp_path, raw_retention_days=0)
+    timestamps, values = _readings(3)
+    series.extend("u1", timestamps, values)
+    rollups.compact_user("u1", now=2 * DAY)
+
+    result = rollups.query("u1", DAY + 100, 3 * DAY, resolution_seconds=resolution)
+
+    assert result.bucket_seconds == width
+    points = 2 * DAY // (width or 300)
+    # El intervalo que contiene el inicio se incluye completo; lo no compactado se agrega al vuelo
+    assert len(result.timestamps) == points - (1 if width == 0 else 0)
+    assert int(result.count.sum()) == (2 * 288 - 1 if width == 0 else 2 * 288)
+
+def test_rollup_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "ModelManager", lambda: ModelManager(models_directory=str(tmp_path)))
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+    start = datetime(2025, 6, 19)
+    timestamps, values = _readings(1)
+    timestamps += start.timestamp()
+
+    with TestClient(router.app) as client:
+        router.model_manager.cgm_series.extend("u1", timestamps, values)
+        router.model_manager.cgm_rollups.compact_all()
+        response = client.get("/cgm/u1/rollup", params={"start": start.isoformat(), "resolution": 3600}).json()
+
+    assert response["bucket_seconds"] == 3600 and len(response["timestamp"]) == 24
+    assert response["count"] == [12] * 24
+    assert response["mean"][0] == pytest.approx(float(values[:12].mean()), rel=1e-5)
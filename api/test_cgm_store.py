@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+
+from cgm_history import CGMHistoryStore
+from cgm_store import CGMSeriesFile, CGMSeriesStore, TieredCGMStore, sliding_windows
+
+DAY = 24 * 3600
+
+def test_series_appends_backfills_and_reopens_from_disk(tmp_path):
+    store = CGMSeriesStore(str(tmp_path), max_open_users=1)
+    timestamps = np.arange(0, 30 * DAY, 300, dtype=np.float64)
+    values = (100 + np.arange(len(timestamps)) % 80).astype(np.float32)
+
+    assert store.extend("u1", timestamps[::2], values[::2]) == (4320, 4320)
+    assert store.append("u2", 0.0, 150.0) == 1
+    # Las lecturas atrasadas se mezclan en una generación nueva y las repetidas se reemplazan
+    assert store.extend("u1", timestamps[1::2], values[1::2]) == (4320, 8640)
+    assert store.extend("u1", timestamps[:1], np.array([42.0])) == (1, 8640)
+
+    reopened = CGMSeriesStore(str(tmp_path))
+    window_timestamps, window_values = reopened.window("u1", 10 * DAY, 11 * DAY)
+
+    assert reopened.user_ids() == ["u1", "u2"]
+    assert window_timestamps.tolist() == list(range(10 * DAY, 11 * DAY + 1, 300))
+    np.testing.assert_array_equal(window_values, values[2880:3169])
+    assert isinstance(window_values.base, np.memmap) or isinstance(window_values, np.memmap)
+    assert not window_values.flags.writeable
+    assert reopened.latest("u1", 2)[1].tolist() == values[-2:].tolist()
+    assert reopened.window("u1", 0, 0)[1].tolist() == [42.0]
+    assert sorted(os.listdir(tmp_path)) == [
+        "cgm_u1.2.ts", "cgm_u1.2.val", "cgm_u1.meta", "cgm_u2.0.ts", "cgm_u2.0.val", "cgm_u2.meta"
+    ]
+
+def test_uncommitted_bytes_are_ignored_and_overwritten(tmp_path):
+    series = CGMSeriesFile(str(tmp_path), "u1", fsync=False)
+    series.extend(np.array([0.0, 300.0]), np.array([100.0, 110.0]))
+    # Escritura interrumpida: las columnas crecieron pero la confirmación no se escribió
+    with open(series.column_path("ts"), "ab") as f:
+        f.write(np.array([600, 900], dtype=np.int64).tobytes())
+    with open(series.column_path("val"), "ab") as f:
+        f.write(np.array([999.0], dtype=np.float32).tobytes())
+
+    recovered = CGMSeriesFile(str(tmp_path), "u1", fsync=False)
+    assert len(recovered) == 2 and recovered.latest(5)[0].tolist() == [0, 300]
+    recovered.extend(np.array([600.0]), np.array([120.0]))
+    assert CGMSeriesFile(str(tmp_path), "u1").window()[1].tolist() == [100.0, 110.0, 120.0]
+
+    # Registro de confirmación escrito a medias: vale el anterior
+    with open(recovered.meta_path, "r+b") as f:
+        f.seek((recovered._commits % 2) * 32 + 16)
+        f.write(b"\xff\xff")
+    assert len(CGMSeriesFile(str(tmp_path), "u1")) == 2
+
+    # Confirmación que supera a las columnas (datos perdidos sin fsync): se usa lo disponible
+    with open(recovered.column_path("val"), "r+b") as f:
+        f.truncate(1 * 4)
+    assert len(CGMSeriesFile(str(tmp_path), "u1")) == 1
+
+def test_tiered_store_serves_from_memory_or_disk(tmp_path):
+    memory = CGMHistoryStore(capacity=12, max_users=4)
+    tiered = TieredCGMStore(memory, CGMSeriesStore(str(tmp_path)))
+    timestamps = np.arange(0, DAY, 300, dtype=np.float64)
+    tiered.extend_many(["u1"] * len(timestamps), timestamps, np.full(len(timestamps), 120.0, dtype=np.float32))
+    tiered.append("u1", DAY, 180.0)
+
+    recent = tiered.window("u1", DAY - 3300, None)
+    full = tiered.window("u1", None, None)
+
+    assert np.shares_memory(recent[1], memory.latest("u1", 12)[1])
+    assert len(full[1]) == 289 and full[1][-1] == 180.0
+    assert len(tiered.latest("u1", 5)[1]) == 5 and len(tiered.latest("u1", 100)[1]) == 100
+
+    windows_timestamps, windows = sliding_windows(tiered, "u1", 12, start=0)
+    assert windows.shape == (278, 12) and windows_timestamps[0, -1] == 11 * 300
+    assert np.shares_memory(windows, full[1])
+    assert sliding_windows(tiered, "unknown", 12)[1].shape == (0, 12)
+
+def test_write_failures_are_isolated_per_user(tmp_path):
+    store = CGMSeriesStore(str(tmp_path))
+
+    stored = store.extend_many(["u1", "a/b", "u1"], np.array([0.0, 0.0, 300.0]), np.array([100.0, 110.0, 120.0]))
+
+    assert stored == 2 and store.window("u1")[1].tolist() == [100.0, 120.0]
+    assert "a/b" not in store and len(store.window("a/b")[0]) == 0
@@ -0,0 +1,126 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from cgm_history import CGMHistoryStore
+from cgm_stream import CGMStreamSession, NDJSONLineSplitter
+from model_manager import ModelManager
+
+START = datetime(2025, 6, 19, 8, 0)
+
+def _line(seq, user_id, minutes, value):
+    return json.dumps(
+        {"seq": seq, "user_id": user_id, "cgm_value": value, "timestamp": (START + timedelta(minutes=minutes)).isoformat()}
+    )
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "ModelManager", lambda: ModelManager(models_directory=str(tmp_path)))
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+    with TestClient(router.app) as test_client:
+        yield test_client
+
+def test_session_validates_in_batches_and_skips_resent_sequences():
+    store = CGMHistoryStore(capacity=16, max_users=8)
+    session = CGMStreamSession(store)
+    first = session.ingest([_line(1, "u1", 0, 100.0), _line(2, "u2", 0, 200.0), _line(3, "u1", 5, 110.0)])
+
+    second = session.ingest([
+        _line(3, "u1", 5, 110.0),
+        _line(4, "u2", 5, 500.0),
+        "{no es json",
+        json.dumps({"seq": 5, "cgm_value": 120.0}),
+        json.dumps({"seq": 6, "user_id": "u3", "cgm_value": 90.0, "timestamp": START.timestamp()}),
+        _line(2, "u2", 10, 210.0)
+    ])
+
+    assert first.ack == 3 and first.num_accepted == 3 and first.num_rejected == 0
+    assert second.ack == 6 and second.num_received == 6
+    assert second.num_accepted == 1 and second.num_duplicates == 2 and second.num_rejected == 3
+    assert sorted(rejection.seq or 0 for rejection in second.rejected) == [0, 4, 5]
+    assert store.latest("u1", 16)[1].tolist() == [100.0, 110.0]
+    assert store.latest("u2", 16)[1].tolist() == [200.0]
+    assert store.latest("u3", 16)[0].tolist() == [START.timestamp()]
+    assert session.summary().num_accepted == 4 and session.summary().num_rejected == 3
+
+def test_splitter_reassembles_lines_across_chunks():
+    splitter = NDJSONLineSplitter(max_line_bytes=16)
+
+    assert splitter.feed(b'{"a": 1}\n{"b"') == [b'{"a": 1}']
+    assert splitter.feed(b': 2}\n\n{"c": 3}') == [b'{"b": 2}']
+    assert splitter.flush() == [b'{"c": 3}']
+    with pytest.raises(ValueError):
+        splitter.feed(b"x" * 17)
+
+def test_websocket_stream_acknowledges_every_reading(client):
+    users = [f"u{index}" for index in range(10)]
+    messages = [
+        "\n".join(_line(minute * len(users) + index + 1, user, 5 * minute, 100.0 + minute) for index, user in enumerate(users))
+        for minute in range(30)
+    ]
+    last_sequence = 30 * len(users)
+
+    with client.websocket_connect("/cgm/stream") as websocket:
+        for message in messages:
+            websocket.send_text(message)
+        acks = []
+        while not acks or acks[-1]["ack"] != last_sequence:
+            acks.append(websocket.receive_json())
+
+    # Los mensajes acumulados pueden confirmarse juntos, pero ninguna lectura queda sin confirmar
+    assert [ack["ack"] for ack in acks] == sorted(ack["ack"] for ack in acks)
+    assert sum(ack["num_accepted"] for ack in acks) == last_sequence
+    for user in users:
+        assert client.get(f"/cgm/{user}/history").json()["cgm_value"] == [100.0 + minute for minute in range(30)]
+
+def test_ndjson_stream_is_processed_in_chunks(client):
+    lines = [_line(seq, f"u{seq % 3}", seq, 100.0 + seq % 50) for seq in range(1, 301)]
+    lines.insert(100, _line(1000, "u1", 0, 20.0))
+    body = ("\n".join(lines) + "\n").encode()
+
+    def chunks():
+        for start in range(0, len(body), 777):
+            yield body[start:start + 777]
+
+    response = client.post("/cgm/stream", content=chunks(), headers={"Content-Type": "application/x-ndjson"})
+    too_long = client.post("/cgm/stream", content=lines[0] + "\n" + "x" * 5000)
+
+    summary = response.json()
+    assert response.status_code == 200
+    assert summary["ack"] == 1000 and summary["num_received"] == 301
+    # La lectura 1000 está fuera de rango y las posteriores, con número menor, cuentan como repetidas
+    assert summary["num_accepted"] == 100 and summary["num_duplicates"] == 200
+    assert summary["rejected"] == [{"seq": 1000, "error": "Valor de CGM debe estar entre 40.0 y 400.0 mg/dL"}]
+    assert too_long.status_code == 413 and too_long.json()["detail"]["ack"] is None
+    assert len(client.get("/cgm/u1/history").json()["cgm_value"]) == 34
+
+def test_invalid_user_ids_are_rejected_per_line(client):
+    lines = [_line(1, "u1", 0, 100.0), _line(2, "a/b", 0, 110.0), _line(3, "x" * 200, 0, 120.0)]
+
+    summary = client.post("/cgm/stream", content="\n".join(lines)).json()
+    single = client.post("/cgm/reading", json={"user_id": "../u1", "cgm_value": 100.0})
+
+    assert summary["ack"] == 3 and summary["num_accepted"] == 1
+    assert [rejection["seq"] for rejection in summary["rejected"]] == [2, 3]
+    assert client.get("/cgm/u1/history").json()["cgm_value"] == [100.0]
+    assert single.status_code == 422
+
+def test_cgm_io_is_rejected_when_the_executor_is_saturated(client, monkeypatch):
+    # Sin capacidad en el ejecutor acotado, toda la E/S de CGM se rechaza en lugar de encolar hilos
+    with monkeypatch.context() as saturated:
+        saturated.setattr(router.model_manager.executor, "max_workers", 0)
+        saturated.setattr(router.model_manager.executor, "max_queue_size", 0)
+        single = client.post("/cgm/reading", json={"user_id": "u1", "cgm_value": 100.0})
+        stream = client.post("/cgm/stream", content=_line(1, "u1", 0, 100.0))
+        history = client.get("/cgm/u1/history")
+        with client.websocket_connect("/cgm/stream") as websocket:
+            websocket.send_text(_line(1, "u1", 0, 100.0))
+            closing = websocket.receive()
+
+    assert single.status_code == stream.status_code == history.status_code == 503
+    assert closing["type"] == "websocket.close" and closing["code"] == 1013
+    assert client.get("/cgm/u1/history").json()["cgm_value"] == []
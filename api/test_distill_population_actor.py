@@ -0,0 +1,49 @@
+import numpy as np
+import torch
+
+from distill_population_actor import distill, fold_input_normalization, sample_inputs
+from models.models import Actor, infer_actor_hidden_dims, load_actor_model
+from constants.constants import (
+    STATE_DIM,
+    ACTION_DIM,
+    MIN_CGM_INPUT,
+    MAX_CGM_INPUT,
+    MAX_CARBS_INPUT,
+    MAX_IOB_INPUT
+)
+
+def test_samples_respect_request_validation_ranges():
+    cgm, carbs, iob, minutes = sample_inputs(np.random.default_rng(0), 10_000)
+
+    assert cgm.min() >= MIN_CGM_INPUT and cgm.max() <= MAX_CGM_INPUT
+    assert carbs.min() == 0.0 and carbs.max() <= MAX_CARBS_INPUT
+    assert iob.min() >= 0.0 and iob.max() <= MAX_IOB_INPUT
+    assert minutes.min() >= 0 and minutes.max() < 24 * 60
+
+def test_folded_normalization_is_equivalent():
+    torch.manual_seed(0)
+    student = Actor(STATE_DIM, ACTION_DIM, (16,))
+    mean, std = torch.tensor([200.0, 3.0, 700.0, 4.0]), torch.tensor([100.0, 5.0, 400.0, 6.0])
+    states = torch.rand(8, STATE_DIM) * 400
+
+    with torch.no_grad():
+        expected = student((states - mean) / std)
+        fold_input_normalization(student, mean, std)
+        assert torch.allclose(student(states), expected, atol=1e-5)
+
+def test_distilled_actor_round_trips_and_is_served(make_manager, tmp_path):
+    manager = make_manager()
+    student = distill(manager, (32, 32), steps=100, batch_size=256, learning_rate=3e-3, seed=0)
+    manager.model_store.save_distilled_population(student)
+    torch.save(student.state_dict(), tmp_path / "student.pth")
+
+    served = make_manager(serve_distilled_population=True, distilled_max_dose_deviation=float("inf"))
+    rejected = make_manager(serve_distilled_population=True, distilled_max_dose_deviation=-1.0)
+    default = make_manager()
+
+    assert infer_actor_hidden_dims(served.population_serving_actor.state_dict()) == (32, 32)
+    assert served.get_user_models("sin_modelo")["actor"] is served.population_serving_actor
+    assert rejected.population_serving_actor is rejected.population_actor
+    # El actor destilado cambia las dosis: solo se sirve si se habilita explícitamente
+    assert default.population_serving_actor is default.population_actor
+    assert infer_actor_hidden_dims(load_actor_model(str(tmp_path / "student.pth"), STATE_DIM, ACTION_DIM).state_dict()) == (32, 32)
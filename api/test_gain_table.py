@@ -0,0 +1,100 @@
+import numpy as np
+import torch
+
+from gain_table import GainTable
+
+# Grilla gruesa para que las pruebas del ciclo de vida construyan tablas rápido
+COARSE_STEPS = (80.0, 10.0, 240.0, 25.0)
+
+def _multilinear(states):
+    cgm, cho_rate, minutes, iob = states.T.astype(np.float64)
+    return np.stack(
+        [0.01 * cgm - 0.2 * iob, 0.5 + 0.001 * cgm * cho_rate, cho_rate * iob - 0.0001 * minutes * cgm], axis=1
+    ).astype(np.float32)
+
+def test_lookup_reproduces_multilinear_functions():
+    table = GainTable.build(_multilinear, (30.0, 0.0, 0.0, 0.0), (410.0, 20.0, 1440.0, 50.0), (20.0, 2.0, 60.0, 5.0))
+    rng = np.random.default_rng(0)
+    states = rng.uniform(table.lower, table.upper, size=(500, 4)).astype(np.float32)
+    # Incluir el borde superior de la grilla
+    states[0] = table.upper
+
+    np.testing.assert_allclose(table.lookup(states), _multilinear(states), rtol=1e-4, atol=1e-3)
+    assert table.shape == (20, 11, 25, 11)
+    assert table.nbytes == 20 * 11 * 25 * 11 * 3 * 4
+
+def test_covers_only_states_inside_the_grid():
+    table = GainTable.build(_multilinear, (30.0, 0.0, 0.0, 0.0), (410.0, 20.0, 1440.0, 50.0), (20.0, 2.0, 60.0, 5.0))
+    states = np.array([[120.0, 2.0, 600.0, 1.0], [10.0, 2.0, 600.0, 1.0], [120.0, 2.0, 600.0, 60.0]], dtype=np.float32)
+
+    assert table.covers(states).tolist() == [True, False, False]
+
+def test_population_table_is_opt_in(make_manager):
+    manager = make_manager()
+    manager.warm_up(max_models=0)
+
+    assert manager.ready.is_set()
+    assert manager.get_gain_table_stats()["tables"] == 0
+
+def test_population_table_stays_within_validated_dose_error(make_manager):
+    manager = make_manager(dose_table_population=True)
+    manager.warm_up(max_models=0)
+    table = manager.gain_tables[manager.population_serving_actor]
+    rng = np.random.default_rng(7)
+    inputs = (rng.uniform(40, 400, 2000), rng.uniform(0, 300, 2000), rng.uniform(0, 50, 2000), rng.integers(0, 1440, 2000))
+
+    with_table = manager._predict_bolus_array(manager.population_serving_actor, *inputs)
+    del manager.gain_tables[manager.population_serving_actor]
+    without_table = manager._predict_bolus_array(manager.population_serving_actor, *inputs)
+
+    assert table.max_dose_error <= manager.dose_table_max_dose_error
+    assert np.max(np.abs(with_table - without_table)) <= manager.dose_table_max_dose_error
+    assert manager.get_gain_table_stats()["tables"] == 0
+
+def test_states_outside_the_table_use_the_network(make_manager):
+    manager = make_manager(dose_table_max_dose_error=np.inf)
+    manager.dose_table_steps = COARSE_STEPS
+    actor = manager.population_serving_actor
+    assert manager.build_gain_table("population", actor) is not None
+    states = manager._build_states(np.array([15.0, 120.0]), np.array([30.0, 30.0]), np.array([1.0, 1.0]), np.array([600.0, 600.0]))
+
+    gains = manager._actor_gains(actor, states)
+
+    np.testing.assert_allclose(gains[0], manager.backend.run(actor, states[:1])[0], rtol=1e-6)
+    np.testing.assert_allclose(gains[1], manager.gain_tables[actor].lookup(states[1:])[0], rtol=1e-6)
+
+def test_table_over_threshold_is_not_served(make_manager):
+    manager = make_manager(dose_table_max_dose_error=-1.0)
+    manager.dose_table_steps = COARSE_STEPS
+
+    assert manager.build_gain_table("population", manager.population_serving_actor) is None
+    assert len(manager.gain_tables) == 0
+
+def test_published_weights_rebuild_personalized_table(make_manager):
+    writer = make_manager()
+    writer._save_user_models("u1", writer.population_actor, writer.population_critic)
+    manager = make_manager(dose_table_personalized=True, dose_table_max_dose_error=np.inf)
+    manager.dose_table_steps = COARSE_STEPS
+    manager.start()
+
+    actor = manager.get_user_models("u1")["actor"]
+    manager.wait_for_gain_tables(timeout=60)
+    old_table = manager.gain_tables[actor]
+
+    # Simula un paso del proceso de entrenamiento que publica pesos nuevos
+    with torch.no_grad():
+        writer.population_actor.net[-2].bias.add_(0.5)
+    size, checksum = writer.model_store.save_user_models(
+        "u1", writer.population_actor, writer.population_critic, {"model_version": "1"}
+    )
+    assert manager.apply_published_models("u1", 1, size, checksum)
+    manager.wait_for_gain_tables(timeout=60)
+
+    new_actor = manager.get_user_models("u1")["actor"]
+    new_table = manager.gain_tables[new_actor]
+    manager.shutdown()
+    states = new_table.cell_centers()[:100]
+    node = new_table.lower.astype(np.float32)[None]
+    assert new_actor is not actor and old_table not in manager.gain_tables.values()
+    np.testing.assert_allclose(new_table.lookup(node), manager.backend.run(new_actor, node), rtol=1e-5)
+    assert not np.allclose(new_table.lookup(states), old_table.lookup(states))
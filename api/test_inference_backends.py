@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+from inference_backends import NumpyBackend, TorchBackend, compile_numpy_actor, create_backend
+from models.models import Actor
+from src.utils.model_predictor import Actor as PredictorActor
+from constants.constants import STATE_DIM, ACTION_DIM
+
+def _randomized(actor):
+    """Actor con pesos y parámetros de LayerNorm no triviales."""
+    torch.manual_seed(0)
+    with torch.no_grad():
+        for parameter in actor.parameters():
+            parameter.copy_(torch.randn_like(parameter) * 0.3)
+    return actor.eval()
+
+@pytest.mark.parametrize("actor, state_dim", [
+    (Actor(STATE_DIM, ACTION_DIM), STATE_DIM),
+    (PredictorActor(), 5),
+])
+@pytest.mark.parametrize("batch_size", [1, 21, 257])
+def test_numpy_backend_matches_torch(actor, state_dim, batch_size):
+    actor = _randomized(actor)
+    states = np.random.default_rng(batch_size).normal(0, 2, size=(batch_size, state_dim)).astype(np.float32)
+
+    expected = TorchBackend().run(actor, states)
+    actual = NumpyBackend().run(actor, states)
+
+    assert actual.dtype == np.float32 and actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-5)
+
+def test_numpy_backend_sees_in_place_weight_updates():
+    actor = _randomized(Actor(STATE_DIM, ACTION_DIM))
+    backend = NumpyBackend()
+    states = np.ones((2, STATE_DIM), dtype=np.float32)
+    before = backend.run(actor, states)
+
+    with torch.no_grad():
+        actor.net[4].bias.add_(1.0)
+
+    assert not np.allclose(backend.run(actor, states), before)
+    np.testing.assert_allclose(backend.run(actor, states), TorchBackend().run(actor, states), rtol=1e-5, atol=1e-5)
+
+def test_unsupported_modules_fall_back_to_torch():
+    actor = nn.Sequential(nn.Linear(STATE_DIM, ACTION_DIM), nn.GELU())
+    states = np.ones((3, STATE_DIM), dtype=np.float32)
+
+    assert compile_numpy_actor(actor) is None
+    np.testing.assert_array_equal(NumpyBackend().run(actor, states), TorchBackend().run(actor, states))
+
+def test_create_backend_validates_name_and_device():
+    assert isinstance(create_backend("numpy"), NumpyBackend)
+    with pytest.raises(ValueError):
+        create_backend("onnx")
+    with pytest.raises(ValueError):
+        create_backend("numpy", device="cuda")
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+import torch
+
+from inference_executor import InferenceExecutor, InferenceQueueFullError
+
+def test_runs_work_off_the_event_loop_thread():
+    async def run():
+        executor = InferenceExecutor(max_workers=2, max_queue_size=4)
+        executor.start()
+        try:
+            return await executor.run(threading.get_ident), threading.get_ident(), executor.get_stats()
+        finally:
+            executor.shutdown()
+
+    worker_thread, loop_thread, stats = asyncio.run(run())
+
+    assert worker_thread != loop_thread
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
+
+def test_rejects_tasks_beyond_queue_capacity():
+    release = threading.Event()
+
+    async def run():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+        executor.start()
+        try:
+            running = asyncio.ensure_future(executor.run(release.wait))
+            queued = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            stats = executor.get_stats()
+            with pytest.raises(InferenceQueueFullError):
+                await executor.run(release.wait)
+            release.set()
+            await asyncio.gather(running, queued)
+            return stats, executor.get_stats()
+        finally:
+            release.set()
+            executor.shutdown()
+
+    busy_stats, final_stats = asyncio.run(run())
+
+    assert busy_stats["running"] == 1
+    assert busy_stats["queue_depth"] == 1
+    assert final_stats["rejected"] == 1
+    assert final_stats["completed"] == 2
+
+def test_cancelled_callers_keep_their_slot_until_the_task_finishes():
+    release = threading.Event()
+
+    async def run():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+        executor.start()
+        try:
+            running = asyncio.ensure_future(executor.run(release.wait))
+            queued = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            running.cancel()
+            queued.cancel()
+            await asyncio.sleep(0.05)
+            # La tarea en ejecución no se puede cancelar y sigue ocupando su lugar; la encolada se libera
+            during = executor.get_stats()
+            release.set()
+            await asyncio.sleep(0.05)
+            return during, executor.get_stats()
+        finally:
+            release.set()
+            executor.shutdown()
+
+    during, after = asyncio.run(run())
+
+    assert during["running"] == 1 and during["queue_depth"] == 0
+    assert after["running"] == 0 and after["queue_depth"] == 0 and after["completed"] == 1
+
+def test_initializer_configures_only_the_pool_threads():
+    def subnormal():
+        return (torch.tensor([1e-40]) * 1.0).item()
+
+    async def run():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=1, initializer=lambda: torch.set_flush_denormal(True))
+        executor.start()
+        try:
+            return await executor.run(subnormal)
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(run()) == 0.0
+    assert subnormal() > 0.0
+
+def test_pool_threads_start_only_when_the_executor_is_started():
+    before = set(threading.enumerate())
+    executor = InferenceExecutor(max_workers=2, max_queue_size=4)
+    created = set(threading.enumerate()) - before
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(executor.run(threading.get_ident))
+    executor.shutdown()
+
+    assert not created
+    assert executor.get_stats()["rejected"] == 0 and executor.get_stats()["queue_depth"] == 0
@@ -0,0 +1,147 @@
+import copy
+from datetime import datetime
+
+import numpy as np
+import pytest
+import torch
+
+from models.models import Actor, Critic
+from low_rank import attach_low_rank, base_layers, is_low_rank, low_rank_actor_gains, low_rank_from_full
+from convert_to_low_rank import convert_directory
+from training_worker import OnlineTrainer
+from response_models import BolusRequest, UserProfile
+from constants.constants import (
+    STATE_DIM,
+    ACTION_DIM,
+    PERSONALIZATION_METADATA_KEY
+)
+
+def _perturbed(model, scale, seed):
+    generator = torch.Generator().manual_seed(seed)
+    with torch.no_grad():
+        for param in model.parameters():
+            param.add_(torch.randn(param.shape, generator=generator) * scale)
+    return model
+
+def _requests(user_ids):
+    return [
+        BolusRequest(
+            user_id=user_id, cgm_value=cgm, carb_intake_grams=60.0, iob=0.5, timestamp=datetime(2025, 6, 19, 12, 30)
+        )
+        for user_id in user_ids for cgm in (90.0, 180.0)
+    ]
+
+def test_adapters_start_at_the_base_and_share_its_weights():
+    torch.manual_seed(0)
+    base = Actor(STATE_DIM, ACTION_DIM)
+    model = attach_low_rank(base, rank=4)
+    states = torch.rand(5, STATE_DIM)
+
+    torch.testing.assert_close(model(states), base(states))
+    assert is_low_rank(model) and not is_low_rank(base)
+    assert all(name.rsplit(".", 1)[1] in ("lora_a", "lora_b", "bias_delta") for name in model.state_dict())
+    assert sum(p.numel() for p in model.parameters()) < sum(p.numel() for p in base.parameters()) / 5
+    # Las copias (redes objetivo, exportación) siguen apuntando a la misma base
+    assert base_layers(copy.deepcopy(model)) == base_layers(model) == tuple(base.net[::2])
+
+def test_shared_base_evaluation_matches_each_actor():
+    torch.manual_seed(1)
+    rng = np.random.default_rng(1)
+    base = Actor(STATE_DIM, ACTION_DIM)
+    actors = [_perturbed(attach_low_rank(base, rank=4), 0.05, seed) for seed in range(4)]
+    states = [rng.random((rows, STATE_DIM)).astype(np.float32) for rows in (3, 21, 1, 7)]
+
+    gains = low_rank_actor_gains(actors, states)
+
+    for actor, actor_states, actor_gains in zip(actors, states, gains):
+        with torch.no_grad():
+            expected = actor(torch.from_numpy(actor_states)).numpy()
+        np.testing.assert_allclose(actor_gains, expected, rtol=1e-5, atol=1e-6)
+
+def test_svd_recovers_low_rank_differences():
+    torch.manual_seed(2)
+    base = Critic(STATE_DIM, ACTION_DIM)
+    full = copy.deepcopy(base)
+    with torch.no_grad():
+        for layer in full.net1[::2]:
+            layer.weight.add_(torch.randn(layer.out_features, 2) @ torch.randn(2, layer.in_features) * 0.01)
+            layer.bias.add_(0.1)
+
+    exact, exact_errors = low_rank_from_full(base, full, rank=2)
+    _, truncated_errors = low_rank_from_full(base, full, rank=1)
+
+    assert max(exact_errors) < 1e-6
+    assert min(truncated_errors[:2]) > 1e-4
+    state, action = torch.rand(6, STATE_DIM), torch.rand(6, ACTION_DIM)
+    torch.testing.assert_close(exact(state, action), full(state, action), rtol=1e-4, atol=1e-5)
+
+def test_low_rank_mode_saves_only_adapters_and_reloads_them(make_manager):
+    manager = make_manager(personalization_mode="low_rank", low_rank_rank=4)
+    user_models = manager._materialize_user_models("u1")
+    _perturbed(user_models["actor"], 0.01, seed=3)
+    manager._save_user_models("u1", user_models["actor"], user_models["critic"])
+
+    actor_state, critic_state, metadata = manager.model_store.load_user_state("u1")
+    assert metadata[PERSONALIZATION_METADATA_KEY] == "low_rank"
+    assert actor_state.keys() == user_models["actor"].state_dict().keys()
+    assert critic_state.keys() == user_models["critic"].state_dict().keys()
+
+    # Un administrador en modo completo carga igual los pesos según cómo se guardaron
+    reader = make_manager(dose_table_personalized=False)
+    loaded = reader.get_user_models("u1")
+    assert is_low_rank(loaded["actor"]) and base_layers(loaded["actor"])[0] is reader.population_actor.net[0]
+    states = torch.rand(4, STATE_DIM) * torch.tensor([300.0, 5.0, 1440.0, 5.0])
+    with torch.no_grad():
+        torch.testing.assert_close(loaded["actor"](states), user_models["actor"](states))
+
+def test_conversion_reports_errors_and_serves_adapters(make_manager, models_dir):
+    writer = make_manager()
+    for shift, user_id in enumerate(("u1", "u2", "u3")):
+        actor = copy.deepcopy(writer.population_actor)
+        with torch.no_grad():
+            # La última capa tiene 3 salidas: su diferencia es de rango <= 3
+            actor.net[-2].weight.mul_(1.0 - shift)
+        writer.model_store.save_user_models(user_id, actor, writer.population_critic)
+    full = make_manager(prediction_cache_max_entries=0, dose_table_personalized=False)
+    requests = _requests(("u1", "u2", "u3"))
+    expected = full.predict_bolus_with_confidence_batch(requests)
+
+    assert [report["converted"] for report in convert_directory(models_dir, rank=4, dry_run=True)] == [False] * 3
+    reports = convert_directory(models_dir, rank=4)
+
+    assert [report["user_id"] for report in reports] == ["u1", "u2", "u3"]
+    for report in reports:
+        assert report["converted"] and report["max_dose_deviation"] < 1e-3
+        assert report["actor_weight_error"] < 1e-5 and report["critic_weight_error"] < 1e-5
+    assert convert_directory(models_dir, rank=4) == []
+
+    manager = make_manager(prediction_cache_max_entries=0, dose_table_personalized=False)
+    results = manager.predict_bolus_with_confidence_batch(requests)
+    for result, reference in zip(results, expected):
+        assert result[:3] == pytest.approx(reference[:3], abs=1e-3)
+    assert len({round(result[0], 3) for result in results[::2]}) == 3
+    assert all(is_low_rank(manager.get_user_models(user_id)["actor"]) for user_id in ("u1", "u2", "u3"))
+    assert manager.get_model_version("u1") == "personalized-v1"
+
+def test_trainer_updates_only_the_adapters(make_manager, models_dir):
+    server = make_manager(dose_table_personalized=False)
+    server.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+    population_before = {name: p.clone() for name, p in server.population_actor.state_dict().items()}
+    trainer = OnlineTrainer(
+        models_dir, batch_size=8, update_freq=4, min_transitions=4, personalization_mode="low_rank", low_rank_rank=4
+    )
+    rng = np.random.default_rng(4)
+    for _ in range(4):
+        state = np.array([rng.uniform(70, 250), 1.0, rng.uniform(0, 1440), 1.0], dtype=np.float32)
+        trainer.observe(("u1", state, np.ones(ACTION_DIM, dtype=np.float32), 1.0, state, False))
+
+    published = trainer.train_due()
+    trainer.close()
+
+    assert [version[:2] for version in published] == [("u1", 1)]
+    assert server.apply_published_models(*published[0])
+    served = server.get_user_models("u1")["actor"]
+    assert is_low_rank(served)
+    torch.testing.assert_close(dict(served.state_dict()), dict(trainer.agents.export("u1")[0].state_dict()))
+    for name, param in trainer.models.population_actor.state_dict().items():
+        torch.testing.assert_close(param, population_before[name])
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+def test_concurrent_submissions_are_grouped_and_resolved_individually():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(process, max_wait_ms=5.0, max_batch_size=4)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+
+    assert results == [i * 10 for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    stats = batcher.get_stats()
+    assert stats["batches_processed"] == 3
+    assert stats["items_processed"] == 10
+    assert stats["max_observed_batch_size"] == 4
+
+def test_per_item_errors_only_fail_their_caller():
+    def process(items):
+        return [ValueError(item) if item < 0 else item for item in items]
+
+    async def run():
+        batcher = MicroBatcher(process, max_wait_ms=1.0, max_batch_size=8)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(-1), return_exceptions=True)
+
+    ok, failed = asyncio.run(run())
+
+    assert ok == 1
+    assert isinstance(failed, ValueError)
+
+def test_batch_failure_propagates_to_all_callers():
+    def process(items):
+        raise RuntimeError("fallo")
+
+    async def run():
+        batcher = MicroBatcher(process, max_wait_ms=1.0, max_batch_size=8)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import torch
+
+import router
+from model_cache import ModelCache, models_size_bytes
+
+def _models(size=100):
+    """Entrada con un único modelo de `size` parámetros float32."""
+    return {"actor": torch.nn.Linear(size, 1, bias=False)}
+
+ENTRY_BYTES = 100 * 4
+
+def test_evicts_least_recently_used_entries_over_budget():
+    cache = ModelCache(max_bytes=2 * ENTRY_BYTES, ttl_seconds=3600)
+    cache["a"] = _models()
+    cache["b"] = _models()
+    cache.get("a")
+    cache["c"] = _models()
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes_used"] == 2 * ENTRY_BYTES
+
+def test_pinned_entries_count_towards_budget_but_are_never_evicted():
+    population = _models()
+    cache = ModelCache(max_bytes=2 * ENTRY_BYTES, ttl_seconds=0)
+    cache.pin("population", population)
+    cache["a"] = _models()
+    cache["b"] = _models()
+
+    assert len(cache) == 1 and "b" in cache
+    assert cache.evict_expired() == 1
+    assert cache.get_stats()["pinned_bytes"] == ENTRY_BYTES
+
+def test_tensors_shared_with_pinned_entries_are_not_counted():
+    population = _models()
+    cache = ModelCache(max_bytes=10 * ENTRY_BYTES, ttl_seconds=3600)
+    cache.pin("population", population)
+    cache["shared_user"] = {"actor": population["actor"]}
+
+    assert cache.get_stats()["bytes_used"] == ENTRY_BYTES
+    assert models_size_bytes(population) == ENTRY_BYTES
+
+def test_counts_hits_misses_and_expires_idle_entries():
+    cache = ModelCache(max_bytes=10 * ENTRY_BYTES, ttl_seconds=0.01)
+    cache["a"] = _models()
+    assert cache.get("a") is not None
+    assert cache.get("missing") is None
+    time.sleep(0.02)
+
+    assert cache.evict_expired() == 1
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+
+def test_periodic_cleanup_survives_failures_off_the_event_loop(monkeypatch):
+    calls = []
+
+    def cleanup():
+        calls.append(("cleanup", threading.current_thread() is threading.main_thread()))
+        raise RuntimeError("fallo")
+
+    monkeypatch.setattr(router, "MODEL_CLEANUP_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(router, "model_manager", SimpleNamespace(
+        cleanup_unused_models=cleanup, refresh_model_manifest=lambda: calls.append(("refresh", None))
+    ), raising=False)
+
+    async def run():
+        task = asyncio.create_task(router._periodic_model_cleanup())
+        while len(calls) < 4:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert calls[:4] == [("cleanup", False), ("refresh", None)] * 2
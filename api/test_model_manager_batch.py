@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from model_manager import ModelManager
+from response_models import BolusBatchColumns, BolusRequest, UserProfile
+
+@pytest.fixture
+def manager(make_manager):
+    """ModelManager con copias de los modelos poblacionales en un directorio temporal."""
+    manager = make_manager()
+    manager.register_user(UserProfile(user_id="population_user"))
+    return manager
+
+def _request(cgm_value, carbs, iob, hour):
+    return BolusRequest(
+        user_id="population_user",
+        cgm_value=cgm_value,
+        carb_intake_grams=carbs,
+        iob=iob,
+        timestamp=datetime(2025, 6, 19, hour, 30)
+    )
+
+def test_batch_matches_single_predictions(manager):
+    requests = [_request(65.0, 0.0, 0.0, 7), _request(180.0, 60.0, 1.0, 13), _request(320.0, 0.0, 4.0, 21)]
+
+    batch_results = manager.predict_bolus_with_confidence_batch(requests)
+
+    for request, batch_result in zip(requests, batch_results):
+        bolus, lower, upper, alerts = manager.predict_bolus_with_confidence(request)
+        assert batch_result[0] == pytest.approx(bolus, abs=1e-9)
+        assert batch_result[1] == pytest.approx(lower, abs=1e-9)
+        assert batch_result[2] == pytest.approx(upper, abs=1e-9)
+        assert batch_result[3] == alerts
+
+def test_batch_reports_errors_per_row(manager):
+    manager.population_actor = None
+    results = manager.predict_bolus_with_confidence_batch([_request(120.0, 0.0, 0.0, 8)])
+
+    assert isinstance(results[0], ValueError)
+
+def test_requests_from_columns_validates_each_row(manager):
+    columns = BolusBatchColumns(
+        user_id=["population_user", "population_user", "population_user"],
+        cgm_value=[120.0, 20.0, 150.0],
+        carb_intake_grams=[30.0, 0.0, 500.0],
+        timestamp=[datetime(2025, 6, 19, 8, 0)] * 3
+    )
+
+    rows = manager.requests_from_columns(columns)
+
+    assert isinstance(rows[0], BolusRequest)
+    assert rows[0].carb_intake_grams == 30.0 and rows[0].iob == 0.0
+    assert "CGM" in rows[1]
+    assert "Carbohidratos" in rows[2]
+
+def test_batch_endpoint_reports_invalid_rows_without_rejecting_the_batch(monkeypatch, manager):
+    monkeypatch.setattr(router, "ModelManager", lambda: manager)
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+    rows = [
+        {"user_id": "population_user", "cgm_value": 120.0, "carb_intake_grams": 30.0},
+        {"user_id": "population_user", "cgm_value": 20.0},
+        {"cgm_value": 150.0},
+        {"user_id": "unknown", "cgm_value": 150.0}
+    ]
+
+    with TestClient(router.app) as client:
+        response = client.post("/predict/bolus/batch", json={"requests": rows})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["num_succeeded"] == 1 and body["num_failed"] == 3
+    assert body["results"][0]["result"]["user_id"] == "population_user"
+    assert body["results"][1]["error"] == "Valor de CGM debe estar entre 40.0 y 400.0 mg/dL"
+    assert body["results"][2]["error"].startswith("user_id:")
+    assert body["results"][3]["error"] == "Usuario no encontrado"
+
+def test_numpy_backend_predictions_match_torch_backend(manager):
+    numpy_manager = ModelManager(models_directory=manager.models_directory, inference_backend="numpy")
+    numpy_manager.register_user(UserProfile(user_id="population_user"))
+    requests = [_request(65.0, 0.0, 0.0, 7), _request(180.0, 60.0, 1.0, 13), _request(320.0, 0.0, 4.0, 21)]
+
+    for expected, actual in zip(manager.predict_bolus_with_confidence_batch(requests),
+                                numpy_manager.predict_bolus_with_confidence_batch(requests)):
+        assert actual[:3] == pytest.approx(expected[:3], abs=1e-4)
+        assert actual[3] == expected[3]
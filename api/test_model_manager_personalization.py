@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from response_models import UserProfile
+
+@pytest.fixture
+def manager(make_manager):
+    """ModelManager con copias de los modelos poblacionales en un directorio temporal."""
+    return make_manager()
+
+def _model_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("personalized_"))
+
+def test_registration_shares_population_weights(manager):
+    assert manager.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+
+    user_models = manager.get_user_models("u1")
+
+    assert user_models["actor"] is manager.population_actor
+    assert not manager.has_personalized_models("u1")
+    assert _model_files(manager.models_directory) == []
+    assert len(manager.loaded_models) == 0
+
+def test_feedback_without_weight_changes_does_not_materialize(manager):
+    manager.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+
+    manager.update_user_model_with_feedback("u1", np.zeros(4), np.ones(3), 1.0, np.zeros(4), False)
+
+    assert not manager.has_personalized_models("u1")
+    assert _model_files(manager.models_directory) == []
+
+def test_materialization_copies_population_weights(manager):
+    manager.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+
+    user_models = manager._materialize_user_models("u1")
+
+    assert user_models["actor"] is not manager.population_actor
+    for own, shared in zip(user_models["actor"].parameters(), manager.population_actor.parameters()):
+        assert torch.equal(own, shared)
+        assert own.data_ptr() != shared.data_ptr()
+    assert manager.has_personalized_models("u1")
+    assert manager.get_user_models("u1") is user_models
+
+def test_materialized_models_survive_cache_eviction(make_manager):
+    # Presupuesto de un solo usuario: materializar al segundo desaloja al primero
+    manager = make_manager(model_cache_max_bytes=1)
+    first = manager._materialize_user_models("u1")
+    manager._materialize_user_models("u2")
+
+    assert "u1" not in manager.loaded_models
+    assert manager.has_personalized_models("u1")
+    assert _model_files(manager.models_directory) == ["personalized_u1.safetensors", "personalized_u2.safetensors"]
+
+    reloaded = manager._materialize_user_models("u1")
+
+    assert reloaded["actor"] is not manager.population_actor and "critic" in reloaded
+    assert manager.get_model_version("u1") == "personalized-v0"
+    for own, stored in zip(first["actor"].parameters(), reloaded["actor"].parameters()):
+        assert torch.equal(own, stored)
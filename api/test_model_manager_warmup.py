@@ -0,0 +1,63 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from model_manager import ModelManager
+from models.models import Actor, Critic
+from constants.constants import STATE_DIM, ACTION_DIM
+
+@pytest.fixture
+def manager(make_manager):
+    """ModelManager con modelos poblacionales y tres usuarios personalizados en disco."""
+    writer = make_manager()
+    for index, user_id in enumerate(("u1", "u2", "u3")):
+        writer._save_user_models(user_id, Actor(STATE_DIM, ACTION_DIM), Critic(STATE_DIM, ACTION_DIM))
+        os.utime(writer.model_store.user_path(user_id), (1000 + index, 1000 + index))
+    return make_manager()
+
+def test_warm_up_preloads_most_recent_models_and_marks_ready(manager):
+    assert not manager.ready.is_set()
+
+    stats = manager.warm_up(max_models=2, max_workers=2, users_file="")
+
+    assert stats["selected"] == stats["warmed"] == 2
+    assert "u3" in manager.loaded_models and "u2" in manager.loaded_models
+    assert "u1" not in manager.loaded_models
+    assert manager.ready.is_set()
+
+def test_warm_up_uses_listed_users(manager, tmp_path):
+    users_file = tmp_path / "warmup.txt"
+    users_file.write_text("u1\ndesconocido\n")
+
+    stats = manager.warm_up(max_models=10, max_workers=2, users_file=str(users_file))
+
+    assert stats["warmed"] == 1
+    assert "u1" in manager.loaded_models and "u3" not in manager.loaded_models
+
+def test_warm_up_runs_the_served_actor_variants(make_manager, monkeypatch):
+    make_manager()._save_user_models(
+        "u1", Actor(STATE_DIM, ACTION_DIM), Critic(STATE_DIM, ACTION_DIM)
+    )
+    manager = make_manager(serving_precision="float16")
+    warmed = []
+    monkeypatch.setattr(manager, "_warm_up_actor", warmed.append)
+
+    manager.warm_up(max_models=1, max_workers=1, users_file="")
+
+    assert warmed[0] is manager.population_serving_actor
+    assert warmed[1] is manager.loaded_models["u1"]["actor"]
+    assert manager.population_serving_actor is not manager.population_actor
+
+def test_ready_endpoint_reports_warm_up_state(make_manager, monkeypatch):
+    monkeypatch.setattr(router, "ModelManager", make_manager)
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+
+    with TestClient(router.app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503 and response.json()["ready"] is False
+
+        router.model_manager.ready.set()
+        response = client.get("/ready")
+        assert response.status_code == 200 and response.json()["ready"] is True
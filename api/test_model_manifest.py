@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pytest
+import torch
+
+from model_manager import ModelManager
+from model_manifest import ModelManifest
+from models.models import Actor, Critic
+from constants.constants import STATE_DIM, ACTION_DIM
+
+REPO_MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+
+@pytest.fixture
+def manager(make_manager, models_dir):
+    """ModelManager con los modelos poblacionales y un par personalizado en formato .pth."""
+    for file_name in ("personalized_actor_adult#001.pth", "personalized_critic_adult#001.pth"):
+        shutil.copy(os.path.join(REPO_MODELS_DIR, file_name), os.path.join(models_dir, file_name))
+    return make_manager()
+
+def _fail_on_filesystem_access(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("acceso inesperado al sistema de archivos")
+    for name in ("exists", "isfile", "getmtime", "getsize"):
+        monkeypatch.setattr(os.path, name, fail)
+    monkeypatch.setattr(os, "stat", fail)
+    monkeypatch.setattr(os, "scandir", fail)
+
+def test_startup_indexes_legacy_pairs(manager):
+    entry = manager.model_store.user_entry("adult#001")
+
+    assert entry is not None and entry.legacy
+    assert len(entry.paths) == 2 and entry.checksum is None
+    assert manager.model_store.manifest.get_stats()["scans"] == 1
+
+def test_users_without_models_are_answered_without_filesystem_access(manager, monkeypatch):
+    _fail_on_filesystem_access(monkeypatch)
+
+    assert not manager.has_personalized_models("nuevo")
+    assert manager.get_user_models("nuevo")["actor"] is manager.population_actor
+
+def test_store_writes_keep_the_manifest_current(manager):
+    manager._save_user_models("u1", Actor(STATE_DIM, ACTION_DIM), Critic(STATE_DIM, ACTION_DIM))
+    entry = manager.model_store.user_entry("u1")
+
+    assert entry is not None and not entry.legacy
+    assert entry.size == os.path.getsize(entry.paths[0])
+    assert len(entry.checksum) == 64
+    assert ModelManifest(manager.models_directory).refresh() == 2
+
+def test_directories_are_created_on_first_write(tmp_path):
+    models_dir = tmp_path / "models"
+    manager = ModelManager(models_directory=str(models_dir))
+
+    assert not models_dir.exists()
+    assert not manager.has_personalized_models("u1")
+
+    manager.cgm_series.append("u1", 1.75e9, 120.0)
+    manager._save_user_models("u1", Actor(STATE_DIM, ACTION_DIM), Critic(STATE_DIM, ACTION_DIM))
+
+    assert manager.has_personalized_models("u1")
+    assert sorted(os.listdir(models_dir)) == sorted([os.path.basename(manager.model_store.user_path("u1")), "cgm"])
+
+def test_unloadable_files_are_not_retried_until_they_change(manager):
+    path = manager.model_store.user_path("roto")
+    with open(path, "wb") as f:
+        f.write(b"\x10\x00\x00\x00\x00\x00\x00\x00{}              ")
+    manager.refresh_model_manifest()
+    assert manager.has_personalized_models("roto")
+
+    assert manager.get_user_models("roto")["actor"] is manager.population_actor
+    manager.refresh_model_manifest()
+    assert not manager.has_personalized_models("roto")
+    assert manager.model_store.manifest.get_stats()["failed_entries"] == 1
+
+    manager.model_store.save_user_models("roto", Actor(STATE_DIM, ACTION_DIM), None)
+    assert isinstance(manager.get_user_models("roto")["actor"], Actor)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import torch
+
+from model_cache import models_size_bytes
+from model_quantization import HalfPrecisionActor, make_serving_variant, max_dose_deviation, reference_grid
+from models.models import Actor, Critic
+from constants.constants import STATE_DIM, ACTION_DIM
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_variants_stay_within_dose_tolerance(make_manager, precision):
+    manager = make_manager()
+    variant = make_serving_variant(manager.population_actor, precision)
+
+    assert variant is not manager.population_actor
+    assert max_dose_deviation(manager.population_actor, variant, manager._predict_bolus_array) < 0.1
+    assert len(reference_grid()[0]) > 1000
+
+def test_int8_serving_caches_only_the_smaller_actor(make_manager):
+    writer = make_manager()
+    writer._save_user_models("u1", writer.population_actor, writer.population_critic)
+    manager = make_manager(serving_precision="int8")
+
+    served = manager.get_user_models("u1")
+    trainable = manager.get_user_models("u1", trainable=True)
+
+    assert set(served) == {"actor"}
+    assert models_size_bytes(served) < models_size_bytes({"actor": trainable["actor"]}) / 3
+    assert isinstance(trainable["actor"], Actor) and isinstance(trainable["critic"], Critic)
+    assert manager.population_serving_actor is not manager.population_actor
+    assert manager.get_user_models("sin_modelo")["actor"] is manager.population_serving_actor
+
+def test_variant_over_threshold_is_not_served(make_manager):
+    manager = make_manager(serving_precision="float16", max_dose_deviation=-1.0)
+
+    assert manager.population_serving_actor is manager.population_actor
+
+def test_half_precision_actor_keeps_float32_interface():
+    variant = HalfPrecisionActor(Actor(STATE_DIM, ACTION_DIM))
+
+    output = variant(torch.ones(2, STATE_DIM))
+
+    assert output.dtype == torch.float32
+    assert all(parameter.dtype == torch.float16 for parameter in variant.parameters())
+
+def test_unknown_precision_is_rejected(make_manager):
+    with pytest.raises(ValueError):
+        make_manager(serving_precision="int4")
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from convert_models import convert_directory
+from model_store import ModelStore, load_module_state
+from models.models import Actor, Critic
+from packed_format import read_header, read_packed, write_packed
+from constants.constants import STATE_DIM, ACTION_DIM
+
+def _models():
+    torch.manual_seed(0)
+    return Actor(STATE_DIM, ACTION_DIM).eval(), Critic(STATE_DIM, ACTION_DIM).eval()
+
+def test_packed_round_trip_preserves_tensors_and_metadata(tmp_path):
+    path = str(tmp_path / "m.safetensors")
+    tensors = {"a": torch.randn(3, 5), "b": torch.arange(7, dtype=torch.float32)}
+
+    write_packed(path, tensors, {"user_id": "u1"})
+    loaded, metadata = read_packed(path)
+    header, header_metadata = read_header(path)
+
+    assert metadata == header_metadata
+    assert metadata["user_id"] == "u1" and len(metadata["sha256"]) == 64
+    assert set(header) == {"a", "b"}
+    for name, tensor in tensors.items():
+        assert torch.equal(loaded[name], tensor)
+
+def test_loaded_modules_share_memory_with_the_mapping(tmp_path):
+    actor, critic = _models()
+    store = ModelStore(str(tmp_path))
+    store.save_user_models("u1", actor, critic)
+
+    actor_state, critic_state, metadata = store.load_user_state("u1")
+    loaded = load_module_state(Actor(STATE_DIM, ACTION_DIM), actor_state)
+
+    assert metadata["user_id"] == "u1"
+    assert critic_state is not None
+    for name, parameter in loaded.state_dict().items():
+        assert parameter.data_ptr() == actor_state[name].data_ptr()
+        assert torch.equal(parameter, actor.state_dict()[name])
+
+def test_float16_storage_is_converted_back_to_module_dtype(tmp_path):
+    actor, _ = _models()
+    store = ModelStore(str(tmp_path), storage_dtype="float16")
+    store.save_user_models("u1", actor, None)
+
+    actor_state, critic_state, _ = store.load_user_state("u1")
+    loaded = load_module_state(Actor(STATE_DIM, ACTION_DIM), actor_state)
+
+    assert critic_state is None
+    assert all(tensor.dtype == torch.float16 for tensor in actor_state.values())
+    for name, parameter in loaded.state_dict().items():
+        assert parameter.dtype == torch.float32
+        assert torch.allclose(parameter, actor.state_dict()[name], atol=1e-3)
+
+def test_manager_prefers_converted_models(make_manager, models_dir, tmp_path):
+    legacy = make_manager()
+
+    written = convert_directory(models_dir, remove_legacy=True)
+    packed = make_manager()
+
+    assert os.listdir(tmp_path) == [os.path.basename(written[0])]
+    states = np.random.default_rng(0).uniform(0, 1, size=(4, STATE_DIM)).astype(np.float32)
+    with torch.no_grad():
+        expected = legacy.population_actor(torch.from_numpy(states))
+        actual = packed.population_actor(torch.from_numpy(states))
+    assert torch.equal(expected, actual)
@@ -0,0 +1,58 @@
+import numpy as np
+import torch
+
+from models.models import (
+    Actor,
+    apply_safety_constraints,
+    apply_safety_constraints_batch,
+    compute_bolus,
+    compute_bolus_batch,
+    flush_subnormal_parameters,
+)
+from constants.constants import STATE_DIM, ACTION_DIM
+
+NUM_CASES = 5000
+
+def _random_cases(rng, n):
+    """Genera entradas aleatorias con alta densidad en los umbrales clínicos."""
+    edges = np.array([40.0, 53.999, 54.0, 69.999, 70.0, 110.0, 110.001, 400.0])
+    cgm = np.where(rng.random(n) < 0.3, rng.choice(edges, n), rng.uniform(10.0, 900.0, n))
+    cho = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0.0, 300.0, n))
+    iob = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0.0, 50.0, n))
+    # Ganancias en float32, como las produce el actor
+    gains = rng.uniform(0.0, 2.5, (n, 3)).astype(np.float32)
+    mealtime = rng.random(n) < 0.8
+    return gains, cho, cgm, iob, mealtime
+
+def test_apply_safety_constraints_batch_matches_scalar():
+    rng = np.random.default_rng(0)
+    gains, _, cgm, _, _ = _random_cases(rng, NUM_CASES)
+
+    batch = apply_safety_constraints_batch(gains, cgm)
+    expected = np.stack([
+        apply_safety_constraints(torch.from_numpy(g), float(c)).numpy() for g, c in zip(gains, cgm)
+    ])
+
+    np.testing.assert_array_equal(batch, expected)
+    assert batch.dtype == np.float32
+
+def test_compute_bolus_batch_matches_scalar():
+    rng = np.random.default_rng(1)
+    gains, cho, cgm, iob, mealtime = _random_cases(rng, NUM_CASES)
+    safe_gains = apply_safety_constraints_batch(gains, cgm)
+
+    batch = compute_bolus_batch(safe_gains, cho, cgm, iob, mealtime)
+    expected = np.array([
+        compute_bolus(torch.from_numpy(g), float(c), float(b), float(i), bool(m))
+        for g, c, b, i, m in zip(safe_gains, cho, cgm, iob, mealtime)
+    ])
+
+    np.testing.assert_array_equal(batch, expected)
+
+def test_flush_subnormal_parameters_zeroes_only_subnormals():
+    actor = Actor(STATE_DIM, ACTION_DIM, (8,))
+    with torch.no_grad():
+        actor.net[0].weight[0, :2] = torch.tensor([1e-40, 0.5])
+
+    assert flush_subnormal_parameters(actor) == 1
+    assert actor.net[0].weight[0, 0] == 0.0 and actor.net[0].weight[0, 1] == 0.5
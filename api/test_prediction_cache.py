@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from models.models import Actor
+from prediction_cache import PredictionCache
+from response_models import BolusRequest, UserProfile
+from constants.constants import STATE_DIM, ACTION_DIM
+
+@pytest.fixture
+def manager(make_manager):
+    """ModelManager con modelos poblacionales y un usuario personalizado en disco."""
+    writer = make_manager()
+    writer._save_user_models("u1", writer.population_actor, writer.population_critic)
+    manager = make_manager(prediction_cache_max_entries=100)
+    manager.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+    return manager
+
+def _request(cgm_value, iob=1.0, exercise_intensity=None, carb_intake_grams=45.0):
+    return BolusRequest(
+        user_id="u1",
+        cgm_value=cgm_value,
+        carb_intake_grams=carb_intake_grams,
+        iob=iob,
+        exercise_intensity=exercise_intensity,
+        timestamp=datetime(2025, 6, 19, 12, 30)
+    )
+
+def test_quantized_keys_and_lru_eviction():
+    cache = PredictionCache(2, 1.0, 1.0, 0.05, 1.0)
+    actor = Actor(STATE_DIM, ACTION_DIM)
+    steps = cache.quantize(120.4, 30.2, 1.02, 750)
+    near_steps = cache.quantize(119.6, 29.8, 0.99, 750)
+
+    assert steps == near_steps == (120, 30, 20, 750)
+
+    for cgm in (100, 110, 120):
+        cache.put(cache.key("u1", actor, (cgm, 30, 20, 750)), (1.0, 0.9, 1.1))
+    stats = cache.get_stats()
+
+    assert cache.get(cache.key("u1", actor, (100, 30, 20, 750))) is None
+    assert cache.get(cache.key("u1", actor, (120, 30, 20, 750))) == (1.0, 0.9, 1.1)
+    assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["bytes_used"] > 0
+    assert cache.invalidate_user("u1") == 2 and len(cache) == 0
+
+def test_actor_versions_never_collide():
+    cache = PredictionCache(10, 1.0, 1.0, 0.05, 1.0)
+    actor = Actor(STATE_DIM, ACTION_DIM)
+    key = cache.key("u1", actor, (120, 30, 20, 750))
+
+    assert cache.key("u1", Actor(STATE_DIM, ACTION_DIM), (120, 30, 20, 750)) != key
+    cache.invalidate_actor(actor)
+    assert cache.key("u1", actor, (120, 30, 20, 750)) != key
+
+def test_repeated_requests_are_served_from_cache(manager):
+    first = manager.predict_bolus_with_confidence(_request(120.2))
+    retry = manager.predict_bolus_with_confidence(_request(119.8, exercise_intensity=9))
+    stats = manager.prediction_cache.get_stats()
+
+    assert retry[:3] == first[:3]
+    # Las alertas se calculan con la solicitud recibida, no se guardan
+    assert len(retry[3]) > len(first[3])
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+def test_misses_are_computed_from_the_exact_inputs(manager):
+    bolus, _, _, _ = manager.predict_bolus_with_confidence(_request(120.2, iob=1.004))
+    expected = manager._predict_bolus_with_uncertainty(
+        manager.get_user_models("u1")["actor"], np.array([120.2]), np.array([45.0]), np.array([1.004]), np.array([750])
+    )
+
+    assert bolus == pytest.approx(float(expected[0, 0]))
+
+def test_cells_around_clinical_thresholds_are_not_cached():
+    cache = PredictionCache(10, 1.0, 1.0, 0.05, 1.0, cgm_thresholds=(70.0,), cgm_margin=4.0)
+
+    assert cache.crosses_threshold(cache.quantize(69.6, 30, 1, 750))
+    # Celda [65.5, 66.5) más el margen: alcanza 70.5
+    assert cache.crosses_threshold(cache.quantize(66.4, 30, 1, 750))
+    assert cache.crosses_threshold(cache.quantize(74.4, 30, 1, 750))
+    assert not cache.crosses_threshold(cache.quantize(65.4, 30, 1, 750))
+    assert not cache.crosses_threshold(cache.quantize(75.6, 30, 1, 750))
+
+def test_doses_around_the_hypo_threshold_match_the_uncached_path(manager, make_manager):
+    uncached = make_manager()
+    uncached.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+
+    for cgm_value in (69.6, 70.4, 69.6):
+        request = _request(cgm_value, iob=0.0, carb_intake_grams=60.0)
+        assert manager.predict_bolus_with_confidence(request)[:3] == uncached.predict_bolus_with_confidence(request)[:3]
+
+    assert manager.predict_bolus_with_confidence(_request(69.6, iob=0.0, carb_intake_grams=60.0))[0] == 0.0
+    assert manager.predict_bolus_with_confidence(_request(70.4, iob=0.0, carb_intake_grams=60.0))[0] > 0.0
+    assert len(manager.prediction_cache) == 0
+
+def test_model_and_profile_updates_invalidate_user_entries(manager):
+    manager.predict_bolus_with_confidence(_request(120.0))
+    user_models = manager.get_user_models("u1")
+    size, checksum = manager.model_store.save_user_models("u1", user_models["actor"], user_models["critic"])
+    manager.apply_published_models("u1", 1, size, checksum)
+
+    assert len(manager.prediction_cache) == 0
+
+    manager.predict_bolus_with_confidence(_request(120.0))
+    manager.register_user(UserProfile(user_id="u1", icr=12.0))
+
+    assert len(manager.prediction_cache) == 0
+    assert manager.prediction_cache.get_stats()["invalidations"] == 2
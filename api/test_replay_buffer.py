@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from model_manager import ModelManager
+from replay_buffer import PrioritizedReplayBuffer, ReplayBufferPool, SumTree
+
+def _fill(buffer, count, offset=0):
+    for i in range(count):
+        value = float(offset + i)
+        buffer.add(np.full(4, value), np.full(3, value), value, np.full(4, value + 1), i % 2 == 0)
+
+def test_sum_tree_finds_leaves_by_cumulative_priority():
+    rng = np.random.default_rng(0)
+    tree = SumTree(37)
+    priorities = rng.random(37)
+    tree.update(np.arange(37), priorities)
+    values = rng.random(1000) * priorities.sum()
+
+    assert tree.total == pytest.approx(priorities.sum())
+    np.testing.assert_array_equal(tree.find(values), np.searchsorted(np.cumsum(priorities), values, side="right"))
+
+    tree.update(np.array([5, 5, 9]), np.array([0.0, 2.0, 3.0]))
+    assert tree.total == pytest.approx(priorities.sum() - priorities[5] - priorities[9] + 5.0)
+
+def test_buffer_overwrites_oldest_transitions():
+    buffer = PrioritizedReplayBuffer(capacity=3)
+    _fill(buffer, 5)
+
+    assert len(buffer) == 3
+    assert sorted(buffer.rewards.tolist()) == [2.0, 3.0, 4.0]
+
+def test_sampling_follows_priorities_with_importance_weights():
+    buffer = PrioritizedReplayBuffer(capacity=100, alpha=1.0, beta=1.0)
+    _fill(buffer, 100)
+    td_errors = np.full(100, 0.01)
+    td_errors[7] = 100.0
+    buffer.update_priorities(np.arange(100), td_errors)
+
+    batch = buffer.sample(64, np.random.default_rng(0))
+
+    assert np.mean(batch["indices"] == 7) > 0.9
+    assert batch["states"].shape == (64, 4) and batch["actions"].shape == (64, 3)
+    assert batch["weights"].max() == pytest.approx(1.0)
+    assert batch["weights"][batch["indices"] == 7].max() < 0.1
+
+def test_pool_spills_least_recent_buffer_and_restores_it(tmp_path):
+    buffer_bytes = PrioritizedReplayBuffer(capacity=16).nbytes
+    pool = ReplayBufferPool(str(tmp_path), max_bytes=buffer_bytes, capacity=16)
+    pool.add("u1", np.ones(4), np.ones(3), 1.0, np.ones(4), False)
+    pool.get("u1").update_priorities(np.array([0]), np.array([3.0]))
+    pool.add("u2", np.zeros(4), np.zeros(3), 0.0, np.zeros(4), True)
+
+    assert pool.get_stats()["loaded_users"] == 1
+    assert os.path.exists(pool.path("u1")) and "u1" in pool
+
+    restored = pool.get("u1")
+
+    assert len(restored) == 1 and restored.rewards[0] == 1.0
+    assert restored.tree.total == pytest.approx((3.0 + restored.eps) ** restored.alpha)
+    assert pool.get_stats()["spills"] == 2 and pool.get_stats()["restores"] == 1
+
+def test_feedback_endpoint_buffers_transitions(make_manager, monkeypatch):
+    monkeypatch.setattr(router, "ModelManager", make_manager)
+    monkeypatch.setattr(ModelManager, "warm_up", lambda self: None)
+    feedback = {
+        "user_id": "u1",
+        "state": [150.0, 3.0, 720.0, 1.0],
+        "action": [1.0, 1.0, 1.0],
+        "reward": -0.5,
+        "next_state": [130.0, 0.0, 725.0, 2.0],
+    }
+
+    with TestClient(router.app) as client:
+        assert client.post("/feedback", json=feedback).status_code == 404
+        client.post("/users/register", json={"user_id": "u1"})
+
+        response = client.post("/feedback", json=feedback)
+        invalid = client.post("/feedback", json={**feedback, "action": [1.0]})
+
+        assert response.status_code == 200 and response.json()["buffered_transitions"] == 1
+        assert invalid.status_code == 422
+        assert router.model_manager.replay_buffers.get("u1").states[0].tolist() == feedback["state"]
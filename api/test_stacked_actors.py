@@ -0,0 +1,89 @@
+import gc
+from datetime import datetime
+
+import numpy as np
+import pytest
+import torch
+
+from models.models import Actor
+from inference_backends import TorchBackend
+from stacked_actors import StackedActorPool
+from response_models import BolusRequest, UserProfile
+from constants.constants import STATE_DIM, ACTION_DIM
+
+def _states(rng, rows):
+    return (rng.random((rows, STATE_DIM)) * [300.0, 5.0, 1440.0, 5.0]).astype(np.float32)
+
+def test_mixed_batch_matches_each_actor():
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    actors = [Actor(STATE_DIM, ACTION_DIM) for _ in range(5)]
+    pool = StackedActorPool(actors[0], capacity=8)
+    states = [_states(rng, rows) for rows in (3, 21, 1, 7, 21)]
+
+    gains = pool.run(actors, states)
+
+    for actor, actor_states, actor_gains in zip(actors, states, gains):
+        np.testing.assert_allclose(actor_gains, TorchBackend().run(actor, actor_states), rtol=1e-5, atol=1e-6)
+    assert pool.get_stats()["actors"] == 5 and pool.get_stats()["assignments"] == 5
+
+def test_actors_are_added_and_evicted_without_rebuilding():
+    torch.manual_seed(1)
+    rng = np.random.default_rng(1)
+    actors = [Actor(STATE_DIM, ACTION_DIM) for _ in range(4)]
+    pool = StackedActorPool(actors[0], capacity=3)
+    pool.run(actors[:3], [_states(rng, 2)] * 3)
+    pool.run(actors[1:3], [_states(rng, 2)] * 2)
+
+    gains = pool.run([actors[3], actors[1]], [_states(rng, 4)] * 2)
+
+    # Solo el actor nuevo se copia, en la ranura del menos usado recientemente
+    assert actors[0] not in pool and actors[3] in pool
+    assert pool.get_stats()["assignments"] == 4 and pool.get_stats()["evictions"] == 1
+    assert gains[0].shape == (4, ACTION_DIM)
+
+    # La ranura de un actor liberado se reutiliza sin desalojar a otro
+    actors.pop(2)
+    gc.collect()
+    pool.run([Actor(STATE_DIM, ACTION_DIM), actors[1]], [_states(rng, 1)] * 2)
+    assert pool.get_stats()["evictions"] == 1
+
+def test_architecture_must_match_the_stack():
+    pool = StackedActorPool(Actor(STATE_DIM, ACTION_DIM), capacity=2)
+
+    assert pool.supports(Actor(STATE_DIM, ACTION_DIM))
+    assert not pool.supports(Actor(STATE_DIM, ACTION_DIM, (64, 64)))
+    assert not pool.supports(Actor(STATE_DIM, ACTION_DIM).half())
+
+@pytest.mark.parametrize("stacked_inference_max_actors", [0, 8])
+def test_mixed_user_batch_predictions_do_not_depend_on_stacking(make_manager, stacked_inference_max_actors):
+    writer = make_manager()
+    for shift, user_id in enumerate(("u1", "u2", "u3")):
+        actor = Actor(STATE_DIM, ACTION_DIM)
+        actor.load_state_dict(writer.population_actor.state_dict())
+        with torch.no_grad():
+            actor.net[-2].weight.mul_(1.0 - shift)
+        writer.model_store.save_user_models(user_id, actor, writer.population_critic)
+    manager = make_manager(
+        prediction_cache_max_entries=0,
+        stacked_inference_max_actors=stacked_inference_max_actors
+    )
+    requests = [
+        BolusRequest(
+            user_id=user_id,
+            cgm_value=cgm,
+            carb_intake_grams=60.0,
+            iob=0.5,
+            timestamp=datetime(2025, 6, 19, 12, 30)
+        )
+        for user_id in ("u1", "u2", "u3") for cgm in (90.0, 180.0)
+    ]
+
+    results = manager.predict_bolus_with_confidence_batch(requests)
+    expected = [manager.predict_bolus_with_confidence(request) for request in requests]
+
+    for result, single in zip(results, expected):
+        assert result[:3] == pytest.approx(single[:3], abs=1e-4)
+    assert len({round(result[0], 3) for result in results[::2]}) == 3
+    if stacked_inference_max_actors:
+        assert manager.stacked_actors.get_stats()["actors"] == 3
@@ -0,0 +1,154 @@
+import copy
+import os
+import threading
+
+import numpy as np
+import torch
+
+from replay_buffer import PrioritizedReplayBuffer, ReplayBufferPool
+from training_worker import OnlineTrainer, TrainingWorker, ddpg_update, make_agent
+from stacked_ddpg import StackedDDPG
+from models.models import Actor, Critic
+from response_models import UserProfile
+from constants.constants import STATE_DIM, ACTION_DIM, TAU
+
+def _transition(rng, user_id="u1"):
+    state = np.array([rng.uniform(70, 250), rng.uniform(0, 5), rng.uniform(0, 1440), rng.uniform(0, 5)], dtype=np.float32)
+    return user_id, state, rng.uniform(0.5, 1.5, 3).astype(np.float32), float(rng.normal()), state + 1.0, False
+
+def test_ddpg_update_trains_networks_and_returns_td_errors():
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    agent = make_agent(Actor(STATE_DIM, ACTION_DIM), Critic(STATE_DIM, ACTION_DIM))
+    buffer = PrioritizedReplayBuffer(capacity=64)
+    for _ in range(64):
+        buffer.add(*_transition(rng)[1:])
+    actor_before = [p.detach().clone() for p in agent.actor.parameters()]
+    target_before = [p.detach().clone() for p in agent.target_actor.parameters()]
+
+    batch = buffer.sample(32, rng)
+    td_errors = ddpg_update(agent, batch)
+
+    assert td_errors.shape == (32,) and np.all(td_errors >= 0)
+    assert any(not torch.equal(a, p) for a, p in zip(actor_before, agent.actor.parameters()))
+    for before, target, actor in zip(target_before, agent.target_actor.parameters(), agent.actor.parameters()):
+        torch.testing.assert_close(target, before + TAU * (actor.detach() - before))
+
+def test_stacked_update_matches_independent_updates():
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    pairs = [(Actor(STATE_DIM, ACTION_DIM), Critic(STATE_DIM, ACTION_DIM)) for _ in range(3)]
+    stacked = StackedDDPG(*pairs[0], capacity=4)
+    agents = []
+    for user, (actor, critic) in enumerate(pairs):
+        stacked.add(f"u{user}", actor, critic)
+        agents.append(make_agent(copy.deepcopy(actor), copy.deepcopy(critic)))
+    buffer = PrioritizedReplayBuffer(capacity=64)
+    for _ in range(64):
+        buffer.add(*_transition(rng)[1:])
+
+    # Los tres usuarios y luego un grupo con ranuras no consecutivas
+    for user_ids in (["u0", "u1", "u2"], ["u0", "u2"]):
+        batches = [buffer.sample(16, rng) for _ in user_ids]
+        td_errors = stacked.update(user_ids, batches)
+        expected = [ddpg_update(agents[int(user_id[1])], batch) for user_id, batch in zip(user_ids, batches)]
+        np.testing.assert_allclose(td_errors, np.stack(expected), rtol=1e-4, atol=1e-4)
+
+    for user, agent in enumerate(agents):
+        actor, critic = stacked.export(f"u{user}")
+        torch.testing.assert_close(dict(actor.state_dict()), dict(agent.actor.state_dict()), rtol=1e-3, atol=1e-4)
+        torch.testing.assert_close(dict(critic.state_dict()), dict(agent.critic.state_dict()), rtol=1e-3, atol=1e-4)
+
+def test_trainer_publishes_versions_that_the_server_swaps_in(make_manager, models_dir):
+    server = make_manager()
+    server.register_user(UserProfile(user_id="u1", ml_model_type="personalized"))
+    served_before = server.get_user_models("u1")["actor"]
+    trainer = OnlineTrainer(models_dir, batch_size=8, update_freq=2, min_transitions=4)
+    rng = np.random.default_rng(1)
+
+    assert [trainer.observe(_transition(rng)) for _ in range(4)] == [False, False, False, True]
+    first = trainer.train_due()
+    for _ in range(2):
+        trainer.observe(_transition(rng))
+    second = trainer.train_due()
+
+    assert [version[:2] for version in first + second] == [("u1", 1), ("u1", 2)]
+    assert server.get_model_version("u1") == "population"
+
+    for version in first + second:
+        assert server.apply_published_models(*version)
+    served = server.get_user_models("u1")["actor"]
+
+    assert server.get_model_version("u1") == "personalized-v2"
+    assert served is not served_before
+    torch.testing.assert_close(dict(served.state_dict()), dict(trainer.agents.export("u1")[0].state_dict()))
+    # Una versión atrasada no reemplaza los pesos en servicio
+    assert server.apply_published_models(*first[0]) and server.get_user_models("u1")["actor"] is served
+
+def test_due_users_are_trained_together(models_dir):
+    trainer = OnlineTrainer(models_dir, batch_size=8, update_freq=1, min_transitions=2, max_agents=2)
+    rng = np.random.default_rng(3)
+    for _ in range(2):
+        for user_id in ("u1", "u2", "u3"):
+            trainer.observe(_transition(rng, user_id))
+    steps = []
+    original_update = trainer.agents.update
+    trainer.agents.update = lambda user_ids, batches: steps.append(list(user_ids)) or original_update(user_ids, batches)
+
+    published = trainer.train_due()
+
+    assert sorted(version[0] for version in published) == ["u1", "u2", "u3"]
+    assert steps == [["u1", "u2"], ["u3"]]
+    assert len(trainer.agents) == 2 and "u3" in trainer.agents
+    assert trainer.models.model_store.has_user_models("u1")
+
+def test_trainer_and_server_flush_replay_buffers_to_different_files(make_manager, models_dir):
+    server = make_manager()
+    trainer = OnlineTrainer(models_dir, batch_size=8, update_freq=10, min_transitions=10)
+    rng = np.random.default_rng(5)
+    server.update_user_model_with_feedback(*_transition(rng))
+    trainer.observe(_transition(rng))
+    trainer.observe(_transition(rng))
+
+    server.replay_buffers.flush()
+    trainer.close()
+
+    assert server.replay_buffers.path("u1") != trainer.replay_buffers.path("u1")
+    assert os.path.exists(server.replay_buffers.path("u1")) and os.path.exists(trainer.replay_buffers.path("u1"))
+    assert len(ReplayBufferPool(os.path.dirname(server.replay_buffers.path("u1")), 1 << 20).get("u1")) == 1
+    assert len(ReplayBufferPool(os.path.dirname(trainer.replay_buffers.path("u1")), 1 << 20).get("u1")) == 2
+
+def test_group_members_are_not_evicted_by_a_new_user(models_dir):
+    trainer = OnlineTrainer(models_dir, batch_size=8, update_freq=1, min_transitions=2, max_agents=2)
+    rng = np.random.default_rng(4)
+    for user_ids in (("A", "B"), ("A", "C")):
+        for _ in range(2):
+            for user_id in user_ids:
+                trainer.observe(_transition(rng, user_id))
+        published = trainer.train_due()
+        assert sorted(version[0] for version in published) == sorted(user_ids)
+
+    # A era el menos usado, pero al integrar el grupo se desaloja B
+    assert list(trainer.agents.slots) == ["A", "C"]
+
+def test_training_worker_process_publishes_to_the_server(make_manager, models_dir):
+    received = []
+    done = threading.Event()
+
+    def on_published(*version):
+        received.append(version)
+        done.set()
+
+    worker = TrainingWorker(models_dir, on_published, batch_size=8, update_freq=4, min_transitions=4)
+    worker.start()
+    try:
+        rng = np.random.default_rng(2)
+        for _ in range(4):
+            assert worker.submit(*_transition(rng))
+        assert done.wait(timeout=120)
+    finally:
+        worker.stop(timeout=60)
+
+    assert received[0][:2] == ("u1", 1)
+    assert worker.get_stats() == {"alive": False, "submitted": 4, "dropped": 0, "published_versions": 1}
+    assert make_manager().has_personalized_models("u1")
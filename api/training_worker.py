@@ -0,0 +1,530 @@
+import copy
+import os
+import queue
+import threading
+import multiprocessing
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from model_loader import ModelLoader
+from replay_buffer import ReplayBufferPool
+from stacked_ddpg import StackedDDPG
+from low_rank import attach_low_rank, personalization_metadata
+from constants.constants import (
+    SEED,
+    BATCH_SIZE,
+    GAMMA,
+    TAU,
+    LR_ACTOR,
+    LR_CRITIC,
+    UPDATE_FREQ,
+    MODEL_VERSION_METADATA_KEY,
+    TRAINING_QUEUE_MAX_SIZE,
+    TRAINING_MIN_TRANSITIONS,
+    TRAINING_MAX_AGENTS,
+    TRAINING_NUM_THREADS,
+    TRAINING_DRAIN_MAX_TRANSITIONS,
+    PERSONALIZATION_MODE,
+    LOW_RANK_RANK,
+    REPLAY_BUFFER_CAPACITY,
+    REPLAY_BUFFER_MAX_BYTES,
+    TRAINING_REPLAY_BUFFER_DIR,
+    TRAINING_WORKER_STARTED_MSG,
+    TRAINING_WORKER_STOPPED_MSG,
+    TRAINING_STEP_ERROR_MSG,
+    MODEL_VERSION_SWAP_ERROR_MSG
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Transición enviada al proceso: (user_id, estado, acción, recompensa, siguiente estado, terminado)
+Transition = Tuple[str, np.ndarray, np.ndarray, float, np.ndarray, bool]
+# Versión publicada por el proceso: (user_id, versión, tamaño en bytes, checksum)
+PublishedVersion = Tuple[str, int, int, str]
+
+@dataclass
+class DDPGAgent:
+    """
+    Redes y optimizadores de un usuario en entrenamiento.
+    """
+    actor: torch.nn.Module
+    critic: torch.nn.Module
+    target_actor: torch.nn.Module
+    target_critic: torch.nn.Module
+    actor_optimizer: torch.optim.Optimizer
+    critic_optimizer: torch.optim.Optimizer
+
+def make_agent(
+    actor: torch.nn.Module,
+    critic: torch.nn.Module,
+    lr_actor: float = LR_ACTOR,
+    lr_critic: float = LR_CRITIC
+) -> DDPGAgent:
+    """
+    Prepara actor y critic para entrenar: copias objetivo y optimizadores Adam.
+    
+    Parámetros:
+    -----------
+    actor : torch.nn.Module
+        Actor del usuario (se modifica en el lugar).
+    critic : torch.nn.Module
+        Critic del usuario (se modifica en el lugar).
+    lr_actor : float
+        Tasa de aprendizaje del actor.
+    lr_critic : float
+        Tasa de aprendizaje del critic.
+    
+    Retorna:
+    --------
+    DDPGAgent
+        Agente listo para `ddpg_update`.
+    """
+    actor.train()
+    critic.train()
+    target_actor: torch.nn.Module = copy.deepcopy(actor).requires_grad_(False)
+    target_critic: torch.nn.Module = copy.deepcopy(critic).requires_grad_(False)
+    return DDPGAgent(
+        actor=actor,
+        critic=critic,
+        target_actor=target_actor,
+        target_critic=target_critic,
+        actor_optimizer=torch.optim.Adam(actor.parameters(), lr=lr_actor),
+        critic_optimizer=torch.optim.Adam(critic.parameters(), lr=lr_critic)
+    )
+
+def soft_update(target: torch.nn.Module, source: torch.nn.Module, tau: float) -> None:
+    """
+    Actualiza las redes objetivo: target = tau * source + (1 - tau) * target.
+    """
+    with torch.no_grad():
+        for target_param, param in zip(target.parameters(), source.parameters()):
+            target_param.lerp_(param, tau)
+
+def ddpg_update(agent: DDPGAgent, batch: Dict[str, np.ndarray], gamma: float = GAMMA, tau: float = TAU) -> np.ndarray:
+    """
+    Ejecuta un paso de DDPG (critic, actor y redes objetivo) sobre un lote del buffer priorizado.
+    
+    Versión de un solo usuario; el proceso de entrenamiento usa `StackedDDPG`, que reproduce
+    este paso para muchos usuarios a la vez.
+    
+    Parámetros:
+    -----------
+    agent : DDPGAgent
+        Redes y optimizadores del usuario.
+    batch : Dict[str, np.ndarray]
+        Lote devuelto por `PrioritizedReplayBuffer.sample` (incluye los pesos de importancia).
+    gamma : float
+        Factor de descuento.
+    tau : float
+        Tasa de actualización suave de las redes objetivo.
+    
+    Retorna:
+    --------
+    np.ndarray
+        Errores TD absolutos del lote, para actualizar las prioridades.
+    """
+    states: torch.Tensor = torch.from_numpy(batch["states"])
+    actions: torch.Tensor = torch.from_numpy(batch["actions"])
+    rewards: torch.Tensor = torch.from_numpy(batch["rewards"]).unsqueeze(1)
+    next_states: torch.Tensor = torch.from_numpy(batch["next_states"])
+    dones: torch.Tensor = torch.from_numpy(batch["dones"].astype(np.float32)).unsqueeze(1)
+    weights: torch.Tensor = torch.from_numpy(batch["weights"].astype(np.float32)).unsqueeze(1)
+    
+    # Objetivo de Bellman con las redes objetivo
+    with torch.no_grad():
+        target_q: torch.Tensor = rewards + gamma * (1.0 - dones) * agent.target_critic(
+            next_states, agent.target_actor(next_states)
+        )
+    
+    # Critic: error cuadrático ponderado por importancia (corrige el sesgo del muestreo priorizado)
+    td_errors: torch.Tensor = target_q - agent.critic(states, actions)
+    critic_loss: torch.Tensor = (weights * td_errors.pow(2)).mean()
+    agent.critic_optimizer.zero_grad()
+    critic_loss.backward()
+    agent.critic_optimizer.step()
+    
+    # Actor: maximizar el valor estimado por el critic
+    actor_loss: torch.Tensor = -agent.critic(states, agent.actor(states)).mean()
+    agent.actor_optimizer.zero_grad()
+    actor_loss.backward()
+    agent.actor_optimizer.step()
+    
+    soft_update(agent.target_actor, agent.actor, tau)
+    soft_update(agent.target_critic, agent.critic, tau)
+    return td_errors.detach().abs().squeeze(1).numpy()
+
+class OnlineTrainer:
+    """
+    Entrenamiento DDPG en línea por usuario, ejecutado dentro del proceso de entrenamiento.
+    
+    Usa un `ModelLoader` (solo pesos float32, sin cachés ni ejecutores de inferencia) para cargar
+    los pesos del almacén y guardar las versiones nuevas, y un pool de buffers de repetición en su
+    propio subdirectorio, distinto del que vuelca el servidor, para que ningún archivo de buffer
+    tenga dos escritores. Los usuarios con transiciones nuevas suficientes se entrenan juntos en un paso vectorizado
+    sobre sus pesos apilados (`StackedDDPG`). En el modo de bajo rango solo se apilan y entrenan
+    las correcciones; los pesos poblacionales quedan fijos y compartidos.
+    """
+    
+    def __init__(
+        self,
+        models_directory: str,
+        batch_size: int = BATCH_SIZE,
+        update_freq: int = UPDATE_FREQ,
+        min_transitions: int = TRAINING_MIN_TRANSITIONS,
+        max_agents: int = TRAINING_MAX_AGENTS,
+        gamma: float = GAMMA,
+        tau: float = TAU,
+        personalization_mode: str = PERSONALIZATION_MODE,
+        low_rank_rank: int = LOW_RANK_RANK
+    ) -> None:
+        """
+        Inicializa el entrenador.
+        
+        Parámetros:
+        -----------
+        models_directory : str
+            Directorio de modelos compartido con el servidor.
+        batch_size : int
+            Transiciones por usuario en cada paso de entrenamiento.
+        update_freq : int
+            Transiciones nuevas de un usuario entre pasos de entrenamiento.
+        min_transitions : int
+            Transiciones en el buffer necesarias antes del primer paso.
+        max_agents : int
+            Usuarios con pesos apilados y estado de Adam en memoria (también el tamaño máximo de un grupo).
+        gamma : float
+            Factor de descuento.
+        tau : float
+            Tasa de actualización suave de las redes objetivo.
+        personalization_mode : str
+            'full' o 'low_rank' (ver `ModelManager`); todos los usuarios entrenados deben tener pesos de ese modo.
+        low_rank_rank : int
+            Rango de las correcciones en el modo 'low_rank'.
+        """
+        self.models: ModelLoader = ModelLoader(
+            models_directory, personalization_mode=personalization_mode, low_rank_rank=low_rank_rank
+        )
+        self.models.load_population_models()
+        self.replay_buffers: ReplayBufferPool = ReplayBufferPool(
+            os.path.join(models_directory, TRAINING_REPLAY_BUFFER_DIR), REPLAY_BUFFER_MAX_BYTES, REPLAY_BUFFER_CAPACITY
+        )
+        self.batch_size: int = batch_size
+        self.update_freq: int = update_freq
+        self.min_transitions: int = min_transitions
+        self.rng: np.random.Generator = np.random.default_rng(seed=SEED)
+        self.pending: Counter = Counter()
+        # Usuarios con un paso pendiente, en orden de llegada
+        self.due: "OrderedDict[str, None]" = OrderedDict()
+        # Todos los personalizados comparten la arquitectura poblacional
+        self.agents: Optional[StackedDDPG] = None
+        if self.models.population_actor is not None and self.models.population_critic is not None:
+            actor_template: torch.nn.Module = self.models.population_actor
+            critic_template: torch.nn.Module = self.models.population_critic
+            if personalization_mode == "low_rank":
+                actor_template = attach_low_rank(actor_template, low_rank_rank)
+                critic_template = attach_low_rank(critic_template, low_rank_rank)
+            self.agents = StackedDDPG(actor_template, critic_template, max_agents, gamma=gamma, tau=tau)
+    
+    def _ensure_slot(self, user_id: str) -> bool:
+        """
+        Ubica los pesos del usuario en los tensores apilados, materializándolos si todavía comparte los poblacionales.
+        
+        El usuario queda como el más reciente: los integrantes del grupo en armado (a lo sumo
+        `capacity - 1` al agregar uno nuevo) ocupan el final del orden y nunca se desalojan.
+        """
+        if user_id in self.agents:
+            self.agents.slots.move_to_end(user_id)
+            return True
+        # Los pesos apilados pasan a ser la copia de trabajo del usuario; se guardan tras cada paso
+        user_models: Optional[Dict[str, torch.nn.Module]] = (
+            self.models.load_user_models(user_id) or self.models.clone_population_models()
+        )
+        if "critic" not in user_models:
+            return False
+        self.agents.add(user_id, user_models["actor"], user_models["critic"])
+        return True
+    
+    def observe(self, transition: Transition) -> bool:
+        """
+        Guarda una transición y marca al usuario para entrenar cada `update_freq` transiciones nuevas.
+        
+        Parámetros:
+        -----------
+        transition : Transition
+            Transición recibida del servidor.
+            
+        Retorna:
+        --------
+        bool
+            True si el usuario quedó con un paso de entrenamiento pendiente.
+        """
+        user_id: str = transition[0]
+        buffered: int = self.replay_buffers.add(*transition)
+        self.pending[user_id] += 1
+        if self.pending[user_id] < self.update_freq or buffered < self.min_transitions:
+            return False
+        self.pending[user_id] = 0
+        self.due[user_id] = None
+        return True
+    
+    def train_due(self) -> List[PublishedVersion]:
+        """
+        Entrena a los usuarios pendientes en grupos de hasta `max_agents`, un paso vectorizado por grupo,
+        y guarda la versión resultante de cada uno en el almacén.
+        
+        Retorna:
+        --------
+        List[PublishedVersion]
+            Versiones guardadas, una por usuario entrenado.
+        """
+        if self.agents is None:
+            self.due.clear()
+            return []
+        published: List[PublishedVersion] = []
+        while self.due:
+            group: List[str] = []
+            while self.due and len(group) < self.agents.capacity:
+                user_id: str = self.due.popitem(last=False)[0]
+                try:
+                    if self._ensure_slot(user_id):
+                        group.append(user_id)
+                except Exception as e:
+                    logger.error(f"{TRAINING_STEP_ERROR_MSG} {user_id}: {e}")
+            published.extend(self.train(group))
+        return published
+    
+    def train(self, user_ids: List[str]) -> List[PublishedVersion]:
+        """
+        Ejecuta un paso de DDPG conjunto para usuarios que ya ocupan ranuras y guarda sus versiones.
+        
+        Parámetros:
+        -----------
+        user_ids : List[str]
+            Usuarios del grupo.
+            
+        Retorna:
+        --------
+        List[PublishedVersion]
+            Versiones guardadas, una por usuario.
+        """
+        if not user_ids:
+            return []
+        # Ordenar por ranura permite operar sobre vistas cuando las ranuras son consecutivas
+        user_ids = sorted(user_ids, key=self.agents.slots.__getitem__)
+        buffers = [self.replay_buffers.get(user_id) for user_id in user_ids]
+        batches: List[Dict[str, np.ndarray]] = [buffer.sample(self.batch_size, self.rng) for buffer in buffers]
+        td_errors: np.ndarray = self.agents.update(user_ids, batches)
+        
+        published: List[PublishedVersion] = []
+        for user_id, buffer, batch, errors in zip(user_ids, buffers, batches, td_errors):
+            buffer.update_priorities(batch["indices"], errors)
+            version: int = self.models.model_versions.get(user_id, 0) + 1
+            actor, critic = self.agents.export(user_id)
+            size, checksum = self.models.model_store.save_user_models(
+                user_id, actor, critic, {MODEL_VERSION_METADATA_KEY: str(version), **personalization_metadata(actor)}
+            )
+            self.models.model_versions[user_id] = version
+            published.append((user_id, version, size, checksum))
+        return published
+    
+    def close(self) -> None:
+        """
+        Persiste los buffers de repetición del proceso.
+        """
+        self.replay_buffers.flush()
+
+def run_training_worker(
+    models_directory: str,
+    transitions: "multiprocessing.Queue[Optional[Transition]]",
+    published: "multiprocessing.Queue[Optional[PublishedVersion]]",
+    trainer_options: Dict[str, Any]
+) -> None:
+    """
+    Bucle principal del proceso de entrenamiento: consume transiciones hasta recibir None.
+    
+    Tras cada transición recibida se vacía lo que ya esté en la cola, de modo que los usuarios
+    que llegan a su paso al mismo tiempo se entrenan en un único paso vectorizado.
+    
+    Parámetros:
+    -----------
+    models_directory : str
+        Directorio de modelos compartido con el servidor.
+    transitions : multiprocessing.Queue
+        Cola de transiciones enviadas por el servidor.
+    published : multiprocessing.Queue
+        Cola donde se publican las versiones nuevas de pesos (None al terminar).
+    trainer_options : Dict[str, Any]
+        Argumentos adicionales de `OnlineTrainer`.
+    """
+    torch.set_num_threads(TRAINING_NUM_THREADS)
+    trainer: OnlineTrainer = OnlineTrainer(models_directory, **trainer_options)
+    running: bool = True
+    try:
+        while running:
+            received: List[Optional[Transition]] = [transitions.get()]
+            try:
+                while len(received) < TRAINING_DRAIN_MAX_TRANSITIONS:
+                    received.append(transitions.get_nowait())
+            except queue.Empty:
+                pass
+            
+            for transition in received:
+                if transition is None:
+                    running = False
+                    break
+                trainer.observe(transition)
+            try:
+                versions: List[PublishedVersion] = trainer.train_due()
+            except Exception as e:
+                logger.error(f"{TRAINING_STEP_ERROR_MSG} {list(trainer.due)}: {e}")
+                trainer.due.clear()
+                continue
+            for version in versions:
+                published.put(version)
+    finally:
+        trainer.close()
+        published.put(None)
+
+class TrainingWorker:
+    """
+    Proceso de entrenamiento en segundo plano visto desde el servidor.
+    
+    Las transiciones se envían sin bloquear; un hilo escucha las versiones publicadas y las
+    entrega a `on_published` (normalmente `ModelManager.apply_published_models`).
+    """
+    
+    def __init__(
+        self,
+        models_directory: str,
+        on_published: Callable[[str, int, int, str], Any],
+        queue_size: int = TRAINING_QUEUE_MAX_SIZE,
+        **trainer_options: Any
+    ) -> None:
+        """
+        Inicializa el proceso de entrenamiento (sin iniciarlo).
+        
+        Parámetros:
+        -----------
+        models_directory : str
+            Directorio de modelos compartido con el proceso.
+        on_published : Callable[[str, int, int, str], Any]
+            Función llamada con (user_id, versión, tamaño, checksum) por cada versión publicada.
+        queue_size : int
+            Transiciones que pueden esperar en la cola antes de descartar nuevas.
+        **trainer_options : Any
+            Argumentos adicionales de `OnlineTrainer`.
+        """
+        self.models_directory: str = models_directory
+        self.on_published: Callable[[str, int, int, str], Any] = on_published
+        self.trainer_options: Dict[str, Any] = trainer_options
+        # 'spawn' evita heredar hilos y locks del servidor en el proceso hijo
+        self._context = multiprocessing.get_context("spawn")
+        self._transitions = self._context.Queue(maxsize=queue_size)
+        self._published = self._context.Queue()
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._listener: Optional[threading.Thread] = None
+        self._submitted: Counter = Counter()
+        self.dropped: int = 0
+        self.published_versions: int = 0
+    
+    def start(self) -> None:
+        """
+        Inicia el proceso de entrenamiento y el hilo que escucha las versiones publicadas.
+        """
+        self._process = self._context.Process(
+            target=run_training_worker,
+            args=(self.models_directory, self._transitions, self._published, self.trainer_options),
+            name="training-worker",
+            daemon=True
+        )
+        self._process.start()
+        self._listener = threading.Thread(target=self._listen, name="training-listener", daemon=True)
+        self._listener.start()
+        logger.info(f"{TRAINING_WORKER_STARTED_MSG} (pid={self._process.pid})")
+    
+    def _listen(self) -> None:
+        """
+        Entrega las versiones publicadas hasta que el proceso termina.
+        """
+        while True:
+            version: Optional[PublishedVersion] = self._published.get()
+            if version is None:
+                break
+            self.published_versions += 1
+            try:
+                self.on_published(*version)
+            except Exception as e:
+                logger.error(f"{MODEL_VERSION_SWAP_ERROR_MSG} {version[0]}: {e}")
+    
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+    
+    def submit(
+        self,
+        user_id: str,
+        state: np.ndarray,
+        action: np.ndarray,
+        reward: float,
+        next_state: np.ndarray,
+        done: bool
+    ) -> bool:
+        """
+        Envía una transición al proceso sin bloquear.
+        
+        Retorna:
+        --------
+        bool
+            True si se encoló, False si la cola estaba llena y se descartó.
+        """
+        try:
+            self._transitions.put_nowait((user_id, state, action, float(reward), next_state, bool(done)))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self._submitted[user_id] += 1
+        return True
+    
+    def submitted_count(self, user_id: str) -> int:
+        """
+        Transiciones del usuario enviadas al proceso desde que se inició.
+        """
+        return self._submitted[user_id]
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Termina el proceso tras procesar las transiciones pendientes y espera al hilo de escucha.
+        
+        Parámetros:
+        -----------
+        timeout : Optional[float]
+            Segundos máximos de espera.
+        """
+        if self._process is None:
+            return
+        self._transitions.put(None)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        if self._process.exitcode != 0:
+            # El proceso no llegó a publicar el fin; se libera al hilo de escucha
+            self._published.put(None)
+        if self._listener is not None:
+            self._listener.join(timeout)
+        logger.info(TRAINING_WORKER_STOPPED_MSG)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado del proceso y los contadores de transiciones y versiones.
+        """
+        return {
+            "alive": self.is_alive(),
+            "submitted": sum(self._submitted.values()),
+            "dropped": self.dropped,
+            "published_versions": self.published_versions
+        }
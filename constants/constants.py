@@ -1,9 +1,12 @@
 # Dimensiones del estado y acción
+import os
 from typing import Dict, Tuple
 
 
 STATE_DIM: int = 4  # CGM + CHO + tiempo_comida + IOB
 ACTION_DIM: int = 3  # ganancias: g_ICR, g_ISF, g_IOB
+ACTOR_HIDDEN_DIMS: tuple = (400, 300)  # capas ocultas del actor poblacional
+DISTILLED_ACTOR_HIDDEN_DIMS: tuple = (64, 64)  # capas ocultas del actor destilado
 
 # Replay Buffer y entrenamiento
 BUFFER_SIZE: int = 50000
@@ -139,6 +142,125 @@ CONFIDENCE_LOWER_PERCENTILE: float = 2.5
 CONFIDENCE_UPPER_PERCENTILE: float = 97.5
 MEAL_DURATION_FOR_RATE_CALCULATION: int = 15  # minutos
 
+# Rangos válidos de entrada (mismos límites que los validadores de BolusRequest)
+MIN_CGM_INPUT: float = 40.0
+MAX_CGM_INPUT: float = 400.0
+MIN_CARBS_INPUT: float = 0.0
+MAX_CARBS_INPUT: float = 300.0
+MIN_IOB_INPUT: float = 0.0
+MAX_IOB_INPUT: float = 50.0
+
+# Micro-batching de predicciones concurrentes (configurable por variables de entorno)
+MICRO_BATCH_MAX_WAIT_MS: float = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2.0"))  # milisegundos
+MICRO_BATCH_MAX_SIZE: int = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))  # solicitudes por lote
+
+# Ejecutor de inferencia y E/S de modelos (configurable por variables de entorno)
+INFERENCE_MAX_WORKERS: int = int(os.getenv("INFERENCE_MAX_WORKERS", "2"))  # hilos del pool
+INFERENCE_MAX_QUEUE_SIZE: int = int(os.getenv("INFERENCE_MAX_QUEUE_SIZE", "256"))  # tareas en espera
+INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")  # 'torch' o 'numpy'
+# Trata los subnormales como cero en los hilos de inferencia (opcional; solo afecta a esos hilos)
+INFERENCE_FLUSH_DENORMAL: bool = os.getenv("INFERENCE_FLUSH_DENORMAL", "false").lower() == "true"
+
+# Caché de modelos por usuario en memoria (configurable por variables de entorno)
+MODEL_CACHE_MAX_BYTES: int = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # bytes
+MODEL_CACHE_TTL_SECONDS: float = float(os.getenv("MODEL_CACHE_TTL_SECONDS", "3600"))  # inactividad máxima
+MODEL_CLEANUP_INTERVAL_SECONDS: float = float(os.getenv("MODEL_CLEANUP_INTERVAL_SECONDS", "300"))
+
+# Actores personalizados con pesos apilados para evaluar lotes de varios usuarios juntos (0 lo deshabilita)
+STACKED_INFERENCE_MAX_ACTORS: int = int(os.getenv("STACKED_INFERENCE_MAX_ACTORS", "64"))
+
+# Personalización: pesos completos por usuario ('full') o correcciones de bajo rango sobre la población ('low_rank')
+PERSONALIZATION_MODE: str = os.getenv("PERSONALIZATION_MODE", "full")
+LOW_RANK_RANK: int = int(os.getenv("LOW_RANK_RANK", "8"))  # rango de las correcciones por capa
+LOW_RANK_MAX_DOSE_DEVIATION: float = float(os.getenv("LOW_RANK_MAX_DOSE_DEVIATION", "0.1"))  # Unidades, al convertir
+PERSONALIZATION_METADATA_KEY: str = "personalization"  # metadato del archivo empaquetado con el modo
+
+# Caché de predicciones indexada por entradas cuantizadas (opcional: 0 entradas la deshabilita)
+PREDICTION_CACHE_MAX_ENTRIES: int = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "0"))
+PREDICTION_CACHE_CGM_RESOLUTION: float = float(os.getenv("PREDICTION_CACHE_CGM_RESOLUTION", "1"))  # mg/dL
+PREDICTION_CACHE_CARBS_RESOLUTION: float = float(os.getenv("PREDICTION_CACHE_CARBS_RESOLUTION", "1"))  # gramos
+PREDICTION_CACHE_IOB_RESOLUTION: float = float(os.getenv("PREDICTION_CACHE_IOB_RESOLUTION", "0.01"))  # Unidades
+PREDICTION_CACHE_MINUTES_RESOLUTION: float = float(os.getenv("PREDICTION_CACHE_MINUTES_RESOLUTION", "1"))  # minutos
+
+# Buffers de repetición por usuario para el entrenamiento en línea (volcados a disco al superar el presupuesto)
+REPLAY_BUFFER_CAPACITY: int = int(os.getenv("REPLAY_BUFFER_CAPACITY", str(BUFFER_SIZE)))  # transiciones por usuario
+REPLAY_BUFFER_MAX_BYTES: int = int(os.getenv("REPLAY_BUFFER_MAX_BYTES", str(256 * 1024 * 1024)))  # bytes
+
+# Historial de CGM por usuario en memoria (buffers circulares preasignados)
+CGM_HISTORY_CAPACITY: int = int(os.getenv("CGM_HISTORY_CAPACITY", "576"))  # lecturas por usuario (48 h cada 5 min)
+CGM_HISTORY_MAX_USERS: int = int(os.getenv("CGM_HISTORY_MAX_USERS", "10000"))  # usuarios con historial en memoria
+
+# Series de CGM en disco por usuario (columnas mapeadas en memoria)
+CGM_STORE_ENABLED: bool = os.getenv("CGM_STORE_ENABLED", "true").lower() == "true"
+CGM_STORE_FSYNC: bool = os.getenv("CGM_STORE_FSYNC", "true").lower() == "true"  # sincronizar antes de confirmar
+CGM_STORE_MAX_OPEN_USERS: int = int(os.getenv("CGM_STORE_MAX_OPEN_USERS", "256"))  # series mapeadas a la vez
+
+# Agregados de CGM por intervalos y retención de lecturas crudas en disco
+CGM_ROLLUP_WIDTHS: Tuple[int, ...] = tuple(
+    int(width) for width in os.getenv("CGM_ROLLUP_WIDTHS", "900,3600").split(",")
+)  # segundos por intervalo de cada nivel
+CGM_RAW_RETENTION_DAYS: float = float(os.getenv("CGM_RAW_RETENTION_DAYS", "90"))  # 0 conserva todas las lecturas
+CGM_ROLLUP_LATE_SECONDS: int = int(os.getenv("CGM_ROLLUP_LATE_SECONDS", str(6 * 3600)))  # atraso que se reagrega
+CGM_RETENTION_MIN_DROP_SECONDS: int = int(os.getenv("CGM_RETENTION_MIN_DROP_SECONDS", str(24 * 3600)))
+CGM_COMPACTION_INTERVAL_SECONDS: float = float(os.getenv("CGM_COMPACTION_INTERVAL_SECONDS", "3600"))
+
+# Métricas glucémicas por ventana deslizante, actualizadas con cada lectura
+CGM_METRICS_WINDOWS_HOURS: Tuple[int, ...] = tuple(
+    int(hours) for hours in os.getenv("CGM_METRICS_WINDOWS_HOURS", "24,168,336").split(",")
+)  # 24 h, 7 días y 14 días
+CGM_METRICS_BUCKET_SECONDS: int = int(os.getenv("CGM_METRICS_BUCKET_SECONDS", "3600"))  # resolución de las ventanas
+CGM_METRICS_EVENT_GAP_SECONDS: int = int(os.getenv("CGM_METRICS_EVENT_GAP_SECONDS", "1800"))  # corte que separa episodios
+CGM_METRICS_MAX_USERS: int = int(os.getenv("CGM_METRICS_MAX_USERS", "2000"))  # usuarios con métricas en memoria
+
+# Ingesta continua de CGM desde gateways (WebSocket y NDJSON)
+CGM_STREAM_MAX_BATCH_READINGS: int = int(os.getenv("CGM_STREAM_MAX_BATCH_READINGS", "5000"))  # lecturas por lote
+CGM_STREAM_MAX_PENDING_MESSAGES: int = int(os.getenv("CGM_STREAM_MAX_PENDING_MESSAGES", "32"))  # mensajes sin procesar
+CGM_STREAM_MAX_LINE_BYTES: int = int(os.getenv("CGM_STREAM_MAX_LINE_BYTES", "4096"))  # bytes por lectura
+CGM_STREAM_MAX_REPORTED_REJECTIONS: int = int(os.getenv("CGM_STREAM_MAX_REPORTED_REJECTIONS", "100"))  # por respuesta
+
+# Proceso de entrenamiento en segundo plano (DDPG fuera del camino de las solicitudes)
+TRAINING_WORKER_ENABLED: bool = os.getenv("TRAINING_WORKER_ENABLED", "false").lower() == "true"
+TRAINING_QUEUE_MAX_SIZE: int = int(os.getenv("TRAINING_QUEUE_MAX_SIZE", "10000"))  # transiciones pendientes
+TRAINING_MIN_TRANSITIONS: int = int(os.getenv("TRAINING_MIN_TRANSITIONS", str(BATCH_SIZE)))  # antes del primer paso
+TRAINING_MAX_AGENTS: int = int(os.getenv("TRAINING_MAX_AGENTS", "64"))  # usuarios con optimizadores en memoria
+TRAINING_NUM_THREADS: int = int(os.getenv("TRAINING_NUM_THREADS", "1"))  # hilos de torch del proceso
+TRAINING_DRAIN_MAX_TRANSITIONS: int = int(os.getenv("TRAINING_DRAIN_MAX_TRANSITIONS", "1024"))  # por ciclo del proceso
+
+# Precarga de modelos al iniciar (configurable por variables de entorno)
+WARMUP_MAX_MODELS: int = int(os.getenv("WARMUP_MAX_MODELS", "64"))  # modelos personalizados a precargar
+WARMUP_MAX_WORKERS: int = int(os.getenv("WARMUP_MAX_WORKERS", "4"))  # hilos de precarga
+WARMUP_USERS_FILE: str = os.getenv("WARMUP_USERS_FILE", "")  # archivo con un user_id por línea (opcional)
+
+# Precisión de los actores al servir inferencia ('float32', 'float16' o 'int8')
+MODEL_SERVING_PRECISION: str = os.getenv("MODEL_SERVING_PRECISION", "float32")
+QUANTIZATION_MAX_DOSE_DEVIATION: float = float(os.getenv("QUANTIZATION_MAX_DOSE_DEVIATION", "0.1"))  # Unidades
+# Grilla de referencia para validar las variantes contra el modelo float32
+QUANTIZATION_GRID_CGM: tuple = (40.0, 55.0, 70.0, 85.0, 100.0, 120.0, 150.0, 180.0, 220.0, 260.0, 320.0, 400.0)
+QUANTIZATION_GRID_CARBS: tuple = (0.0, 15.0, 30.0, 60.0, 90.0, 150.0)
+QUANTIZATION_GRID_IOB: tuple = (0.0, 0.5, 1.5, 3.0, 6.0)
+QUANTIZATION_GRID_MINUTES: tuple = (90.0, 450.0, 750.0, 1110.0)  # madrugada, desayuno, almuerzo, cena
+
+# Actor poblacional destilado (opcional: se sirve a usuarios poblacionales si existe y pasa la validación de dosis)
+DISTILLED_POPULATION_ENABLED: bool = os.getenv("DISTILLED_POPULATION_ENABLED", "false").lower() == "true"
+DISTILLED_MAX_DOSE_DEVIATION: float = float(os.getenv("DISTILLED_MAX_DOSE_DEVIATION", "0.25"))  # Unidades
+
+# Tablas de ganancias precalculadas (opcional: interpolación multilineal en lugar de evaluar el actor)
+DOSE_TABLE_POPULATION_ENABLED: bool = os.getenv("DOSE_TABLE_POPULATION_ENABLED", "false").lower() == "true"
+DOSE_TABLE_PERSONALIZED_ENABLED: bool = os.getenv("DOSE_TABLE_PERSONALIZED_ENABLED", "false").lower() == "true"
+DOSE_TABLE_MAX_DOSE_ERROR: float = float(os.getenv("DOSE_TABLE_MAX_DOSE_ERROR", "0.05"))  # Unidades
+DOSE_TABLE_CGM_STEP: float = float(os.getenv("DOSE_TABLE_CGM_STEP", "20"))  # mg/dL
+DOSE_TABLE_CARBS_STEP: float = float(os.getenv("DOSE_TABLE_CARBS_STEP", "20"))  # gramos
+DOSE_TABLE_MINUTES_STEP: float = float(os.getenv("DOSE_TABLE_MINUTES_STEP", "15"))  # minutos
+DOSE_TABLE_IOB_STEP: float = float(os.getenv("DOSE_TABLE_IOB_STEP", "5"))  # Unidades
+# Límites de la grilla en el espacio de estados [cgm, cho_rate, minutos, iob]; el margen de CGM cubre
+# las variaciones usadas para estimar la incertidumbre
+DOSE_TABLE_LOWER: tuple = (MIN_CGM_INPUT - 10.0, 0.0, 0.0, 0.0)
+DOSE_TABLE_UPPER: tuple = (MAX_CGM_INPUT + 10.0, MAX_CARBS_INPUT / MEAL_DURATION_FOR_RATE_CALCULATION, 24 * 60.0, MAX_IOB_INPUT)
+DOSE_TABLE_VALIDATION_SAMPLES: int = 50_000  # estados aleatorios, además de los centros de celda
+
+# Almacén empaquetado de modelos ('float32' o 'float16' en disco)
+MODEL_STORE_DTYPE: str = os.getenv("MODEL_STORE_DTYPE", "float32")
+
 # Randomización y reproducibilidad
 SEED: int = 42  # Semilla para reproducibilidad
 
@@ -148,6 +270,19 @@ POPULATION_CRITIC_FILE: str = "population_critic.pth"
 PERSONALIZED_ACTOR_PREFIX: str = "personalized_actor_"
 PERSONALIZED_CRITIC_PREFIX: str = "personalized_critic_"
 MODEL_EXTENSION: str = ".pth"
+POPULATION_CACHE_KEY: str = "population"
+PACKED_MODEL_EXTENSION: str = ".safetensors"
+PACKED_POPULATION_FILE: str = "population.safetensors"
+PACKED_DISTILLED_POPULATION_FILE: str = "population_distilled.safetensors"
+PACKED_PERSONALIZED_PREFIX: str = "personalized_"
+REPLAY_BUFFER_DIR: str = "replay"  # subdirectorio del directorio de modelos
+TRAINING_REPLAY_BUFFER_DIR: str = "replay_training"  # buffers del proceso de entrenamiento (otro escritor)
+REPLAY_BUFFER_PREFIX: str = "replay_"
+CGM_STORE_DIR: str = "cgm"  # subdirectorio del directorio de modelos
+CGM_STORE_PREFIX: str = "cgm_"
+CGM_USER_ID_PATTERN: str = r"^[A-Za-z0-9_.@-]{1,128}$"  # usuarios admitidos en nombres de archivo
+MODEL_VERSION_METADATA_KEY: str = "model_version"  # versión de los pesos en los metadatos del archivo
+PERSONALIZED_MODEL_VERSION_PREFIX: str = "personalized-v"
 
 # Mensajes
 ## API
@@ -161,11 +296,20 @@ ACTIVE_STATUS = "activa"
 REGISTER_SUCCESS_MSG = "registrado exitosamente"
 UPDATE_SUCCESS_MSG = "actualizado exitosamente"
 CGM_RECORD_MSG = "Lectura CGM registrada exitosamente"
+CGM_BULK_RECORD_MSG = "Lecturas CGM registradas exitosamente"
+CGM_STREAM_OPENED_MSG = "Flujo de lecturas CGM abierto"
+CGM_STREAM_CLOSED_MSG = "Flujo de lecturas CGM cerrado"
+CGM_STREAM_LINE_TOO_LONG_MSG = "Lectura del flujo CGM excede el tamaño máximo"
 USER_NOT_FOUND_MSG = "Usuario no encontrado"
 USER_ID_MISMATCH_MSG = "ID de usuario no coincide"
 REGISTER_ERROR_MSG = "Error al registrar usuario"
 INTERNAL_ERROR_CODE = "INTERNAL_ERROR"
 INTERNAL_ERROR_MSG = "Error interno del servidor"
+INFERENCE_QUEUE_FULL_MSG = "Servicio de inferencia saturado, intente nuevamente"
+CGM_RANGE_ERROR_MSG = "Valor de CGM debe estar entre 40.0 y 400.0 mg/dL"
+CGM_USER_ID_ERROR_MSG = "user_id debe tener de 1 a 128 letras, dígitos o los caracteres _ . @ -"
+CARBS_RANGE_ERROR_MSG = "Carbohidratos deben estar entre 0.0 y 300.0 gramos"
+IOB_RANGE_ERROR_MSG = "IOB debe estar entre 0.0 y 50.0 unidades"
 ## Mensajes de alerta
 HYPO_SEVERE_MSG: str = "ALERTA: Glucosa actual por debajo de 70 mg/dL"
 HYPO_WARNING_MSG: str = "PRECAUCIÓN: Glucosa cercana al rango de hipoglucemia"
@@ -186,12 +330,40 @@ USER_REGISTER_ERROR_MSG: str = "Error al registrar usuario"
 PERSONALIZED_MODEL_LOADED_MSG: str = "Modelo personalizado cargado para usuario"
 PERSONALIZED_MODEL_CLONED_MSG: str = "Modelo personalizado clonado para usuario"
 PERSONALIZED_MODEL_ERROR_MSG: str = "Error al cargar modelo personalizado para"
+MODEL_MANIFEST_SCAN_ERROR_MSG: str = "Error al leer el encabezado del modelo empaquetado"
+MODEL_MANIFEST_REFRESHED_MSG: str = "Índice de modelos actualizado; usuarios con modelos personalizados:"
 USING_POPULATION_MODEL_MSG: str = "Usando modelo poblacional para usuario"
 NO_MODEL_AVAILABLE_MSG: str = "No hay modelo disponible para usuario"
 CLEANUP_MODELS_MSG: str = "Limpieza de modelos no utilizados ejecutada"
 MODEL_SAVED_MSG: str = "Modelo guardado exitosamente para usuario"
-MODEL_CLONE_DURING_REGISTRATION_MSG: str = "Modelos clonados durante registro para usuario"
-MODEL_CLONE_ERROR_DURING_REGISTRATION_MSG: str = "Error al clonar modelos durante registro para usuario"
+PERSONALIZED_MODEL_CLONE_ERROR_MSG: str = "Error al clonar modelos personalizados para usuario"
+WARMUP_STARTED_MSG: str = "Precarga de modelos iniciada; usuarios seleccionados:"
+WARMUP_FINISHED_MSG: str = "Precarga de modelos finalizada"
+WARMUP_USERS_FILE_ERROR_MSG: str = "No se pudo leer el archivo de usuarios a precargar"
+WARMUP_MODEL_ERROR_MSG: str = "Error en la precarga del modelo para usuario"
+SERVING_VARIANT_ACCEPTED_MSG: str = "Variante de inferencia aceptada; desviación máxima de dosis (U):"
+SERVING_VARIANT_REJECTED_MSG: str = "Variante de inferencia rechazada, se sirve float32; desviación máxima de dosis (U):"
+DISTILLED_POPULATION_ACCEPTED_MSG: str = "Actor poblacional destilado en servicio; desviación máxima de dosis (U):"
+DISTILLED_POPULATION_REJECTED_MSG: str = "Actor poblacional destilado rechazado; desviación máxima de dosis (U):"
+POPULATION_SERVING_ACTOR_MSG: str = "Actor poblacional en servicio:"
+DOSE_TABLE_ACCEPTED_MSG: str = "Tabla de ganancias en servicio; error máximo de dosis (U):"
+DOSE_TABLE_REJECTED_MSG: str = "Tabla de ganancias rechazada, se evalúa el actor; error máximo de dosis (U):"
+DOSE_TABLE_ERROR_MSG: str = "Error al construir la tabla de ganancias para"
+REPLAY_BUFFER_SPILLED_MSG: str = "Buffer de repetición volcado a disco para usuario"
+CGM_COMPACTION_MSG: str = "Compactación de series de CGM completada"
+CGM_STORE_WRITE_ERROR_MSG: str = "Error al guardar lecturas de CGM en disco para usuario"
+CGM_STORE_TRUNCATED_MSG: str = "Serie de CGM con columnas incompletas, se descartan lecturas no escritas para usuario"
+REPLAY_BUFFER_RESTORE_ERROR_MSG: str = "Error al restaurar el buffer de repetición del usuario"
+FEEDBACK_RECORDED_MSG: str = "Retroalimentación registrada"
+TRAINING_WORKER_STARTED_MSG: str = "Proceso de entrenamiento iniciado"
+TRAINING_WORKER_STOPPED_MSG: str = "Proceso de entrenamiento detenido"
+TRAINING_QUEUE_FULL_MSG: str = "Cola de entrenamiento llena, se descarta la transición del usuario"
+TRAINING_STEP_ERROR_MSG: str = "Error en el paso de entrenamiento del usuario"
+MODEL_VERSION_PUBLISHED_MSG: str = "Nueva versión de pesos publicada para usuario"
+MODEL_VERSION_SWAP_ERROR_MSG: str = "Error al cargar la versión publicada de pesos del usuario"
+LOW_RANK_CONVERTED_MSG: str = "Pesos convertidos a correcciones de bajo rango para usuario"
+LOW_RANK_REJECTED_MSG: str = "Conversión a bajo rango rechazada, se conservan los pesos completos del usuario"
+SHARED_POPULATION_WEIGHTS_MSG: str = "Pesos sin cambios, se siguen compartiendo los modelos poblacionales para usuario"
 
 ## Mensajes de Error
 ACTOR_MODEL_ERROR_MSG: str = "Error al cargar modelo actor desde"
@@ -1,3 +1,5 @@
+import os
+import re
 import sys
 import json
 import datetime
@@ -8,6 +10,8 @@ import logging
 from pathlib import Path
 import pandas as pd
 import pkg_resources
+from collections import OrderedDict
+from typing import Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,12 +24,166 @@ CORRECTION_BG = 120.0
 ICR = 40.0
 ISF = 12.0
 
+class CGMRing:
+    """
+    Últimas `capacity` lecturas de CGM (timestamp, valor) de un usuario en arrays preasignados.
+
+    Buffer circular: `_head` apunta a la lectura más antigua y `_count` indica cuántas hay; una
+    lectura nueva se escribe en O(1) sobre la posición siguiente y, con el buffer lleno, pisa la
+    más antigua. Las lecturas atrasadas (sincronizaciones del sensor) se ubican en orden y, ante
+    timestamps iguales, prevalece la última recibida.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity: int = capacity
+        self._timestamps: np.ndarray = np.empty(capacity, dtype=np.float64)
+        self._values: np.ndarray = np.empty(capacity, dtype=np.float32)
+        self._head: int = 0
+        self._count: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _newest(self) -> int:
+        return (self._head + self._count - 1) % self.capacity
+
+    def append(self, timestamp: float, value: float) -> bool:
+        """Agrega una lectura; devuelve False si es más antigua que todas las de un buffer lleno."""
+        if self._count and timestamp <= self._timestamps[self._newest()]:
+            return self._insert(timestamp, value)
+        position: int = (self._head + self._count) % self.capacity
+        self._timestamps[position] = timestamp
+        self._values[position] = value
+        if self._count < self.capacity:
+            self._count += 1
+        else:
+            self._head = (self._head + 1) % self.capacity
+        return True
+
+    def _insert(self, timestamp: float, value: float) -> bool:
+        """Ubica una lectura atrasada o repetida reescribiendo el buffer en orden (O(capacity))."""
+        timestamps, values = self.latest(self._count)
+        position: int = int(np.searchsorted(timestamps, timestamp))
+        if position < len(timestamps) and timestamps[position] == timestamp:
+            values[position] = value
+        elif position == 0 and self._count == self.capacity:
+            return False
+        else:
+            timestamps = np.insert(timestamps, position, timestamp)[-self.capacity:]
+            values = np.insert(values, position, value)[-self.capacity:]
+        self._count = len(values)
+        self._head = 0
+        self._timestamps[:self._count] = timestamps
+        self._values[:self._count] = values
+        return True
+
+    def latest(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copia de las últimas `count` lecturas, de la más antigua a la más reciente."""
+        count = max(0, min(count, self._count))
+        positions: np.ndarray = (self._head + self._count - count + np.arange(count)) % self.capacity
+        return self._timestamps[positions], self._values[positions]
+
+def valid_user_id(user_id) -> bool:
+    """Indica si un identificador de usuario puede usarse como nombre de archivo del historial."""
+    return isinstance(user_id, str) and HISTORY_USER_ID_PATTERN.fullmatch(user_id) is not None
+
+class UserCGMHistories:
+    """
+    Un `CGMRing` por usuario, descartando el usuario sin lecturas hace más tiempo al superar `max_users`.
+
+    El script corre una vez por predicción, así que con `directory` el historial de cada usuario se
+    carga de `<directory>/<user_id>.npy` la primera vez que se usa y se reescribe tras cada lectura.
+    Es independiente del historial de la API (api/cgm_history.py), que corre en otro proceso.
+    """
+
+    def __init__(self, capacity: int, max_users: int, directory: Optional[Path] = None):
+        self.capacity: int = capacity
+        self.max_users: int = max_users
+        self.directory: Optional[Path] = Path(directory) if directory else None
+        self._rings: "OrderedDict[str, CGMRing]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def _ring(self, user_id: str) -> CGMRing:
+        ring: Optional[CGMRing] = self._rings.get(user_id)
+        if ring is None:
+            if len(self._rings) >= self.max_users:
+                self._rings.popitem(last=False)
+            ring = self._rings[user_id] = self._load(user_id)
+        self._rings.move_to_end(user_id)
+        return ring
+
+    def _path(self, user_id: str) -> Path:
+        if not valid_user_id(user_id):
+            raise ValueError(f'Invalid user id for CGM history: {user_id!r}')
+        return self.directory / f'{user_id}.npy'
+
+    def _load(self, user_id: str) -> CGMRing:
+        ring: CGMRing = CGMRing(self.capacity)
+        if self.directory is None:
+            return ring
+        path: Path = self._path(user_id)
+        if path.exists():
+            try:
+                timestamps, values = np.load(path, allow_pickle=False)
+                for timestamp, value in zip(timestamps, values):
+                    ring.append(float(timestamp), float(value))
+            except (OSError, ValueError) as e:
+                logger.warning(f'Could not load CGM history for {user_id}: {e}')
+        return ring
+
+    def _save(self, user_id: str, ring: CGMRing) -> None:
+        if self.directory is None:
+            return
+        path: Path = self._path(user_id)
+        temporary: Path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(temporary, 'wb') as file:
+                np.save(file, np.stack(ring.latest(len(ring))).astype(np.float64))
+            os.replace(temporary, path)
+        except OSError as e:
+            # Sin historial persistido la predicción sigue, solo pierde la tendencia
+            logger.warning(f'Could not save CGM history for {user_id}: {e}')
+
+    def append(self, user_id: str, timestamp: float, value: float) -> int:
+        """Agrega una lectura y devuelve las lecturas del usuario."""
+        ring: CGMRing = self._ring(user_id)
+        if ring.append(timestamp, value):
+            self._save(user_id, ring)
+        return len(ring)
+
+    def extend(self, user_id: str, timestamps: np.ndarray, values: np.ndarray) -> Tuple[int, int]:
+        """Agrega lecturas en cualquier orden; devuelve las que se escribieron y el total del usuario."""
+        ring: CGMRing = self._ring(user_id)
+        order: np.ndarray = np.argsort(np.asarray(timestamps, dtype=np.float64), kind='stable')
+        stored: int = sum(ring.append(float(timestamps[i]), float(values[i])) for i in order)
+        if stored:
+            self._save(user_id, ring)
+        return stored, len(ring)
+
+    def latest(self, user_id: str, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Últimas lecturas del usuario (vacías si no tiene historial)."""
+        if user_id not in self._rings and self.directory is None:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+        return self._ring(user_id).latest(count)
+
 # Modelo global para evitar recargas innecesarias
 _actors = {}
-cgm_history = []
 cgm_history_max = 12
+cgm_history_max_users = 10000
+DEFAULT_HISTORY_USER = 'default'
+# Historial persistido por usuario entre ejecuciones del script (vacío lo deshabilita)
+CGM_HISTORY_DIR = os.getenv('CGM_HISTORY_DIR', str(Path(__file__).parent / 'cgm_history'))
+HISTORY_USER_ID_PATTERN = re.compile(r'[A-Za-z0-9_.@#-]{1,128}')
+# Historial por usuario del lado del servidor: los clientes ya no necesitan reenviarlo en cada solicitud
+cgm_history = UserCGMHistories(capacity=cgm_history_max, max_users=cgm_history_max_users, directory=CGM_HISTORY_DIR)
 
 class Actor(nn.Module):
+    # Operaciones aplicadas tras `net` en forward (las usa el backend de inferencia numpy)
+    OUTPUT_OPS = (("relu", None), ("scale", 0.1), ("sigmoid", None), ("scale", 1.8), ("shift", 0.2))
+
     def __init__(self, state_dim=5, action_dim=3):
         super().__init__()
         self.net = nn.Sequential(
@@ -98,7 +256,7 @@ def calculate_trend_factor(cgm_history, current_cgm):
     - Tendencia a mediano plazo (30 min)
     - Aceleración (cambio en la tendencia)
     """
-    if not cgm_history or len(cgm_history) < 6:
+    if cgm_history is None or len(cgm_history) < 6:
         return 1.0
     
     trend_15min = (current_cgm - cgm_history[-3]) / 15 if len(cgm_history) >= 3 else 0
@@ -134,13 +292,23 @@ def calculate_trend_factor(cgm_history, current_cgm):
     
     return np.clip(base_factor, 0.5, 2.0)
 
-def update_cgm_history(cgm):
-    """Actualiza el historial de CGM."""
-    global cgm_history
-    cgm_history.append(cgm)
-    if len(cgm_history) > cgm_history_max:
-        cgm_history.pop(0)
-    return cgm_history
+def update_cgm_history(cgm: float, user_id: str = DEFAULT_HISTORY_USER, timestamp: Optional[float] = None) -> np.ndarray:
+    """
+    Agrega una lectura al historial de CGM del usuario y devuelve sus últimos valores
+    (del más antiguo al más reciente).
+    """
+    if timestamp is None:
+        timestamp = datetime.datetime.now().timestamp()
+    cgm_history.append(user_id, timestamp, cgm)
+    return cgm_history.latest(user_id, cgm_history_max)[1]
+
+def ingest_cgm_readings(user_id: str, timestamps, values) -> int:
+    """
+    Carga un bloque de lecturas (timestamps en segundos epoch) en el historial del usuario,
+    por ejemplo al sincronizar datos atrasados del sensor. Devuelve las lecturas guardadas.
+    """
+    stored, _ = cgm_history.extend(user_id, np.asarray(timestamps, dtype=np.float64), np.asarray(values, dtype=np.float32))
+    return stored
 
 def apply_hypo_guard(cgm_value: float, bolus: float, threshold: float = 70.0) -> float:
     """
@@ -177,7 +345,7 @@ def compute_bolus(gains, cho, cgm, iob, mealtime, patient_icr=None, patient_isf=
     """
     bg = cgm  # Asignar siempre el valor de glucosa actual
     
-    trend_factor = calculate_trend_factor(cgm_history, bg) if cgm_history else 1.0
+    trend_factor = calculate_trend_factor(cgm_history, bg) if cgm_history is not None and len(cgm_history) else 1.0
     
     # Convertir gains a numpy si es tensor
     if isinstance(gains, torch.Tensor):
@@ -231,17 +399,101 @@ def compute_bolus(gains, cho, cgm, iob, mealtime, patient_icr=None, patient_isf=
 
     return bolus, meal_dose, correction_dose
 
+def apply_hypo_guard_batch(cgm_values, bolus, threshold: float = 70.0):
+    """
+    Versión vectorizada de apply_hypo_guard: recibe arrays de CGM y bolos
+    y aplica la misma reducción gradual fila a fila.
+    """
+    cgm_values = np.asarray(cgm_values)
+    bolus = np.asarray(bolus)
+    reduction_factor = (cgm_values - 50) / (threshold - 50)
+    guarded = np.where(cgm_values < 50, 0.0, bolus * reduction_factor)
+    return np.where(cgm_values < threshold, guarded, bolus)
+
+def apply_contextual_constraints_batch(gains, cgm, cho):
+    """
+    Versión vectorizada de apply_contextual_constraints para gains con forma (N, 3).
+    """
+    gains = np.array(gains, copy=True)  # Crear una copia para no modificar el original
+    cgm = np.asarray(cgm)
+
+    hypo = cgm < 70  # Hipoglucemia
+    severe_hyper = ~hypo & (cgm > 250)  # Hiperglucemia severa
+
+    gains[hypo, 0] *= 0.5
+    gains[hypo, 1] *= 0.1
+    gains[severe_hyper, 1] *= 1.5
+
+    return gains
+
+def compute_bolus_batch(gains, cho, cgm, iob, mealtime, patient_icr=None, patient_isf=None, trend_factor=None):
+    """
+    Versión vectorizada de compute_bolus.
+
+    Recibe gains con forma (N, 3) y arrays (N,) de cho, cgm, iob y mealtime, y
+    devuelve arrays (N,) de bolo total, dosis de comida y dosis de corrección.
+    En lugar del historial de CGM recibe el trend_factor ya calculado por fila
+    (1.0 si no se indica). Los cálculos se hacen en float64.
+    """
+    if isinstance(gains, torch.Tensor):
+        gains = gains.detach().cpu().numpy()
+    gains = np.asarray(gains, dtype=np.float64)
+
+    cho = np.asarray(cho, dtype=np.float64)
+    bg = np.asarray(cgm, dtype=np.float64)
+    iob = np.asarray(iob, dtype=np.float64)
+    mealtime = np.asarray(mealtime, dtype=bool)
+    trend_factor = 1.0 if trend_factor is None else np.asarray(trend_factor, dtype=np.float64)
+
+    # Aplicar restricciones contextuales
+    gains = apply_contextual_constraints_batch(gains, bg, cho)
+
+    icr_to_use = patient_icr if patient_icr is not None else ICR
+    isf_to_use = patient_isf if patient_isf is not None else ISF
+
+    # Calcular componente de comida
+    meal_dose = np.where(mealtime & (cho > 0), (cho / icr_to_use) * gains[:, 0], 0.0)
+    bolus = meal_dose
+
+    # Calcular componente de corrección
+    correction_mask = bg > CORRECTION_BG
+    correction = (bg - CORRECTION_BG) / isf_to_use * trend_factor
+    correction_dose = np.where(correction_mask, correction * gains[:, 1], 0.0)
+    bolus = np.where(correction_mask, bolus + correction_dose, bolus)
+
+    # Ajustar por insulina activa
+    iob_mask = iob > 0
+    iob_reduction = np.where(iob_mask, iob * gains[:, 2], 0.0)
+    bolus = np.where(iob_mask, np.maximum(0.0, bolus - iob_reduction), bolus)
+
+    # Aplicar límites de seguridad
+    bolus = apply_hypo_guard_batch(bg, bolus)
+
+    # Si el bolo es positivo pero muy pequeño, redondear a min_bolus
+    bolus = np.where((bolus > 0) & (bolus < MIN_BOLUS), MIN_BOLUS, bolus)
+
+    bolus = np.minimum(bolus, MAX_BOLUS_ABS)
+
+    # Recalcular desglose si el bolo total fue ajustado
+    zero_bolus = bolus == 0
+    total_calculated = (meal_dose + correction_dose) - iob_reduction
+    rescale = ~zero_bolus & (total_calculated > 0)
+    ratio = bolus / np.where(rescale, total_calculated, 1.0)
+    meal_dose = np.where(zero_bolus, 0.0, np.where(rescale, meal_dose * ratio, meal_dose))
+    correction_dose = np.where(zero_bolus, 0.0, np.where(rescale, correction_dose * ratio, correction_dose))
+
+    return bolus, meal_dose, correction_dose
+
 def prepare_state(cgm, cho, hour_of_day, iob, cgm_history=None):
     """Prepara el estado para el modelo DRL, incluyendo trend_factor."""
     minutes_since_midnight = hour_of_day * 60
     cho_rate = cho / 5.0 if cho > 0 else 0.0  # Distribución en 5 minutos
-    trend_factor = calculate_trend_factor(cgm_history, cgm) if cgm_history else 1.0
+    trend_factor = calculate_trend_factor(cgm_history, cgm) if cgm_history is not None and len(cgm_history) else 1.0
     state = np.array([cgm, cho_rate, minutes_since_midnight, iob, trend_factor], dtype=np.float32)
     logger.info(f'Prepared state: {state}')
     return state
 
 def predict_insulin(data):
-    global cgm_history
     try:
         logger.info('Starting insulin prediction')
         logger.info(f'Input data: {json.dumps(data, indent=2)}')
@@ -267,14 +519,20 @@ def predict_insulin(data):
         cho = float(data['carbs'])
         iob = float(data.get('insulinOnBoard', 0.0))
         
-        # Actualizar historial de CGM
+        # Historial de CGM: el guardado por usuario entre ejecuciones; un historial enviado por el
+        # cliente (formato anterior) se sigue aceptando y tiene prioridad. Sin identificador no se
+        # usa un historial compartido, que mezclaría lecturas de distintos pacientes.
+        user_id = data.get('user_id') or data.get('patient_name')
+        history = None
+        if valid_user_id(user_id):
+             history = update_cgm_history(cgm, user_id, request_date.timestamp())
+        elif user_id:
+             logger.warning(f'Ignoring CGM history for invalid user id {user_id!r}')
         if 'cgm_history' in data and data['cgm_history']:
-             cgm_history = data['cgm_history']
-        else:
-             cgm_history = update_cgm_history(cgm)
+             history = data['cgm_history']
 
         # Preparar el estado
-        state = prepare_state(cgm, cho, hour_of_day, iob, cgm_history)
+        state = prepare_state(cgm, cho, hour_of_day, iob, history)
         state_tensor = torch.FloatTensor(state).unsqueeze(0).to(device)
         
         # Obtener las ganancias del actor (igual que en validación)
@@ -284,7 +542,7 @@ def predict_insulin(data):
         
         # Calcular el bolo
         mealtime = cho > 0
-        bolus, meal_dose, correction_dose = compute_bolus(gains, cho, cgm, iob, mealtime, ICR, ISF, cgm_history)
+        bolus, meal_dose, correction_dose = compute_bolus(gains, cho, cgm, iob, mealtime, ICR, ISF, history)
         
         # Convertir a float nativo
         bolus = round(float(bolus), 2)
@@ -0,0 +1,86 @@
+import numpy as np
+
+from model_predictor import (
+    apply_contextual_constraints,
+    apply_contextual_constraints_batch,
+    apply_hypo_guard,
+    apply_hypo_guard_batch,
+    calculate_trend_factor,
+    compute_bolus,
+    compute_bolus_batch,
+)
+
+NUM_CASES = 5000
+
+def _random_cases(rng, n):
+    """Genera entradas aleatorias con alta densidad en los umbrales clínicos."""
+    edges = np.array([0.0, 45.0, 50.0, 60.0, 69.999, 70.0, 120.0, 120.001, 250.0, 250.001, 400.0])
+    cgm = np.where(rng.random(n) < 0.3, rng.choice(edges, n), rng.uniform(30.0, 450.0, n))
+    cho = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0.0, 300.0, n))
+    iob = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0.0, 50.0, n))
+    gains = rng.uniform(0.0, 2.5, (n, 3))
+    mealtime = rng.random(n) < 0.8
+    trend = np.where(rng.random(n) < 0.5, 1.0, rng.uniform(0.5, 2.0, n))
+    return gains, cho, cgm, iob, mealtime, trend
+
+def test_apply_hypo_guard_batch_matches_scalar():
+    rng = np.random.default_rng(0)
+    _, _, cgm, _, _, _ = _random_cases(rng, NUM_CASES)
+    bolus = rng.uniform(0.0, 25.0, NUM_CASES)
+
+    batch = apply_hypo_guard_batch(cgm, bolus)
+    expected = np.array([apply_hypo_guard(float(c), float(b)) for c, b in zip(cgm, bolus)])
+
+    np.testing.assert_array_equal(batch, expected)
+
+def test_apply_contextual_constraints_batch_matches_scalar():
+    rng = np.random.default_rng(1)
+    gains, cho, cgm, _, _, _ = _random_cases(rng, NUM_CASES)
+    gains = gains.astype(np.float32)
+
+    batch = apply_contextual_constraints_batch(gains, cgm, cho)
+    expected = np.stack([apply_contextual_constraints(g, float(c), float(h)) for g, c, h in zip(gains, cgm, cho)])
+
+    np.testing.assert_array_equal(batch, expected)
+    assert batch.dtype == gains.dtype
+
+def test_compute_bolus_batch_matches_scalar():
+    rng = np.random.default_rng(2)
+    gains, cho, cgm, iob, mealtime, _ = _random_cases(rng, NUM_CASES)
+
+    # Historiales por fila: vacíos, cortos o completos, con tendencias variadas
+    lengths = rng.choice([0, 4, 12], NUM_CASES)
+    histories = [
+        list(c - rng.uniform(-4.0, 4.0) * np.arange(n, 0, -1) * 5) if n else None
+        for c, n in zip(cgm, lengths)
+    ]
+    trend = np.array([calculate_trend_factor(h, c) if h else 1.0 for h, c in zip(histories, cgm)])
+
+    bolus, meal_dose, correction_dose = compute_bolus_batch(
+        gains, cho, cgm, iob, mealtime, trend_factor=trend
+    )
+
+    for i in range(NUM_CASES):
+        expected = compute_bolus(
+            gains[i], float(cho[i]), float(cgm[i]), float(iob[i]), bool(mealtime[i]),
+            cgm_history=histories[i]
+        )
+        assert bolus[i] == expected[0], i
+        assert meal_dose[i] == expected[1], i
+        assert correction_dose[i] == expected[2], i
+
+def test_compute_bolus_batch_float32_gains_match_scalar_within_rounding():
+    # Con gains float32 la versión escalar acumula en float32; el lote opera en float64
+    rng = np.random.default_rng(3)
+    gains, cho, cgm, iob, mealtime, _ = _random_cases(rng, NUM_CASES)
+    gains = gains.astype(np.float32)
+
+    bolus, meal_dose, correction_dose = compute_bolus_batch(gains, cho, cgm, iob, mealtime)
+    expected = np.array([
+        compute_bolus(g, float(c), float(b), float(i), bool(m))
+        for g, c, b, i, m in zip(gains, cho, cgm, iob, mealtime)
+    ], dtype=np.float64)
+
+    np.testing.assert_allclose(bolus, expected[:, 0], rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(meal_dose, expected[:, 1], rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(correction_dose, expected[:, 2], rtol=1e-4, atol=1e-4)
@@ -0,0 +1,77 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import model_predictor
+from model_predictor import CGMRing, UserCGMHistories
+
+def test_ring_overwrites_the_oldest_reading():
+    ring = CGMRing(3)
+    for minute in range(5):
+        ring.append(minute * 300.0, 100.0 + minute)
+
+    timestamps, values = ring.latest(10)
+
+    assert len(ring) == 3 and ring._head == 2
+    np.testing.assert_array_equal(timestamps, [600.0, 900.0, 1200.0])
+    np.testing.assert_array_equal(values, [102.0, 103.0, 104.0])
+    np.testing.assert_array_equal(ring.latest(2)[1], [103.0, 104.0])
+
+def test_late_and_repeated_readings_are_kept_in_order():
+    ring = CGMRing(3)
+    ring.append(300.0, 110.0)
+    ring.append(900.0, 130.0)
+    ring.append(600.0, 120.0)
+    ring.append(900.0, 135.0)
+
+    assert not ring.append(0.0, 90.0)
+    np.testing.assert_array_equal(ring.latest(3)[0], [300.0, 600.0, 900.0])
+    np.testing.assert_array_equal(ring.latest(3)[1], [110.0, 120.0, 135.0])
+
+    ring.append(1200.0, 140.0)
+    np.testing.assert_array_equal(ring.latest(3)[1], [120.0, 135.0, 140.0])
+
+def test_histories_are_per_user_and_bounded():
+    histories = UserCGMHistories(capacity=4, max_users=2)
+    stored, total = histories.extend("u1", np.array([900.0, 300.0, 600.0]), np.array([3.0, 1.0, 2.0]))
+    histories.append("u2", 0.0, 50.0)
+    histories.append("u3", 0.0, 60.0)
+
+    assert (stored, total) == (3, 3)
+    assert len(histories) == 2 and len(histories.latest("u1", 4)[0]) == 0
+    np.testing.assert_array_equal(histories.latest("u3", 4)[1], [60.0])
+
+def test_histories_persist_between_runs(tmp_path):
+    UserCGMHistories(capacity=4, max_users=2, directory=tmp_path).extend("u1", np.arange(5) * 300.0, np.arange(5) + 100.0)
+    reloaded = UserCGMHistories(capacity=4, max_users=2, directory=tmp_path)
+    reloaded.append("u1", 1500.0, 200.0)
+
+    np.testing.assert_array_equal(reloaded.latest("u1", 4)[1], [102.0, 103.0, 104.0, 200.0])
+    assert len(UserCGMHistories(capacity=4, max_users=2, directory=tmp_path).latest("u1", 4)[1]) == 4
+    with pytest.raises(ValueError):
+        reloaded.append("../u1", 0.0, 100.0)
+
+def test_trend_uses_the_history_persisted_by_previous_calls(monkeypatch, tmp_path):
+    start = datetime.datetime(2025, 6, 19, 12, 0)
+    for minutes in range(0, 45, 5):
+        # Cada llamada simula una ejecución nueva del script, sin historial en memoria
+        monkeypatch.setattr(model_predictor, "cgm_history", UserCGMHistories(12, 10, directory=tmp_path))
+        served = model_predictor.predict_insulin({
+            "user_id": "u1",
+            "date": (start + datetime.timedelta(minutes=minutes)).isoformat(),
+            "cgm": 150.0 + 3 * minutes,
+            "carbs": 30.0
+        })
+
+    history = model_predictor.cgm_history.latest("u1", 12)[1]
+    supplied = model_predictor.predict_insulin({
+        "date": (start + datetime.timedelta(minutes=40)).isoformat(),
+        "cgm": 270.0,
+        "carbs": 30.0,
+        "cgm_history": history.tolist()
+    })
+
+    assert len(history) == 9
+    assert model_predictor.calculate_trend_factor(history, 270.0) > 1.0
+    assert served == supplied and "error" not in served